@@ -6,3 +6,6 @@ class AiManagementConfig(AppConfig):
     name = "ai_management"
     verbose_name = "AI管理"
 
+    def ready(self):
+        """应用就绪时导入信号"""
+        import ai_management.signals  # noqa
@@ -6,15 +6,20 @@ Tab3 AI 对话 WebSocket Consumer
 2) session/thread/conversation 归属强校验
 3) MCP 白名单工具桥接（客户端工具调用）
 4) 结构化消息推送（card/action_result/scope_hint）
+5) 连接级上下文缓存（用户/权限范围/当前会话）与消息批量落库，按消息记录数据库耗时
 """
 import asyncio
 import json
 import logging
 import re
+import time
 import uuid
 from typing import Optional
 
+from asgiref.sync import async_to_sync
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.db import transaction
 from django.utils import timezone
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
@@ -37,6 +42,24 @@ from conf import env
 
 logger = logging.getLogger(__name__)
 
+# 缓冲的待写入条数达到该值时立即触发落库
+TAB3_WRITE_BUFFER_LIMIT = 20
+
+
+def tab3_context_group(user_id) -> str:
+    return f"tab3_context_{user_id}"
+
+
+def notify_tab3_context_changed(user_id) -> None:
+    """通知该用户的所有 Tab3 连接刷新权限范围上下文（角色、部门等变化后调用）。"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not user_id:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(tab3_context_group(user_id), {"type": "tab3.context_changed"})
+    except Exception:
+        logger.warning("Notify tab3 context change failed: user_id=%s", user_id, exc_info=True)
+
 
 def _looks_like_customer_count_question(text: str) -> bool:
     value = (text or "").strip()
@@ -443,6 +466,22 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         self.user_id: Optional[int] = None
         self.conversation_id: Optional[int] = None
         self.client = None
+        # 连接级上下文：连接建立时解析一次，变化时显式刷新
+        self.scope_payload: Optional[dict] = None
+        self.capabilities_payload: Optional[dict] = None
+        self._session: Optional[Tab3Session] = None
+        self._conversation: Optional[AIConversation] = None
+        # 待批量写入的消息、历史、会话时间与 session 字段
+        self._pending_messages: list[dict] = []
+        self._pending_histories: list[dict] = []
+        self._pending_touch: set[int] = set()
+        self._pending_session_fields: dict[str, dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # 当前消息的数据库耗时统计
+        self._db_seconds = 0.0
+        self._db_calls = 0
+        self.last_metrics: dict = {}
 
     def _extract_token(self) -> Optional[str]:
         """从 headers 或 querystring 提取 Bearer token。"""
@@ -480,7 +519,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         jwt_auth = JWTAuthentication()
         try:
             validated = jwt_auth.get_validated_token(token)
-            user = await asyncio.to_thread(jwt_auth.get_user, validated)
+            user = await self._db(jwt_auth.get_user, validated)
             self.user_id = getattr(user, "id", None)
             return bool(self.user_id)
         except InvalidToken:
@@ -529,9 +568,6 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
             modifier=str(user_id),
         )
 
-    def _db_touch_conversation(self, conversation_id: int):
-        AIConversation.objects.filter(id=conversation_id, is_deleted=False).update(last_message_time=timezone.now())
-
     def _db_create_session(
         self,
         session_id: str,
@@ -555,48 +591,167 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         session_obj.save(update_fields=list(fields.keys()) + ["update_datetime"])
         return session_obj
 
-    def _db_save_user_message(self, conversation_id: int, user_id: int, text: str, attachments: list):
-        AIMessage.objects.create(
-            conversation_id=conversation_id,
-            role="user",
-            message_type="text",
-            content_json={"text": text, "attachments": attachments or []},
-            creator_id=user_id,
-            modifier=str(user_id),
-        )
-        self._db_touch_conversation(conversation_id)
+    def _db_flush_writes(self, messages: list, histories: list, touched: set, session_fields: dict):
+        now = timezone.now()
+        with transaction.atomic():
+            if messages:
+                AIMessage.objects.bulk_create([AIMessage(**row) for row in messages])
+            if histories:
+                AIChatHistory.objects.bulk_create([AIChatHistory(**row) for row in histories])
+            if touched:
+                AIConversation.objects.filter(id__in=touched, is_deleted=False).update(last_message_time=now)
+            for session_id, fields in session_fields.items():
+                Tab3Session.objects.filter(session_id=session_id, user_id=self.user_id).update(
+                    update_datetime=now, **fields
+                )
 
-    def _db_save_ai_message(self, conversation_id: int, user_id: int, text: str):
-        AIMessage.objects.create(
-            conversation_id=conversation_id,
-            role="assistant",
-            message_type="text",
-            content_json={"text": text},
-            creator_id=user_id,
-            modifier=str(user_id),
+    async def _db(self, func, *args, **kwargs):
+        """在线程中执行 ORM 调用，并计入当前消息的数据库耗时。"""
+        started = time.perf_counter()
+        try:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        finally:
+            self._db_seconds += time.perf_counter() - started
+            self._db_calls += 1
+
+    async def _db_ordered(self, func, *args, **kwargs):
+        """会自行写入会话消息的工具调用：先落库缓冲的消息，保证消息顺序。"""
+        started = time.perf_counter()
+        await self._ensure_flushed()
+        self._db_seconds += time.perf_counter() - started
+        return await self._db(func, *args, **kwargs)
+
+    # ---------------- 连接级上下文 ----------------
+
+    async def _load_context(self):
+        self.scope_payload = await self._db(crm_get_scope, self.user_id)
+        self.capabilities_payload = await self._db(get_tab3_capabilities)
+
+    async def _refresh_context(self):
+        await self._load_context()
+        await self.send_json(
+            {
+                "type": "scope_hint",
+                "scope": self.scope_payload,
+                "conversationId": self.conversation_id,
+                "sessionId": self.session_id,
+            }
+        )
+        await self.send_json({"type": "capabilities", "capabilities": self.capabilities_payload})
+
+    async def tab3_context_changed(self, event):
+        """channels group 消息：用户角色/部门等变化后刷新上下文。"""
+        await self._refresh_context()
+
+    async def _get_session(self, session_id: str):
+        if self._session is not None and self._session.session_id == session_id:
+            return self._session
+        return await self._db(self._db_get_session, session_id)
+
+    async def _get_conversation(self, conversation_id: int):
+        if self._conversation is not None and self._conversation.id == conversation_id:
+            return self._conversation
+        return await self._db(self._db_get_conversation, conversation_id, int(self.user_id))
+
+    async def _update_session(self, session_obj: Tab3Session, **fields):
+        # 与批量落库串行，避免缓冲中的旧字段覆盖本次更新
+        async with self._flush_lock:
+            pending = self._pending_session_fields.get(session_obj.session_id)
+            if pending:
+                for key in fields:
+                    pending.pop(key, None)
+            return await self._db(self._db_update_session, session_obj, **fields)
+
+    # ---------------- 批量落库 ----------------
+
+    def _buffered_count(self) -> int:
+        return (
+            len(self._pending_messages)
+            + len(self._pending_histories)
+            + sum(len(fields) for fields in self._pending_session_fields.values())
         )
-        self._db_touch_conversation(conversation_id)
 
-    def _db_save_legacy_history(self, user_id: int, message: str, answer: str):
-        AIChatHistory.objects.create(
-            user_id=user_id,
-            message=message,
-            response=answer,
-            context_type="tab3",
-            context_id=None,
-            model_name="xpert",
+    def _queue_message(self, conversation_id: int, role: str, message_type: str, content_json: dict):
+        self._pending_messages.append(
+            {
+                "conversation_id": conversation_id,
+                "role": role,
+                "message_type": message_type,
+                "content_json": content_json,
+                "creator_id": self.user_id,
+                "modifier": str(self.user_id),
+            }
         )
+        self._pending_touch.add(conversation_id)
+        if self._buffered_count() >= TAB3_WRITE_BUFFER_LIMIT:
+            self._schedule_flush()
 
-    def _db_save_scope_hint_message(self, conversation_id: int, user_id: int, scope_payload: dict):
-        AIMessage.objects.create(
-            conversation_id=conversation_id,
-            role="assistant",
-            message_type="scope_hint",
-            content_json=scope_payload,
-            creator_id=user_id,
-            modifier=str(user_id),
+    def _queue_user_message(self, conversation_id: int, text: str, attachments: list):
+        self._queue_message(conversation_id, "user", "text", {"text": text, "attachments": attachments or []})
+
+    def _queue_ai_message(self, conversation_id: int, text: str):
+        self._queue_message(conversation_id, "assistant", "text", {"text": text})
+
+    def _queue_legacy_history(self, message: str, answer: str):
+        self._pending_histories.append(
+            {
+                "user_id": int(self.user_id),
+                "message": message,
+                "response": answer,
+                "context_type": "tab3",
+                "context_id": None,
+                "model_name": "xpert",
+            }
         )
-        self._db_touch_conversation(conversation_id)
+
+    def _queue_session_fields(self, session_id: str, **fields):
+        if self._session is not None and self._session.session_id == session_id:
+            for key, value in fields.items():
+                setattr(self._session, key, value)
+        self._pending_session_fields.setdefault(session_id, {}).update(fields)
+
+    async def _flush_writes(self):
+        async with self._flush_lock:
+            if not (self._pending_messages or self._pending_histories or self._pending_session_fields):
+                return
+            messages, self._pending_messages = self._pending_messages, []
+            histories, self._pending_histories = self._pending_histories, []
+            touched, self._pending_touch = self._pending_touch, set()
+            session_fields, self._pending_session_fields = self._pending_session_fields, {}
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._db_flush_writes, messages, histories, touched, session_fields)
+            except Exception:
+                logger.error("Tab3 batched write failed, will retry: user_id=%s", self.user_id, exc_info=True)
+                # 放回缓冲区头部，下次落库重试
+                self._pending_messages[:0] = messages
+                self._pending_histories[:0] = histories
+                self._pending_touch |= touched
+                for session_id, fields in session_fields.items():
+                    merged = dict(fields)
+                    merged.update(self._pending_session_fields.get(session_id, {}))
+                    self._pending_session_fields[session_id] = merged
+                return
+            logger.debug(
+                "Tab3 batched write: user_id=%s messages=%s histories=%s sessions=%s ms=%.1f",
+                self.user_id,
+                len(messages),
+                len(histories),
+                len(session_fields),
+                (time.perf_counter() - started) * 1000,
+            )
+
+    def _schedule_flush(self):
+        """后台落库，不阻塞当前消息的响应。"""
+        if not self._buffered_count():
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_writes())
+
+    async def _ensure_flushed(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self._flush_writes()
 
     async def _reset_current_thread(self, reason: str):
         """
@@ -615,10 +770,9 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         self.run_id = None
 
         if self.session_id:
-            session = await asyncio.to_thread(self._db_get_session, self.session_id)
+            session = await self._get_session(self.session_id)
             if session and session.user_id == self.user_id:
-                await asyncio.to_thread(
-                    self._db_update_session,
+                await self._update_session(
                     session,
                     thread_id="",
                     last_run_id="",
@@ -640,34 +794,70 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         if not ok:
             return
         await self.accept()
-        scope_payload = await asyncio.to_thread(crm_get_scope, self.user_id)
-        capabilities_payload = await asyncio.to_thread(get_tab3_capabilities)
+        if self.channel_layer is not None:
+            await self.channel_layer.group_add(tab3_context_group(self.user_id), self.channel_name)
+        await self._load_context()
         await self.send_json(
             {
                 "type": "scope_hint",
-                "scope": scope_payload,
+                "scope": self.scope_payload,
             }
         )
         await self.send_json(
             {
                 "type": "capabilities",
-                "capabilities": capabilities_payload,
+                "capabilities": self.capabilities_payload,
             }
         )
         logger.info("Tab3 WS connected: user_id=%s", self.user_id)
 
     async def disconnect(self, close_code):
+        if self.user_id and self.channel_layer is not None:
+            await self.channel_layer.group_discard(tab3_context_group(self.user_id), self.channel_name)
+        try:
+            await self._ensure_flushed()
+        except Exception:
+            logger.warning("Failed to flush tab3 writes on disconnect", exc_info=True)
         if self.session_id:
-            session = await asyncio.to_thread(self._db_get_session, self.session_id)
+            session = await self._get_session(self.session_id)
             if session and session.user_id == self.user_id:
                 try:
-                    await asyncio.to_thread(self._db_update_session, session, is_active=False)
+                    await self._update_session(session, is_active=False)
                 except Exception:
                     logger.warning("Failed to update session status on disconnect", exc_info=True)
         logger.info("Tab3 WS disconnected: user_id=%s session=%s code=%s", self.user_id, self.session_id, close_code)
 
     async def receive_json(self, content, **kwargs):
         msg_type = content.get("type")
+        started = time.perf_counter()
+        self._db_seconds = 0.0
+        self._db_calls = 0
+        try:
+            await self._dispatch(msg_type, content)
+        finally:
+            buffered = self._buffered_count()
+            self._schedule_flush()
+            self.last_metrics = {
+                "type": msg_type,
+                "db_calls": self._db_calls,
+                "db_ms": round(self._db_seconds * 1000, 1),
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                "buffered_writes": buffered,
+            }
+            logger.info(
+                "Tab3 message metrics: user_id=%s type=%s db_calls=%s db_ms=%s total_ms=%s buffered_writes=%s",
+                self.user_id,
+                msg_type,
+                self.last_metrics["db_calls"],
+                self.last_metrics["db_ms"],
+                self.last_metrics["total_ms"],
+                buffered,
+            )
+
+    async def _dispatch(self, msg_type, content: dict):
+        if msg_type == "refresh_context":
+            await self._refresh_context()
+            return
         if msg_type == "user_message":
             await self.handle_user_message(content)
             return
@@ -696,20 +886,22 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         if not conversation_id:
             await self.send_json({"type": "error", "code": "missing_conversation", "message": "缺少 conversationId"})
             return
-        conversation = await asyncio.to_thread(self._db_get_conversation, int(conversation_id), int(self.user_id))
+        # 切换会话时总是重新校验归属
+        conversation = await self._db(self._db_get_conversation, int(conversation_id), int(self.user_id))
         if not conversation:
             await self.send_json({"type": "error", "code": "conversation_not_found", "message": "会话不存在或无权访问"})
             return
 
-        latest_session = await asyncio.to_thread(
+        latest_session = await self._db(
             self._db_get_latest_session_by_conversation,
             conversation.id,
             int(self.user_id),
         )
+        self._conversation = conversation
+        self._session = latest_session
         self.conversation_id = conversation.id
         self.session_id = latest_session.session_id if latest_session else None
         self.thread_id = latest_session.thread_id if latest_session else None
-        scope_payload = await asyncio.to_thread(crm_get_scope, self.user_id)
         await self.send_json(
             {
                 "type": "conversation_meta",
@@ -721,7 +913,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         await self.send_json(
             {
                 "type": "scope_hint",
-                "scope": scope_payload,
+                "scope": self.scope_payload,
                 "conversationId": conversation.id,
                 "sessionId": self.session_id,
             }
@@ -732,7 +924,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         if not operation_id:
             await self.send_json({"type": "error", "code": "missing_operation_id", "message": "缺少 operationId"})
             return
-        result = await asyncio.to_thread(
+        result = await self._db_ordered(
             confirm_pending_action,
             self.user_id,
             operation_id,
@@ -762,7 +954,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         if not operation_id:
             await self.send_json({"type": "error", "code": "missing_operation_id", "message": "缺少 operationId"})
             return
-        result = await asyncio.to_thread(crm_cancel_action, self.user_id, operation_id)
+        result = await self._db_ordered(crm_cancel_action, self.user_id, operation_id)
         if not result.get("success"):
             await self.send_json(
                 {
@@ -788,7 +980,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         if not operation_id and not conversation_id:
             await self.send_json({"type": "error", "code": "missing_operation_id", "message": "缺少 operationId"})
             return
-        result = await asyncio.to_thread(
+        result = await self._db_ordered(
             crm_patch_pending_action,
             self.user_id,
             operation_id or None,
@@ -891,7 +1083,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
 
         # 1) 如果传入 sessionId，先校验归属
         if requested_session_id:
-            session = await asyncio.to_thread(self._db_get_session, requested_session_id)
+            session = await self._get_session(requested_session_id)
             if session and session.user_id and int(session.user_id) != int(self.user_id):
                 await self.send_json(
                     {
@@ -902,8 +1094,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                 )
                 return None, None, None
             if session and session.user_id in (None, 0):
-                session = await asyncio.to_thread(
-                    self._db_update_session,
+                session = await self._update_session(
                     session,
                     user_id=self.user_id,
                 )
@@ -913,11 +1104,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         # 2) 如果传入 conversationId，校验归属
         if requested_conversation_id:
             try:
-                conversation = await asyncio.to_thread(
-                    self._db_get_conversation,
-                    int(requested_conversation_id),
-                    int(self.user_id),
-                )
+                conversation = await self._get_conversation(int(requested_conversation_id))
             except Exception:
                 conversation = None
             if not conversation:
@@ -942,7 +1129,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
 
         # 3) 若都没有，则新建 conversation
         if not conversation:
-            conversation = await asyncio.to_thread(
+            conversation = await self._db(
                 self._db_create_conversation,
                 int(self.user_id),
                 self._conversation_title_from_message(message),
@@ -958,20 +1145,21 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                     },
                 }
             )
-            scope_payload = await asyncio.to_thread(crm_get_scope, self.user_id)
-            await asyncio.to_thread(self._db_save_scope_hint_message, conversation.id, int(self.user_id), scope_payload)
+            self._queue_message(conversation.id, "assistant", "scope_hint", self.scope_payload)
             await self.send_json(
                 {
                     "type": "scope_hint",
-                    "scope": scope_payload,
+                    "scope": self.scope_payload,
                     "conversationId": conversation.id,
                     "sessionId": None,
                 }
             )
 
         # 4) 若没有 session 但已有 conversation，尝试找到该会话最近活跃 session
+        if not session and self._session is not None and self._session.conversation_id == conversation.id:
+            session = self._session
         if not session:
-            session = await asyncio.to_thread(
+            session = await self._db(
                 self._db_get_latest_session_by_conversation,
                 conversation.id,
                 int(self.user_id),
@@ -979,12 +1167,13 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
 
         # 5) 若 session 存在但未绑 conversation，则回填
         if session and not session.conversation_id:
-            session = await asyncio.to_thread(
-                self._db_update_session,
+            session = await self._update_session(
                 session,
                 conversation_id=conversation.id,
             )
 
+        self._conversation = conversation
+        self._session = session
         self.conversation_id = conversation.id
         self.session_id = session.session_id if session else None
         self.thread_id = session.thread_id if session else None
@@ -1003,26 +1192,21 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
         if not conversation:
             return
 
-        # 记录用户消息
-        await asyncio.to_thread(
-            self._db_save_user_message,
-            conversation.id,
-            int(self.user_id),
-            message,
-            attachments,
-        )
+        # 记录用户消息：后台落库，与后续查询/模型调用并行
+        self._queue_user_message(conversation.id, message, attachments)
+        self._schedule_flush()
 
         # 默认编辑模式：会话内存在待确认卡片时，优先把用户输入解释为卡片编辑
         editing_operation_id = (content.get("editingOperationId") or "").strip()
         if not self._is_exit_edit_intent(message):
-            latest_pending = await asyncio.to_thread(
+            latest_pending = await self._db(
                 get_latest_pending_action,
                 self.user_id,
                 conversation.id,
             )
             operation_id_for_edit = editing_operation_id or latest_pending.get("operation_id")
             if operation_id_for_edit:
-                patched = await asyncio.to_thread(
+                patched = await self._db_ordered(
                     crm_patch_pending_action,
                     self.user_id,
                     operation_id_for_edit,
@@ -1055,7 +1239,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
 
         # 计数查询优先走结构化工具，避免误用名称模糊匹配
         if self._is_customer_count_intent(message):
-            counted = await asyncio.to_thread(
+            counted = await self._db(
                 crm_count_customers,
                 self.user_id,
                 None,
@@ -1068,8 +1252,8 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
             )
             if counted.get("success"):
                 answer = self._format_count_result_message(counted)
-                await asyncio.to_thread(self._db_save_legacy_history, int(self.user_id), message, answer)
-                await asyncio.to_thread(self._db_save_ai_message, conversation.id, int(self.user_id), answer)
+                self._queue_legacy_history(message, answer)
+                self._queue_ai_message(conversation.id, answer)
                 if counted.get("need_clarify"):
                     await self.send_json(
                         {
@@ -1091,7 +1275,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
 
         # 快速卡片链路：跟进意图直接生成草稿卡
         if self._is_followup_intent(message):
-            prepared = await asyncio.to_thread(
+            prepared = await self._db_ordered(
                 crm_prepare_followup,
                 self.user_id,
                 conversation.id,
@@ -1148,8 +1332,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                 self.thread_id = thread_id
 
                 if session:
-                    session = await asyncio.to_thread(
-                        self._db_update_session,
+                    session = await self._update_session(
                         session,
                         thread_id=thread_id,
                         user_id=self.user_id,
@@ -1157,13 +1340,14 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                         conversation_id=conversation.id,
                     )
                 else:
-                    session = await asyncio.to_thread(
+                    session = await self._db(
                         self._db_create_session,
                         decided_session_id,
                         thread_id,
                         int(self.user_id),
                         conversation.id,
                     )
+                self._session = session
                 self.session_id = session.session_id
                 await self.send_json(
                     {
@@ -1184,12 +1368,8 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                 return
         else:
             if session:
-                await asyncio.to_thread(
-                    self._db_update_session,
-                    session,
-                    is_active=True,
-                    conversation_id=conversation.id,
-                )
+                # 随消息批量落库，不单独占用一次数据库往返
+                self._queue_session_fields(session.session_id, is_active=True, conversation_id=conversation.id)
 
         assistant_id = getattr(env, "XPERT_ASSISTANT_ID", "")
         stream_mode = getattr(env, "XPERT_STREAM_MODE", "debug")
@@ -1213,7 +1393,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
             "uploaded_files": attachments,
             "files": attachments,
             "messages": [{"role": "user", "content": message}],
-            "scope": await asyncio.to_thread(crm_get_scope, self.user_id),
+            "scope": self.scope_payload,
             "scope_prefetched": True,
             "tool_runtime_policy": {
                 "scope_prefetched": True,
@@ -1253,13 +1433,8 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                     if extracted_run_id and extracted_run_id != self.run_id:
                         self.run_id = extracted_run_id
                         if self.session_id:
-                            session = await asyncio.to_thread(self._db_get_session, self.session_id)
-                            if session and session.user_id == self.user_id:
-                                await asyncio.to_thread(
-                                    self._db_update_session,
-                                    session,
-                                    last_run_id=self.run_id,
-                                )
+                            # run_id 变化频繁，随消息一起批量落库
+                            self._queue_session_fields(self.session_id, last_run_id=self.run_id)
 
                     # 客户端工具调用中断
                     req = _find_client_tool_request(event_data if isinstance(event_data, dict) else {"data": event_data})
@@ -1271,7 +1446,7 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                             missing_tool_call_id = False
                             for tool_call in tool_calls:
                                 try:
-                                    executed = await asyncio.to_thread(
+                                    executed = await self._db_ordered(
                                         _execute_client_tool,
                                         tool_call,
                                         user_id=self.user_id,
@@ -1320,25 +1495,15 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                                     await self.send_json(payload)
 
                             if missing_tool_call_id:
-                                fallback_answer = await asyncio.to_thread(
+                                fallback_answer = await self._db(
                                     _build_fallback_answer_for_tool_interrupt,
                                     int(self.user_id),
                                     message,
                                     executed_tool_results,
                                 )
                                 if fallback_answer:
-                                    await asyncio.to_thread(
-                                        self._db_save_legacy_history,
-                                        int(self.user_id),
-                                        message,
-                                        fallback_answer,
-                                    )
-                                    await asyncio.to_thread(
-                                        self._db_save_ai_message,
-                                        conversation.id,
-                                        int(self.user_id),
-                                        fallback_answer,
-                                    )
+                                    self._queue_legacy_history(message, fallback_answer)
+                                    self._queue_ai_message(conversation.id, fallback_answer)
                                     await self.send_json(
                                         {
                                             "type": "final",
@@ -1359,25 +1524,15 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                                     self.user_id,
                                     self.run_id,
                                 )
-                                fallback_answer = await asyncio.to_thread(
+                                fallback_answer = await self._db(
                                     _build_fallback_answer_for_tool_interrupt,
                                     int(self.user_id),
                                     message,
                                     executed_tool_results,
                                 )
                                 if fallback_answer:
-                                    await asyncio.to_thread(
-                                        self._db_save_legacy_history,
-                                        int(self.user_id),
-                                        message,
-                                        fallback_answer,
-                                    )
-                                    await asyncio.to_thread(
-                                        self._db_save_ai_message,
-                                        conversation.id,
-                                        int(self.user_id),
-                                        fallback_answer,
-                                    )
+                                    self._queue_legacy_history(message, fallback_answer)
+                                    self._queue_ai_message(conversation.id, fallback_answer)
                                     await self.send_json(
                                         {
                                             "type": "final",
@@ -1440,8 +1595,8 @@ class Tab3ChatConsumer(AsyncJsonWebsocketConsumer):
                         if isinstance(outputs, dict):
                             answer = outputs.get("output", "")
                             if answer:
-                                await asyncio.to_thread(self._db_save_legacy_history, int(self.user_id), message, answer)
-                                await asyncio.to_thread(self._db_save_ai_message, conversation.id, int(self.user_id), answer)
+                                self._queue_legacy_history(message, answer)
+                                self._queue_ai_message(conversation.id, answer)
                                 await self.send_json(
                                     {
                                         "type": "final",
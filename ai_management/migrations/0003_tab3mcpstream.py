@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ai_management", "0002_tab3_conversation_and_actions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tab3McpStream",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("channel_name", models.CharField(help_text="会话channel", max_length=200, unique=True, verbose_name="会话channel")),
+                ("user_id", models.IntegerField(db_index=True, help_text="会话归属用户ID", verbose_name="用户ID")),
+                ("last_seen", models.DateTimeField(db_index=True, help_text="最近一次刷新时间", verbose_name="最近在线时间")),
+            ],
+            options={
+                "verbose_name": "Tab3 MCP流",
+                "verbose_name_plural": "Tab3 MCP流",
+                "db_table": "lsl_tab3_mcp_stream",
+            },
+        ),
+    ]
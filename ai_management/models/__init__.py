@@ -1,12 +1,13 @@
 # 在这里导入所有模型
 from .chat_history import AIChatHistory
 from .conversation import AIConversation, AIMessage, AIPendingAction
-from .tab3_session import Tab3Session
+from .tab3_session import Tab3McpStream, Tab3Session
 
 __all__ = [
     "AIChatHistory",
     "AIConversation",
     "AIMessage",
     "AIPendingAction",
+    "Tab3McpStream",
     "Tab3Session",
 ]
@@ -58,3 +58,20 @@ class Tab3Session(CoreModel):
             models.Index(fields=['is_active']),
             models.Index(fields=['conversation', '-create_datetime'], name='lsl_tab3_conv_ctime_idx'),
         ]
+
+
+class Tab3McpStream(models.Model):
+    """
+    MCP SSE 流在线状态
+
+    SSE 流所在的 worker 建立流时登记、空闲心跳时定期刷新、流结束时删除；
+    其他 worker 收到 POST 时据此判断会话是否仍有监听者。
+    """
+    channel_name = models.CharField(max_length=200, unique=True, verbose_name="会话channel", help_text="会话channel")
+    user_id = models.IntegerField(db_index=True, verbose_name="用户ID", help_text="会话归属用户ID")
+    last_seen = models.DateTimeField(db_index=True, verbose_name="最近在线时间", help_text="最近一次刷新时间")
+
+    class Meta:
+        db_table = "lsl_tab3_mcp_stream"
+        verbose_name = "Tab3 MCP流"
+        verbose_name_plural = "Tab3 MCP流"
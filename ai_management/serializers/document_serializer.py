@@ -42,4 +42,5 @@ class DocumentExtractSerializer(serializers.Serializer):
     force_ocr = serializers.BooleanField(required=False, default=False)
     ocr_all_pages = serializers.BooleanField(required=False, default=False)
     ocr_page_limit = serializers.IntegerField(required=False, default=0)
+    ocr_missing_pages = serializers.BooleanField(required=False, default=False)
 
@@ -1,13 +1,20 @@
+import logging
+import math
+import multiprocessing
 import os
 import tempfile
-from typing import Any, Dict, Optional, Tuple
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from urllib.parse import urlparse
 
 import requests
 from django.conf import settings
-from django.core.files.uploadedfile import SimpleUploadedFile
 
 from ai_management.services.ocr_service import TencentOCRService
+from ai_management.utils.pdf_pages import extract_page_texts, render_page
+from ai_management.utils.result_cache import get_result_cache, hash_file
 
 try:
     import fitz  # PyMuPDF
@@ -22,10 +29,74 @@ except Exception:  # pragma: no cover - optional dependency
 
 IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.tiff'}
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACT_CONFIG = {
+    # 页面渲染进程数（0 表示在当前进程内渲染）；进程池在 worker 进程内共享，首次使用时以 spawn 方式创建
+    'RENDER_PROCESSES': 2,
+    # 页数达到该值才启用多进程，避免小文件承担进程池启动开销
+    'PARALLEL_MIN_PAGES': 4,
+    # OCR 并发请求数（进程内共享的线程池，线程复用各自的 OCR 客户端）
+    'OCR_CONCURRENCY': 4,
+    # 单页 OCR 超时（秒）与重试次数
+    'OCR_PAGE_TIMEOUT': 30,
+    'OCR_RETRIES': 2,
+    'OCR_RETRY_BACKOFF': 0.5,
+    'RENDER_DPI': 200,
+}
+
+
+def _chunk_indexes(indexes: Sequence[int], chunks: int) -> List[List[int]]:
+    chunks = max(min(chunks, len(indexes)), 1)
+    return [list(indexes[i::chunks]) for i in range(chunks)]
+
+
+_render_pool = None
+_ocr_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool(processes: int) -> Optional[ProcessPoolExecutor]:
+    """
+    进程内共享的页面渲染进程池
+
+    使用 spawn 启动子进程：在已有线程（数据库连接、OCR 线程池等）的 worker 中 fork 并不安全。
+    """
+    global _render_pool
+    if processes <= 0:
+        return None
+    if _render_pool is None:
+        with _pool_lock:
+            if _render_pool is None:
+                _render_pool = ProcessPoolExecutor(
+                    max_workers=processes, mp_context=multiprocessing.get_context('spawn')
+                )
+    return _render_pool
+
+
+def reset_render_pool():
+    """丢弃渲染进程池（渲染超时时调用，卡住的子进程不再占用共享池）"""
+    global _render_pool
+    with _pool_lock:
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_ocr_pool(concurrency: int) -> ThreadPoolExecutor:
+    """进程内共享的 OCR 线程池，线程常驻以复用线程内的 OCR 客户端"""
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _pool_lock:
+            if _ocr_pool is None:
+                _ocr_pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix='document-ocr')
+    return _ocr_pool
+
 
 class DocumentExtractService:
     def __init__(self):
         self.ocr_service = TencentOCRService()
+        self.config = {**DEFAULT_EXTRACT_CONFIG, **(getattr(settings, 'DOCUMENT_EXTRACT_CONFIG', {}) or {})}
 
     def extract(
         self,
@@ -34,6 +105,7 @@ class DocumentExtractService:
         force_ocr: bool = False,
         ocr_all_pages: bool = False,
         ocr_page_limit: int = 0,
+        ocr_missing_pages: bool = False,
     ) -> Dict[str, Any]:
         if not url:
             raise ValueError("url is required")
@@ -41,21 +113,32 @@ class DocumentExtractService:
         local_path, cleanup_path = self._resolve_to_local_path(url)
         try:
             ext = self._get_ext(file_name or local_path or url)
-            if ext in IMAGE_EXTS:
-                return self._extract_image(local_path)
-            if ext == '.pdf':
-                return self._extract_pdf(
-                    local_path,
-                    force_ocr=force_ocr,
-                    ocr_all_pages=ocr_all_pages,
-                    ocr_page_limit=ocr_page_limit,
-                )
-            if ext in {'.docx', '.doc'}:
-                return self._extract_docx(local_path)
-            if ext in {'.txt', '.md'}:
-                return self._extract_text_file(local_path)
-
-            raise ValueError(f"unsupported file type: {ext or 'unknown'}")
+            options = {
+                'ext': ext,
+                'force_ocr': force_ocr,
+                'ocr_all_pages': ocr_all_pages,
+                'ocr_page_limit': ocr_page_limit,
+                'ocr_missing_pages': ocr_missing_pages,
+            }
+            content_hash = hash_file(local_path)
+            cached = get_result_cache().get('document.extract', content_hash, options)
+            if cached is not None:
+                return cached
+
+            result = self._extract_by_ext(
+                local_path, ext,
+                force_ocr=force_ocr,
+                ocr_all_pages=ocr_all_pages,
+                ocr_page_limit=ocr_page_limit,
+                ocr_missing_pages=ocr_missing_pages,
+            )
+            # 含模拟 OCR 文本或存在失败页的结果不缓存，避免把不完整结果固化下来
+            incomplete = any(
+                str(w).startswith('ocr_failed_pages') or w == 'ocr_mock' for w in result.get('warnings', [])
+            )
+            if not incomplete:
+                get_result_cache().set('document.extract', content_hash, result, options)
+            return result
         finally:
             if cleanup_path:
                 try:
@@ -63,6 +146,32 @@ class DocumentExtractService:
                 except Exception:
                     pass
 
+    def _extract_by_ext(
+        self,
+        local_path: str,
+        ext: str,
+        force_ocr: bool = False,
+        ocr_all_pages: bool = False,
+        ocr_page_limit: int = 0,
+        ocr_missing_pages: bool = False,
+    ) -> Dict[str, Any]:
+        if ext in IMAGE_EXTS:
+            return self._extract_image(local_path)
+        if ext == '.pdf':
+            return self._extract_pdf(
+                local_path,
+                force_ocr=force_ocr,
+                ocr_all_pages=ocr_all_pages,
+                ocr_page_limit=ocr_page_limit,
+                ocr_missing_pages=ocr_missing_pages,
+            )
+        if ext in {'.docx', '.doc'}:
+            return self._extract_docx(local_path)
+        if ext in {'.txt', '.md'}:
+            return self._extract_text_file(local_path)
+
+        raise ValueError(f"unsupported file type: {ext or 'unknown'}")
+
     def _resolve_to_local_path(self, url: str) -> Tuple[str, Optional[str]]:
         parsed = urlparse(url)
         raw_path = parsed.path if parsed.scheme in ('http', 'https') else url
@@ -136,15 +245,17 @@ class DocumentExtractService:
     def _extract_image(self, path: str) -> Dict[str, Any]:
         with open(path, 'rb') as handle:
             content = handle.read()
-        uploaded = SimpleUploadedFile(os.path.basename(path), content)
-        result = self.ocr_service.recognize_general(uploaded)
-        text = (result or {}).get('rawText', '') or ''
+        result = self.ocr_service.recognize_general_bytes(content) or {}
+        text = result.get('rawText', '') or ''
+        warnings = [] if result.get('success', True) else ['ocr_failed_pages:1']
+        if result.get('mock'):
+            warnings.append('ocr_mock')
         return {
             'text': text.strip(),
             'method': 'ocr',
             'page_count': 1,
             'ocr_pages': 1,
-            'warnings': [],
+            'warnings': warnings,
         }
 
     def _extract_pdf(
@@ -153,6 +264,7 @@ class DocumentExtractService:
         force_ocr: bool = False,
         ocr_all_pages: bool = False,
         ocr_page_limit: int = 0,
+        ocr_missing_pages: bool = False,
     ) -> Dict[str, Any]:
         if fitz is None:
             raise ValueError("PyMuPDF is not available")
@@ -160,57 +272,170 @@ class DocumentExtractService:
         doc = fitz.open(path)
         try:
             page_count = doc.page_count
-            text_parts = []
-
-            for page in doc:
-                page_text = page.get_text("text").strip()
-                if page_text:
-                    text_parts.append(page_text)
-
-            extracted_text = "\n".join(text_parts).strip()
-            warnings = []
-
-            ocr_text = ''
-            if force_ocr or not extracted_text:
-                ocr_pages = page_count if ocr_all_pages else min(1, page_count)
-                if ocr_page_limit and ocr_page_limit > 0:
-                    ocr_pages = min(ocr_pages, ocr_page_limit)
-                ocr_text = self._ocr_pdf_pages(doc, ocr_pages)
-            else:
-                ocr_pages = 0
-
-            if extracted_text and ocr_text:
-                method = 'text+ocr'
-                text = f"{extracted_text}\n{ocr_text}".strip()
-            elif ocr_text:
-                method = 'ocr'
-                text = ocr_text.strip()
-            else:
-                method = 'text'
-                text = extracted_text.strip()
-
-            if not text:
-                warnings.append('no_text_extracted')
-
-            return {
-                'text': text,
-                'method': method,
-                'page_count': page_count,
-                'ocr_pages': ocr_pages,
-                'warnings': warnings,
-            }
         finally:
             doc.close()
 
-    def _ocr_pdf_pages(self, doc, pages: int) -> str:
-        lines = []
-        for index in range(pages):
-            page = doc.load_page(index)
-            pix = page.get_pixmap(dpi=200, alpha=False)
-            image_bytes = pix.tobytes("png")
-            uploaded = SimpleUploadedFile(f"page_{index + 1}.png", image_bytes)
-            result = self.ocr_service.recognize_general(uploaded)
-            text = (result or {}).get('rawText', '') or ''
-            if text.strip():
-                lines.append(text.strip())
-        return "\n".join(lines)
+        executor = None
+        if page_count >= self.config['PARALLEL_MIN_PAGES']:
+            executor = get_render_pool(self.config['RENDER_PROCESSES'])
+        page_texts = self._extract_pdf_texts(path, page_count, executor)
+        extracted_text = "\n".join(text for text in page_texts if text).strip()
+        warnings = []
+
+        # 选择需要 OCR 的页：仅无文本层的页，或沿用原有的前 N 页策略
+        if ocr_missing_pages:
+            ocr_indexes = [index for index, text in enumerate(page_texts) if not text]
+        elif force_ocr or not extracted_text:
+            ocr_indexes = list(range(page_count if ocr_all_pages else min(1, page_count)))
+        else:
+            ocr_indexes = []
+        if ocr_page_limit and ocr_page_limit > 0:
+            ocr_indexes = ocr_indexes[:ocr_page_limit]
+
+        mock_pages = set()
+        ocr_results = self._ocr_pdf_pages(path, ocr_indexes, executor, mock_pages) if ocr_indexes else {}
+        failed_pages = [index + 1 for index in ocr_indexes if index not in ocr_results]
+        if failed_pages:
+            warnings.append(f"ocr_failed_pages:{','.join(str(page) for page in failed_pages)}")
+        if mock_pages:
+            warnings.append('ocr_mock')
+
+        # 按页序重组：有文本层用文本层，否则用 OCR 结果
+        if ocr_missing_pages:
+            ocr_text = "\n".join(ocr_results[index] for index in sorted(ocr_results) if ocr_results[index])
+            page_parts = (page_texts[index] or ocr_results.get(index, '') for index in range(page_count))
+            text = "\n".join(part for part in page_parts if part).strip()
+        else:
+            ocr_text = "\n".join(ocr_results[index] for index in ocr_indexes if ocr_results.get(index))
+            text = f"{extracted_text}\n{ocr_text}".strip()
+
+        if extracted_text and ocr_text:
+            method = 'text+ocr'
+        elif ocr_text:
+            method = 'ocr'
+        else:
+            method = 'text'
+
+        if not text:
+            warnings.append('no_text_extracted')
+
+        return {
+            'text': text,
+            'method': method,
+            'page_count': page_count,
+            'ocr_pages': len(ocr_indexes),
+            'warnings': warnings,
+        }
+
+    def _extract_pdf_texts(self, path: str, page_count: int, executor=None) -> List[str]:
+        """提取每页文本层，大文件按页分片并行"""
+        page_texts = [''] * page_count
+        if executor is None:
+            chunks = [extract_page_texts(path, range(page_count))]
+        else:
+            futures = [
+                executor.submit(extract_page_texts, path, indexes)
+                for indexes in _chunk_indexes(range(page_count), self.config['RENDER_PROCESSES'])
+            ]
+            chunks = [future.result() for future in futures]
+        for chunk in chunks:
+            for index, text in chunk:
+                page_texts[index] = text
+        return page_texts
+
+    def _page_budget(self) -> float:
+        """单页 OCR 的时间上限：每次请求超时加上重试退避"""
+        retries = self.config['OCR_RETRIES']
+        backoff = sum(self.config['OCR_RETRY_BACKOFF'] * (2 ** attempt) for attempt in range(retries))
+        return self.config['OCR_PAGE_TIMEOUT'] * (retries + 1) + backoff
+
+    def _submit_render(self, path: str, index: int, executor=None) -> Future:
+        if executor is not None:
+            return executor.submit(render_page, path, index, self.config['RENDER_DPI'])
+        future = Future()
+        try:
+            future.set_result(render_page(path, index, self.config['RENDER_DPI']))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def _ocr_pdf_pages(self, path: str, indexes: Sequence[int], executor=None,
+                       mock_pages: Optional[set] = None) -> Dict[int, str]:
+        """
+        渲染并识别指定页，返回 {页索引: 文本}，失败或超时的页不在结果中；OCR 处于模拟模式的页索引
+        记入 mock_pages
+
+        逐页渲染、渲染完成即提交 OCR；已渲染未识别的页最多 2 * OCR_CONCURRENCY 张，
+        避免大文件的全部 PNG 同时驻留内存。整体按单页时间上限与并发数计算截止时间，
+        超时后取消未开始的任务；渲染超时说明子进程卡住，丢弃共享渲染进程池。
+        """
+        concurrency = max(self.config['OCR_CONCURRENCY'], 1)
+        window = concurrency * 2
+        ocr_pool = get_ocr_pool(concurrency)
+        deadline = time.monotonic() + self._page_budget() * (math.ceil(len(indexes) / concurrency) + 1)
+
+        queue = iter(indexes)
+        renders: Dict[Future, int] = {}
+        ocrs: Dict[Future, int] = {}
+        results: Dict[int, str] = {}
+
+        def fill():
+            while len(renders) + len(ocrs) < window:
+                index = next(queue, None)
+                if index is None:
+                    return
+                renders[self._submit_render(path, index, executor)] = index
+
+        fill()
+        while renders or ocrs:
+            remaining = deadline - time.monotonic()
+            done = wait(list(renders) + list(ocrs), timeout=remaining, return_when=FIRST_COMPLETED)[0] \
+                if remaining > 0 else set()
+            if not done:
+                break
+            for future in done:
+                if future in renders:
+                    index = renders.pop(future)
+                    try:
+                        image_bytes = future.result()
+                    except Exception as exc:
+                        logger.warning(f"PDF第{index + 1}页渲染失败: {exc}")
+                        continue
+                    ocrs[ocr_pool.submit(self._ocr_page, index, image_bytes)] = index
+                else:
+                    index = ocrs.pop(future)
+                    try:
+                        page = future.result()
+                    except Exception as exc:
+                        logger.warning(f"PDF第{index + 1}页OCR异常: {exc}")
+                        continue
+                    if page is not None:
+                        results[index] = page['text']
+                        if page.get('mock') and mock_pages is not None:
+                            mock_pages.add(index)
+            fill()
+
+        if renders or ocrs:
+            timed_out = sorted(list(renders.values()) + list(ocrs.values()))
+            logger.warning(f"PDF OCR超时，未完成的页: {[index + 1 for index in timed_out]}")
+            for future in list(renders) + list(ocrs):
+                future.cancel()
+            if renders and executor is not None:
+                reset_render_pool()
+        return results
+
+    def _ocr_page(self, index: int, image_bytes: bytes) -> Optional[Dict[str, Any]]:
+        """单页 OCR，返回 {'text', 'mock'}；失败时按退避间隔重试，超出单页时间上限或最终失败返回 None"""
+        retries = self.config['OCR_RETRIES']
+        timeout = self.config['OCR_PAGE_TIMEOUT']
+        deadline = time.monotonic() + self._page_budget()
+        for attempt in range(retries + 1):
+            result = self.ocr_service.recognize_general_bytes(image_bytes, timeout=timeout) or {}
+            if result.get('success', True):
+                return {'text': (result.get('rawText', '') or '').strip(), 'mock': bool(result.get('mock'))}
+            logger.warning(f"PDF第{index + 1}页OCR失败（第{attempt + 1}次）: {result.get('error')}")
+            delay = self.config['OCR_RETRY_BACKOFF'] * (2 ** attempt)
+            if attempt >= retries or time.monotonic() + delay + timeout > deadline:
+                break
+            time.sleep(delay)
+        return None
@@ -0,0 +1,145 @@
+"""
+Tab3 MCP SSE 会话传输。
+
+说明：
+1) 会话即 channels layer 上的一个进程专属 channel（Redis 已配置时为 RedisChannelLayer，否则为内存层），
+   SSE 流所在 worker 接收，任意 worker 收到的 POST 都能把响应投递过去，无需粘滞到同一进程。
+2) session_id 是对 {channel, user_id} 的签名，各 worker 无需共享会话表即可校验归属。
+3) SSE 流 await channel 消息，超时仅发送心跳，不再轮询。
+4) 会话有效期随 SSE 流：流在数据库登记在线状态（Tab3McpStream），流结束或超过 MCP_STREAM_TTL
+   未刷新即视为无人监听，POST 返回 404，避免消息堆积在无人接收的 channel。
+5) 与原内存会话表的 TTL 一样按空闲计时：连续 MCP_SESSION_IDLE_TIMEOUT 秒没有消息时结束流，
+   每收到一条消息重新计时，持续活跃的会话不会被强制断开。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import AsyncIterator, Optional
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from django.core import signing
+from django.utils import timezone
+
+from ai_management.models import Tab3McpStream
+
+logger = logging.getLogger(__name__)
+
+MCP_MESSAGE_TYPE = "mcp.message"
+MCP_SESSION_SALT = "ai_management.tab3.mcp_session"
+MCP_HEARTBEAT_SECONDS = 15
+# 会话空闲超时（与原内存会话表的 TTL 一致，收到消息即重新计时）
+MCP_SESSION_IDLE_TIMEOUT = 30 * 60
+# 在线状态刷新间隔与过期时间：超过 TTL 未刷新的流视为已断开（worker 被强杀时 finally 不会执行）
+MCP_STREAM_REFRESH_SECONDS = 40
+MCP_STREAM_TTL = 120
+
+
+def _layer(layer=None):
+    layer = layer or get_channel_layer()
+    if layer is None:
+        raise RuntimeError("未配置 CHANNEL_LAYERS，无法建立 MCP 会话")
+    return layer
+
+
+async def create_session(user_id: int, layer=None) -> tuple[str, str]:
+    """创建会话，返回 (session_id, channel_name)。"""
+    channel_name = await _layer(layer).new_channel(prefix="mcp")
+    session_id = signing.dumps({"c": channel_name, "u": int(user_id)}, salt=MCP_SESSION_SALT, compress=True)
+    return session_id, channel_name
+
+
+def resolve_session(session_id: str) -> Optional[dict]:
+    """
+    校验 session_id，返回 {"channel": ..., "user_id": ...}；签名无效返回 None。
+
+    签名本身不设有效期，会话是否仍可用由 is_stream_alive 判断（SSE 流空闲超时或断开后失效）。
+    """
+    try:
+        data = signing.loads(session_id, salt=MCP_SESSION_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or not data.get("c"):
+        return None
+    return {"channel": data["c"], "user_id": int(data.get("u") or 0)}
+
+
+async def send_message(channel_name: str, payload: dict, layer=None) -> bool:
+    """把 JSON-RPC 响应投递到会话 channel；channel 已满时丢弃并返回 False。"""
+    try:
+        await _layer(layer).send(channel_name, {
+            "type": MCP_MESSAGE_TYPE,
+            "payload": json.dumps(payload, ensure_ascii=False),
+        })
+    except ChannelFull:
+        logger.warning("MCP channel is full and drop message: channel=%s", channel_name)
+        return False
+    return True
+
+
+def send_message_sync(channel_name: str, payload: dict, layer=None) -> bool:
+    return async_to_sync(send_message)(channel_name, payload, layer)
+
+
+async def receive_message(channel_name: str, timeout: float, layer=None) -> Optional[str]:
+    """等待一条消息（JSON 字符串），超时返回 None。"""
+    try:
+        message = await asyncio.wait_for(_layer(layer).receive(channel_name), timeout=timeout)
+    except asyncio.TimeoutError:
+        return None
+    return message.get("payload")
+
+
+def register_stream(channel_name: str, user_id: int) -> None:
+    """登记（或刷新）SSE 流的在线状态。"""
+    Tab3McpStream.objects.update_or_create(
+        channel_name=channel_name,
+        defaults={"user_id": int(user_id), "last_seen": timezone.now()},
+    )
+
+
+def unregister_stream(channel_name: str) -> None:
+    Tab3McpStream.objects.filter(channel_name=channel_name).delete()
+
+
+def is_stream_alive(channel_name: str) -> bool:
+    """会话 channel 当前是否有 SSE 流在监听。"""
+    threshold = timezone.now() - timedelta(seconds=MCP_STREAM_TTL)
+    return Tab3McpStream.objects.filter(channel_name=channel_name, last_seen__gte=threshold).exists()
+
+
+async def iter_sse_events(channel_name: str, endpoint: str, user_id: int, layer=None,
+                          heartbeat: float = MCP_HEARTBEAT_SECONDS,
+                          idle_timeout: float = MCP_SESSION_IDLE_TIMEOUT) -> AsyncIterator[str]:
+    """
+    SSE 事件流：先发送 endpoint 事件，之后逐条转发会话消息，空闲时发送心跳注释行。
+
+    流存续期间在数据库登记在线状态；连续 idle_timeout 秒没有消息时结束流，客户端需重新握手。
+    """
+    await database_sync_to_async(register_stream)(channel_name, user_id)
+    last_active = refreshed = time.monotonic()
+    try:
+        yield f"event: endpoint\ndata: {endpoint}\n\n"
+        while True:
+            remaining = idle_timeout - (time.monotonic() - last_active)
+            if remaining <= 0:
+                break
+            payload = await receive_message(channel_name, min(heartbeat, remaining), layer)
+            # 按经过时间刷新在线状态，持续有消息时也要刷新
+            if time.monotonic() - refreshed >= MCP_STREAM_REFRESH_SECONDS:
+                await database_sync_to_async(register_stream)(channel_name, user_id)
+                refreshed = time.monotonic()
+            if payload is not None:
+                last_active = time.monotonic()
+                yield f"event: message\ndata: {payload}\n\n"
+                continue
+            # SSE 注释行心跳，避免代理超时
+            yield f": heartbeat {int(time.time())}\n\n"
+    finally:
+        await database_sync_to_async(unregister_stream)(channel_name)
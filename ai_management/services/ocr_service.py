@@ -7,12 +7,14 @@ import base64
 import json
 import logging
 import re
-from typing import Any, Dict
+import threading
+from typing import Any, Dict, Optional
 
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 
 from application import dispatch
+from ai_management.utils.result_cache import get_result_cache, hash_bytes
 try:
     from dvadmin.system.models import SystemConfig
 except Exception:  # pragma: no cover
@@ -30,6 +32,9 @@ except Exception:  # pragma: no cover - 避免依赖缺失导致导入失败
 
 logger = logging.getLogger(__name__)
 
+# SDK 客户端按线程复用（服务对象按请求创建，客户端不能挂在实例上）
+_client_local = threading.local()
+
 
 class TencentOCRService:
     """腾讯OCR服务（名片/通用识别）"""
@@ -138,7 +143,18 @@ class TencentOCRService:
         image_file.seek(0)
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-    def _build_client(self):
+    def _get_client(self, timeout: Optional[int] = None):
+        """获取当前线程复用的 OCR 客户端（按凭据、地域与超时时间区分）"""
+        clients = getattr(_client_local, 'clients', None)
+        if clients is None:
+            clients = _client_local.clients = {}
+        key = (self.secret_id, self.secret_key, self.region, timeout)
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = self._build_client(timeout=timeout)
+        return client
+
+    def _build_client(self, timeout: Optional[int] = None):
         # 验证配置
         if not self.secret_id or not self.secret_key:
             raise ValueError(f"OCR配置不完整: SECRET_ID={'已设置' if self.secret_id else '未设置'}, "
@@ -151,6 +167,8 @@ class TencentOCRService:
         cred = credential.Credential(self.secret_id, self.secret_key)
         http_profile = HttpProfile()
         http_profile.endpoint = "ocr.tencentcloudapi.com"
+        if timeout:
+            http_profile.reqTimeout = timeout
         client_profile = ClientProfile()
         client_profile.httpProfile = http_profile
         return ocr_client.OcrClient(cred, self.region, client_profile)
@@ -165,12 +183,21 @@ class TencentOCRService:
             logger.info(f"开始名片OCR识别: SECRET_ID前10位={self.secret_id[:10] if self.secret_id else 'N/A'}, "
                        f"SECRET_KEY长度={len(self.secret_key) if self.secret_key else 0}, REGION={self.region}")
             
-            client = self._build_client()
+            image_file.seek(0)
+            content = image_file.read()
+            content_hash = hash_bytes(content)
+            cached = get_result_cache().get('ocr.business_card', content_hash)
+            if cached is not None:
+                return cached
+
+            client = self._get_client()
             req = models.BusinessCardOCRRequest()
-            req.ImageBase64 = self._file_to_base64(image_file)
+            req.ImageBase64 = base64.b64encode(content).decode('utf-8')
             resp = client.BusinessCardOCR(req)
             data = json.loads(resp.to_json_string())
-            return self._parse_business_card(data)
+            result = self._parse_business_card(data)
+            get_result_cache().set('ocr.business_card', content_hash, result)
+            return result
         except Exception as exc:
             logger.error(f"名片OCR识别失败: {exc}")
             logger.error(f"配置信息: SECRET_ID长度={len(self.secret_id) if self.secret_id else 0}, "
@@ -179,16 +206,28 @@ class TencentOCRService:
             return {"success": False, "error": str(exc)}
 
     def recognize_general(self, image_file: UploadedFile) -> Dict[str, Any]:
+        image_file.seek(0)
+        return self.recognize_general_bytes(image_file.read())
+
+    def recognize_general_bytes(self, content: bytes, timeout: Optional[int] = None) -> Dict[str, Any]:
+        """通用OCR识别（直接传入图片二进制，免去 UploadedFile 包装）"""
         if not self.enabled:
             return self._mock_general()
 
         try:
-            client = self._build_client()
+            content_hash = hash_bytes(content)
+            cached = get_result_cache().get('ocr.general', content_hash)
+            if cached is not None:
+                return cached
+
+            client = self._get_client(timeout)
             req = models.GeneralBasicOCRRequest()
-            req.ImageBase64 = self._file_to_base64(image_file)
+            req.ImageBase64 = base64.b64encode(content).decode('utf-8')
             resp = client.GeneralBasicOCR(req)
             data = json.loads(resp.to_json_string())
-            return self._parse_general(data)
+            result = self._parse_general(data)
+            get_result_cache().set('ocr.general', content_hash, result)
+            return result
         except Exception as exc:
             logger.error(f"通用OCR识别失败: {exc}")
             return {"success": False, "error": str(exc)}
@@ -287,6 +326,7 @@ class TencentOCRService:
     def _mock_general(self) -> Dict[str, Any]:
         return {
             "success": True,
+            "mock": True,
             "rawText": "合同编号: HT20240101\n合同金额: 100000\n日期: 2024-01-01",
             "extractedFields": {
                 "contractNo": "HT20240101",
@@ -4,15 +4,106 @@
 一次请求即返回识别结果，无需轮询
 """
 import base64
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
 import uuid
 import logging
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
 from django.conf import settings
+from django.core.files import File
 from django.core.files.uploadedfile import UploadedFile
 
 logger = logging.getLogger(__name__)
 
+# 读取上传文件的分块大小（3 的倍数，保证每块 Base64 编码后无需填充即可直接拼接）
+STREAM_CHUNK_SIZE = 3 * 256 * 1024
+
+# 进程内并发识别数限制（由 DOUBAO_CONFIG['MAX_CONCURRENT'] 控制，首次使用时初始化）
+_recognition_semaphore = None
+_recognition_semaphore_lock = threading.Lock()
+
+
+def _get_recognition_semaphore(limit: int) -> threading.BoundedSemaphore:
+    global _recognition_semaphore
+    if _recognition_semaphore is None:
+        with _recognition_semaphore_lock:
+            if _recognition_semaphore is None:
+                _recognition_semaphore = threading.BoundedSemaphore(max(limit, 1))
+    return _recognition_semaphore
+
+
+class StreamingBase64JSONBody:
+    """
+    流式 JSON 请求体
+
+    按块读取音频文件并即时 Base64 编码，拼接在 JSON 前后缀之间输出，
+    内存占用只与分块大小有关。实现了 __len__ 和 read()，requests 会据此设置
+    Content-Length 并分块发送，而不是把整个请求体拼成一个字符串。
+    """
+
+    PLACEHOLDER = '__AUDIO_BASE64__'
+
+    def __init__(self, body: Dict[str, Any], audio: File, audio_size: int):
+        """
+        Args:
+            body: 请求体，audio.data 处使用 PLACEHOLDER 占位
+            audio: 音频文件（支持 chunks()）
+            audio_size: 音频字节数
+        """
+        encoded = json.dumps(body, ensure_ascii=False)
+        prefix, suffix = encoded.split(f'"{self.PLACEHOLDER}"', 1)
+        self._prefix = (prefix + '"').encode('utf-8')
+        self._suffix = ('"' + suffix).encode('utf-8')
+        self._audio = audio
+        self._length = len(self._prefix) + 4 * ((audio_size + 2) // 3) + len(self._suffix)
+        self._iterator = self._iter_parts()
+        # 已生成未读取的数据为 _buffer[_offset:]，按偏移读取避免每次切片复制剩余数据
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _iter_parts(self) -> Iterator[bytes]:
+        yield self._prefix
+        remainder = b''
+        for chunk in self._audio.chunks(STREAM_CHUNK_SIZE):
+            if remainder:
+                chunk = remainder + chunk
+            usable = len(chunk) - len(chunk) % 3
+            remainder = bytes(chunk[usable:])
+            if usable:
+                yield base64.b64encode(memoryview(chunk)[:usable])
+        if remainder:
+            yield base64.b64encode(remainder)
+        yield self._suffix
+
+    def read(self, size: int = -1) -> bytes:
+        available = len(self._buffer) - self._offset
+        while size < 0 or available < size:
+            try:
+                part = next(self._iterator)
+            except StopIteration:
+                break
+            if self._offset and self._offset >= available:
+                # 已读部分不少于未读部分时再整理缓冲区，整体只做线性次数的复制
+                del self._buffer[:self._offset]
+                self._offset = 0
+            self._buffer += part
+            available += len(part)
+        end = len(self._buffer) if size < 0 else self._offset + min(size, available)
+        data = bytes(self._buffer[self._offset:end])
+        self._offset = end
+        if self._offset == len(self._buffer):
+            self._buffer.clear()
+            self._offset = 0
+        return data
+
 
 class DoubaoVoiceRecognitionService:
     """豆包语音识别服务（极速版）"""
@@ -27,24 +118,59 @@ class DoubaoVoiceRecognitionService:
         if not all([self.app_id, self.access_key]):
             raise ValueError("豆包API配置不完整，请检查DOUBAO_CONFIG配置（需要APP_ID和ACCESS_KEY）")
     
-    def _file_to_base64(self, audio_file: UploadedFile) -> str:
+    def _transcode(self, audio_file: UploadedFile) -> Optional[str]:
         """
-        将音频文件转换为Base64编码
-        
-        Args:
-            audio_file: 上传的音频文件
-            
+        使用 ffmpeg 转码为 16kHz 单声道 OGG OPUS，以减小上传体积
+
+        输入优先使用上传临时文件路径，输出写入临时文件，全程不在内存中缓冲整段音频。
+
         Returns:
-            Base64编码的字符串
+            转码后的临时文件路径；未启用、ffmpeg 不可用或转码失败时返回 None
         """
-        # 读取文件内容
-        audio_file.seek(0)  # 确保从文件开头读取
-        file_data = audio_file.read()
-        
-        # 转换为Base64
-        base64_data = base64.b64encode(file_data).decode('utf-8')
-        return base64_data
-    
+        if not self.config.get('TRANSCODE_ENABLED', False):
+            return None
+        ffmpeg = shutil.which(self.config.get('FFMPEG_BINARY', 'ffmpeg'))
+        if not ffmpeg:
+            logger.warning("未找到 ffmpeg，跳过音频转码")
+            return None
+
+        input_path = None
+        input_temp = None
+        if hasattr(audio_file, 'temporary_file_path'):
+            input_path = audio_file.temporary_file_path()
+        else:
+            input_temp = tempfile.NamedTemporaryFile(delete=False)
+            for chunk in audio_file.chunks(STREAM_CHUNK_SIZE):
+                input_temp.write(chunk)
+            input_temp.close()
+            input_path = input_temp.name
+
+        output = tempfile.NamedTemporaryFile(delete=False, suffix='.ogg')
+        output.close()
+        try:
+            subprocess.run(
+                [
+                    ffmpeg, '-nostdin', '-y', '-loglevel', 'error', '-i', input_path,
+                    '-ac', '1', '-ar', str(self.config.get('TRANSCODE_SAMPLE_RATE', 16000)),
+                    '-c:a', 'libopus', '-b:a', self.config.get('TRANSCODE_BITRATE', '32k'),
+                    '-f', 'ogg', output.name,
+                ],
+                check=True,
+                capture_output=True,
+                timeout=self.config.get('TRANSCODE_TIMEOUT', 120),
+            )
+            return output.name
+        except Exception as e:
+            logger.warning(f"音频转码失败，使用原始文件上传: {e}")
+            os.remove(output.name)
+            return None
+        finally:
+            if input_temp:
+                try:
+                    os.remove(input_temp.name)
+                except OSError:
+                    pass
+
     def recognize_voice(self, audio_file: UploadedFile) -> Dict[str, Any]:
         """
         语音识别主方法（极速版，一次请求返回结果）
@@ -70,8 +196,34 @@ class DoubaoVoiceRecognitionService:
             if file_ext not in supported_formats:
                 raise ValueError(f"不支持的文件格式: {file_ext}，支持格式: {', '.join(supported_formats)}")
             
-            # 将文件转换为Base64
-            base64_data = self._file_to_base64(audio_file)
+            # 限制单进程并发识别数，避免多路大文件同时上传撑高内存
+            semaphore = _get_recognition_semaphore(self.config.get('MAX_CONCURRENT', 4))
+            if not semaphore.acquire(timeout=self.config.get('QUEUE_TIMEOUT', 30)):
+                raise RuntimeError("语音识别服务繁忙，请稍后重试")
+            try:
+                return self._recognize(audio_file)
+            finally:
+                semaphore.release()
+            
+        except Exception as e:
+            logger.error(f"语音识别过程出错: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _recognize(self, audio_file: UploadedFile) -> Dict[str, Any]:
+        """可选转码后以流式 Base64 请求体上传并解析识别结果"""
+        transcoded_path = self._transcode(audio_file)
+        transcoded_file = None
+        try:
+            if transcoded_path:
+                transcoded_file = File(open(transcoded_path, 'rb'))
+                audio, audio_size = transcoded_file, os.path.getsize(transcoded_path)
+                logger.info(f"音频已转码: {audio_file.size} -> {audio_size} 字节")
+            else:
+                audio_file.seek(0)
+                audio, audio_size = audio_file, audio_file.size
             
             # 构建请求
             url = f"{self.api_url}/api/v3/auc/bigmodel/recognize/flash"
@@ -86,13 +238,13 @@ class DoubaoVoiceRecognitionService:
                 'Content-Type': 'application/json',
             }
             
-            # 构建请求体
+            # 构建请求体（音频数据在发送时按块Base64编码写入）
             request_body = {
                 'user': {
                     'uid': self.app_id
                 },
                 'audio': {
-                    'data': base64_data  # 使用Base64编码的文件数据
+                    'data': StreamingBase64JSONBody.PLACEHOLDER
                 },
                 'request': {
                     'model_name': 'bigmodel',
@@ -107,7 +259,7 @@ class DoubaoVoiceRecognitionService:
             # 发送请求
             response = requests.post(
                 url,
-                json=request_body,
+                data=StreamingBase64JSONBody(request_body, audio, audio_size),
                 headers=headers,
                 timeout=self.config.get('RECOGNITION_TIMEOUT', 60)
             )
@@ -146,10 +298,11 @@ class DoubaoVoiceRecognitionService:
                     'status_code': status_code,
                     'logid': logid,
                 }
-            
-        except Exception as e:
-            logger.error(f"语音识别过程出错: {e}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
+        finally:
+            if transcoded_file:
+                transcoded_file.close()
+            if transcoded_path:
+                try:
+                    os.remove(transcoded_path)
+                except OSError:
+                    pass
@@ -0,0 +1,24 @@
+"""
+AI 管理信号处理
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from dvadmin.system.models import Users
+
+# 只更新这些字段时不影响 Tab3 权限范围
+_SCOPE_IRRELEVANT_FIELDS = {"last_login", "update_datetime"}
+
+
+@receiver(post_save, sender=Users)
+def refresh_tab3_context(sender, instance, created, update_fields=None, **kwargs):
+    """用户角色、部门等变化后，通知其在线 Tab3 连接刷新权限范围上下文"""
+    if created:
+        return
+    if update_fields and set(update_fields) <= _SCOPE_IRRELEVANT_FIELDS:
+        return
+    from ai_management.consumers.tab3_chat import notify_tab3_context_changed
+
+    user_id = instance.id
+    transaction.on_commit(lambda: notify_tab3_context_changed(user_id))
@@ -0,0 +1,67 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ai_management.services import document_extract_service
+from ai_management.services.document_extract_service import DocumentExtractService
+
+
+class DocumentExtractOcrTestCase(SimpleTestCase):
+    """PDF OCR：共享线程池、逐页流水线与单页超时"""
+
+    def setUp(self):
+        with mock.patch.object(document_extract_service, "TencentOCRService"):
+            self.service = DocumentExtractService()
+        self.service.config = dict(
+            document_extract_service.DEFAULT_EXTRACT_CONFIG,
+            OCR_CONCURRENCY=2, OCR_PAGE_TIMEOUT=0.2, OCR_RETRIES=0, OCR_RETRY_BACKOFF=0,
+        )
+        self.lock = threading.Lock()
+        self.rendered = 0
+        self.recognized = 0
+        self.max_pending = 0
+
+    def _render(self, path, index, dpi):
+        with self.lock:
+            self.rendered += 1
+            self.max_pending = max(self.max_pending, self.rendered - self.recognized)
+        return f"page-{index}".encode()
+
+    def _recognize(self, content, timeout=None):
+        if content == b"page-3":
+            time.sleep(1)
+        with self.lock:
+            self.recognized += 1
+        return {"success": True, "rawText": content.decode()}
+
+    def test_pages_streamed_with_bounded_memory(self):
+        self.service.ocr_service.recognize_general_bytes.side_effect = self._recognize
+        with mock.patch.object(document_extract_service, "render_page", side_effect=self._render):
+            results = self.service._ocr_pdf_pages("doc.pdf", [0, 1, 2, 4, 5, 6, 7, 8])
+        self.assertEqual(results, {index: f"page-{index}" for index in [0, 1, 2, 4, 5, 6, 7, 8]})
+        # 已渲染未识别的页不超过 2 * OCR_CONCURRENCY
+        self.assertLessEqual(self.max_pending, 4)
+
+    def test_hanging_page_times_out(self):
+        self.service.ocr_service.recognize_general_bytes.side_effect = self._recognize
+        started = time.monotonic()
+        with mock.patch.object(document_extract_service, "render_page", side_effect=self._render), \
+                mock.patch.object(document_extract_service, "get_ocr_pool",
+                                  return_value=document_extract_service.ThreadPoolExecutor(max_workers=1)):
+            results = self.service._ocr_pdf_pages("doc.pdf", [3])
+        self.assertEqual(results, {})
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_pools_are_shared(self):
+        self.assertIs(document_extract_service.get_ocr_pool(2), document_extract_service.get_ocr_pool(2))
+        self.assertIsNone(document_extract_service.get_render_pool(0))
+        pool = document_extract_service.get_render_pool(1)
+        try:
+            self.assertIs(document_extract_service.get_render_pool(1), pool)
+            self.assertEqual(pool._mp_context.get_start_method(), "spawn")
+        finally:
+            document_extract_service.reset_render_pool()
+        self.assertIsNot(document_extract_service.get_render_pool(1), pool)
+        document_extract_service.reset_render_pool()
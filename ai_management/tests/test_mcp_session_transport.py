@@ -0,0 +1,207 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import time
+import unittest
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ai_management.models import Tab3McpStream
+from ai_management.services import mcp_session_transport
+from ai_management.services.mcp_session_transport import (
+    create_session,
+    is_stream_alive,
+    iter_sse_events,
+    receive_message,
+    register_stream,
+    resolve_session,
+    send_message,
+)
+from ai_management.views.api.tab3_views import Tab3ChatViewSet
+from dvadmin.system.models import Users
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+REDIS_URL = os.getenv("MCP_TEST_REDIS_URL", "")
+REDIS_SERVER = shutil.which("redis-server")
+
+
+def _start_redis():
+    """未指定 MCP_TEST_REDIS_URL 时，在随机端口启动本机 redis-server 作为跨进程共享的 channels layer"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [REDIS_SERVER, "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"redis://127.0.0.1:{port}/0"
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("redis-server 启动失败")
+
+
+def _redis_layer(url):
+    from channels_redis.core import RedisChannelLayer
+
+    return RedisChannelLayer(hosts=[url])
+
+
+def _post_worker(session_queue, url):
+    """模拟收到 POST 的另一个 worker 进程：只凭 session_id 即可把响应投递到 SSE 流所在进程"""
+    session = resolve_session(session_queue.get(timeout=10))
+    asyncio.run(send_message(session["channel"], {"jsonrpc": "2.0", "id": 1, "result": {}}, _redis_layer(url)))
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class McpSessionTransportTestCase(TestCase):
+    """Tab3 MCP 会话：签名校验、await 投递与跨进程路由"""
+
+    def test_session_id_is_signed(self):
+        session_id, channel_name = async_to_sync(create_session)(5)
+        self.assertEqual(resolve_session(session_id), {"channel": channel_name, "user_id": 5})
+        self.assertIsNone(resolve_session(session_id[:-2] + "xx"))
+        self.assertIsNone(resolve_session("not-a-session"))
+
+    def test_stream_awaits_messages(self):
+        async def run():
+            session_id, channel_name = await create_session(5)
+            events = iter_sse_events(channel_name, "http://testserver/endpoint", 5, heartbeat=0.05)
+            self.assertEqual(await events.__anext__(), "event: endpoint\ndata: http://testserver/endpoint\n\n")
+            self.assertTrue(await database_sync_to_async(is_stream_alive)(channel_name))
+            # 空闲时只发送心跳
+            self.assertTrue((await events.__anext__()).startswith(": heartbeat"))
+
+            await send_message(channel_name, {"jsonrpc": "2.0", "id": 3, "result": {"ok": True}})
+            event = await events.__anext__()
+            await events.aclose()
+            # 流关闭后不再有监听者
+            self.assertFalse(await database_sync_to_async(is_stream_alive)(channel_name))
+            return event
+
+        event = async_to_sync(run)()
+        self.assertEqual(json.loads(event.split("data: ", 1)[1]), {"jsonrpc": "2.0", "id": 3, "result": {"ok": True}})
+
+    def test_presence_refreshed_under_steady_traffic(self):
+        async def run():
+            _, channel_name = await create_session(5)
+            events = iter_sse_events(channel_name, "http://testserver/endpoint", 5, heartbeat=10)
+            await events.__anext__()
+            seen = []
+            with mock.patch.object(mcp_session_transport, "MCP_STREAM_REFRESH_SECONDS", 0):
+                for index in range(3):
+                    await send_message(channel_name, {"jsonrpc": "2.0", "id": index, "result": {}})
+                    self.assertTrue((await events.__anext__()).startswith("event: message"))
+                    seen.append(await database_sync_to_async(
+                        lambda: Tab3McpStream.objects.get(channel_name=channel_name).last_seen
+                    )())
+            await events.aclose()
+            return seen
+
+        seen = async_to_sync(run)()
+        # 每条消息都未经过心跳超时，在线状态仍随时间刷新
+        self.assertEqual(seen, sorted(seen))
+        self.assertLess(seen[0], seen[-1])
+
+    def test_stream_ends_when_idle(self):
+        async def run():
+            _, channel_name = await create_session(5)
+            events = [event async for event in iter_sse_events(
+                channel_name, "http://testserver/endpoint", 5, heartbeat=0.05, idle_timeout=0.12,
+            )]
+            return events, await database_sync_to_async(is_stream_alive)(channel_name)
+
+        events, alive = async_to_sync(run)()
+        self.assertTrue(events[0].startswith("event: endpoint"))
+        self.assertTrue(all(event.startswith(": heartbeat") for event in events[1:]))
+        self.assertFalse(alive)
+
+    def test_active_stream_outlives_idle_timeout(self):
+        async def run():
+            _, channel_name = await create_session(5)
+            events = iter_sse_events(channel_name, "http://testserver/endpoint", 5, heartbeat=0.05, idle_timeout=0.2)
+            await events.__anext__()
+            started = time.monotonic()
+            received = 0
+            # 持续有消息时空闲计时不断重置，存活时间超过 idle_timeout
+            while time.monotonic() - started < 0.5:
+                await send_message(channel_name, {"jsonrpc": "2.0", "id": received, "result": {}})
+                while not (await events.__anext__()).startswith("event: message"):
+                    pass
+                received += 1
+                await asyncio.sleep(0.1)
+            alive = await database_sync_to_async(is_stream_alive)(channel_name)
+            await events.aclose()
+            return alive
+
+        self.assertTrue(async_to_sync(run)())
+
+    def test_messages_endpoint_routes_to_session_channel(self):
+        owner = Users.objects.create(username="mcp_owner", name="会话用户")
+        other = Users.objects.create(username="mcp_other", name="其他用户")
+        session_id, channel_name = async_to_sync(create_session)(owner.id)
+        view = Tab3ChatViewSet.as_view({"post": "mcp_messages"})
+        factory = APIRequestFactory()
+
+        def post(user, sid):
+            request = factory.post(
+                f"/api/ai/tab3/mcp/messages/?session_id={sid}",
+                {"jsonrpc": "2.0", "id": 9, "method": "ping"}, format="json",
+            )
+            force_authenticate(request, user=user)
+            return view(request)
+
+        self.assertEqual(post(other, session_id).data["code"], 403)
+        self.assertEqual(post(owner, "bogus").data["code"], 404)
+        # 签名有效但没有 SSE 流在监听
+        self.assertEqual(post(owner, session_id).data["code"], 404)
+
+        register_stream(channel_name, owner.id)
+        response = post(owner, session_id)
+        self.assertEqual(response.data["data"]["emitted"], 1)
+        payload = async_to_sync(receive_message)(channel_name, 1)
+        self.assertEqual(json.loads(payload), {"jsonrpc": "2.0", "id": 9, "result": {}})
+
+    @unittest.skipUnless(REDIS_URL or REDIS_SERVER, "需要本机 redis-server 或设置 MCP_TEST_REDIS_URL")
+    def test_session_across_worker_processes(self):
+        redis_process, url = (None, REDIS_URL) if REDIS_URL else _start_redis()
+        self.addCleanup(lambda: redis_process and redis_process.terminate())
+        # 在启动事件循环前 fork，子进程不触碰数据库连接
+        context = multiprocessing.get_context("fork")
+        session_queue = context.Queue()
+        post_process = context.Process(target=_post_worker, args=(session_queue, url))
+        post_process.start()
+
+        async def run():
+            layer = _redis_layer(url)
+            session_id, channel_name = await create_session(7, layer)
+            events = iter_sse_events(channel_name, "http://testserver/mcp/messages/", 7, layer, heartbeat=1)
+            await events.__anext__()
+            # 本进程持有 SSE 流，POST 由另一个进程处理
+            session_queue.put(session_id)
+            try:
+                event = await events.__anext__()
+                while not event.startswith("event: message"):
+                    event = await events.__anext__()
+            finally:
+                await events.aclose()
+            return event
+
+        try:
+            event = async_to_sync(run)()
+        finally:
+            post_process.join(10)
+        self.assertEqual(post_process.exitcode, 0)
+        self.assertEqual(json.loads(event.split("data: ", 1)[1]), {"jsonrpc": "2.0", "id": 1, "result": {}})
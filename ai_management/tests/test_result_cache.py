@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_management.services import document_extract_service
+from ai_management.services.document_extract_service import DocumentExtractService
+from ai_management.utils import result_cache
+from ai_management.utils.result_cache import ContentHashCache
+
+
+class ContentHashCacheTestCase(SimpleTestCase):
+    """内容哈希结果缓存：读取不写库、总大小由触发器维护、LRU 淘汰"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.path = os.path.join(self.root, 'cache.sqlite3')
+
+    def _sum(self, cache):
+        return cache._connect().execute('SELECT COALESCE(SUM(size), 0) FROM result_cache').fetchone()[0]
+
+    def test_reads_do_not_write_until_flush(self):
+        cache = ContentHashCache(self.path)
+        cache.set('ocr.general', 'a', {'rawText': '合同'})
+        conn = cache._connect()
+        changes = conn.total_changes
+        for _ in range(10):
+            self.assertEqual(cache.get('ocr.general', 'a'), {'rawText': '合同'})
+            self.assertIsNone(cache.get('ocr.general', 'b'))
+        self.assertEqual(conn.total_changes, changes)
+
+        stats = cache.stats()['namespaces']['ocr.general']
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (10, 10, 0.5))
+
+    def test_reads_flushed_in_batches(self):
+        cache = ContentHashCache(self.path)
+        cache.set('ocr.general', 'a', 'x')
+        with mock.patch.object(result_cache, 'FLUSH_EVERY', 5):
+            for _ in range(5):
+                cache.get('ocr.general', 'a')
+        other = ContentHashCache(self.path)
+        self.assertEqual(other.stats()['hits'], 5)
+
+    def test_total_tracked_without_scanning(self):
+        cache = ContentHashCache(self.path, max_bytes=1000)
+        for index in range(20):
+            cache.set('document.extract', str(index), 'x' * 90)
+            # 覆盖写入同一键时按差值更新总大小
+            cache.set('document.extract', str(index), 'y' * 95)
+            self.assertEqual(cache.total_bytes(), self._sum(cache))
+        self.assertLessEqual(cache.total_bytes(), 1000)
+
+        # 旧缓存文件升级时按现有条目初始化总大小
+        conn = cache._connect()
+        conn.execute('DROP TABLE result_cache_total')
+        conn.commit()
+        self.assertEqual(ContentHashCache(self.path).total_bytes(), self._sum(cache))
+
+    def test_least_recently_used_evicted(self):
+        cache = ContentHashCache(self.path, max_bytes=300)
+        for key in ('a', 'b', 'c'):
+            cache.set('ns', key, 'x' * 95)
+        # 读取 a 后再写入，淘汰最久未访问的 b
+        cache.get('ns', 'a')
+        cache.set('ns', 'd', 'x' * 95)
+        self.assertIsNotNone(cache.get('ns', 'a'))
+        self.assertIsNone(cache.get('ns', 'b'))
+        self.assertIsNotNone(cache.get('ns', 'd'))
+
+
+class DocumentExtractCacheTestCase(SimpleTestCase):
+    """文档提取结果缓存与 OCR 是否启用无关，只跳过含模拟 OCR 或失败页的结果"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        with mock.patch.object(document_extract_service, 'TencentOCRService'):
+            self.service = DocumentExtractService()
+        self.service.ocr_service.enabled = False
+        self.cache = ContentHashCache(':memory:')
+        patcher = mock.patch.object(document_extract_service, 'get_result_cache', return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.media_root, name), 'wb') as f:
+            f.write(content)
+        return f'/media/{name}'
+
+    def test_text_result_cached_without_ocr(self):
+        url = self._write('起诉状.txt', '原告：张三'.encode('utf-8'))
+        with override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='/media/'), \
+                mock.patch.object(self.service, '_extract_by_ext', wraps=self.service._extract_by_ext) as extract:
+            first = self.service.extract(url)
+            second = self.service.extract(url)
+        self.assertEqual(first['text'], '原告：张三')
+        self.assertEqual(second, first)
+        self.assertEqual(extract.call_count, 1)
+
+    def test_mock_ocr_result_not_cached(self):
+        url = self._write('名片.png', b'png')
+        self.service.ocr_service.recognize_general_bytes.return_value = {
+            'success': True, 'mock': True, 'rawText': '模拟文本',
+        }
+        with override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='/media/'):
+            result = self.service.extract(url)
+            self.service.extract(url)
+        self.assertIn('ocr_mock', result['warnings'])
+        self.assertEqual(self.service.ocr_service.recognize_general_bytes.call_count, 2)
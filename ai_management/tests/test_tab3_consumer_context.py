@@ -0,0 +1,89 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TransactionTestCase
+
+from ai_management.consumers import tab3_chat
+from ai_management.consumers.tab3_chat import Tab3ChatConsumer
+from ai_management.models import AIChatHistory, AIConversation, AIMessage, Tab3Session
+from dvadmin.system.models import Users
+
+
+class Tab3ConsumerContextTestCase(TransactionTestCase):
+    """Tab3 WebSocket：连接级上下文缓存、批量落库与按消息统计数据库耗时"""
+
+    def setUp(self):
+        self.user = Users.objects.create(username="tab3_ctx", name="Tab3用户")
+        self.conversation = AIConversation.objects.create(user_id=self.user.id, title="会话")
+        self.session = Tab3Session.objects.create(
+            session_id="s-ctx", thread_id="t-1", user_id=self.user.id, conversation_id=self.conversation.id,
+        )
+        self.consumer = Tab3ChatConsumer()
+        self.consumer.user_id = self.user.id
+        self.consumer.send_json = mock.AsyncMock()
+        scope_patch = mock.patch.object(tab3_chat, "crm_get_scope", return_value={"role_level": "SALES"})
+        self.crm_get_scope = scope_patch.start()
+        self.addCleanup(scope_patch.stop)
+
+    def test_context_resolved_once_per_connection(self):
+        async def run():
+            await self.consumer._load_context()
+            content = {"sessionId": "s-ctx", "conversationId": self.conversation.id}
+            with mock.patch.object(self.consumer, "_db_get_conversation", wraps=self.consumer._db_get_conversation) as get_conv, \
+                    mock.patch.object(self.consumer, "_db_get_session", wraps=self.consumer._db_get_session) as get_session:
+                for _ in range(3):
+                    session, conversation, _ = await self.consumer._resolve_session_and_conversation(content, "你好")
+                self.assertEqual((get_conv.call_count, get_session.call_count), (1, 1))
+            self.assertEqual(conversation.id, self.conversation.id)
+            self.assertEqual(session.session_id, "s-ctx")
+
+            # 显式刷新（角色/部门变化后的 group 通知）
+            self.crm_get_scope.return_value = {"role_level": "TEAM"}
+            await self.consumer.tab3_context_changed({"type": "tab3.context_changed"})
+
+        async_to_sync(run)()
+        self.assertEqual(self.crm_get_scope.call_count, 2)
+        self.assertEqual(self.consumer.scope_payload, {"role_level": "TEAM"})
+        sent_types = [call.args[0]["type"] for call in self.consumer.send_json.call_args_list]
+        self.assertEqual(sent_types, ["scope_hint", "capabilities"])
+
+    def test_writes_buffered_and_flushed_in_order(self):
+        async def run():
+            self.consumer._queue_user_message(self.conversation.id, "问题", [])
+            self.consumer._queue_ai_message(self.conversation.id, "回答")
+            self.consumer._queue_legacy_history("问题", "回答")
+            self.consumer._queue_session_fields("s-ctx", last_run_id="run-9")
+            self.assertEqual(await self._count_messages(), 0)
+            await self.consumer._ensure_flushed()
+
+        async_to_sync(run)()
+        rows = list(AIMessage.objects.filter(conversation_id=self.conversation.id).order_by("id"))
+        self.assertEqual([(row.role, row.content_json["text"]) for row in rows], [("user", "问题"), ("assistant", "回答")])
+        self.assertTrue(AIChatHistory.objects.filter(user_id=self.user.id, response="回答").exists())
+        self.assertEqual(Tab3Session.objects.get(session_id="s-ctx").last_run_id, "run-9")
+        self.conversation.refresh_from_db()
+        self.assertIsNotNone(self.conversation.last_message_time)
+
+    def test_direct_session_update_supersedes_buffered_fields(self):
+        async def run():
+            session = await self.consumer._get_session("s-ctx")
+            self.consumer._queue_session_fields("s-ctx", last_run_id="stale")
+            await self.consumer._update_session(session, last_run_id="", thread_id="")
+            await self.consumer._ensure_flushed()
+
+        async_to_sync(run)()
+        self.assertEqual(Tab3Session.objects.get(session_id="s-ctx").last_run_id, "")
+
+    def test_metrics_report_db_time_per_message(self):
+        async def run():
+            await self.consumer.receive_json({"type": "refresh_context"})
+
+        async_to_sync(run)()
+        metrics = self.consumer.last_metrics
+        self.assertEqual(metrics["type"], "refresh_context")
+        # 权限范围 + 能力清单
+        self.assertEqual(metrics["db_calls"], 2)
+        self.assertGreaterEqual(metrics["total_ms"], metrics["db_ms"])
+
+    async def _count_messages(self):
+        return await self.consumer._db(AIMessage.objects.filter(conversation_id=self.conversation.id).count)
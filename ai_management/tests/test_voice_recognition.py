@@ -0,0 +1,59 @@
+import base64
+import json
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from ai_management.services import voice_recognition_service
+from ai_management.services.voice_recognition_service import StreamingBase64JSONBody
+
+
+class StreamingBase64JSONBodyTestCase(SimpleTestCase):
+    """流式 JSON 请求体：输出与整体编码一致，按偏移读取且缓冲区有界"""
+
+    def setUp(self):
+        patcher = mock.patch.object(voice_recognition_service, 'STREAM_CHUNK_SIZE', 7)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _body(self, audio):
+        request_body = {'user': {'uid': '应用'}, 'audio': {'data': StreamingBase64JSONBody.PLACEHOLDER}}
+        expected = json.dumps(
+            {'user': {'uid': '应用'}, 'audio': {'data': base64.b64encode(audio).decode('ascii')}},
+            ensure_ascii=False,
+        ).encode('utf-8')
+        return StreamingBase64JSONBody(request_body, ContentFile(audio), len(audio)), expected
+
+    def _read_all(self, body, size):
+        parts = []
+        while True:
+            data = body.read(size)
+            if not data:
+                return b''.join(parts)
+            self.assertLessEqual(len(data), size)
+            parts.append(data)
+
+    def test_output_matches_full_encoding(self):
+        for audio_size in (0, 1, 2, 3, 20, 64):
+            audio = bytes(range(audio_size))
+            for size in (1, 5, 4096):
+                body, expected = self._body(audio)
+                self.assertEqual(len(body), len(expected))
+                self.assertEqual(self._read_all(body, size), expected)
+
+            body, expected = self._body(audio)
+            self.assertEqual(body.read(), expected)
+            self.assertEqual(body.read(), b'')
+
+    def test_buffer_bounded(self):
+        body, expected = self._body(bytes(1000))
+        parts = []
+        while True:
+            data = body.read(3)
+            if not data:
+                break
+            parts.append(data)
+            # 已读取的数据会被及时丢弃，缓冲区不随请求体增长
+            self.assertLess(len(body._buffer), 64)
+        self.assertEqual(b''.join(parts), expected)
@@ -0,0 +1,30 @@
+"""
+PDF 分页处理（在渲染进程池中执行）
+
+进程池使用 spawn 启动，子进程会导入本模块，因此这里只依赖 PyMuPDF，
+不导入 Django 配置或模型。
+"""
+from typing import List, Sequence, Tuple
+
+try:
+    import fitz  # PyMuPDF
+except Exception:  # pragma: no cover - optional dependency
+    fitz = None
+
+
+def extract_page_texts(path: str, indexes: Sequence[int]) -> List[Tuple[int, str]]:
+    """提取指定页的文本层，每次调用独立打开文档"""
+    doc = fitz.open(path)
+    try:
+        return [(index, doc.load_page(index).get_text("text").strip()) for index in indexes]
+    finally:
+        doc.close()
+
+
+def render_page(path: str, index: int, dpi: int) -> bytes:
+    """把单页渲染为 PNG"""
+    doc = fitz.open(path)
+    try:
+        return doc.load_page(index).get_pixmap(dpi=dpi, alpha=False).tobytes("png")
+    finally:
+        doc.close()
@@ -0,0 +1,273 @@
+"""
+内容哈希结果缓存
+
+按文件内容 SHA-256 + 处理参数缓存 OCR / 文档提取结果，避免同一文件重复调用付费接口。
+结果存放在本地 SQLite 文件中，多个 worker 进程共享；总大小超过上限时按最近访问时间（LRU）淘汰，
+并按命名空间累计命中/未命中次数以便统计命中率。
+
+读取只执行一次查询：访问时间与命中计数先在进程内累计，每 FLUSH_EVERY 次读取或 FLUSH_INTERVAL 秒
+批量写回；总大小由触发器维护在 result_cache_total 中，写入时无需 SUM 全表。
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 淘汰时清理到上限的该比例，避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+# 访问时间与命中计数批量写回的条件：累计读取次数或距上次写回的秒数
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 30
+
+
+def hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件 SHA-256，避免把大文件整体读入内存"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentHashCache:
+    """基于 SQLite 的内容哈希结果缓存（按总大小 LRU 淘汰）"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        config = getattr(settings, 'AI_RESULT_CACHE', {}) or {}
+        self.path = path or config.get('PATH') or os.path.join(settings.BASE_DIR, 'cache', 'ai_result_cache.sqlite3')
+        self.max_bytes = max_bytes or config.get('MAX_BYTES') or DEFAULT_MAX_BYTES
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._memory_conn = None
+        self._lock = threading.Lock()
+        # 待写回的访问时间 {cache_key: accessed_at} 与命中计数 {namespace: [hits, misses]}
+        self._pending_access: Dict[str, float] = {}
+        self._pending_stats: Dict[str, list] = {}
+        self._pending_reads = 0
+        self._flushed_at = time.monotonic()
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path == ':memory:':
+            if self._memory_conn is None:
+                self._memory_conn = sqlite3.connect(':memory:', check_same_thread=False)
+            return self._memory_conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS result_cache (
+                cache_key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_accessed ON result_cache (accessed_at)')
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS result_cache_stats (
+                namespace TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.commit()
+        # 总大小单行表与维护触发器；旧缓存文件首次升级时按现有条目初始化
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS result_cache_total (id INTEGER PRIMARY KEY CHECK (id = 1), total INTEGER NOT NULL)'
+        )
+        conn.execute(
+            'INSERT OR IGNORE INTO result_cache_total (id, total) SELECT 1, COALESCE(SUM(size), 0) FROM result_cache'
+        )
+        conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS result_cache_total_insert AFTER INSERT ON result_cache BEGIN '
+            'UPDATE result_cache_total SET total = total + NEW.size WHERE id = 1; END'
+        )
+        conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS result_cache_total_update AFTER UPDATE OF size ON result_cache BEGIN '
+            'UPDATE result_cache_total SET total = total - OLD.size + NEW.size WHERE id = 1; END'
+        )
+        conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS result_cache_total_delete AFTER DELETE ON result_cache BEGIN '
+            'UPDATE result_cache_total SET total = total - OLD.size WHERE id = 1; END'
+        )
+        conn.commit()
+
+    @staticmethod
+    def make_key(namespace: str, content_hash: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """缓存键 = 命名空间 + 内容哈希 + 规范化后的参数"""
+        options_part = json.dumps(options or {}, sort_keys=True, ensure_ascii=False)
+        options_hash = hashlib.sha256(options_part.encode('utf-8')).hexdigest()[:16]
+        return f'{namespace}:{content_hash}:{options_hash}'
+
+    def _record(self, key: Optional[str], namespace: str, hit: bool):
+        """在进程内累计访问时间与命中计数（调用方持有 self._lock），达到条件时写回"""
+        if key is not None:
+            self._pending_access[key] = time.time()
+        counts = self._pending_stats.setdefault(namespace, [0, 0])
+        counts[0 if hit else 1] += 1
+        self._pending_reads += 1
+        if self._pending_reads >= FLUSH_EVERY or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self._flush(self._connect())
+            self._connect().commit()
+
+    def _flush(self, conn):
+        """把累计的访问时间与命中计数写回数据库（调用方持有 self._lock，并负责提交）"""
+        if self._pending_access:
+            conn.executemany(
+                'UPDATE result_cache SET accessed_at = MAX(accessed_at, ?) WHERE cache_key = ?',
+                [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+            )
+        if self._pending_stats:
+            conn.executemany(
+                "INSERT INTO result_cache_stats (namespace, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT(namespace) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                [(namespace, hits, misses) for namespace, (hits, misses) in self._pending_stats.items()]
+            )
+        self._pending_access = {}
+        self._pending_stats = {}
+        self._pending_reads = 0
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        """立即写回累计的访问时间与命中计数"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                self._flush(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写回结果缓存统计失败: {e}")
+
+    def get(self, namespace: str, content_hash: str, options: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        key = self.make_key(namespace, content_hash, options)
+        try:
+            with self._lock:
+                row = self._connect().execute('SELECT value FROM result_cache WHERE cache_key = ?', (key,)).fetchone()
+                self._record(key if row else None, namespace, hit=bool(row))
+            return json.loads(row[0]) if row else None
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"读取结果缓存失败: {e}")
+            return None
+
+    def set(self, namespace: str, content_hash: str, value: Any, options: Optional[Dict[str, Any]] = None):
+        key = self.make_key(namespace, content_hash, options)
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                # 借本次写事务一并写回累计的访问时间，淘汰时的 LRU 顺序更准确
+                self._flush(conn)
+                conn.execute(
+                    "INSERT INTO result_cache (cache_key, namespace, value, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(cache_key) DO UPDATE SET namespace = excluded.namespace, value = excluded.value, "
+                    "size = excluded.size, created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                    (key, namespace, payload, len(payload.encode('utf-8')), now, now)
+                )
+                self._evict(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入结果缓存失败: {e}")
+
+    def total_bytes(self) -> int:
+        return self._connect().execute('SELECT total FROM result_cache_total WHERE id = 1').fetchone()[0]
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT total FROM result_cache_total WHERE id = 1').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        evicted = 0
+        for key, size in conn.execute('SELECT cache_key, size FROM result_cache ORDER BY accessed_at'):
+            if total <= target:
+                break
+            evicted += 1
+            total -= size
+        if evicted:
+            conn.execute(
+                'DELETE FROM result_cache WHERE cache_key IN '
+                '(SELECT cache_key FROM result_cache ORDER BY accessed_at LIMIT ?)',
+                (evicted,)
+            )
+        logger.info(f"结果缓存超出上限，已淘汰 {evicted} 条")
+
+    def stats(self) -> Dict[str, Any]:
+        """按命名空间返回条目数、占用大小、命中次数及命中率"""
+        self.flush()
+        conn = self._connect()
+        usage = {
+            namespace: {'entries': entries, 'bytes': size}
+            for namespace, entries, size in conn.execute(
+                'SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM result_cache GROUP BY namespace'
+            ).fetchall()
+        }
+        namespaces = {}
+        total_hits = total_misses = 0
+        for namespace, hits, misses in conn.execute(
+            'SELECT namespace, hits, misses FROM result_cache_stats'
+        ).fetchall():
+            total_hits += hits
+            total_misses += misses
+            namespaces[namespace] = {
+                **usage.pop(namespace, {'entries': 0, 'bytes': 0}),
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        for namespace, item in usage.items():
+            namespaces[namespace] = {**item, 'hits': 0, 'misses': 0, 'hit_ratio': 0.0}
+        return {
+            'max_bytes': self.max_bytes,
+            'total_bytes': sum(item['bytes'] for item in namespaces.values()),
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_ratio': round(total_hits / (total_hits + total_misses), 4) if total_hits + total_misses else 0.0,
+            'namespaces': namespaces,
+        }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ContentHashCache:
+    """获取进程级结果缓存单例"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ContentHashCache()
+                # 进程退出前写回尚未落库的访问时间与命中计数
+                atexit.register(_result_cache.flush)
+    return _result_cache
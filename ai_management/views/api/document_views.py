@@ -76,6 +76,7 @@ class DocumentViewSet(CustomModelViewSet):
                 force_ocr=data.get('force_ocr', False),
                 ocr_all_pages=data.get('ocr_all_pages', False),
                 ocr_page_limit=data.get('ocr_page_limit', 0),
+                ocr_missing_pages=data.get('ocr_missing_pages', False),
             )
             return DetailResponse(data=result)
         except Exception as e:
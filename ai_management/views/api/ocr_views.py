@@ -9,6 +9,7 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from dvadmin.utils.viewset import CustomModelViewSet
 from dvadmin.utils.json_response import DetailResponse, ErrorResponse
 from ai_management.services.ocr_service import TencentOCRService
+from ai_management.utils.result_cache import get_result_cache
 
 logger = logging.getLogger(__name__)
 
@@ -80,3 +81,15 @@ class OCRViewSet(CustomModelViewSet):
             logger.error(f"通用识别失败: {exc}")
             logger.error(traceback.format_exc())
             return ErrorResponse(msg=f"通用识别失败: {str(exc)}", code=500)
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """
+        OCR/文档提取结果缓存统计（条目数、占用大小、命中率）
+        GET /api/ai/ocr/cache-stats/
+        """
+        try:
+            return DetailResponse(data=get_result_cache().stats(), msg="获取成功")
+        except Exception as exc:
+            logger.error(f"获取结果缓存统计失败: {exc}")
+            return ErrorResponse(msg=f"获取结果缓存统计失败: {str(exc)}", code=500)
@@ -3,12 +3,9 @@ Tab3 AI 对话 HTTP 视图。
 """
 import json
 import logging
-import queue
-import threading
-import time
-import uuid
 from urllib.parse import urlencode
 
+from asgiref.sync import async_to_sync
 from django.http import StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import serializers
@@ -17,6 +14,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 
 from ai_management.models import AIChatHistory, AIConversation, AIMessage, AIPendingAction, Tab3Session
+from ai_management.services.mcp_session_transport import (
+    create_session,
+    is_stream_alive,
+    iter_sse_events,
+    resolve_session,
+    send_message_sync,
+)
 from ai_management.services.mcp_tool_service import (
     confirm_pending_action,
     crm_cancel_action,
@@ -36,11 +40,6 @@ from dvadmin.utils.viewset import CustomModelViewSet
 logger = logging.getLogger(__name__)
 
 
-_MCP_SESSION_TTL_SECONDS = 60 * 30
-_MCP_SESSION_LOCK = threading.Lock()
-_MCP_SESSIONS: dict[str, dict] = {}
-
-
 class _EmptySerializer(serializers.Serializer):
     """占位序列化器，避免默认路由触发时抛出 serializer 缺失异常。"""
 
@@ -76,64 +75,6 @@ def _extract_text_content(message: AIMessage):
     return str(content)
 
 
-def _mcp_cleanup_expired_sessions():
-    now = time.time()
-    remove_keys = []
-    with _MCP_SESSION_LOCK:
-        for key, item in _MCP_SESSIONS.items():
-            last_seen = item.get("last_seen") or item.get("created_at") or now
-            if now - last_seen > _MCP_SESSION_TTL_SECONDS:
-                remove_keys.append(key)
-        for key in remove_keys:
-            _MCP_SESSIONS.pop(key, None)
-
-
-def _mcp_create_session(user_id: int) -> str:
-    _mcp_cleanup_expired_sessions()
-    session_id = uuid.uuid4().hex
-    with _MCP_SESSION_LOCK:
-        _MCP_SESSIONS[session_id] = {
-            "user_id": user_id,
-            "queue": queue.Queue(maxsize=200),
-            "created_at": time.time(),
-            "last_seen": time.time(),
-        }
-    return session_id
-
-
-def _mcp_get_session(session_id: str) -> dict | None:
-    with _MCP_SESSION_LOCK:
-        session = _MCP_SESSIONS.get(session_id)
-        if session:
-            session["last_seen"] = time.time()
-        return session
-
-
-def _mcp_remove_session(session_id: str):
-    with _MCP_SESSION_LOCK:
-        _MCP_SESSIONS.pop(session_id, None)
-
-
-def _mcp_enqueue_message(session_id: str, payload: dict):
-    session = _mcp_get_session(session_id)
-    if not session:
-        return
-    q = session.get("queue")
-    if not q:
-        return
-    try:
-        q.put_nowait(payload)
-    except queue.Full:
-        try:
-            q.get_nowait()
-        except Exception:
-            pass
-        try:
-            q.put_nowait(payload)
-        except Exception:
-            logger.warning("MCP queue is full and drop message: session_id=%s", session_id)
-
-
 def _mcp_tool_definitions():
     return [
         {
@@ -779,29 +720,15 @@ class Tab3ChatViewSet(CustomModelViewSet):
         连接成功后会先返回 `endpoint` 事件，客户端向该 endpoint 发送 JSON-RPC 消息。
         """
         user = request.user
-        session_id = _mcp_create_session(int(user.id))
+        # 会话建立在 channels layer 上，消息可由任意 worker 投递到本流
+        session_id, channel_name = async_to_sync(create_session)(int(user.id))
         endpoint = request.build_absolute_uri("/api/ai/tab3/mcp/messages/")
         endpoint_with_session = f"{endpoint}?{urlencode({'session_id': session_id})}"
 
-        def stream():
-            try:
-                yield f"event: endpoint\ndata: {endpoint_with_session}\n\n"
-                while True:
-                    session = _mcp_get_session(session_id)
-                    if not session:
-                        break
-                    q = session.get("queue")
-                    try:
-                        message = q.get(timeout=15)
-                        payload = json.dumps(message, ensure_ascii=False)
-                        yield f"event: message\ndata: {payload}\n\n"
-                    except queue.Empty:
-                        # SSE 注释行心跳，避免代理超时
-                        yield f": heartbeat {int(time.time())}\n\n"
-            finally:
-                _mcp_remove_session(session_id)
-
-        response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+        response = StreamingHttpResponse(
+            iter_sse_events(channel_name, endpoint_with_session, int(user.id)),
+            content_type="text/event-stream",
+        )
         response["Cache-Control"] = "no-cache"
         response["Connection"] = "keep-alive"
         response["X-Accel-Buffering"] = "no"
@@ -818,11 +745,13 @@ class Tab3ChatViewSet(CustomModelViewSet):
         if not session_id:
             return ErrorResponse(msg="缺少 session_id", code=400)
 
-        session = _mcp_get_session(session_id)
+        session = resolve_session(session_id)
         if not session:
             return ErrorResponse(msg="MCP 会话不存在或已过期", code=404)
-        if int(session.get("user_id") or 0) != int(user.id):
+        if session["user_id"] != int(user.id):
             return ErrorResponse(msg="无权访问该 MCP 会话", code=403)
+        if not is_stream_alive(session["channel"]):
+            return ErrorResponse(msg="MCP 会话不存在或已过期", code=404)
 
         payload = request.data
         accepted = 0
@@ -833,7 +762,7 @@ class Tab3ChatViewSet(CustomModelViewSet):
             accepted += 1
             response_payload = _handle_mcp_rpc_message(user, item)
             if response_payload is not None:
-                _mcp_enqueue_message(session_id, response_payload)
+                send_message_sync(session["channel"], response_payload)
                 emitted += 1
 
         try:
@@ -88,7 +88,7 @@ class VoiceRecognitionViewSet(CustomModelViewSet):
             
             logger.info(f"收到语音识别请求（极速版），文件: {audio_file.name}, 大小: {audio_file.size}, 类型: {audio_file.content_type}")
             
-            # 执行语音识别（极速版：直接Base64编码上传，一次请求返回结果）
+            # 执行语音识别（极速版：分块流式Base64编码上传，一次请求返回结果）
             result = self.voice_service.recognize_voice(audio_file)
             
             if result.get('success'):
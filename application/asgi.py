@@ -17,6 +17,11 @@ os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
 
 http_application = get_asgi_application()
 
+# 服务进程启动后预热模板文本缓存
+from case_management.utils.template_text_cache import warm_in_background
+
+warm_in_background()
+
 # WebSocket 路由
 from ai_management.routing import websocket_urlpatterns
 
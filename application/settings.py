@@ -15,6 +15,7 @@ import sys
 import logging
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
 
 # 配置 PyMySQL 作为 MySQL 数据库后端
 import pymysql
@@ -135,6 +136,7 @@ REST_FRAMEWORK = {
 
 MIDDLEWARE = [
     "dvadmin.utils.middleware.HealthCheckMiddleware",
+    "dvadmin.utils.middleware.QueryMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -229,6 +231,11 @@ STATICFILES_DIRS = [
 
 MEDIA_ROOT = "media"  # 媒体文件在服务器上的物理存储目录
 MEDIA_URL = "/media/"  # 媒体文件的URL访问前缀（已启用权限控制，需登录才能访问）
+# 受保护媒体文件交付：OFFLOAD 为 'nginx'（X-Accel-Redirect）或 'sendfile'（X-Sendfile）时由前端代理输出文件
+PROTECTED_MEDIA = locals().get("PROTECTED_MEDIA", {
+    'OFFLOAD': None,
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',
+})
 
 #添加以下代码以后就不用写{% load staticfiles %}，可以直接引用
 STATICFILES_FINDERS = (
@@ -558,6 +565,105 @@ CACHES = {
     }
 }
 
+# 法规文档缓存目录（原始文档按内容哈希存储，解析结果与之并存）
+REGULATION_CACHE_DIR = locals().get("REGULATION_CACHE_DIR", os.path.join(BASE_DIR, "cache", "regulations"))
+# 法规文档缓存重验证间隔（秒），超过后向源站发起条件请求
+REGULATION_CACHE_REVALIDATE_SECONDS = locals().get("REGULATION_CACHE_REVALIDATE_SECONDS", 3600)
+# 案件全文检索索引文件（SQLite FTS5）
+CASE_SEARCH_INDEX_PATH = locals().get("CASE_SEARCH_INDEX_PATH", os.path.join(BASE_DIR, "cache", "case_search.sqlite3"))
+# 案件文档树缓存时间（秒），目录/文档变更时递增数据库中的版本号立即失效（所有 worker 共享）
+CASE_DOCUMENT_TREE_CACHE_TTL = locals().get("CASE_DOCUMENT_TREE_CACHE_TTL", 600)
+# 服务启动时预热模板文本缓存（见 case_management/utils/template_text_cache.py）
+TEMPLATE_TEXT_CACHE_WARMUP = locals().get("TEMPLATE_TEXT_CACHE_WARMUP", True)
+# 大模型文书并发生成（见 case_management/services/llm_generation.py）：并发数与每分钟 token 上限（0 为不限）
+LLM_GENERATION = locals().get("LLM_GENERATION", {
+    'MAX_CONCURRENCY': 4,
+    'TOKENS_PER_MINUTE': 0,
+    'CHARS_PER_TOKEN': 2,
+    'COMPLETION_TOKENS': 2000,
+})
+# DOCX/HTML 转换缓存（见 case_management/utils/conversion_cache.py）：缓存目录、总大小上限与大文件后台转换阈值
+DOCUMENT_CONVERSION_CACHE_DIR = locals().get("DOCUMENT_CONVERSION_CACHE_DIR", os.path.join(MEDIA_ROOT, "cache", "conversions"))
+DOCUMENT_CONVERSION_CACHE = locals().get("DOCUMENT_CONVERSION_CACHE", {
+    'MAX_BYTES': 512 * 1024 * 1024,
+    'BACKGROUND_THRESHOLD': 2 * 1024 * 1024,
+    'BACKGROUND_BACKEND': 'thread',
+    'PENDING_TIMEOUT': 600,
+    'FAILED_TIMEOUT': 600,
+    'EVICT_INTERVAL': 300,
+})
+# 请求查询统计（见 dvadmin/utils/query_metrics.py）：按路径通配配置查询数/重复查询/数据库耗时/响应耗时预算
+QUERY_METRICS = locals().get("QUERY_METRICS", {
+    'ENABLED': True,
+    'LOG_REQUESTS': False,
+    'RESPONSE_HEADERS': DEBUG,
+    'RAISE_ON_BUDGET': False,
+    'DEFAULT_BUDGET': {'queries': 100, 'duplicates': 20},
+    'BUDGETS': {
+        # 小程序客户详情/列表
+        '/api/crm/client/*': {'queries': 30, 'duplicates': 5},
+        # 报表
+        '/api/customer/reports/*': {'queries': 40, 'duplicates': 5, 'db_ms': 1000},
+        '/admin-api/customer/reports/*': {'queries': 40, 'duplicates': 5, 'db_ms': 1000},
+        # 组织/部门/用户树
+        '/api/customer/organization/tree/': {'queries': 20, 'duplicates': 3},
+        '/api/customer/dept/tree/': {'queries': 20, 'duplicates': 3},
+    },
+    'METRICS_PATH': '/metrics/queries',
+    'METRICS_TOKEN': locals().get("QUERY_METRICS_TOKEN", ""),
+    'TOP_DUPLICATES': 5,
+})
+# 日志归档（见 dvadmin/utils/log_archive.py）：超过保留天数的日志按月写入 gzip JSONL 分片并从热表删除
+LOG_ARCHIVE = locals().get("LOG_ARCHIVE", {
+    'DIR': os.path.join(BASE_DIR, 'logs', 'archive'),
+    'BATCH_SIZE': 2000,
+    'TABLES': {
+        'system.OperationLog': {
+            'days': 90,
+            'filter_fields': ['creator_id', 'request_modular', 'request_method', 'request_path', 'request_ip',
+                              'response_code', 'status'],
+        },
+        'system.LoginLog': {'days': 180, 'filter_fields': ['creator_id', 'username', 'ip', 'login_type']},
+        'case_management.WPSCallbackLog': {'days': 90, 'filter_fields': ['document_id', 'file_id', 'event_type']},
+        'case_management.RegulationSearchHistory': {
+            'days': 180,
+            'children': [('case_management.RegulationSearchResult', 'search_history_id')],
+            'filter_fields': ['user_id', 'search_type'],
+        },
+    },
+})
+# 定时任务（celery beat）：每天凌晨前移重复日程的展开窗口，避免超过 SCHEDULE_RECURRENCE_HORIZON_DAYS 后日历缺少实例；
+# 随后按 LOG_ARCHIVE 归档超过保留期的日志
+CELERY_BEAT_SCHEDULE = locals().get("CELERY_BEAT_SCHEDULE", {
+    'refresh-schedule-occurrences': {
+        'task': 'customer_management.tasks.refresh_schedule_occurrences_task',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    'archive-logs': {
+        'task': 'dvadmin.system.tasks.archive_logs_task',
+        'schedule': crontab(hour=3, minute=30),
+    },
+})
+# 日程重复规则展开：物化未来/过去多少天内的实例，以及单个日程最多物化的实例数
+SCHEDULE_RECURRENCE_HORIZON_DAYS = locals().get("SCHEDULE_RECURRENCE_HORIZON_DAYS", 180)
+SCHEDULE_RECURRENCE_LOOKBACK_DAYS = locals().get("SCHEDULE_RECURRENCE_LOOKBACK_DAYS", 365)
+SCHEDULE_RECURRENCE_MAX_OCCURRENCES = locals().get("SCHEDULE_RECURRENCE_MAX_OCCURRENCES", 1000)
+# 日程提醒投递调度（见 customer_management/services/schedule_reminder_dispatcher.py）
+SCHEDULE_REMINDER_DISPATCH = locals().get("SCHEDULE_REMINDER_DISPATCH", {
+    'BACKEND': 'customer_management.services.schedule_reminder_dispatcher.NotificationServiceBackend',
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 60,
+    'LEASE_SECONDS': 300,
+})
+# 对象存储上传（见 dvadmin/utils/object_storage.py）：超过阈值的文件分片并行上传，已完成分片记录在数据库中以便续传
+OBJECT_STORAGE_UPLOAD = locals().get("OBJECT_STORAGE_UPLOAD", {
+    'PART_SIZE': 8 * 1024 * 1024,
+    'MULTIPART_THRESHOLD': 16 * 1024 * 1024,
+    'MAX_WORKERS': 4,
+    'STATE_TTL': 7 * 24 * 3600,
+})
+
 # ================================================= #
 # ******************** 插件配置 ******************** #
 # ================================================= #
@@ -657,6 +763,15 @@ DOUBAO_CONFIG = {
     
     # 超时配置
     'RECOGNITION_TIMEOUT': 60,  # 识别超时时间(秒)
+
+    # 并发控制：单进程同时上传识别的最大数量，超出时排队等待 QUEUE_TIMEOUT 秒
+    'MAX_CONCURRENT': 4,
+    'QUEUE_TIMEOUT': 30,
+
+    # 可选服务端转码（需安装 ffmpeg）：上传前转为 16kHz 单声道 OGG OPUS 以减小体积
+    'TRANSCODE_ENABLED': False,
+    'TRANSCODE_SAMPLE_RATE': 16000,
+    'TRANSCODE_BITRATE': '32k',
 }
 
 # ================================================= #
@@ -668,3 +783,19 @@ TENCENT_OCR_CONFIG = {
     'REGION': locals().get('TENCENT_OCR_REGION', 'ap-beijing'),
     'USE_SYSTEM_CONFIG': True,
 }
+
+# OCR / 文档提取结果缓存（按文件内容 SHA-256 + 参数缓存，超出上限按 LRU 淘汰）
+AI_RESULT_CACHE = locals().get("AI_RESULT_CACHE", {
+    'PATH': os.path.join(BASE_DIR, 'cache', 'ai_result_cache.sqlite3'),
+    'MAX_BYTES': 256 * 1024 * 1024,
+})
+
+# 文档文本提取（PDF 分页并行渲染 + 有限并发 OCR）
+DOCUMENT_EXTRACT_CONFIG = locals().get("DOCUMENT_EXTRACT_CONFIG", {
+    'RENDER_PROCESSES': 2,  # 页面渲染进程数，0 表示在当前进程内渲染
+    'PARALLEL_MIN_PAGES': 4,  # 页数达到该值才启用多进程
+    'OCR_CONCURRENCY': 4,  # OCR 并发请求数
+    'OCR_PAGE_TIMEOUT': 30,  # 单页 OCR 超时（秒）
+    'OCR_RETRIES': 2,  # 单页 OCR 失败重试次数
+    'RENDER_DPI': 200,
+})
@@ -15,3 +15,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
 os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
 
 application = get_wsgi_application()
+
+# 服务进程启动后预热模板文本缓存
+from case_management.utils.template_text_cache import warm_in_background
+
+warm_in_background()
@@ -5,7 +5,8 @@
 import os
 import json
 import re
-from typing import Dict, Any, List
+import threading
+from typing import Dict, Any, List, Iterator
 import logging
 
 # 配置日志
@@ -105,11 +106,31 @@ PRIORITY_MODELS = [
     # 注意：Ollama模型需要本地服务运行，暂时移除
 ]
 
+# 进程内复用的模型实例：(模型名, API 密钥) -> 模型；底层 HTTP 客户端线程安全，可供并发生成共享
+_chat_model_pool = {}
+_chat_model_pool_lock = threading.Lock()
+
+
 def get_chat_model(model_name: str = None):
-    """获取LangChain模型实例"""
+    """获取LangChain模型实例（按模型名与 API 密钥在进程内复用）"""
     if model_name is None:
         model_name = get_best_available_model()
     
+    config = MODEL_CONFIGS.get(model_name) or {}
+    pool_key = (model_name, os.getenv(config["api_key_env"]) if config.get("api_key_env") else None)
+    model = _chat_model_pool.get(pool_key)
+    if model is not None:
+        return model
+    with _chat_model_pool_lock:
+        model = _chat_model_pool.get(pool_key)
+        if model is None:
+            model = _create_chat_model(model_name)
+            _chat_model_pool[pool_key] = model
+    return model
+
+
+def _create_chat_model(model_name: str):
+    """创建LangChain模型实例"""
     if model_name not in MODEL_CONFIGS:
         raise ValueError(f"不支持的模型: {model_name}")
     
@@ -940,6 +961,31 @@ def get_file_type(filename: str) -> str:
     return type_map.get(ext, 'unknown')
 
 
+def parse_template_file(filepath: str, file_type: str) -> str:
+    """按文件类型解析模板文件，不支持的类型返回空字符串"""
+    if file_type == 'text':
+        # 文本文件
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+    elif file_type == 'word_new':
+        # 新版Word文档 (.docx)
+        content = parse_docx_file(filepath)
+    elif file_type == 'word_old':
+        # 旧版Word文档 (.doc) - 使用python-docx2txt
+        content = parse_doc_file(filepath)
+    elif file_type == 'excel_new':
+        # 新版Excel文档 (.xlsx)
+        content = parse_xlsx_file(filepath)
+    elif file_type == 'excel_old':
+        # 旧版Excel文档 (.xls)
+        content = parse_xls_file(filepath)
+    else:
+        logger.warning(f"不支持的文件类型: {filepath}")
+        return ""
+    logger.info(f"成功解析模板: {os.path.basename(filepath)}")
+    return content
+
+
 def load_template_files(use_unstructured: bool = False) -> List[Dict[str, str]]:
     """加载模板文件 - 支持多种文件格式"""
     if use_unstructured:
@@ -963,67 +1009,41 @@ def load_template_files(use_unstructured: bool = False) -> List[Dict[str, str]]:
             logger.warning("数据库中没有找到启用的模板记录，请先在模版管理中上传模板文件")
             return templates
         
+        from .utils.template_text_cache import template_text_cache
+        
+        filepaths = []
         for template_record in template_records:
             filepath = template_record.full_file_path
             filename = os.path.basename(filepath)
+            filepaths.append(filepath)
             
             if not os.path.exists(filepath):
                 logger.warning(f"模板文件不存在: {filepath}，跳过该模板")
                 continue
-                
-            # 根据文件扩展名确定文件类型
-            file_type = get_file_type(filename)
-            doc_type = extract_document_type_from_filename(filename)
             
+            # 解析结果按 (路径, mtime, 大小) 缓存，模板未变化时不再重复解析
             try:
-                if file_type == 'text':
-                    # 文本文件
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    logger.info(f"成功加载文本模板: {filename}")
-                    
-                elif file_type == 'word_new':
-                    # 新版Word文档 (.docx)
-                    content = parse_docx_file(filepath)
-                    logger.info(f"成功加载Word模板: {filename}")
-                    
-                elif file_type == 'word_old':
-                    # 旧版Word文档 (.doc) - 使用python-docx2txt
-                    content = parse_doc_file(filepath)
-                    logger.info(f"成功加载Word模板: {filename}")
-                    
-                elif file_type == 'excel_new':
-                    # 新版Excel文档 (.xlsx)
-                    content = parse_xlsx_file(filepath)
-                    logger.info(f"成功加载Excel模板: {filename}")
-                    
-                elif file_type == 'excel_old':
-                    # 旧版Excel文档 (.xls)
-                    content = parse_xls_file(filepath)
-                    logger.info(f"成功加载Excel模板: {filename}")
-                    
-                else:
-                    logger.warning(f"不支持的文件类型: {filename}")
-                    continue
-                
-                if not content or content.strip() == "":
-                    logger.error(f"文件 {filename} 解析内容为空，跳过该模板")
-                    continue
-                
-                # 保留原始格式标签，不进行任何转换
-                templates.append({
-                    "name": filename,
-                    "content": content,  # 直接使用原始内容，保留所有格式标签
-                    "is_binary": False,
-                    "file_type": file_type,
-                    "template_type": template_record.template_type,
-                    "template_id": template_record.id
-                })
-                
+                parsed = template_text_cache.get(filepath)
             except Exception as e:
                 logger.error(f"解析模板文件 {filename} 时出错: {e}")
                 continue
-                
+            
+            if parsed is None:
+                logger.error(f"文件 {filename} 不支持或解析内容为空，跳过该模板")
+                continue
+            
+            # 保留原始格式标签，不进行任何转换
+            templates.append({
+                "name": filename,
+                "content": parsed["content"],  # 直接使用原始内容，保留所有格式标签
+                "is_binary": False,
+                "file_type": parsed["file_type"],
+                "template_type": template_record.template_type,
+                "template_id": template_record.id,
+                "placeholders": parsed["placeholders"]
+            })
+        
+        template_text_cache.retain(filepaths)
         logger.info(f"从数据库成功加载 {len(templates)} 个模板文件")
         return templates
         
@@ -1120,10 +1140,11 @@ def load_template_files_from_filesystem():
     logger.info(f"从文件系统成功加载 {len(templates)} 个模板文件")
     return templates
 
-def generate_document_with_langchain(case_data: Dict[str, Any], document_type: str, template_info: Dict[str, Any] = None) -> Dict[str, Any]:
+def generate_document_with_langchain(case_data: Dict[str, Any], document_type: str, template_info: Dict[str, Any] = None,
+                                     model=None) -> Dict[str, Any]:
     """使用LangChain生成单个法律文书（优化版 - 保持模板格式）"""
     try:
-        model = get_chat_model()
+        model = model or get_chat_model()
         
         # 启用调试模式
         import logging
@@ -1504,80 +1525,134 @@ def generate_document_with_langchain(case_data: Dict[str, Any], document_type: s
         }
 
 
-def generate_all_documents_with_langchain(case_data: Dict[str, Any], use_unstructured: bool = False) -> Dict[str, Any]:
-    """使用LangChain根据所有模板生成法律文书"""
-    if use_unstructured:
-        # 使用Unstructured库生成
-        try:
-            from .unstructured_document_service import unstructured_service
-            return unstructured_service.generate_all_documents(case_data)
-        except Exception as e:
-            logger.error(f"使用Unstructured生成文档失败: {e}")
-            # 回退到原有方法
-            pass
+def iter_generate_all_documents_with_langchain(case_data: Dict[str, Any], model=None,
+                                               max_concurrency: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    并发生成所有模板对应的法律文书，按完成顺序逐个产出
+    
+    产出事件：
+        {'type': 'start', 'total_count': int}
+        {'type': 'document', 'index': int, ...单个文档结果}
+        {'type': 'done', 'total_count', 'success_count', 'error_count'}
+    并发数与每分钟 token 上限见 settings.LLM_GENERATION。
+    """
+    from .services.llm_generation import build_rate_limiter, estimate_tokens, get_generation_config, run_concurrently
     
     # 加载所有模板文件
     templates = load_template_files(use_unstructured=False)
     
     if not templates:
         logger.error("没有找到任何模板文件")
-        return {
-            'success': False,
-            'documents': [],
-            'total_count': 0,
-            'success_count': 0,
-            'error_count': 0,
-            'error': '没有找到任何模板文件'
-        }
+        yield {'type': 'error', 'error': '没有找到任何模板文件'}
+        return
     
     logger.info(f"找到 {len(templates)} 个模板文件，开始生成文档...")
     
-    generated_documents = []
-    success_count = 0
-    generated_types = set()  # 用于防止重复生成相同类型的文档
-    
+    # 防止重复生成相同类型的文档
+    jobs = []
+    generated_types = set()
     for template in templates:
-        # 从文件名提取文档类型
-        template_name = template['name']
-        document_type = extract_document_type_from_filename(template_name)
-        
-        # 防止重复生成相同类型的文档
+        document_type = extract_document_type_from_filename(template['name'])
         if document_type in generated_types:
             logger.warning(f"跳过重复的文档类型: {document_type}")
             continue
-        
         generated_types.add(document_type)
-        
-        logger.info(f"正在生成文档: {document_type} (模板: {template_name})")
-        result = generate_document_with_langchain(case_data, document_type, template)
+        jobs.append((document_type, template))
+    
+    config = get_generation_config()
+    # 所有文档共享同一个模型实例；创建失败时由各文档分别返回错误
+    if model is None:
+        try:
+            model = get_chat_model()
+        except Exception as e:
+            logger.error(f"获取模型失败: {e}")
+    yield {'type': 'start', 'total_count': len(templates)}
+    
+    def _generate(job):
+        document_type, template = job
+        logger.info(f"正在生成文档: {document_type} (模板: {template['name']})")
+        return generate_document_with_langchain(case_data, document_type, template, model=model)
+    
+    success_count = 0
+    for index, result in run_concurrently(
+        jobs, _generate,
+        max_concurrency=max_concurrency or config['MAX_CONCURRENCY'],
+        limiter=build_rate_limiter(config),
+        cost=lambda job: estimate_tokens(job[1].get('content', ''), config),
+    ):
+        document_type, template = jobs[index]
+        template_name = template['name']
+        if isinstance(result, Exception):
+            result = {'success': False, 'error': str(result), 'content': ''}
         
         if result.get('success', False):
-            generated_documents.append({
+            success_count += 1
+            logger.info(f"成功生成文档: {document_type} (模板: {template_name})")
+            document = {
                 "document_name": template_name,  # 使用模板文件名作为文档名称
                 "template_name": template_name,
                 "content": result['content'],
                 "success": True
-            })
-            success_count += 1
-            logger.info(f"成功生成文档: {document_type} (模板: {template_name})")
+            }
         else:
-            generated_documents.append({
+            logger.error(f"生成文档失败: {document_type} (模板: {template_name}) - {result.get('error', '未知错误')}")
+            document = {
                 "document_name": template_name,  # 使用模板文件名作为文档名称
                 "template_name": template_name,
                 "content": result.get('content', ''),
                 "success": False,
                 "error": result.get('error', '未知错误')
-            })
-            logger.error(f"生成文档失败: {document_type} (模板: {template_name}) - {result.get('error', '未知错误')}")
-
-    return {
-        'success': success_count > 0,
-        'documents': generated_documents,
+            }
+        yield {'type': 'document', 'index': index, **document}
+    
+    yield {
+        'type': 'done',
         'total_count': len(templates),
         'success_count': success_count,
         'error_count': len(templates) - success_count
     }
 
+
+def generate_all_documents_with_langchain(case_data: Dict[str, Any], use_unstructured: bool = False,
+                                          model=None, max_concurrency: int = None) -> Dict[str, Any]:
+    """使用LangChain根据所有模板生成法律文书（并发生成，结果按模板顺序返回）"""
+    if use_unstructured:
+        # 使用Unstructured库生成
+        try:
+            from .unstructured_document_service import unstructured_service
+            return unstructured_service.generate_all_documents(case_data)
+        except Exception as e:
+            logger.error(f"使用Unstructured生成文档失败: {e}")
+            # 回退到原有方法
+            pass
+    
+    documents = {}
+    summary = {}
+    for event in iter_generate_all_documents_with_langchain(case_data, model=model, max_concurrency=max_concurrency):
+        if event['type'] == 'error':
+            return {
+                'success': False,
+                'documents': [],
+                'total_count': 0,
+                'success_count': 0,
+                'error_count': 0,
+                'error': event['error']
+            }
+        if event['type'] == 'document':
+            index = event.pop('index')
+            event.pop('type')
+            documents[index] = event
+        elif event['type'] == 'done':
+            summary = event
+
+    return {
+        'success': summary.get('success_count', 0) > 0,
+        'documents': [documents[index] for index in sorted(documents)],
+        'total_count': summary.get('total_count', 0),
+        'success_count': summary.get('success_count', 0),
+        'error_count': summary.get('error_count', 0)
+    }
+
 def extract_document_type_from_filename(filename: str) -> str:
     """从文件名动态提取文档类型"""
     # 移除文件扩展名
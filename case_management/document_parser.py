@@ -3,9 +3,10 @@
 解析Word文档(.docx)格式的法规文件，提取章节、条款等结构化信息
 """
 
+import io
 import os
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union
 from docx import Document
 import logging
 
@@ -15,12 +16,12 @@ logger = logging.getLogger(__name__)
 class RegulationDocumentParser:
     """法规文档解析器"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: Union[str, bytes]):
         """
         初始化解析器
         
         Args:
-            file_path: Word文档路径
+            file_path: Word文档路径，或文档的二进制内容（无需落地临时文件）
         """
         self.file_path = file_path
         self.document = None
@@ -33,7 +34,10 @@ class RegulationDocumentParser:
             包含法规结构化信息的字典
         """
         try:
-            self.document = Document(self.file_path)
+            if isinstance(self.file_path, (bytes, bytearray)):
+                self.document = Document(io.BytesIO(self.file_path))
+            else:
+                self.document = Document(self.file_path)
             
             # 提取文档内容
             title = self._extract_title()
@@ -240,12 +244,12 @@ class RegulationDocumentParser:
         return total
 
 
-def parse_regulation_document(file_path: str) -> Dict[str, Any]:
+def parse_regulation_document(file_path: Union[str, bytes]) -> Dict[str, Any]:
     """
     解析法规文档
     
     Args:
-        file_path: 文档路径
+        file_path: 文档路径或文档二进制内容
         
     Returns:
         解析结果
@@ -9,10 +9,27 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import json
 import logging
+from dvadmin.utils.request_util import get_request_user
+from .models import CaseManagement
+from .services.case_search_service import get_case_search_index
 
 logger = logging.getLogger(__name__)
 
 
+def _accessible_case_ids(request):
+    """
+    当前用户可检索的案件 ID，与 CaseManagementViewSet.get_queryset 的数据范围一致：
+    总部（HQ）不限制（返回 None），其他用户只能检索自己经办的案件
+    """
+    user = get_request_user(request) or getattr(request, 'user', None)
+    if not user or not getattr(user, 'is_authenticated', False):
+        return []
+    role_level = getattr(user, 'role_level', None) or getattr(user, 'org_scope', None)
+    if role_level == 'HQ':
+        return None
+    return list(CaseManagement.objects.filter(handlers=user).values_list('id', flat=True))
+
+
 class LegalSearchViewSet(ViewSet):
     """法律检索视图集"""
     
@@ -70,7 +87,7 @@ class LegalSearchViewSet(ViewSet):
             data = request.data
             query = data.get('query', '')
             filters = data.get('filters', {})
-            config = data.get('config', {})
+            config = data.get('config') or {}
             
             if not query:
                 return Response({
@@ -79,43 +96,24 @@ class LegalSearchViewSet(ViewSet):
                     'data': []
                 })
             
-            # TODO: 接入第三方案例搜索API
-            # 模拟案例搜索结果
-            mock_results = [
-                {
-                    'id': 1,
-                    'title': '张某与李某交通事故责任纠纷案',
-                    'type': '民事案例',
-                    'summary': '本案涉及交通事故责任认定及损害赔偿问题。法院认定被告李某承担主要责任，原告张某承担次要责任。',
-                    'date': '2023-06-15',
-                    'authority': '北京市朝阳区人民法院',
-                    'court': '北京市朝阳区人民法院',
-                    'caseNumber': '(2023)京0105民初12345号',
-                    'relevance': 0.95,
-                    'tags': ['交通事故', '损害赔偿', '责任认定']
-                },
-                {
-                    'id': 2,
-                    'title': '王某交通事故损害赔偿纠纷案',
-                    'type': '民事案例',
-                    'summary': '原告王某在交通事故中受伤，要求被告保险公司承担赔偿责任。法院支持了原告的部分诉讼请求。',
-                    'date': '2023-05-20',
-                    'authority': '上海市浦东新区人民法院',
-                    'court': '上海市浦东新区人民法院',
-                    'caseNumber': '(2023)沪0115民初67890号',
-                    'relevance': 0.88,
-                    'tags': ['交通事故', '保险赔偿', '人身损害']
-                }
-            ]
+            # 本地全文索引检索（BM25 排序，支持 case_type/status/date_from/date_to 过滤）
+            search_result = get_case_search_index().search(
+                query,
+                filters=filters,
+                page=config.get('page', 1),
+                page_size=config.get('pageSize', 20),
+                case_ids=_accessible_case_ids(request),
+            )
+            results = search_result['results']
             
-            logger.info(f"搜索案例: {query} -> {len(mock_results)}条结果")
+            logger.info(f"搜索案例: {query} -> {search_result['total']}条结果")
             
             return Response({
                 'code': 2000,
                 'msg': '案例搜索成功',
                 'data': {
-                    'results': mock_results,
-                    'total': len(mock_results),
+                    'results': results,
+                    'total': search_result['total'],
                     'query': query,
                     'filters': filters,
                     'config': config
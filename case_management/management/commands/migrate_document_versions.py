@@ -0,0 +1,21 @@
+"""
+把旧版本备份目录导入文档版本库
+"""
+from django.core.management.base import BaseCommand
+
+from case_management.services.document_version_store import LEGACY_VERSION_DIR, DocumentVersionStore
+
+
+class Command(BaseCommand):
+    help = f'把 MEDIA_ROOT/{LEGACY_VERSION_DIR} 下的旧版本备份导入按内容寻址的版本库，并删除原文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不导入也不删除')
+
+    def handle(self, *args, **options):
+        counts = DocumentVersionStore().migrate_legacy_versions(dry_run=options['dry_run'])
+        prefix = '（试运行）' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}旧版本迁移完成：导入 {counts['imported']} 个，删除 {counts['removed']} 个，"
+            f"跳过无法识别的 {counts['skipped']} 个"
+        ))
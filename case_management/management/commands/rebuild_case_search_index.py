@@ -0,0 +1,25 @@
+"""
+重建案件全文检索索引
+"""
+from django.core.management.base import BaseCommand
+from case_management.models import CaseManagement, CaseDocument
+from case_management.services.case_search_service import get_case_search_index
+
+
+class Command(BaseCommand):
+    help = '全量重建案件/文档全文检索索引（SQLite FTS5）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批提交的记录数')
+
+    def handle(self, *args, **options):
+        index = get_case_search_index()
+        cases = CaseManagement.objects.filter(is_deleted=False).iterator(chunk_size=options['batch_size'])
+        documents = CaseDocument.objects.filter(
+            is_deleted=False, case__is_deleted=False
+        ).select_related('case').iterator(chunk_size=options['batch_size'])
+
+        counts = index.rebuild(cases, documents, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"索引重建完成：案件 {counts['cases']} 条，文档 {counts['documents']} 条，索引文件 {index.index_path}"
+        ))
@@ -3,9 +3,14 @@
 提供对上传文件的权限控制访问
 """
 import os
+import re
+import stat
 import mimetypes
+from urllib.parse import quote
+
 from django.conf import settings
-from django.http import FileResponse, Http404, HttpResponse
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -32,20 +37,148 @@ def _authenticate_from_query_token(request):
     return None
 
 
-@api_view(['GET'])
+DEFAULT_PROTECTED_MEDIA_CONFIG = {
+    # 文件交付方式：None 由 Django 直接输出；'nginx' 使用 X-Accel-Redirect；'sendfile' 使用 X-Sendfile（Apache/lighttpd）
+    'OFFLOAD': None,
+    # nginx internal location 的前缀，对应 MEDIA_ROOT，例如 location /protected-media/ { internal; alias /path/to/media/; }
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',
+    # 流式输出的分块大小
+    'CHUNK_SIZE': 64 * 1024,
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _get_media_config():
+    return {**DEFAULT_PROTECTED_MEDIA_CONFIG, **(getattr(settings, 'PROTECTED_MEDIA', None) or {})}
+
+
+def _error_response(error, message, code, http_status):
+    return Response({"error": error, "message": message, "code": code}, status=http_status)
+
+
+def _check_permission(user, file_path):
+    """
+    文件级权限检查，返回拒绝时的响应，通过时返回 None
+
+    当前：已登录即可访问；案件目录下的文件额外校验案件权限。
+    """
+    case_id = extract_case_id_from_path(file_path)
+    allowed = user_has_document_permission(user) and (
+        case_id is None or has_case_access_permission(user, case_id)
+    )
+    if allowed:
+        return None
+    return _error_response(
+        "没有权限访问", "您没有权限访问此案件的文件", "CASE_ACCESS_DENIED", status.HTTP_403_FORBIDDEN
+    )
+
+
+def _make_etag(stat_result):
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_matches(header, etag):
+    """If-None-Match / If-Range 比较（弱比较，忽略 W/ 前缀）"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [item.strip() for item in header.split(',')]
+    return any(candidate.replace('W/', '', 1) == etag for candidate in candidates)
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE') or '')
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _parse_range(request, etag, mtime, size):
+    """
+    解析单段 Range 请求头
+
+    Returns:
+        None 表示返回完整内容；(start, end) 为闭区间；'invalid' 表示范围无法满足
+    """
+    header = request.META.get('HTTP_RANGE', '')
+    match = RANGE_RE.match(header.strip())
+    if not match or size == 0:
+        # 多段范围或格式不支持时按 RFC 7233 忽略 Range，返回完整内容
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        if_range_date = parse_http_date_safe(if_range)
+        fresh = int(mtime) <= if_range_date if if_range_date is not None else _etag_matches(if_range, etag)
+        if not fresh:
+            return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        return None
+    if start > end or start >= size:
+        return 'invalid'
+    return start, end
+
+
+def _iter_file_range(path, start, length, chunk_size):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _set_common_headers(response, full_path, etag, mtime):
+    filename = os.path.basename(full_path)
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Accept-Ranges'] = 'bytes'
+    # 受保护文件只允许浏览器私有缓存，每次使用前带条件请求重新校验
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _offload_response(full_path, media_root, content_type, config):
+    """授权通过后交由前端代理输出文件（代理自行处理 Range 与条件请求）"""
+    response = HttpResponse(content_type=content_type)
+    if config['OFFLOAD'] == 'nginx':
+        relative = os.path.relpath(full_path, media_root).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = config['ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + quote(relative)
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+@api_view(['GET', 'HEAD'])
 def serve_protected_media(request, file_path):
     """
     提供受保护的媒体文件访问
     
-    当前权限：只有登录用户可以访问
-    未来扩展：可以根据文件路径、用户角色等进行更细粒度的权限控制
+    - 支持 ETag / Last-Modified 条件请求（304）与单段 Range 请求（206）
+    - 配置 PROTECTED_MEDIA['OFFLOAD'] 后仅做鉴权，由 nginx（X-Accel-Redirect）或 X-Sendfile 输出文件
+    - 每次请求都重新检查权限（已登录，案件目录下的文件另需案件权限），不缓存检查结果
     
     Args:
         request: HTTP请求对象
         file_path: 相对于MEDIA_ROOT的文件路径
     
     Returns:
-        FileResponse: 文件响应
+        文件响应（200/206/304/416）
     """
     
     # ========== 友好的权限检查 ==========
@@ -67,84 +200,64 @@ def serve_protected_media(request, file_path):
     full_path = os.path.abspath(full_path)
     media_root = os.path.abspath(settings.MEDIA_ROOT)
     
-    if not full_path.startswith(media_root):
-        return Response(
-            {
-                "error": "访问被拒绝",
-                "message": "非法的文件路径，无法访问",
-                "code": "INVALID_PATH"
-            },
-            status=status.HTTP_403_FORBIDDEN
-        )
+    if not full_path.startswith(media_root + os.sep):
+        return _error_response("访问被拒绝", "非法的文件路径，无法访问", "INVALID_PATH", status.HTTP_403_FORBIDDEN)
     
     # 检查文件是否存在
-    if not os.path.exists(full_path) or not os.path.isfile(full_path):
-        return Response(
-            {
-                "error": "文件不存在",
-                "message": "您访问的文件不存在或已被删除",
-                "code": "FILE_NOT_FOUND"
-            },
-            status=status.HTTP_404_NOT_FOUND
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        return _error_response(
+            "文件不存在", "您访问的文件不存在或已被删除", "FILE_NOT_FOUND", status.HTTP_404_NOT_FOUND
         )
     
-    # ========== 权限控制逻辑（可扩展） ==========
-    # 当前：已登录即可访问
-    # 未来可以在这里添加更细粒度的权限检查，例如：
-    
-    # 1. 检查用户是否有权限访问特定案件的文件
-    # if 'cases/' in file_path:
-    #     case_id = extract_case_id_from_path(file_path)
-    #     if not has_case_access_permission(request.user, case_id):
-    #         return Response(
-    #             {
-    #                 "error": "没有权限访问",
-    #                 "message": "您没有权限访问此案件的文件",
-    #                 "code": "CASE_ACCESS_DENIED"
-    #             },
-    #             status=status.HTTP_403_FORBIDDEN
-    #         )
-    
-    # 2. 检查用户角色权限
-    # if not request.user.has_perm('case_management.view_casedocument'):
-    #     return Response(
-    #         {
-    #             "error": "没有权限访问",
-    #             "message": "您没有查看文档的权限",
-    #             "code": "PERMISSION_DENIED"
-    #         },
-    #         status=status.HTTP_403_FORBIDDEN
-    #     )
-    
-    # 3. 检查文件类型权限
-    # file_ext = os.path.splitext(file_path)[1].lower()
-    # if file_ext in ['.pdf', '.docx'] and not user_has_document_permission(request.user):
-    #     return Response(
-    #         {
-    #             "error": "没有权限访问",
-    #             "message": "您没有权限访问此类型的文件",
-    #             "code": "FILE_TYPE_DENIED"
-    #         },
-    #         status=status.HTTP_403_FORBIDDEN
-    #     )
+    # ========== 权限控制逻辑（每次请求实时检查） ==========
+    denied = _check_permission(user, file_path)
+    if denied is not None:
+        return denied
     
     # ========== 权限检查通过，返回文件 ==========
-    
-    # 获取文件的MIME类型
+    config = _get_media_config()
     content_type, _ = mimetypes.guess_type(full_path)
     if content_type is None:
         content_type = 'application/octet-stream'
     
-    # 返回文件
-    try:
-        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
-        
-        # 设置文件名（支持中文）
-        filename = os.path.basename(full_path)
-        response['Content-Disposition'] = f'inline; filename*=UTF-8\'\'{filename}'
-        
+    etag = _make_etag(stat_result)
+    mtime = stat_result.st_mtime
+    size = stat_result.st_size
+    
+    if config['OFFLOAD']:
+        return _set_common_headers(_offload_response(full_path, media_root, content_type, config), full_path, etag, mtime)
+    
+    if _not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(mtime)
+        return response
+    
+    byte_range = _parse_range(request, etag, mtime, size)
+    if byte_range == 'invalid':
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
         return response
-    except Exception as e:
+    
+    try:
+        if byte_range is None:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _iter_file_range(full_path, start, length, config['CHUNK_SIZE']),
+                status=status.HTTP_206_PARTIAL_CONTENT,
+                content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+        return _set_common_headers(response, full_path, etag, mtime)
+    except OSError as e:
         return Response(
             {
                 "error": "文件读取失败",
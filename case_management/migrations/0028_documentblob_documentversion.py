@@ -0,0 +1,87 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("case_management", "0027_alter_casemanagement_options_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentBlob",
+            fields=[
+                ("sha1", models.CharField(help_text="内容SHA-1摘要", max_length=40, primary_key=True, serialize=False, verbose_name="SHA-1")),
+                ("size", models.BigIntegerField(default=0, help_text="内容大小（字节）", verbose_name="大小(字节)")),
+                ("storage_path", models.CharField(help_text="相对于MEDIA_ROOT的存储路径", max_length=500, verbose_name="存储相对路径")),
+                ("ref_count", models.IntegerField(default=0, help_text="引用该内容的版本数量", verbose_name="引用计数")),
+                ("create_datetime", models.DateTimeField(auto_now_add=True, help_text="创建时间", verbose_name="创建时间")),
+            ],
+            options={
+                "verbose_name": "文档内容块",
+                "verbose_name_plural": "文档内容块",
+                "db_table": "document_blob",
+                "indexes": [models.Index(fields=["ref_count"], name="document_blob_ref_count_idx")],
+            },
+        ),
+        migrations.CreateModel(
+            name="DocumentVersion",
+            fields=[
+                ("id", models.BigAutoField(help_text="Id", primary_key=True, serialize=False, verbose_name="Id")),
+                ("description", models.CharField(blank=True, help_text="描述", max_length=255, null=True, verbose_name="描述")),
+                ("modifier", models.CharField(blank=True, help_text="修改人", max_length=255, null=True, verbose_name="修改人")),
+                ("dept_belong_id", models.CharField(blank=True, help_text="数据归属部门", max_length=255, null=True, verbose_name="数据归属部门")),
+                ("update_datetime", models.DateTimeField(auto_now=True, help_text="修改时间", null=True, verbose_name="修改时间")),
+                ("create_datetime", models.DateTimeField(auto_now_add=True, help_text="创建时间", null=True, verbose_name="创建时间")),
+                ("version", models.IntegerField(help_text="保存后的文档版本号", verbose_name="版本号")),
+                ("file_name", models.CharField(blank=True, help_text="保存时的文件名", max_length=200, null=True, verbose_name="文件名")),
+                ("file_size", models.BigIntegerField(default=0, help_text="文件大小（字节）", verbose_name="文件大小(字节)")),
+                ("editor_id", models.BigIntegerField(blank=True, help_text="保存该版本的用户ID", null=True, verbose_name="编辑人ID")),
+                (
+                    "blob",
+                    models.ForeignKey(
+                        db_column="blob_sha1",
+                        db_constraint=False,
+                        help_text="版本内容",
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="versions",
+                        to="case_management.documentblob",
+                        verbose_name="内容块",
+                    ),
+                ),
+                (
+                    "creator",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        help_text="创建人",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_query_name="creator_query",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="创建人",
+                    ),
+                ),
+                (
+                    "document",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        help_text="关联文档",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="case_management.casedocument",
+                        verbose_name="文档",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "文档版本",
+                "verbose_name_plural": "文档版本",
+                "db_table": "document_version",
+                "ordering": ["-version"],
+                "unique_together": {("document", "version")},
+            },
+        ),
+    ]
@@ -932,3 +932,106 @@ class WPSCallbackLog(CoreModel):
     
     def __str__(self):
         return f"{self.event_type} - {self.status} - {self.create_datetime}"
+
+
+class DocumentBlob(models.Model):
+    """
+    文档内容块（按 SHA-1 内容寻址）
+
+    同一内容只存一份，ref_count 记录引用它的 DocumentVersion 数量，归零后由版本库回收。
+    """
+    sha1 = models.CharField(
+        max_length=40,
+        primary_key=True,
+        verbose_name="SHA-1",
+        help_text="内容SHA-1摘要"
+    )
+    size = models.BigIntegerField(
+        default=0,
+        verbose_name="大小(字节)",
+        help_text="内容大小（字节）"
+    )
+    storage_path = models.CharField(
+        max_length=500,
+        verbose_name="存储相对路径",
+        help_text="相对于MEDIA_ROOT的存储路径"
+    )
+    ref_count = models.IntegerField(
+        default=0,
+        verbose_name="引用计数",
+        help_text="引用该内容的版本数量"
+    )
+    create_datetime = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="创建时间",
+        help_text="创建时间"
+    )
+
+    class Meta:
+        db_table = "document_blob"
+        verbose_name = "文档内容块"
+        verbose_name_plural = "文档内容块"
+        indexes = [
+            models.Index(fields=['ref_count'], name='document_blob_ref_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sha1} ({self.ref_count})"
+
+
+class DocumentVersion(CoreModel):
+    """
+    文档版本索引
+
+    每次保存一行，指向 DocumentBlob；内容相同的保存只增加一行元数据。
+    不设反向关联，避免参与 CaseDocument 的级联软删除（文档恢复后版本历史仍在）。
+    """
+    document = models.ForeignKey(
+        CaseDocument,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_constraint=False,
+        verbose_name="文档",
+        help_text="关联文档"
+    )
+    version = models.IntegerField(
+        verbose_name="版本号",
+        help_text="保存后的文档版本号"
+    )
+    blob = models.ForeignKey(
+        DocumentBlob,
+        on_delete=models.PROTECT,
+        related_name='versions',
+        db_column='blob_sha1',
+        db_constraint=False,
+        verbose_name="内容块",
+        help_text="版本内容"
+    )
+    file_name = models.CharField(
+        max_length=200,
+        null=True,
+        blank=True,
+        verbose_name="文件名",
+        help_text="保存时的文件名"
+    )
+    file_size = models.BigIntegerField(
+        default=0,
+        verbose_name="文件大小(字节)",
+        help_text="文件大小（字节）"
+    )
+    editor_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="编辑人ID",
+        help_text="保存该版本的用户ID"
+    )
+
+    class Meta:
+        db_table = "document_version"
+        verbose_name = "文档版本"
+        verbose_name_plural = "文档版本"
+        ordering = ['-version']
+        unique_together = ('document', 'version')
+
+    def __str__(self):
+        return f"{self.document_id} v{self.version} ({self.blob_id})"
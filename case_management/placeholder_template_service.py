@@ -345,6 +345,7 @@ class PlaceholderTemplateService:
             - 如果不存在，则创建新文档
         """
         from .models import CaseDocument, CaseManagement, CaseFolder
+        from .services.document_version_store import DocumentVersionStore
         from django.conf import settings
         from django.db.models import Q
         logger.info(f"[DEBUG] 保存DOCX文档: case_id={case_id}, document_name={document_name}, file_path={file_path}, folder_path={folder_path}, template_id={template_id}, creator={creator}, dept_belong_id={dept_belong_id}, template_print_count={template_print_count}")
@@ -421,7 +422,9 @@ class PlaceholderTemplateService:
         if existing_doc:
             # ✅ 删除旧文件
             old_file_path = existing_doc.full_file_path
-            if old_file_path and os.path.exists(old_file_path):
+            # 版本库内容块由引用计数回收，不在这里删除
+            if old_file_path and os.path.exists(old_file_path) \
+                    and not DocumentVersionStore.is_blob_path(existing_doc.file_path):
                 try:
                     os.remove(old_file_path)
                     logger.info(f"[DEBUG] 已删除旧文件: {old_file_path}")
@@ -12,7 +12,6 @@ from .models import (
     RegulationConversation, RegulationMessage
 )
 from .xpert_integration import XpertAIClient
-from .document_parser import parse_regulation_document
 from django.db import models
 from django.conf import settings
 import json
@@ -1313,32 +1312,19 @@ class RegulationConversationViewSet(ViewSet):
                 'summary': ''
             }
             
-            # 下载文档到临时文件
+            # 通过法规文档缓存获取解析结果（按URL+ETag/Last-Modified条件重验证，按内容哈希复用解析结果）
             import requests
-            import tempfile
+            from .utils.regulation_cache import get_regulation_cache
             
             try:
-                logger.info(f"开始下载文档: {file_url}")
-                response = requests.get(file_url, timeout=30)
-                response.raise_for_status()
-                
-                # 创建临时文件保存下载的文档
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as temp_file:
-                    temp_file.write(response.content)
-                    temp_file_path = temp_file.name
-                
-                logger.info(f"文档下载成功，保存到: {temp_file_path}")
-                
-                # 解析Word文档
-                logger.info(f"开始解析文档...")
-                parse_result = parse_regulation_document(temp_file_path)
+                parse_result = get_regulation_cache().get(file_url)
                 
                 if parse_result.get('success'):
                     # 合并基本信息和解析结果
                     regulation_info['chapters'] = parse_result.get('chapters', [])
                     regulation_info['total_articles'] = parse_result.get('total_articles', 0)
                     regulation_info['title'] = parse_result.get('title', regulation_name)
-                    logger.info(f"法规解析成功: {regulation_info['name']}, 共{regulation_info.get('total_articles', 0)}条")
+                    logger.info(f"法规解析成功: {regulation_info['name']}, 共{regulation_info.get('total_articles', 0)}条, 缓存状态: {parse_result.get('cache')}")
                 else:
                     logger.error(f"法规解析失败: {parse_result.get('error')}")
                     return Response({
@@ -1347,13 +1333,6 @@ class RegulationConversationViewSet(ViewSet):
                         'data': None
                     })
                 
-                # 删除临时文件
-                try:
-                    os.unlink(temp_file_path)
-                    logger.info(f"临时文件已删除: {temp_file_path}")
-                except Exception as del_error:
-                    logger.warning(f"删除临时文件失败: {del_error}")
-                
             except requests.RequestException as download_error:
                 logger.error(f"下载文档失败: {download_error}")
                 return Response({
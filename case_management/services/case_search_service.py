@@ -0,0 +1,418 @@
+"""
+案件全文检索服务
+
+基于 SQLite FTS5 的本地倒排索引，覆盖案件名称、当事人、事实与理由以及案件文档内容。
+中文按二元组（bigram）切分后写入索引，查询使用 BM25 排序，并支持案件类型、状态、日期范围过滤。
+索引通过 CaseManagement / CaseDocument 的保存信号增量更新，无需外部搜索服务。
+
+FTS5 的 UNINDEXED 列上没有 B 树索引，按这些列 DELETE/UPDATE 会扫描整张表，
+因此每条记录使用确定的 rowid（案件 2*id、文档 2*id+1），增删改都按 rowid 定位；
+按案件批量操作其文档时通过普通表 case_search_rows(rowid, case_id) 查找 rowid。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 字段权重（BM25）：标题 > 当事人 > 正文
+FIELD_WEIGHTS = (10.0, 5.0, 1.0)
+# 摘要原文保留长度
+RAW_TEXT_LIMIT = 4000
+SUMMARY_LENGTH = 160
+# 索引结构版本，变更表结构时递增；旧版本索引会被清空，需要执行 rebuild_case_search_index 重建
+SCHEMA_VERSION = 2
+
+_TOKEN_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]+|[A-Za-z0-9]+')
+_CJK_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    切分文本：中文连续片段按二元组切分，英文/数字按整词（小写）切分
+
+    例如 "交通事故2023" -> ["交通", "通事", "事故", "2023"]
+    """
+    if not text:
+        return []
+    tokens = []
+    for segment in _TOKEN_PATTERN.findall(text):
+        if _CJK_PATTERN.match(segment):
+            if len(segment) == 1:
+                tokens.append(segment)
+            else:
+                tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            tokens.append(segment.lower())
+    return tokens
+
+
+def _join_text(*values) -> str:
+    return '\n'.join(str(v) for v in values if v)
+
+
+def _build_match_expression(query: str, operator: str = 'AND') -> str:
+    """把查询串转换为 FTS5 MATCH 表达式，单个汉字使用前缀匹配"""
+    terms = []
+    seen = set()
+    for token in tokenize(query):
+        if token in seen:
+            continue
+        seen.add(token)
+        escaped = token.replace('"', '""')
+        if len(token) == 1 and _CJK_PATTERN.match(token):
+            terms.append(f'"{escaped}"*')
+        else:
+            terms.append(f'"{escaped}"')
+    return f' {operator} '.join(terms)
+
+
+def _make_summary(raw_text: str, query: str) -> str:
+    """截取命中词附近的原文作为摘要"""
+    if not raw_text:
+        return ''
+    position = -1
+    for segment in _TOKEN_PATTERN.findall(query or ''):
+        position = raw_text.lower().find(segment.lower())
+        if position >= 0:
+            break
+    start = max(position - SUMMARY_LENGTH // 4, 0) if position >= 0 else 0
+    summary = raw_text[start:start + SUMMARY_LENGTH].replace('\n', ' ').strip()
+    if start > 0:
+        summary = '...' + summary
+    if start + SUMMARY_LENGTH < len(raw_text):
+        summary += '...'
+    return summary
+
+
+def case_rowid(case_id: int) -> int:
+    return int(case_id) * 2
+
+
+def document_rowid(document_id: int) -> int:
+    return int(document_id) * 2 + 1
+
+
+class CaseSearchIndex:
+    """案件全文索引（SQLite FTS5）"""
+
+    def __init__(self, index_path: Optional[str] = None):
+        """
+        初始化索引
+
+        Args:
+            index_path: 索引文件路径，默认 settings.CASE_SEARCH_INDEX_PATH；传入 ":memory:" 可用于测试
+        """
+        self.index_path = index_path or getattr(
+            settings, 'CASE_SEARCH_INDEX_PATH',
+            os.path.join(settings.BASE_DIR, 'cache', 'case_search.sqlite3')
+        )
+        if self.index_path != ':memory:':
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        self._local = threading.local()
+        self._memory_conn = None
+        self._write_lock = threading.Lock()
+        self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用独立连接；内存库共享同一连接"""
+        if self.index_path == ':memory:':
+            if self._memory_conn is None:
+                self._memory_conn = sqlite3.connect(':memory:', check_same_thread=False)
+            return self._memory_conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        conn = self._connect()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'case_search'"
+            ).fetchone()
+            if exists:
+                logger.warning('案件检索索引结构已升级，旧索引已清空，请执行 rebuild_case_search_index 重建')
+            conn.execute('DROP TABLE IF EXISTS case_search')
+            conn.execute('DROP TABLE IF EXISTS case_search_rows')
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS case_search USING fts5(
+                title, parties, body,
+                kind UNINDEXED, case_id UNINDEXED, document_id UNINDEXED,
+                case_type UNINDEXED, status UNINDEXED, case_date UNINDEXED,
+                display_title UNINDEXED, case_number UNINDEXED, raw_text UNINDEXED,
+                tokenize = 'unicode61'
+            )
+            """
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS case_search_rows (rowid INTEGER PRIMARY KEY, case_id INTEGER NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS case_search_rows_case_id ON case_search_rows (case_id)')
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.commit()
+
+    # ------------------------------------------------------------------ #
+    # 写入
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _case_filters(case) -> Dict[str, str]:
+        case_date = case.case_date or case.filing_date
+        if not case_date and case.create_datetime:
+            case_date = case.create_datetime.date()
+        return {
+            'case_type': case.case_type or '',
+            'status': case.status or '',
+            'case_date': case_date.isoformat() if case_date else '',
+        }
+
+    def _upsert(self, conn, rowid: int, kind: str, case_id: int, document_id: Optional[int],
+                title: str, parties: str, body: str, filters: Dict[str, str],
+                display_title: str, case_number: str):
+        conn.execute('DELETE FROM case_search WHERE rowid = ?', (rowid,))
+        conn.execute(
+            """
+            INSERT INTO case_search (
+                rowid, title, parties, body, kind, case_id, document_id,
+                case_type, status, case_date, display_title, case_number, raw_text
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                rowid, ' '.join(tokenize(title)), ' '.join(tokenize(parties)), ' '.join(tokenize(body)),
+                kind, case_id, document_id,
+                filters['case_type'], filters['status'], filters['case_date'],
+                display_title, case_number, (body or '')[:RAW_TEXT_LIMIT],
+            )
+        )
+        conn.execute('INSERT OR REPLACE INTO case_search_rows (rowid, case_id) VALUES (?, ?)', (rowid, case_id))
+
+    @staticmethod
+    def _delete_rows(conn, rowids: List[int]):
+        if not rowids:
+            return
+        placeholders = ', '.join('?' * len(rowids))
+        conn.execute(f'DELETE FROM case_search WHERE rowid IN ({placeholders})', rowids)
+        conn.execute(f'DELETE FROM case_search_rows WHERE rowid IN ({placeholders})', rowids)
+
+    @staticmethod
+    def _case_rowids(conn, case_id: int) -> List[int]:
+        return [row[0] for row in conn.execute('SELECT rowid FROM case_search_rows WHERE case_id = ?', (case_id,))]
+
+    def index_case(self, case, commit: bool = True):
+        """索引（或移除已删除的）案件，并同步其文档的过滤字段"""
+        rowid = case_rowid(case.id)
+        with self._write_lock:
+            conn = self._connect()
+            if getattr(case, 'is_deleted', False):
+                self._delete_rows(conn, self._case_rowids(conn, case.id))
+            else:
+                filters = self._case_filters(case)
+                self._upsert(
+                    conn, rowid, 'case', case.id, None,
+                    title=_join_text(case.case_name, case.case_number),
+                    parties=_join_text(
+                        case.plaintiff_name, case.defendant_name, case.petitioner,
+                        case.plaintiff_legal_representative, case.defendant_legal_representative,
+                    ),
+                    body=_join_text(
+                        case.case_description, case.facts_and_reasons, case.litigation_request,
+                        case.case_result, case.case_notes,
+                    ),
+                    filters=filters,
+                    display_title=case.case_name or '',
+                    case_number=case.case_number or '',
+                )
+                document_rowids = [item for item in self._case_rowids(conn, case.id) if item != rowid]
+                if document_rowids:
+                    conn.execute(
+                        f"UPDATE case_search SET case_type = ?, status = ?, case_date = ? "
+                        f"WHERE rowid IN ({', '.join('?' * len(document_rowids))})",
+                        [filters['case_type'], filters['status'], filters['case_date']] + document_rowids
+                    )
+            if commit:
+                conn.commit()
+
+    def index_document(self, document, commit: bool = True):
+        """索引（或移除已删除的）案件文档"""
+        rowid = document_rowid(document.id)
+        with self._write_lock:
+            conn = self._connect()
+            case = document.case
+            if getattr(document, 'is_deleted', False) or getattr(case, 'is_deleted', False):
+                self._delete_rows(conn, [rowid])
+            else:
+                self._upsert(
+                    conn, rowid, 'document', case.id, document.id,
+                    title=document.document_name,
+                    parties='',
+                    body=document.document_content,
+                    filters=self._case_filters(case),
+                    display_title=document.document_name or '',
+                    case_number=case.case_number or '',
+                )
+            if commit:
+                conn.commit()
+
+    def remove_case(self, case_id: int):
+        with self._write_lock:
+            conn = self._connect()
+            self._delete_rows(conn, self._case_rowids(conn, case_id))
+            conn.commit()
+
+    def remove_document(self, document_id: int):
+        with self._write_lock:
+            conn = self._connect()
+            self._delete_rows(conn, [document_rowid(document_id)])
+            conn.commit()
+
+    def rebuild(self, cases: Iterable, documents: Iterable, batch_size: int = 500) -> Dict[str, int]:
+        """全量重建索引"""
+        with self._write_lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM case_search')
+            conn.execute('DELETE FROM case_search_rows')
+            conn.commit()
+        counts = {'cases': 0, 'documents': 0}
+        for key, items, index_func in (
+            ('cases', cases, self.index_case),
+            ('documents', documents, self.index_document),
+        ):
+            for item in items:
+                index_func(item, commit=False)
+                counts[key] += 1
+                if counts[key] % batch_size == 0:
+                    self._connect().commit()
+        conn = self._connect()
+        conn.commit()
+        conn.execute("INSERT INTO case_search(case_search) VALUES ('optimize')")
+        conn.commit()
+        return counts
+
+    # ------------------------------------------------------------------ #
+    # 查询
+    # ------------------------------------------------------------------ #
+
+    def search(self, query: str, filters: Optional[Dict] = None, page: int = 1,
+               page_size: int = 20, case_ids: Optional[Iterable[int]] = None) -> Dict:
+        """
+        检索案件与文档
+
+        Args:
+            query: 检索关键词
+            filters: 过滤条件，支持 case_type、status、date_from、date_to（YYYY-MM-DD）、kind（case/document）
+            page: 页码
+            page_size: 每页数量
+            case_ids: 可访问的案件 ID，None 表示不限制
+
+        Returns:
+            {'results': [...], 'total': int}
+        """
+        filters = filters or {}
+        where = ['case_search MATCH ?']
+        params: List = []
+        if case_ids is not None:
+            case_ids = [int(case_id) for case_id in case_ids]
+            if not case_ids:
+                return {'results': [], 'total': 0}
+            where.append(
+                'rowid IN (SELECT rowid FROM case_search_rows '
+                'WHERE case_id IN (SELECT value FROM json_each(?)))'
+            )
+            params.append(json.dumps(case_ids))
+        for column in ('case_type', 'status', 'kind'):
+            value = filters.get(column)
+            if value:
+                if isinstance(value, (list, tuple)):
+                    where.append(f"{column} IN ({', '.join('?' * len(value))})")
+                    params.extend(value)
+                else:
+                    where.append(f'{column} = ?')
+                    params.append(value)
+        if filters.get('date_from'):
+            where.append("case_date != '' AND case_date >= ?")
+            params.append(str(filters['date_from']))
+        if filters.get('date_to'):
+            where.append("case_date != '' AND case_date <= ?")
+            params.append(str(filters['date_to']))
+
+        page = max(int(page or 1), 1)
+        page_size = min(max(int(page_size or 20), 1), 100)
+        conn = self._connect()
+        weights = ', '.join(str(w) for w in FIELD_WEIGHTS)
+        sql_where = ' AND '.join(where)
+
+        # 先要求命中全部词；无结果时放宽为任一词命中
+        for operator in ('AND', 'OR'):
+            expression = _build_match_expression(query, operator)
+            if not expression:
+                return {'results': [], 'total': 0}
+            total = conn.execute(
+                f'SELECT COUNT(*) FROM case_search WHERE {sql_where}', [expression] + params
+            ).fetchone()[0]
+            if total:
+                break
+
+        if not total:
+            return {'results': [], 'total': 0}
+
+        rows = conn.execute(
+            f"""
+            SELECT kind, case_id, document_id, case_type, status, case_date,
+                   display_title, case_number, raw_text, bm25(case_search, {weights}) AS score
+            FROM case_search WHERE {sql_where}
+            ORDER BY score LIMIT ? OFFSET ?
+            """,
+            [expression] + params + [page_size, (page - 1) * page_size]
+        ).fetchall()
+
+        # 相关度按全部命中结果中的最佳得分归一化，翻页后同一条记录的分值不变
+        best_score = rows[0][-1] if page == 1 and rows else conn.execute(
+            f'SELECT bm25(case_search, {weights}) AS score FROM case_search WHERE {sql_where} '
+            f'ORDER BY score LIMIT 1',
+            [expression] + params
+        ).fetchone()[0]
+        top_score = -best_score if best_score < 0 else 1.0
+        results = []
+        for kind, case_id, document_id, case_type, status, case_date, title, case_number, raw_text, score in rows:
+            results.append({
+                'id': int(document_id) if kind == 'document' else int(case_id),
+                'kind': kind,
+                'caseId': int(case_id),
+                'documentId': int(document_id) if document_id is not None else None,
+                'title': title,
+                'type': case_type,
+                'status': status,
+                'date': case_date,
+                'caseNumber': case_number,
+                'summary': _make_summary(raw_text, query),
+                'relevance': round(-score / top_score, 4) if top_score else 0,
+            })
+        return {'results': results, 'total': total}
+
+
+_case_search_index = None
+_case_search_index_lock = threading.Lock()
+
+
+def get_case_search_index() -> CaseSearchIndex:
+    """获取进程级案件检索索引单例"""
+    global _case_search_index
+    if _case_search_index is None:
+        with _case_search_index_lock:
+            if _case_search_index is None:
+                _case_search_index = CaseSearchIndex()
+    return _case_search_index
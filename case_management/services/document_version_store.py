@@ -0,0 +1,259 @@
+"""
+文档版本库
+
+按 SHA-1 内容寻址存放文档内容（DocumentBlob），每次保存写一行 DocumentVersion 索引：
+- 内容已存在时不再写文件，相同内容的保存只增加一行元数据
+- 超出保留数量的旧版本按索引表删除并递减引用计数，引用归零的内容在事务提交后删除文件
+- 不再需要扫描版本目录
+- 启用版本管理时文档当前文件就是最新版本的内容块，内容只写一次；内容块不可原地覆盖
+
+旧版本备份目录 documents/versions/<文档ID>/ 由 migrate_document_versions 命令导入版本库后删除。
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+from typing import BinaryIO, Iterable, Optional, Tuple, Union
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from case_management.models import CaseDocument, DocumentBlob, DocumentVersion
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.path.join('documents', 'blobs')
+LEGACY_VERSION_DIR = os.path.join('documents', 'versions')
+# 旧备份文件名：WPSDocumentHandler 为 v<版本>_<时间戳>.docx，DocumentFileManager 为 v<版本>.docx
+LEGACY_VERSION_RE = re.compile(r'^v(\d+)(?:_\d{8}_\d{6})?\.docx$')
+
+
+def sha1_of_chunks(chunks: Iterable[bytes]) -> Tuple[str, int]:
+    digest = hashlib.sha1()
+    size = 0
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _iter_source(source: Union[str, BinaryIO], chunk_size: int = 1024 * 1024):
+    """支持文件路径、UploadedFile（chunks()）与普通文件对象"""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+        return
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if hasattr(source, 'chunks'):
+        yield from source.chunks()
+    else:
+        yield from iter(lambda: source.read(chunk_size), b'')
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+class DocumentVersionStore:
+    """内容寻址、引用计数回收的文档版本库"""
+
+    def __init__(self, keep: Optional[int] = None):
+        """
+        Args:
+            keep: 每个文档保留的版本数，默认 WPS_VERSION_BACKUP_COUNT + 1（当前版本 + 备份数）
+        """
+        self.keep = keep or getattr(settings, 'WPS_VERSION_BACKUP_COUNT', 5) + 1
+
+    # ------------------------------------------------------------------ #
+    # 内容块
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def blob_relpath(sha1: str) -> str:
+        return os.path.join(BLOB_DIR, sha1[:2], sha1[2:4], f'{sha1}.docx').replace('\\', '/')
+
+    @staticmethod
+    def is_blob_path(path: Optional[str]) -> bool:
+        """相对 MEDIA_ROOT 的路径是否位于内容块目录（内容块被多个版本共享，不可原地覆盖）"""
+        if not path:
+            return False
+        return path.replace('\\', '/').lstrip('/').startswith(BLOB_DIR.replace('\\', '/') + '/')
+
+    @staticmethod
+    def blob_fullpath(blob: DocumentBlob) -> str:
+        return os.path.join(settings.MEDIA_ROOT, blob.storage_path)
+
+    def put_blob(self, source: Union[str, BinaryIO], sha1: Optional[str] = None,
+                 size: Optional[int] = None) -> DocumentBlob:
+        """
+        写入内容块；已存在时直接返回（不重复写文件）
+
+        Args:
+            source: 文件路径或文件对象
+            sha1: 已知的内容摘要（如 WPS 回调已校验的 sha1），为空时计算
+            size: 已知的内容大小
+        """
+        if not sha1:
+            sha1, size = sha1_of_chunks(_iter_source(source))
+
+        blob = DocumentBlob.objects.filter(sha1=sha1).first()
+        if blob is not None and os.path.exists(self.blob_fullpath(blob)):
+            return blob
+
+        relpath = self.blob_relpath(sha1)
+        full_path = os.path.join(settings.MEDIA_ROOT, relpath)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f'{full_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        written = 0
+        with open(tmp_path, 'wb') as f:
+            for chunk in _iter_source(source):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, full_path)
+
+        if blob is None:
+            try:
+                with transaction.atomic():
+                    blob = DocumentBlob.objects.create(sha1=sha1, size=size or written, storage_path=relpath)
+            except IntegrityError:
+                # 并发写入同一内容
+                blob = DocumentBlob.objects.get(sha1=sha1)
+        return blob
+
+    # ------------------------------------------------------------------ #
+    # 版本索引
+    # ------------------------------------------------------------------ #
+
+    def latest(self, document_id: int) -> Optional[DocumentVersion]:
+        return (
+            DocumentVersion.objects.filter(document_id=document_id)
+            .select_related('blob').order_by('-version').first()
+        )
+
+    def has_versions(self, document_id: int) -> bool:
+        return DocumentVersion.objects.filter(document_id=document_id).exists()
+
+    def record_version(self, document_id: int, version: int, blob: DocumentBlob,
+                       file_name: Optional[str] = None, editor_id: Optional[int] = None) -> DocumentVersion:
+        """新增版本索引行并增加内容引用计数，随后裁剪超出保留数量的旧版本"""
+        with transaction.atomic():
+            if not DocumentBlob.objects.filter(sha1=blob.sha1).update(ref_count=F('ref_count') + 1):
+                # 内容块恰好被并发回收
+                raise ValueError(f"文档内容块不存在: {blob.sha1}")
+            row = DocumentVersion.objects.create(
+                document_id=document_id,
+                version=version,
+                blob=blob,
+                file_name=file_name,
+                file_size=blob.size,
+                editor_id=editor_id,
+            )
+            self.prune(document_id)
+        return row
+
+    def prune(self, document_id: int, keep: Optional[int] = None) -> int:
+        """删除超出保留数量的旧版本（按索引表，不扫描目录），返回删除的版本数；keep=0 删除全部版本"""
+        keep = self.keep if keep is None else keep
+        stale = list(
+            DocumentVersion.objects.filter(document_id=document_id)
+            .order_by('-version').values_list('id', 'blob_id')[keep:]
+        )
+        if not stale:
+            return 0
+
+        with transaction.atomic():
+            DocumentVersion.objects.filter(id__in=[row_id for row_id, _ in stale]).delete()
+            released = {}
+            for _, sha1 in stale:
+                released[sha1] = released.get(sha1, 0) + 1
+            for sha1, count in released.items():
+                DocumentBlob.objects.filter(sha1=sha1).update(ref_count=F('ref_count') - count)
+            self.collect_garbage(list(released))
+        return len(stale)
+
+    def collect_garbage(self, candidates: Optional[Iterable[str]] = None) -> int:
+        """
+        回收引用计数归零的内容块
+
+        数据库行在当前事务中删除，文件在事务提交后删除，回滚时文件不受影响。
+        """
+        queryset = DocumentBlob.objects.select_for_update().filter(ref_count__lte=0)
+        if candidates is not None:
+            queryset = queryset.filter(sha1__in=list(candidates))
+        with transaction.atomic():
+            blobs = list(queryset)
+            if not blobs:
+                return 0
+            paths = [self.blob_fullpath(blob) for blob in blobs]
+            DocumentBlob.objects.filter(sha1__in=[blob.sha1 for blob in blobs], ref_count__lte=0).delete()
+            transaction.on_commit(lambda: self._remove_files(paths))
+        return len(blobs)
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除文档内容块失败: {path}, error={str(e)}")
+
+    def restore_to(self, version: DocumentVersion, target_path: str) -> str:
+        """把指定版本的内容复制到目标路径"""
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.copyfile(self.blob_fullpath(version.blob), target_path)
+        return target_path
+
+    # ------------------------------------------------------------------ #
+    # 旧版本目录迁移
+    # ------------------------------------------------------------------ #
+
+    def migrate_legacy_versions(self, dry_run: bool = False) -> dict:
+        """
+        把 documents/versions/<文档ID>/ 下的旧备份导入版本库并删除原文件
+
+        已有同版本号记录、超出保留数量或文档已不存在的备份直接删除；无法识别的文件保留。
+        返回 {'imported': n, 'removed': n, 'skipped': n}。
+        """
+        counts = {'imported': 0, 'removed': 0, 'skipped': 0}
+        legacy_root = os.path.join(settings.MEDIA_ROOT, LEGACY_VERSION_DIR)
+        if not os.path.isdir(legacy_root):
+            return counts
+        for name in sorted(os.listdir(legacy_root)):
+            version_dir = os.path.join(legacy_root, name)
+            if not name.isdigit() or not os.path.isdir(version_dir):
+                counts['skipped'] += 1
+                continue
+            document_id = int(name)
+            document = CaseDocument.objects.filter(id=document_id).first()
+            backups = []
+            for file_name in os.listdir(version_dir):
+                match = LEGACY_VERSION_RE.match(file_name)
+                if match:
+                    backups.append((int(match.group(1)), os.path.getmtime(os.path.join(version_dir, file_name)), file_name))
+                else:
+                    counts['skipped'] += 1
+            recorded = set(DocumentVersion.objects.filter(document_id=document_id).values_list('version', flat=True))
+            # 只导入合并后仍在保留数量内的版本，其余导入后也会立即被裁剪
+            kept = set(sorted(recorded | {version for version, _, _ in backups}, reverse=True)[:self.keep])
+            # 同一版本号有多个备份时导入最新的一个
+            for version, _, file_name in sorted(backups, reverse=True):
+                path = os.path.join(version_dir, file_name)
+                if document is not None and version in kept and version not in recorded:
+                    recorded.add(version)
+                    counts['imported'] += 1
+                    if not dry_run:
+                        self.record_version(document_id, version, self.put_blob(path), document.file_name, None)
+                else:
+                    counts['removed'] += 1
+                if not dry_run:
+                    self._remove_files([path])
+            if not dry_run:
+                try:
+                    os.rmdir(version_dir)
+                except OSError:
+                    pass
+        return counts
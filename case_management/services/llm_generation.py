@@ -0,0 +1,154 @@
+"""
+大模型并发生成
+
+- TokenRateLimiter：按每分钟 token 数限流（令牌桶），多个文档并发时不超过供应商配额
+- run_concurrently：在限定并发数下执行任务，按完成顺序逐个产出结果
+- FakeChatModel：本地假模型，按固定延迟返回结果，用于离线测试吞吐与顺序
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GENERATION_CONFIG = {
+    'MAX_CONCURRENCY': 4,
+    # 每分钟 token 上限，0 表示不限流
+    'TOKENS_PER_MINUTE': 0,
+    # 估算 token：提示词按字符数 / CHARS_PER_TOKEN，另加预留的输出 token
+    'CHARS_PER_TOKEN': 2,
+    'COMPLETION_TOKENS': 2000,
+}
+
+
+def get_generation_config() -> dict:
+    config = dict(DEFAULT_GENERATION_CONFIG)
+    config.update(getattr(settings, 'LLM_GENERATION', None) or {})
+    return config
+
+
+def estimate_tokens(text: str, config: Optional[dict] = None) -> int:
+    config = config or get_generation_config()
+    return len(text or '') // max(int(config['CHARS_PER_TOKEN']), 1) + int(config['COMPLETION_TOKENS'])
+
+
+class TokenRateLimiter:
+    """
+    令牌桶限流
+
+    桶容量为每分钟 token 数，按秒匀速补充；单次请求超过容量时按容量计算，避免永久阻塞。
+    """
+
+    def __init__(self, tokens_per_minute: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: int) -> float:
+        """阻塞直到可用 token 足够，返回等待的秒数"""
+        needed = min(float(tokens), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= needed
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+def build_rate_limiter(config: Optional[dict] = None) -> Optional[TokenRateLimiter]:
+    config = config or get_generation_config()
+    tokens_per_minute = int(config.get('TOKENS_PER_MINUTE') or 0)
+    return TokenRateLimiter(tokens_per_minute) if tokens_per_minute > 0 else None
+
+
+def run_concurrently(jobs: Iterable[Any], worker: Callable[[Any], Any], max_concurrency: int = 4,
+                     limiter: Optional[TokenRateLimiter] = None,
+                     cost: Optional[Callable[[Any], int]] = None) -> Iterator[Tuple[int, Any]]:
+    """
+    并发执行任务，按完成顺序产出 (任务序号, 结果)
+
+    worker 抛出的异常原样作为结果产出，由调用方决定如何记录；提交前按 cost(job) 向限流器申请 token。
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+
+    def _run(job):
+        try:
+            return worker(job)
+        except Exception as e:
+            logger.error(f"并发生成任务失败: {e}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(jobs))),
+                            thread_name_prefix='llm-generation') as executor:
+        futures = {}
+        for index, job in enumerate(jobs):
+            # 达到并发上限时先产出已完成的结果，限流等待也在这里发生
+            while len(futures) >= max_concurrency:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield futures.pop(future), future.result()
+            if limiter is not None and cost is not None:
+                limiter.acquire(cost(job))
+            futures[executor.submit(_run, job)] = index
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures.pop(future), future.result()
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    本地假模型：与 LangChain 聊天模型相同的 invoke(messages) 接口
+
+    延迟可按文档类型单独设置，用于验证并发时的完成顺序；记录调用次数与峰值并发。
+    """
+
+    def __init__(self, delay: float = 0.05, delays: Optional[dict] = None, fail_on: Iterable[str] = ()):
+        self.delay = delay
+        self.delays = delays or {}
+        self.fail_on = set(fail_on)
+        self.calls = 0
+        self.peak_concurrency = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, messages):
+        prompt = messages[-1].content if messages else ''
+        with self._lock:
+            self.calls += 1
+            self._active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._active)
+        try:
+            key = next((name for name in self.delays if name in prompt), None)
+            time.sleep(self.delays.get(key, self.delay))
+            if any(name in prompt for name in self.fail_on):
+                raise RuntimeError(f'模拟生成失败: {prompt}')
+            return FakeMessage(f'【生成结果】{prompt}')
+        finally:
+            with self._lock:
+                self._active -= 1
@@ -5,10 +5,10 @@ import logging
 import os
 import threading
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import CaseManagement
-from .utils.folder_helper import create_case_folders
+from .models import CaseManagement, CaseDocument, CaseFolder, DocumentTemplate
+from .utils.folder_helper import create_case_folders, invalidate_case_document_tree
 
 logger = logging.getLogger(__name__)
 
@@ -47,3 +47,63 @@ def init_case_folders(sender, instance, created, **kwargs):
             transaction.on_commit(_run_after_commit)
         except Exception:
             _run_after_commit()
+
+
+def _run_search_index_update(func, *args):
+    """事务提交后更新全文索引，索引失败不影响业务写入"""
+    def _update():
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"更新案件全文索引失败: {str(e)}")
+
+    try:
+        transaction.on_commit(_update)
+    except Exception:
+        _update()
+
+
+@receiver(post_save, sender=CaseManagement)
+def update_case_search_index(sender, instance, **kwargs):
+    """案件保存（含软删除）后增量更新全文索引"""
+    from .services.case_search_service import get_case_search_index
+    _run_search_index_update(get_case_search_index().index_case, instance)
+
+
+@receiver(post_delete, sender=CaseManagement)
+def remove_case_search_index(sender, instance, **kwargs):
+    """案件物理删除后移除全文索引"""
+    from .services.case_search_service import get_case_search_index
+    _run_search_index_update(get_case_search_index().remove_case, instance.id)
+
+
+@receiver(post_save, sender=CaseDocument)
+def update_document_search_index(sender, instance, **kwargs):
+    """案件文档保存（含软删除）后增量更新全文索引"""
+    from .services.case_search_service import get_case_search_index
+    _run_search_index_update(get_case_search_index().index_document, instance)
+
+
+@receiver(post_delete, sender=CaseDocument)
+def remove_document_search_index(sender, instance, **kwargs):
+    """案件文档物理删除后移除全文索引"""
+    from .services.case_search_service import get_case_search_index
+    _run_search_index_update(get_case_search_index().remove_document, instance.id)
+
+
+@receiver(post_save, sender=CaseFolder)
+@receiver(post_delete, sender=CaseFolder)
+@receiver(post_save, sender=CaseDocument)
+@receiver(post_delete, sender=CaseDocument)
+def bump_case_document_tree(sender, instance, **kwargs):
+    """目录/文档变更（含软删除）后递增案件文档树的版本号"""
+    invalidate_case_document_tree(instance.case_id)
+
+
+@receiver(post_save, sender=DocumentTemplate)
+@receiver(post_delete, sender=DocumentTemplate)
+def invalidate_template_text_cache(sender, instance, **kwargs):
+    """模板变更（含软删除、替换文件）后丢弃该模板的解析缓存"""
+    from .utils.template_text_cache import template_text_cache
+    if instance.file_path:
+        template_text_cache.invalidate(instance.full_file_path)
@@ -4,10 +4,50 @@
 """
 import re
 import logging
-from typing import Dict, Any, List
+from collections import namedtuple
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+WHITESPACE_RE = re.compile(r'\s+')
+EMPTY_VALUES = ('无', '暂无', '待定', '未知')
+# 正则元字符：用于从模式中截取必需的字面量
+_META_CHARS = set('[](){}.*+?|^$\\')
+
+# regex: 编译后的模式；literal: 匹配必然包含的字面量；leading_class: 字面量之前的捕获组字符类（为空表示以字面量开头）
+CompiledPattern = namedtuple('CompiledPattern', ['regex', 'literal', 'leading_class'])
+
+
+def _leading_literal(source: str) -> str:
+    literal = []
+    for char in source:
+        if char in _META_CHARS:
+            break
+        literal.append(char)
+    return ''.join(literal)
+
+
+def compile_pattern(pattern: str) -> CompiledPattern:
+    """
+    编译单个模式并推导预筛选信息
+
+    - 以字面量开头（如 原告[：:]...）：匹配起点必然是该字面量的某次出现
+    - 以捕获组开头（如 ([^\\s，,。\\n]+)\\s*作为原告）：匹配必然包含组后的字面量，起点在其之前的
+      “组字符 / 空白”连续片段内
+    无法推导或字面量含字母（大小写不敏感）时不做预筛选，退化为整篇搜索。
+    """
+    regex = re.compile(pattern, re.IGNORECASE)
+    literal = _leading_literal(pattern)
+    leading_class = None
+    if not literal:
+        head = re.match(r'^\((\[[^\]]+\])[+*]\)(?:\\s\*)?', pattern)
+        if head:
+            literal = _leading_literal(pattern[head.end():])
+            leading_class = re.compile(head.group(1))
+    if not literal or any(char.isalpha() and char.isascii() for char in literal):
+        return CompiledPattern(regex, None, None)
+    return CompiledPattern(regex, literal, leading_class)
+
 
 class SmartContentExtractor:
     """智能内容提取器"""
@@ -123,20 +163,65 @@ class SmartContentExtractor:
                 r'提交日期[：:]\s*([0-9]{4}年[0-9]{1,2}月[0-9]{1,2}日)'
             ]
         }
+        self.compile()
+    
+    def compile(self):
+        """
+        预编译字段模式（修改 field_patterns 后需重新调用）
+        
+        提取时先用 str.find 定位每个字面量的首次出现：不出现的模式直接跳过，出现的模式从首次出现处
+        （或其前方可能的匹配起点）开始搜索，长文本不再被每个模式从头扫描一遍，结果与逐个整篇搜索一致。
+        """
+        self._compiled = [
+            (field, [compile_pattern(pattern) for pattern in patterns])
+            for field, patterns in self.field_patterns.items()
+        ]
+        self._literals = sorted({
+            compiled.literal
+            for _, patterns in self._compiled
+            for compiled in patterns if compiled.literal
+        })
+    
+    @staticmethod
+    def _search_start(content: str, compiled: CompiledPattern, literal_pos: int) -> int:
+        """模式最早可能的匹配起点"""
+        if compiled.leading_class is None:
+            return literal_pos
+        # 匹配片段只由“组字符”与其后的空白构成，向前回退到第一个两者都不是的字符
+        start = literal_pos
+        match_class = compiled.leading_class.match
+        while start > 0:
+            char = content[start - 1]
+            if not (char.isspace() or match_class(char)):
+                break
+            start -= 1
+        return start
+    
+    def _first_match(self, content: str, compiled: CompiledPattern,
+                     positions: Dict[str, int]) -> Optional[re.Match]:
+        if compiled.literal is None:
+            return compiled.regex.search(content)
+        literal_pos = positions[compiled.literal]
+        if literal_pos < 0:
+            return None
+        return compiled.regex.search(content, self._search_start(content, compiled, literal_pos))
     
     def extract_from_content(self, content: str) -> Dict[str, Any]:
         """从内容中提取字段信息"""
         extracted_data = {}
         
         # 清理内容，去除多余空白
-        content = re.sub(r'\s+', ' ', content)
+        content = WHITESPACE_RE.sub(' ', content)
+        
+        # 预筛选：每个字面量只查找一次首次出现位置
+        positions = {literal: content.find(literal) for literal in self._literals}
         
-        for field, patterns in self.field_patterns.items():
-            for pattern in patterns:
-                match = re.search(pattern, content, re.IGNORECASE)
+        for field, patterns in self._compiled:
+            for compiled in patterns:
+                match = self._first_match(content, compiled, positions)
                 if match:
                     value = match.group(1).strip()
-                    if value and value not in ['无', '暂无', '待定', '未知']:
+                    if value and value not in EMPTY_VALUES:
                         extracted_data[field] = value
                         break
         
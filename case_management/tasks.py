@@ -0,0 +1,8 @@
+from application.celery import app
+from case_management.utils.conversion_cache import run_html_conversion
+
+
+@app.task
+def convert_docx_to_html_task(docx_path: str, content_sha: str):
+    """大文件 DOCX→HTML 后台转换（DOCUMENT_CONVERSION_CACHE['BACKGROUND_BACKEND'] = 'celery' 时使用）"""
+    run_html_conversion(docx_path, content_sha)
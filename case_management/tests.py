@@ -1,3 +1,801 @@
-from django.test import TestCase
+import os
+import random
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from case_management import legal_search_views
+from case_management.legal_search_views import LegalSearchViewSet
+from case_management.media_views import serve_protected_media
+from case_management.models import CaseDocument, CaseFolder, CaseManagement, DocumentBlob, DocumentVersion
+from case_management.services.case_search_service import CaseSearchIndex, case_rowid, document_rowid
+from case_management.services.document_version_store import DocumentVersionStore
+from case_management import direct_langchain_ai_service
+from case_management.direct_langchain_ai_service import parse_template_file
+from case_management.services.llm_generation import FakeChatModel, TokenRateLimiter, run_concurrently
+from case_management.smart_content_extractor import SmartContentExtractor
+from case_management.utils import conversion_cache, regulation_cache
+from case_management.utils.conversion_cache import ConversionFailed, DocumentConversionCache
+from case_management.utils.document_converter import CONVERTER_VERSION
+from case_management.utils.folder_helper import get_case_document_tree, invalidate_case_document_tree
+from case_management.utils.regulation_cache import RegulationDocumentCache
+from case_management.utils.template_text_cache import TemplateTextCache
+from case_management.utils.wps_document_handler import WPSDocumentHandler
+from case_management import views as case_views
+from case_management.views import CaseManagementViewSet
+from dvadmin.system.models import Users
+
+
+class ProtectedMediaTestCase(TestCase):
+    """受保护媒体文件：Range、条件请求与代理交付"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.media_root, 'cases', '7'))
+        self.content = bytes(range(256)) * 40
+        with open(os.path.join(self.media_root, 'cases', '7', 'doc.pdf'), 'wb') as f:
+            f.write(self.content)
+        self.user = Users.objects.create(username='media_user', name='媒体')
+        self.factory = APIRequestFactory()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+    def _get(self, **headers):
+        request = self.factory.get('/media/cases/7/doc.pdf', **headers)
+        force_authenticate(request, user=self.user)
+        return serve_protected_media(request, file_path='cases/7/doc.pdf')
+
+    def test_full_and_conditional(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        etag = response['ETag']
+
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_range_requests(self):
+        response = self._get(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self._get(HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        response = self._get(HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range 不匹配时返回完整内容
+        response = self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PROTECTED_MEDIA={'OFFLOAD': 'nginx', 'ACCEL_REDIRECT_PREFIX': '/protected-media/'})
+    def test_accel_redirect(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/cases/7/doc.pdf')
+        self.assertEqual(response.content, b'')
+
+    def test_path_traversal_rejected(self):
+        request = self.factory.get('/media/../secret')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(serve_protected_media(request, file_path='../secret').status_code, 403)
+
+
+class DocumentVersionStoreTestCase(TestCase):
+    """文档版本库：内容去重与引用计数回收"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        self.store = DocumentVersionStore(keep=2)
+
+    def _save(self, document_id, version, content):
+        upload = SimpleUploadedFile('doc.docx', content)
+        blob = self.store.put_blob(upload)
+        return self.store.record_version(document_id, version, blob, upload.name)
+
+    def test_identical_content_adds_only_a_row(self):
+        first = self._save(1, 1, b'same')
+        blob_path = self.store.blob_fullpath(first.blob)
+        mtime = os.stat(blob_path).st_mtime_ns
+
+        second = self._save(1, 2, b'same')
+        self.assertEqual(second.blob_id, first.blob_id)
+        self.assertEqual(os.stat(blob_path).st_mtime_ns, mtime)
+        self.assertEqual(DocumentBlob.objects.count(), 1)
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 2)
+
+    def test_prune_releases_unreferenced_blobs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            old = self._save(1, 1, b'v1')
+            shared = self._save(2, 1, b'v2')
+            self._save(1, 2, b'v2')
+            self._save(1, 3, b'v3')
+
+        self.assertEqual(
+            list(DocumentVersion.objects.filter(document_id=1).values_list('version', flat=True)), [3, 2]
+        )
+        # v1 已无引用：行与文件均被回收；v2 仍被两个版本引用
+        self.assertFalse(DocumentBlob.objects.filter(sha1=old.blob_id).exists())
+        self.assertFalse(os.path.exists(self.store.blob_fullpath(old.blob)))
+        self.assertEqual(DocumentBlob.objects.get(sha1=shared.blob_id).ref_count, 2)
+
+    def _document(self, content):
+        case = CaseManagement.objects.create(case_number='V-001', case_name='版本', case_type='民事')
+        relpath = f'cases/{case.id}/doc.docx'
+        os.makedirs(os.path.join(self.media_root, os.path.dirname(relpath)))
+        with open(os.path.join(self.media_root, relpath), 'wb') as f:
+            f.write(content)
+        return CaseDocument.objects.create(
+            case=case, document_name='代理词', file_name='doc.docx', file_ext='.docx', file_path=relpath,
+        )
+
+    def test_save_writes_content_once(self):
+        document = self._document(b'v0')
+        handler = WPSDocumentHandler()
+        with mock.patch.object(handler, 'check_document_permission', return_value=True), \
+                mock.patch.object(handler, '_save_file') as save_file:
+            result = handler.save_document(document.id, SimpleUploadedFile('doc.docx', b'v1'), user_id=1)
+            again = handler.save_document(document.id, SimpleUploadedFile('doc.docx', b'v1'), user_id=1)
+        save_file.assert_not_called()
+
+        document.refresh_from_db()
+        # 文档文件就是最新版本的内容块
+        self.assertTrue(DocumentVersionStore.is_blob_path(document.file_path))
+        self.assertEqual(document.file_path, DocumentBlob.objects.get(sha1=result['sha1']).storage_path)
+        with open(document.full_file_path, 'rb') as f:
+            self.assertEqual(f.read(), b'v1')
+        self.assertTrue(again['unchanged'])
+        self.assertEqual(DocumentBlob.objects.get(sha1=result['sha1']).ref_count, 2)
+
+    def test_html_save_records_version(self):
+        document = self._document(b'v0')
+        user = Users.objects.create(username='version_editor', name='编辑')
+        request = APIRequestFactory().post(
+            '/case/documents/convert-html-to-docx/', {'documentId': document.id, 'html': '<p>代理词</p>'}, format='json',
+        )
+        force_authenticate(request, user=user)
+
+        def html_to_docx(html, path, image_base_dir=None):
+            with open(path, 'wb') as f:
+                f.write(b'v1')
+
+        with mock.patch.object(case_views, 'get_conversion_cache') as conversion, \
+                self.captureOnCommitCallbacks(execute=True):
+            conversion.return_value.html_to_docx.side_effect = html_to_docx
+            response = case_views.convert_html_to_docx(request)
+        self.assertEqual(response.data['msg'], '转换并保存成功')
+
+        document.refresh_from_db()
+        latest = self.store.latest(document.id)
+        # 原文件作为基线版本入库，编辑结果成为最新版本且就是文档文件
+        self.assertEqual(DocumentVersion.objects.filter(document_id=document.id).count(), 2)
+        self.assertEqual(document.file_path, latest.blob.storage_path)
+        with open(document.full_file_path, 'rb') as f:
+            self.assertEqual(f.read(), b'v1')
+
+    def test_case_destroy_releases_versions(self):
+        document = self._document(b'v0')
+        with self.captureOnCommitCallbacks(execute=True):
+            blob = self._save(document.id, 1, b'v1').blob
+            self._save(document.id, 2, b'v2')
+        user = Users.objects.create(username='version_hq', name='总部', role_level='HQ')
+        request = APIRequestFactory().delete(f'/case/{document.case_id}/')
+        force_authenticate(request, user=user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = CaseManagementViewSet.as_view({'delete': 'destroy'})(request, pk=document.case_id)
+        self.assertEqual(response.data['msg'], '案件删除成功')
+        self.assertFalse(DocumentVersion.objects.exists())
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertFalse(os.path.exists(self.store.blob_fullpath(blob)))
+
+    def test_migrate_legacy_versions(self):
+        document = self._document(b'current')
+        legacy_dir = os.path.join(self.media_root, 'documents', 'versions')
+        os.makedirs(os.path.join(legacy_dir, str(document.id)))
+        os.makedirs(os.path.join(legacy_dir, '999999'))
+        backups = {
+            f'{document.id}/v1_20250101_080000.docx': b'v1',
+            f'{document.id}/v2_20250102_080000.docx': b'v2',
+            f'{document.id}/v3.docx': b'v3',
+            '999999/v1_20250101_080000.docx': b'orphan',
+        }
+        for name, content in backups.items():
+            with open(os.path.join(legacy_dir, name), 'wb') as f:
+                f.write(content)
+
+        self.assertEqual(self.store.migrate_legacy_versions(dry_run=True), {'imported': 2, 'removed': 2, 'skipped': 0})
+        self.assertFalse(DocumentVersion.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = self.store.migrate_legacy_versions()
+        # keep=2：只导入最新的两个版本，孤立与超出保留数量的备份直接删除
+        self.assertEqual(counts, {'imported': 2, 'removed': 2, 'skipped': 0})
+        self.assertEqual(
+            list(DocumentVersion.objects.filter(document_id=document.id).values_list('version', flat=True)), [3, 2]
+        )
+        self.assertEqual(os.listdir(legacy_dir), [])
+
+
+class CaseSearchIndexTestCase(TestCase):
+    """案件全文索引：按确定的 rowid 增删改，相关度按全局最佳得分归一化"""
+
+    def setUp(self):
+        self.index = CaseSearchIndex(':memory:')
+        self.cases = [
+            CaseManagement(
+                id=index, case_number=f'S-{index:03d}', case_name=f'交通事故纠纷{index}', case_type='民事',
+                status='进行中', plaintiff_name='张三', defendant_name='李四',
+                facts_and_reasons='交通事故 ' * (index % 5 + 1),
+            )
+            for index in range(1, 31)
+        ]
+        self.documents = [
+            CaseDocument(id=index, case=self.cases[index - 1], document_name=f'起诉状{index}.docx',
+                         document_content='交通事故损害赔偿起诉状')
+            for index in range(1, 11)
+        ]
+        self.index.rebuild(self.cases, self.documents)
+
+    def _rowids(self):
+        conn = self.index._connect()
+        return sorted(row[0] for row in conn.execute('SELECT rowid FROM case_search'))
+
+    def test_rows_keyed_by_deterministic_rowid(self):
+        self.assertEqual(len(self._rowids()), 40)
+        self.assertIn(case_rowid(1), self._rowids())
+        self.assertIn(document_rowid(1), self._rowids())
+
+        # 重复索引覆盖原行，不产生重复记录
+        self.index.index_case(self.cases[0])
+        self.index.index_document(self.documents[0])
+        self.assertEqual(len(self._rowids()), 40)
+
+        self.index.remove_document(1)
+        self.assertNotIn(document_rowid(1), self._rowids())
+
+        # 删除案件同时移除其文档
+        self.cases[1].is_deleted = True
+        self.index.index_case(self.cases[1])
+        self.assertNotIn(case_rowid(2), self._rowids())
+        self.assertNotIn(document_rowid(2), self._rowids())
+        self.assertEqual(len(self._rowids()), 37)
+
+    def test_case_update_syncs_document_filters(self):
+        self.cases[2].status = '已结案'
+        self.index.index_case(self.cases[2])
+        result = self.index.search('起诉状', filters={'status': '已结案'})
+        self.assertEqual([(item['kind'], item['documentId']) for item in result['results']], [('document', 3)])
+
+    def test_search_pages_and_relevance(self):
+        first = self.index.search('交通事故', page=1, page_size=10)
+        self.assertEqual(first['total'], 40)
+        self.assertEqual(first['results'][0]['relevance'], 1.0)
+
+        scores = []
+        for page in range(1, 5):
+            scores.extend(item['relevance'] for item in self.index.search('交通事故', page=page, page_size=10)['results'])
+        self.assertEqual(len(scores), 40)
+        # 翻页后分值仍按全局最佳归一化，整体单调不增
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertLess(scores[-1], 1.0)
+
+        self.assertEqual(self.index.search('不存在的词语')['total'], 0)
+        self.assertEqual(self.index.search('交通', filters={'kind': 'document'})['total'], 10)
+
+    def test_search_scoped_to_case_ids(self):
+        result = self.index.search('交通事故', case_ids=[1, 2], page_size=100)
+        self.assertEqual(result['total'], 4)
+        self.assertEqual({item['caseId'] for item in result['results']}, {1, 2})
+        self.assertEqual(self.index.search('交通事故', case_ids=[])['total'], 0)
+
+    def test_search_view_limited_to_handled_cases(self):
+        handler = Users.objects.create(username='search_handler', name='经办人')
+        outsider = Users.objects.create(username='search_outsider', name='非经办人')
+        hq = Users.objects.create(username='search_hq', name='总部', role_level='HQ')
+        case = CaseManagement.objects.create(case_number='S-100', case_name='交通事故纠纷', case_type='民事')
+        case.handlers.add(handler)
+        index = CaseSearchIndex(':memory:')
+        index.index_case(case)
+
+        view = LegalSearchViewSet.as_view({'post': 'search_cases'})
+
+        def search(user):
+            request = APIRequestFactory().post('/legal-search/cases/', {'query': '交通事故'}, format='json')
+            force_authenticate(request, user=user)
+            with mock.patch.object(legal_search_views, 'get_case_search_index', return_value=index):
+                return view(request).data['data']
+
+        self.assertEqual(search(outsider)['total'], 0)
+        self.assertEqual([item['caseId'] for item in search(handler)['results']], [case.id])
+        self.assertEqual(search(hq)['total'], 1)
+
+
+class CaseDocumentTreeTestCase(TestCase):
+    """案件文档树：两次查询构建，按案件缓存，版本号存数据库由信号递增"""
+
+    def setUp(self):
+        cache.clear()
+        self.case = CaseManagement.objects.create(case_number='T-001', case_name='树', case_type='民事')
+        for index, path in enumerate(['/a/', '/b/', '/c/']):
+            CaseFolder.objects.create(case=self.case, folder_name=path.strip('/'), folder_path=path, sort_order=index)
+        for index in range(6):
+            CaseDocument.objects.create(
+                case=self.case, folder_path=['/a/', '/b/'][index % 2], document_name=f'文书{index}.docx',
+                file_ext='.docx', file_path=f'cases/{self.case.id}/doc{index}.docx', sort_order=index,
+            )
+
+    def test_tree_built_in_two_queries(self):
+        with self.assertNumQueries(2):
+            tree = get_case_document_tree(self.case.id, use_cache=False)
+        self.assertEqual([node['label'] for node in tree], ['a', 'b', 'c'])
+        self.assertEqual([child['label'] for child in tree[0]['children']], ['文书0.docx', '文书2.docx', '文书4.docx'])
+        self.assertEqual(tree[2]['children'], [])
+
+    def test_cache_invalidated_by_signals(self):
+        tree = get_case_document_tree(self.case.id)
+        # 命中缓存时只读取一次版本号
+        with self.assertNumQueries(1):
+            self.assertEqual(get_case_document_tree(self.case.id), tree)
+
+        document = CaseDocument.objects.filter(case=self.case).first()
+        document.delete()
+        refreshed = get_case_document_tree(self.case.id)
+        self.assertEqual(sum(len(node['children']) for node in refreshed), 5)
+
+        CaseFolder.objects.create(case=self.case, folder_name='d', folder_path='/d/', sort_order=9)
+        self.assertEqual(len(get_case_document_tree(self.case.id)), 4)
+
+    def test_version_shared_across_processes(self):
+        get_case_document_tree(self.case.id)
+        # queryset.update 不触发信号，本进程的本地缓存仍是旧树；任一 worker 递增数据库中的版本号后即失效
+        CaseDocument.objects.filter(case=self.case, document_name='文书0.docx').update(folder_path='/c/')
+        self.assertEqual(get_case_document_tree(self.case.id)[2]['children'], [])
+        invalidate_case_document_tree(self.case.id)
+        self.assertEqual(len(get_case_document_tree(self.case.id)[2]['children']), 1)
+
+
+class TemplateTextCacheTestCase(TestCase):
+    """模板文本缓存：按 mtime/大小失效，重复请求不再解析"""
+
+    def setUp(self):
+        from docx import Document
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.paths = []
+        for index in range(8):
+            document = Document()
+            document.add_heading(f'民事起诉状{index}', level=1)
+            for line in range(60):
+                document.add_paragraph(f'原告：{{{{ plaintiff.name }}}}，第{line}段，金额 {{{{ case.amount | 0 }}}}')
+            path = os.path.join(self.root, f'template_{index}.docx')
+            document.save(path)
+            self.paths.append(path)
+
+    def test_entry_reparsed_when_file_changes(self):
+        cache_ = TemplateTextCache()
+        entry = cache_.get(self.paths[0])
+        self.assertEqual(entry['file_type'], 'word_new')
+        self.assertEqual(entry['placeholders'], ['plaintiff.name', 'case.amount'])
+        self.assertIs(cache_.get(self.paths[0]), entry)
+
+        with open(self.paths[0], 'ab') as f:
+            f.write(b'\0')
+        os.utime(self.paths[0], ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        cache_.get(self.paths[0])
+        self.assertEqual((cache_.hits, cache_.misses), (1, 2))
+
+        os.remove(self.paths[0])
+        self.assertIsNone(cache_.get(self.paths[0]))
+
+    def test_template_load_benchmark(self):
+        # 单次请求加载耗时的前后对比见 scripts/benchmark_template_cache.py
+        rounds = 5
+        legacy = [parse_template_file(path, 'word_new') for path in self.paths]
+
+        cache_ = TemplateTextCache()
+        with mock.patch.object(direct_langchain_ai_service, 'parse_template_file',
+                               wraps=parse_template_file) as parse:
+            for _ in range(rounds):
+                cached = [cache_.get(path)['content'] for path in self.paths]
+        self.assertEqual(cached, legacy)
+        # 每个模板只解析一次，之后的请求全部命中缓存
+        self.assertEqual(parse.call_count, len(self.paths))
+        self.assertEqual((cache_.hits, cache_.misses), ((rounds - 1) * len(self.paths), len(self.paths)))
+
+
+class ConcurrentGenerationTestCase(TestCase):
+    """文书并发生成：假模型验证并发、完成顺序与限流"""
+
+    def setUp(self):
+        self.templates = [
+            {'name': f'{index}、文书{index}.docx', 'content': f'模板{index} {{{{ plaintiff.name }}}}',
+             'file_type': 'word_new', 'template_type': 'litigation', 'template_id': index}
+            for index in range(1, 7)
+        ]
+        patcher = mock.patch.object(direct_langchain_ai_service, 'load_template_files', return_value=self.templates)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_documents_generated_concurrently_in_template_order(self):
+        model = FakeChatModel(delay=0.1, fail_on=['文书3'])
+        started = time.perf_counter()
+        result = direct_langchain_ai_service.generate_all_documents_with_langchain(
+            {'case_name': '测试案件'}, model=model, max_concurrency=3
+        )
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([doc['template_name'] for doc in result['documents']], [t['name'] for t in self.templates])
+        self.assertEqual((result['success_count'], result['error_count']), (5, 1))
+        self.assertFalse(result['documents'][2]['success'])
+        self.assertEqual(model.peak_concurrency, 3)
+        # 6 个文档、并发 3：约两轮延迟，串行需要 6 轮
+        self.assertLess(elapsed, 0.45)
+
+    def test_stream_yields_in_completion_order(self):
+        model = FakeChatModel(delay=0.05, delays={'文书1': 0.3})
+        events = list(direct_langchain_ai_service.iter_generate_all_documents_with_langchain(
+            {}, model=model, max_concurrency=6
+        ))
+        self.assertEqual(events[0], {'type': 'start', 'total_count': 6})
+        documents = [event for event in events if event['type'] == 'document']
+        # 最慢的文书1最后完成
+        self.assertEqual(documents[-1]['index'], 0)
+        self.assertEqual(events[-1]['success_count'], 6)
+
+    def test_token_rate_limiter_blocks_until_refilled(self):
+        now = [0.0]
+        limiter = TokenRateLimiter(600, clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds))
+        self.assertEqual(limiter.acquire(600), 0.0)
+        # 每秒补充 10 个 token
+        self.assertAlmostEqual(limiter.acquire(50), 5.0)
+        # 超过容量的请求按容量计算
+        self.assertAlmostEqual(limiter.acquire(10 ** 6), 60.0)
+
+    def test_run_concurrently_returns_worker_errors(self):
+        def worker(value):
+            if value == 2:
+                raise ValueError('bad')
+            return value * 10
+
+        results = dict(run_concurrently([1, 2, 3], worker, max_concurrency=2))
+        self.assertEqual(results[0], 10)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 30)
+
+
+class FullScanExtractor(SmartContentExtractor):
+    """对照实现：每个模式都从头整篇搜索（预筛选前的行为）"""
+
+    def _first_match(self, content, compiled, positions):
+        return compiled.regex.search(content)
+
+
+class SmartContentExtractorTestCase(TestCase):
+    GOLDEN = [
+        (
+            '民事起诉状\n原告：北京某某科技有限公司，统一社会信用代码：91110108MA01ABCD2X\n法定代表人：王五，职务：总经理\n'
+            '被告：上海某某贸易有限公司\n被告法定代表人：赵六\n案由：买卖合同纠纷\n合同金额：1,250,000.50元\n律师费：30，000元\n'
+            '合同签订日期：2023年3月15日\n起诉日期：2024年1月8日\n管辖法院：北京市海淀区人民法院',
+            {
+                'plaintiff_name': '北京某某科技有限公司',
+                'plaintiff_credit_code': '91110108MA01ABCD2X',
+                'plaintiff_legal_representative': '王五',
+                'defendant_name': '上海某某贸易有限公司',
+                'defendant_legal_representative': '赵六',
+                # 空白被归一化为空格，[^\\n]+ 会取到文本末尾
+                'case_name': '买卖合同纠纷 合同金额：1,250,000.50元 律师费：30，000元 合同签订日期：2023年3月15日 '
+                             '起诉日期：2024年1月8日 管辖法院：北京市海淀区人民法院',
+                'jurisdiction': '北京市海淀区人民法院',
+                'contract_amount': 1250000.5,
+                'lawyer_fee': 30000.0,
+                'contract_date': '2023-03-15',
+                'filing_date': '2024-01-08',
+            },
+        ),
+        (
+            '申请人：张三，男，汉族\n被申请人：李四\n案号：（2024）京0108民初123号\n纠纷类型：借款\n争议金额：50000元\n'
+            '纠纷发生日期：2023年12月1日',
+            {
+                'plaintiff_name': '张三',
+                'defendant_name': '李四',
+                'case_number': '（2024）京0108民初123号',
+                'case_type': '借款',
+                'contract_amount': 50000.0,
+                'dispute_date': '2023-12-01',
+            },
+        ),
+        (
+            '原告：无\n申请人：暂无\n张三作为原告，李四作为被告，诉讼标的：8万元，逾期支付80000元',
+            {'plaintiff_name': '张三', 'defendant_name': '李四', 'contract_amount': 80000.0},
+        ),
+        (
+            '原告方：某公司 案件类型：劳动争议 律师费：待定 代理费：5000元 立案日期：2024年2月30日',
+            {
+                'plaintiff_name': '某公司',
+                'case_type': '劳动争议',
+                'contract_amount': 5000.0,
+                'lawyer_fee': 5000.0,
+                'filing_date': '2024-02-30',
+            },
+        ),
+        ('本院受理的案件中无任何当事人信息。', {}),
+    ]
+
+    FRAGMENTS = [
+        '原告', '被告', '被申请人', '：', ':', ' ', '，', '。', '\n', '张三', '李四', '123', '1,000', '元', '无', '暂无',
+        '2023年1月2日', '作为原告', '作为被告', '起诉', '地址', '住址', '91110000ABCDEFGH12', 'abc', '合同金额',
+        '律师费', '案由', '法院', '法定代表人', '案号', '签订日期',
+    ]
+
+    def setUp(self):
+        self.extractor = SmartContentExtractor()
+        self.reference = FullScanExtractor()
+
+    def test_golden_corpus(self):
+        for content, expected in self.GOLDEN:
+            self.assertEqual(self.extractor.extract_from_content(content), expected)
+            self.assertEqual(self.reference.extract_from_content(content), expected)
+
+    def test_matches_full_scan_on_random_text(self):
+        rng = random.Random(20240101)
+        for _ in range(3000):
+            content = ''.join(rng.choice(self.FRAGMENTS) for _ in range(rng.randint(1, 40)))
+            self.assertEqual(
+                self.extractor.extract_from_content(content),
+                self.reference.extract_from_content(content),
+                content,
+            )
+
+    def test_prefilter_on_large_text(self):
+        """约 760KB 判决书式文本，关键字段在末尾：预筛选与整篇扫描结果一致（吞吐量见 scripts/benchmark_smart_extractor.py）"""
+        content = '本院受理原告张三与被告李四合同纠纷一案，依法组成合议庭，公开开庭进行了审理。' * 20000
+        content += '合同金额：1,000元 律师费：500元'
+
+        for extractor in (self.reference, self.extractor):
+            self.assertEqual(extractor.extract_from_content(content), {'contract_amount': 1000.0, 'lawyer_fee': 500.0})
+
+
+class DocumentConversionCacheTestCase(TestCase):
+    """DOCX/HTML 转换缓存：按内容哈希命中、版本失效、LRU 淘汰与大文件后台转换"""
+
+    def setUp(self):
+        from docx import Document
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.cache_dir = os.path.join(self.root, 'cache')
+        self.paths = []
+        for index in range(3):
+            document = Document()
+            document.add_heading(f'代理词{index}', level=1)
+            for line in range(30):
+                document.add_paragraph(f'第{line}段：被告应当支付货款及利息。')
+            path = os.path.join(self.root, f'document_{index}.docx')
+            document.save(path)
+            self.paths.append(path)
+
+    def _cache(self, **kwargs):
+        conversion = DocumentConversionCache(self.cache_dir, **kwargs)
+        conversion.converter.docx_to_html = mock.Mock(wraps=conversion.converter.docx_to_html)
+        conversion.converter.html_to_docx = mock.Mock(wraps=conversion.converter.html_to_docx)
+        return conversion
+
+    def test_html_cached_by_content_hash(self):
+        conversion = self._cache()
+        first = conversion.docx_to_html(self.paths[0])
+        self.assertIn('代理词0', first['html'])
+
+        copied = os.path.join(self.root, '副本.docx')
+        shutil.copyfile(self.paths[0], copied)
+        second = conversion.docx_to_html(copied)
+        self.assertEqual(second['html'], first['html'])
+        self.assertEqual(second['title'], '副本')
+        self.assertEqual(conversion.converter.docx_to_html.call_count, 1)
+
+        # 新进程（新实例）同样命中磁盘缓存
+        self.assertEqual(self._cache().docx_to_html(self.paths[0])['html'], first['html'])
+
+        with mock.patch.object(conversion_cache, 'CONVERTER_VERSION', CONVERTER_VERSION + 1):
+            conversion.docx_to_html(self.paths[0])
+        self.assertEqual(conversion.converter.docx_to_html.call_count, 2)
+
+    def test_html_to_docx_reuses_output(self):
+        conversion = self._cache()
+        html = '<h1>起诉状</h1><p>原告：张三</p>'
+        first = conversion.html_to_docx(html, os.path.join(self.root, 'a.docx'))
+        second = conversion.html_to_docx(html, os.path.join(self.root, 'b.docx'))
+        self.assertEqual(conversion.converter.html_to_docx.call_count, 1)
+        with open(first, 'rb') as f1, open(second, 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+        conversion.html_to_docx(html, os.path.join(self.root, 'c.docx'), image_base_dir='/other')
+        self.assertEqual(conversion.converter.html_to_docx.call_count, 2)
+
+    def test_lru_eviction(self):
+        conversion = self._cache(max_bytes=0)
+        for path in self.paths:
+            conversion.docx_to_html(path)
+        entry_size = max(size for _, size, _ in conversion._entries())
+
+        digests = [conversion.file_sha1(path) for path in self.paths]
+        for age, digest in zip((300, 200, 100), digests):
+            stamp = time.time() - age
+            os.utime(conversion.entry_dir('html', digest), (stamp, stamp))
+        # 最旧的条目刚被访问过，淘汰次旧的
+        conversion.get_html(digests[0])
+
+        conversion.max_bytes = entry_size * 2 + entry_size // 2
+        self.assertEqual(conversion.evict(), 1)
+        self.assertIsNotNone(conversion.get_html(digests[0]))
+        self.assertIsNone(conversion.get_html(digests[1]))
+        self.assertIsNotNone(conversion.get_html(digests[2]))
+        self.assertLessEqual(conversion.total_size(), conversion.max_bytes)
+
+    def test_eviction_scans_only_when_needed(self):
+        conversion = self._cache(max_bytes=1024 * 1024 * 1024)
+        conversion._entries = mock.Mock(wraps=conversion._entries)
+        for path in self.paths:
+            conversion.docx_to_html(path)
+        # 首次写入时全量扫描一次，之后只累计新条目大小
+        self.assertEqual(conversion._entries.call_count, 1)
+
+        conversion.max_bytes = conversion.total_size() + 1
+        conversion.html_to_docx('<p>新条目</p>', os.path.join(self.root, 'new.docx'))
+        self.assertEqual(conversion._entries.call_count, 3)
+        self.assertLessEqual(conversion.total_size(), conversion.max_bytes)
+
+    def test_pending_marker_shared_between_workers(self):
+        digest = self._cache().file_sha1(self.paths[0])
+        self.assertTrue(self._cache().acquire_pending(digest, 600))
+        # 另一个 worker（新实例）看到同一标记
+        self.assertFalse(self._cache().acquire_pending(digest, 600))
+        # 过期标记可被接管
+        self.assertTrue(self._cache().acquire_pending(digest, 0))
+
+    def test_failed_background_conversion_reported(self):
+        conversion = self._cache()
+        conversion.converter.docx_to_html.side_effect = ValueError('文档已损坏')
+        config = dict(conversion_cache.DEFAULT_CONVERSION_CACHE_CONFIG, BACKGROUND_THRESHOLD=1)
+        with mock.patch.object(conversion_cache, '_conversion_cache', conversion), \
+                override_settings(DOCUMENT_CONVERSION_CACHE=config):
+            self.assertIsNone(conversion_cache.get_or_schedule_html(self.paths[0]))
+            error = None
+            deadline = time.monotonic() + 10
+            while error is None and time.monotonic() < deadline:
+                time.sleep(0.05)
+                try:
+                    conversion_cache.get_or_schedule_html(self.paths[0])
+                except ConversionFailed as e:
+                    error = e.error
+            self.assertEqual(error, '文档已损坏')
+            # 失败记录有效期内不再重新转换
+            with self.assertRaises(ConversionFailed):
+                conversion_cache.get_or_schedule_html(self.paths[0])
+            self.assertEqual(conversion.converter.docx_to_html.call_count, 1)
+
+            # 失败记录过期后重新提交转换
+            conversion.converter.docx_to_html.side_effect = None
+            with override_settings(DOCUMENT_CONVERSION_CACHE=dict(config, FAILED_TIMEOUT=0)):
+                self.assertIsNone(conversion_cache.get_or_schedule_html(self.paths[0]))
+                result = None
+                deadline = time.monotonic() + 10
+                while result is None and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    result = conversion_cache.get_or_schedule_html(self.paths[0])
+            self.assertIn('代理词0', result['html'])
+
+    def test_large_file_converted_in_background(self):
+        conversion = self._cache()
+        config = dict(conversion_cache.DEFAULT_CONVERSION_CACHE_CONFIG, BACKGROUND_THRESHOLD=1)
+        with mock.patch.object(conversion_cache, '_conversion_cache', conversion), \
+                override_settings(DOCUMENT_CONVERSION_CACHE=config):
+            self.assertIsNone(conversion_cache.get_or_schedule_html(self.paths[0]))
+            # 转换进行中时不重复提交
+            self.assertFalse(conversion_cache.schedule_html_conversion(
+                self.paths[0], conversion.file_sha1(self.paths[0])
+            ))
+
+            result = None
+            deadline = time.monotonic() + 10
+            while result is None and time.monotonic() < deadline:
+                time.sleep(0.05)
+                result = conversion_cache.get_or_schedule_html(self.paths[0])
+        self.assertIn('代理词0', result['html'])
+        self.assertEqual(result['title'], 'document_0')
+        self.assertEqual(conversion.converter.docx_to_html.call_count, 1)
+
+
+class RegulationDocumentCacheTestCase(TestCase):
+    """法规文档缓存：内容寻址、条件重验证、LRU 容量与解析失败不缓存"""
+
+    URL = 'https://example.com/regulations/civil_code.docx'
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.parsed = {'success': True, 'chapters': [{'title': '第一章 总则', 'articles': []}]}
+        patcher = mock.patch.object(regulation_cache, 'parse_regulation_document',
+                                    side_effect=lambda content: dict(self.parsed))
+        self.parse = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _cache(self, **kwargs):
+        return RegulationDocumentCache(self.root, **kwargs)
+
+    @staticmethod
+    def _response(content=b'docx', status_code=200, headers=None):
+        response = mock.Mock(status_code=status_code, content=content, headers=headers or {'ETag': '"v1"'})
+        if status_code >= 400:
+            response.raise_for_status.side_effect = regulation_cache.requests.HTTPError(status_code)
+        return response
+
+    def test_hit_within_revalidate_window(self):
+        cache = self._cache(revalidate_after=3600)
+        with mock.patch.object(regulation_cache.requests, 'get', return_value=self._response()) as get:
+            self.assertEqual(cache.get(self.URL)['cache'], 'miss')
+            self.assertEqual(cache.get(self.URL)['cache'], 'hit')
+            # 新实例（其他进程）命中磁盘上的解析结果
+            self.assertEqual(self._cache(revalidate_after=3600).get(self.URL)['cache'], 'hit')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(self.parse.call_count, 1)
+
+    def test_revalidated_and_stale(self):
+        cache = self._cache(revalidate_after=0)
+        with mock.patch.object(regulation_cache.requests, 'get', return_value=self._response()):
+            cache.get(self.URL)
+
+        with mock.patch.object(regulation_cache.requests, 'get',
+                               return_value=self._response(status_code=304)) as get:
+            self.assertEqual(cache.get(self.URL)['cache'], 'revalidated')
+        self.assertEqual(get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+
+        with mock.patch.object(regulation_cache.requests, 'get',
+                               side_effect=regulation_cache.requests.ConnectionError('timeout')):
+            self.assertEqual(cache.get(self.URL)['cache'], 'stale')
+        self.assertEqual(self.parse.call_count, 1)
+
+        # 内容变化时才重新解析
+        with mock.patch.object(regulation_cache.requests, 'get', return_value=self._response(b'docx-v2')):
+            self.assertEqual(cache.get(self.URL)['cache'], 'miss')
+        self.assertEqual(self.parse.call_count, 2)
+
+    def test_memory_bounded(self):
+        cache = self._cache(memory_size=2)
+        for index in range(4):
+            with mock.patch.object(regulation_cache.requests, 'get',
+                                   return_value=self._response(f'docx-{index}'.encode())):
+                cache.get(f'{self.URL}?v={index}')
+        self.assertEqual(len(cache._memory), 2)
+
+    def test_failed_parse_not_cached(self):
+        cache = self._cache()
+        self.parsed = {'success': False, 'error': '文档格式错误'}
+        with mock.patch.object(regulation_cache.requests, 'get', return_value=self._response()):
+            self.assertFalse(cache.get(self.URL)['success'])
+        content_sha = regulation_cache.hashlib.sha256(b'docx').hexdigest()
+        self.assertFalse(os.path.exists(cache._parsed_path(content_sha)))
+
+        # 从原始文档重新解析失败时同样不进入 LRU，解析器恢复后可直接得到正确结果
+        self.assertFalse(cache.get_parsed(content_sha)['success'])
+        self.assertNotIn(content_sha, cache._memory)
+        self.parsed = {'success': True, 'chapters': []}
+        self.assertTrue(cache.get_parsed(content_sha)['success'])
+        self.assertIn(content_sha, cache._memory)
+        self.assertEqual(self.parse.call_count, 3)
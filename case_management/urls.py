@@ -13,6 +13,7 @@ from .views import (
     upload_document_image
 )
 from .regulation_search_views import RegulationSearchViewSet, RegulationConversationViewSet
+from .legal_search_views import LegalSearchViewSet
 from .wps_views import (
     wps_preview_config,
     wps_edit_config,
@@ -48,6 +49,7 @@ router.register(r'templates', DocumentTemplateViewSet, basename='document-templa
 router.register(r'folders', CaseFolderViewSet, basename='case-folders')
 router.register(r'regulation-search', RegulationSearchViewSet, basename='regulation-search')
 router.register(r'regulation-conversations', RegulationConversationViewSet, basename='regulation-conversations')
+router.register(r'legal-search', LegalSearchViewSet, basename='legal-search')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,421 @@
+"""
+文档转换缓存
+按内容哈希 + 转换器版本在本地磁盘缓存 DOCX→HTML（含提取的图片资源）与 HTML→DOCX 的转换结果：
+- 同一内容再次打开预览时直接读取缓存，不再解析 DOCX、提取图片
+- 总大小超过上限时按最近访问时间（LRU）淘汰整个条目；进程内累计写入量，超过上限或距上次全量扫描
+  超过 EVICT_INTERVAL 时才扫描目录
+- 超过阈值的大文件首次转换在后台执行，预览接口先返回 pending，前端稍后重试；进行中与失败标记
+  写在缓存目录中，各 worker 共享，失败时返回错误而不是一直 pending
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from case_management.utils.document_converter import CONVERTER_VERSION, DocumentConverter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONVERSION_CACHE_CONFIG = {
+    # 缓存总大小上限（字节）
+    'MAX_BYTES': 512 * 1024 * 1024,
+    # 超过该大小的 DOCX 首次转换放到后台执行（0 表示总是同步转换）
+    'BACKGROUND_THRESHOLD': 2 * 1024 * 1024,
+    # 后台转换执行方式：thread（进程内线程）或 celery（需 worker 与 Web 共享 MEDIA_ROOT）
+    'BACKGROUND_BACKEND': 'thread',
+    # 后台转换进行中标记的有效期（秒），防止重复提交
+    'PENDING_TIMEOUT': 600,
+    # 后台转换失败记录的有效期（秒），过期后再次打开预览会重新转换
+    'FAILED_TIMEOUT': 600,
+    # 两次全量扫描（淘汰）之间的最长间隔（秒），用于校正其他进程写入的条目
+    'EVICT_INTERVAL': 300,
+}
+
+RESULT_FILE = 'result.json'
+FAILED_FILE = 'failed.json'
+DOCX_FILE = 'output.docx'
+ASSETS_DIR = 'assets'
+
+
+class ConversionFailed(Exception):
+    """后台转换失败（失败记录有效期内不再重新转换）"""
+
+    def __init__(self, error: str):
+        super().__init__(error)
+        self.error = error
+
+
+def get_conversion_cache_config() -> dict:
+    config = dict(DEFAULT_CONVERSION_CACHE_CONFIG)
+    config.update(getattr(settings, 'DOCUMENT_CONVERSION_CACHE', None) or {})
+    return config
+
+
+class DocumentConversionCache:
+    """
+    文档转换磁盘缓存
+
+    目录结构：
+        <cache_dir>/html/v<N>/<sha1>/result.json    DOCX→HTML 结果（html、images）
+        <cache_dir>/html/v<N>/<sha1>/assets/        提取出的图片资源
+        <cache_dir>/docx/v<N>/<sha1>/output.docx    HTML→DOCX 结果
+        <cache_dir>/pending/v<N>/<sha1>             后台转换进行中标记
+        <cache_dir>/failed/v<N>/<sha1>.json         后台转换失败记录
+    条目目录的 mtime 即最近访问时间，命中时刷新，淘汰时按其排序。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 converter: Optional[DocumentConverter] = None):
+        """
+        Args:
+            cache_dir: 缓存根目录，默认 settings.DOCUMENT_CONVERSION_CACHE_DIR（位于 MEDIA_ROOT 下，图片资源可经媒体地址访问）
+            max_bytes: 缓存总大小上限
+            converter: 实际执行转换的转换器
+        """
+        self.cache_dir = cache_dir or getattr(
+            settings, 'DOCUMENT_CONVERSION_CACHE_DIR',
+            os.path.join(settings.MEDIA_ROOT, 'cache', 'conversions')
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else get_conversion_cache_config()['MAX_BYTES']
+        self.converter = converter or DocumentConverter()
+        self._lock = threading.Lock()
+        # 进程内估算的缓存总大小与上次全量扫描时间，None 表示尚未扫描
+        self._total: Optional[int] = None
+        self._scanned_at = 0.0
+        # 文件摘要缓存：path -> ((mtime_ns, size), sha1)，避免每次预览都重新计算大文件摘要
+        self._digests: Dict[str, Tuple[tuple, str]] = {}
+
+    # ------------------------------------------------------------------ #
+    # 路径与摘要
+    # ------------------------------------------------------------------ #
+
+    def entry_dir(self, kind: str, content_sha: str) -> str:
+        return os.path.join(self.cache_dir, kind, f'v{CONVERTER_VERSION}', content_sha)
+
+    def file_sha1(self, path: str) -> str:
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        content_sha = digest.hexdigest()
+        self._digests[path] = (stamp, content_sha)
+        return content_sha
+
+    @staticmethod
+    def html_sha1(html_content: str, image_base_dir: Optional[str] = None) -> str:
+        digest = hashlib.sha1(html_content.encode('utf-8'))
+        # 相对路径图片按 image_base_dir 解析，基础目录不同结果也不同
+        digest.update(f'\0{image_base_dir or ""}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _publish(self, tmp_dir: str, target_dir: str):
+        """整目录替换发布：并发转换同一内容时保留先完成的结果"""
+        os.makedirs(os.path.dirname(target_dir), exist_ok=True)
+        try:
+            os.rename(tmp_dir, target_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _tmp_dir(self, kind: str, content_sha: str) -> str:
+        tmp_dir = os.path.join(self.cache_dir, 'tmp', f'{kind}-{content_sha}.{os.getpid()}.{threading.get_ident()}')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        return tmp_dir
+
+    # ------------------------------------------------------------------ #
+    # DOCX -> HTML
+    # ------------------------------------------------------------------ #
+
+    def get_html(self, content_sha: str) -> Optional[Dict[str, Any]]:
+        """读取已缓存的 HTML 结果，未命中返回 None"""
+        entry = self.entry_dir('html', content_sha)
+        try:
+            with open(os.path.join(entry, RESULT_FILE), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取转换缓存失败，将重新转换: {entry}, {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        self._touch(entry)
+        return result
+
+    def build_html(self, docx_path: str, content_sha: Optional[str] = None) -> Dict[str, Any]:
+        """执行 DOCX→HTML 转换并写入缓存"""
+        content_sha = content_sha or self.file_sha1(docx_path)
+        tmp_dir = self._tmp_dir('html', content_sha)
+        try:
+            result = self.converter.docx_to_html(docx_path, os.path.join(tmp_dir, ASSETS_DIR))
+            cached = {'html': result['html'], 'images': result.get('images') or []}
+            with open(os.path.join(tmp_dir, RESULT_FILE), 'w', encoding='utf-8') as f:
+                json.dump(cached, f, ensure_ascii=False)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self._publish(tmp_dir, self.entry_dir('html', content_sha))
+        self._added(self.entry_dir('html', content_sha))
+        return cached
+
+    def docx_to_html(self, docx_path: str) -> Dict[str, Any]:
+        """与 DocumentConverter.docx_to_html 相同的返回结构，命中缓存时不再转换"""
+        content_sha = self.file_sha1(docx_path)
+        result = self.get_html(content_sha) or self.build_html(docx_path, content_sha)
+        # 标题取自文件名，不随内容缓存
+        return dict(result, title=os.path.splitext(os.path.basename(docx_path))[0])
+
+    # ------------------------------------------------------------------ #
+    # HTML -> DOCX
+    # ------------------------------------------------------------------ #
+
+    def html_to_docx(self, html_content: str, output_path: str, image_base_dir: Optional[str] = None) -> str:
+        """与 DocumentConverter.html_to_docx 相同的调用方式，相同 HTML 直接复制已生成的 DOCX"""
+        content_sha = self.html_sha1(html_content, image_base_dir)
+        entry = self.entry_dir('docx', content_sha)
+        cached_path = os.path.join(entry, DOCX_FILE)
+        if os.path.exists(cached_path):
+            try:
+                shutil.copyfile(cached_path, output_path)
+                self._touch(entry)
+                return output_path
+            except FileNotFoundError:
+                # 恰好被淘汰
+                pass
+
+        self.converter.html_to_docx(html_content, output_path, image_base_dir)
+        tmp_dir = self._tmp_dir('docx', content_sha)
+        shutil.copyfile(output_path, os.path.join(tmp_dir, DOCX_FILE))
+        self._publish(tmp_dir, entry)
+        self._added(entry)
+        return output_path
+
+    # ------------------------------------------------------------------ #
+    # 容量控制
+    # ------------------------------------------------------------------ #
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """所有条目的 (最近访问时间, 大小, 路径)"""
+        entries = []
+        for kind in ('html', 'docx'):
+            kind_dir = os.path.join(self.cache_dir, kind)
+            if not os.path.isdir(kind_dir):
+                continue
+            for version in os.listdir(kind_dir):
+                version_dir = os.path.join(kind_dir, version)
+                if not os.path.isdir(version_dir):
+                    continue
+                for name in os.listdir(version_dir):
+                    entry = os.path.join(version_dir, name)
+                    try:
+                        accessed = os.stat(entry).st_mtime
+                    except OSError:
+                        continue
+                    # 旧版本转换器的条目不会再命中，优先淘汰
+                    if version != f'v{CONVERTER_VERSION}':
+                        accessed = 0
+                    entries.append((accessed, self._entry_size(entry), entry))
+        return entries
+
+    @staticmethod
+    def _entry_size(entry: str) -> int:
+        size = 0
+        for root, _, files in os.walk(entry):
+            for file_name in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, file_name))
+                except OSError:
+                    pass
+        return size
+
+    def _added(self, entry: str):
+        """写入新条目后累计大小，超过上限或到达扫描间隔时才全量扫描淘汰"""
+        if not self.max_bytes or self.max_bytes <= 0:
+            return
+        interval = get_conversion_cache_config()['EVICT_INTERVAL']
+        with self._lock:
+            if self._total is not None:
+                self._total += self._entry_size(entry)
+            stale = self._total is None or time.monotonic() - self._scanned_at >= interval
+            if not stale and self._total <= self.max_bytes:
+                return
+        self.evict()
+
+    def total_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """按最近访问时间淘汰条目直到总大小不超过上限，返回淘汰数量"""
+        if not self.max_bytes or self.max_bytes <= 0:
+            return 0
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed += 1
+            self._total = total
+            self._scanned_at = time.monotonic()
+        if removed:
+            logger.info(f"文档转换缓存淘汰 {removed} 个条目，剩余 {total} 字节")
+        return removed
+
+    # ------------------------------------------------------------------ #
+    # 后台转换状态（写在缓存目录中，与转换结果一样在各 worker 间共享）
+    # ------------------------------------------------------------------ #
+
+    def _marker_path(self, kind: str, content_sha: str) -> str:
+        name = f'{content_sha}.json' if kind == 'failed' else content_sha
+        return os.path.join(self.cache_dir, kind, f'v{CONVERTER_VERSION}', name)
+
+    @staticmethod
+    def _age(path: str) -> Optional[float]:
+        try:
+            return time.time() - os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def acquire_pending(self, content_sha: str, timeout: int) -> bool:
+        """原子地创建进行中标记；已有未过期标记时返回 False"""
+        path = self._marker_path('pending', content_sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        age = self._age(path)
+        if age is not None and age >= timeout:
+            # 转换进程异常退出留下的过期标记
+            self.release_pending(content_sha)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    def release_pending(self, content_sha: str):
+        try:
+            os.remove(self._marker_path('pending', content_sha))
+        except OSError:
+            pass
+
+    def record_failure(self, content_sha: str, error: str):
+        path = self._marker_path('failed', content_sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'error': error}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get_failure(self, content_sha: str, timeout: int) -> Optional[str]:
+        """有效期内的失败记录（错误信息），没有或已过期返回 None"""
+        path = self._marker_path('failed', content_sha)
+        age = self._age(path)
+        if age is None:
+            return None
+        if age >= timeout:
+            self.clear_failure(content_sha)
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('error') or '未知错误'
+        except (OSError, ValueError):
+            return None
+
+    def clear_failure(self, content_sha: str):
+        try:
+            os.remove(self._marker_path('failed', content_sha))
+        except OSError:
+            pass
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        with self._lock:
+            self._total = None
+
+
+_conversion_cache: Optional[DocumentConversionCache] = None
+_conversion_cache_lock = threading.Lock()
+
+
+def get_conversion_cache() -> DocumentConversionCache:
+    global _conversion_cache
+    if _conversion_cache is None:
+        with _conversion_cache_lock:
+            if _conversion_cache is None:
+                _conversion_cache = DocumentConversionCache()
+    return _conversion_cache
+
+
+def run_html_conversion(docx_path: str, content_sha: str) -> None:
+    """后台任务入口：转换并写入缓存，失败时记录错误，结束后清除进行中标记"""
+    conversion_cache = get_conversion_cache()
+    started = time.perf_counter()
+    try:
+        conversion_cache.build_html(docx_path, content_sha)
+        conversion_cache.clear_failure(content_sha)
+        logger.info(f"后台 DOCX→HTML 转换完成: {docx_path}, 耗时 {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        logger.error(f"后台 DOCX→HTML 转换失败: {docx_path}, {e}", exc_info=True)
+        conversion_cache.record_failure(content_sha, str(e))
+    finally:
+        conversion_cache.release_pending(content_sha)
+
+
+def schedule_html_conversion(docx_path: str, content_sha: str) -> bool:
+    """提交后台转换；同一内容已在转换中（任一 worker）时不重复提交，返回是否新提交"""
+    config = get_conversion_cache_config()
+    if not get_conversion_cache().acquire_pending(content_sha, config['PENDING_TIMEOUT']):
+        return False
+    if config['BACKGROUND_BACKEND'] == 'celery':
+        try:
+            from case_management.tasks import convert_docx_to_html_task
+            convert_docx_to_html_task.delay(docx_path, content_sha)
+            return True
+        except Exception as e:
+            logger.warning(f"提交 Celery 转换任务失败，改为进程内执行: {e}")
+    threading.Thread(
+        target=run_html_conversion, args=(docx_path, content_sha),
+        name='docx-html-conversion', daemon=True,
+    ).start()
+    return True
+
+
+def get_or_schedule_html(docx_path: str) -> Optional[Dict[str, Any]]:
+    """
+    获取 DOCX 的 HTML 预览
+
+    命中缓存或小文件时直接返回结果；大文件首次打开时提交后台转换并返回 None，由调用方提示稍后重试；
+    后台转换失败且失败记录未过期时抛出 ConversionFailed。
+    """
+    conversion_cache = get_conversion_cache()
+    content_sha = conversion_cache.file_sha1(docx_path)
+    result = conversion_cache.get_html(content_sha)
+    if result is None:
+        config = get_conversion_cache_config()
+        threshold = config['BACKGROUND_THRESHOLD']
+        if threshold and os.path.getsize(docx_path) >= threshold:
+            error = conversion_cache.get_failure(content_sha, config['FAILED_TIMEOUT'])
+            if error is not None:
+                raise ConversionFailed(error)
+            schedule_html_conversion(docx_path, content_sha)
+            return None
+        result = conversion_cache.build_html(docx_path, content_sha)
+    return dict(result, title=os.path.splitext(os.path.basename(docx_path))[0])
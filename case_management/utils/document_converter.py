@@ -24,6 +24,9 @@ from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# 转换器版本号：转换输出变化时递增，使 conversion_cache 中的旧结果自动失效
+CONVERTER_VERSION = 1
+
 
 class DocumentConverter:
     """文档转换器"""
@@ -4,6 +4,7 @@
 import os
 import logging
 from django.conf import settings
+from django.core.cache import cache
 
 from ..constants import CASE_FOLDER_TEMPLATES
 
@@ -53,9 +54,59 @@ def create_case_folders(case_id):
         raise
 
 
-def get_case_document_tree(case_id):
+DOCUMENT_TREE_CACHE_KEY = 'case_doc_tree:{case_id}:{version}'
+DOCUMENT_TREE_VERSION_NAME = 'case:document_tree:{case_id}'
+DOC_EXTENSIONS = ['.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt', '.pdf']
+
+
+def invalidate_case_document_tree(case_id):
+    """
+    目录或文档变更后使该案件的文档树缓存失效
+
+    版本号存放在数据库（StatsCacheVersion）供所有 worker 共享，其他进程下次读取即使用新的缓存键。
+    """
+    from customer_management.models import StatsCacheVersion
+    if case_id:
+        StatsCacheVersion.bump(DOCUMENT_TREE_VERSION_NAME.format(case_id=case_id))
+
+
+def _document_node(doc):
+    # 构建文档标签：确保 document_name 不包含扩展名，扩展名从 file_ext 获取
+    # 如果 document_name 已经包含扩展名，需要移除以避免重复
+    doc_name = doc.document_name or ""
+    doc_ext = doc.file_ext or ""
+    
+    # 检查 document_name 是否已经包含扩展名（防止重复）
+    lower_name = doc_name.lower()
+    for ext in DOC_EXTENSIONS:
+        if lower_name.endswith(ext):
+            # document_name 已经包含扩展名，移除它
+            doc_name = doc_name[:-len(ext)]
+            # 如果 file_ext 为空，使用检测到的扩展名
+            if not doc_ext:
+                doc_ext = ext
+            break
+    
+    return {
+        'id': doc.id,  # 直接使用文档ID，不加doc_前缀
+        'label': f"{doc_name}{doc_ext}",  # 组合标签：document_name + file_ext
+        'path': doc.file_url or '',  # 使用 file_url 获取完整URL
+        'file_path': doc.file_path or '',  # 保留相对路径供参考
+        'type': 'file',
+        'document_id': doc.id,
+        'file_size': doc.file_size,
+        'document_type': doc.document_type,
+        'version': doc.version,
+        'print_count': doc.print_count,  # ✅ 打印数量
+        'is_selected': getattr(doc, 'is_selected', False),  # ✅ 是否选中（新增字段）
+        'sort_order': doc.sort_order,  # ✅ 排序序号
+        'created_at': doc.create_datetime.strftime('%Y-%m-%d %H:%M:%S') if doc.create_datetime else None
+    }
+
+
+def build_case_document_tree(case_id):
     """
-    获取案件文档树结构
+    构建案件文档树：目录与文档各查询一次，在内存中按 folder_path 归组
     
     Args:
         case_id: 案件ID
@@ -66,70 +117,56 @@ def get_case_document_tree(case_id):
     from ..models import CaseFolder, CaseDocument
     
     # 获取所有目录
-    folders = CaseFolder.objects.filter(
+    folders = list(CaseFolder.objects.filter(
         case_id=case_id,
         is_deleted=False
-    ).order_by('sort_order', 'id')
+    ).order_by('sort_order', 'id'))
     
-    # 获取所有文档（按 sort_order 升序排列）
+    # 获取所有文档（按 sort_order 升序排列），按目录路径归组
+    documents_by_path = {}
     documents = CaseDocument.objects.filter(
         case_id=case_id,
         is_deleted=False
-    ).select_related('template').order_by('sort_order', 'id')
+    ).order_by('sort_order', 'id')
+    for doc in documents:
+        documents_by_path.setdefault(doc.folder_path, []).append(doc)
     
     # 构建树形结构
     tree = []
     for folder in folders:
-        folder_node = {
+        tree.append({
             'id': folder.id,
             'label': folder.folder_name,
             'path': folder.folder_path,
             'type': 'folder',
             'folder_type': folder.folder_type,
-            'children': []
-        }
-        
-        # 添加该目录下的文档
-        folder_docs = documents.filter(folder_path=folder.folder_path)
-        for doc in folder_docs:
-            # 构建文档标签：确保 document_name 不包含扩展名，扩展名从 file_ext 获取
-            # 如果 document_name 已经包含扩展名，需要移除以避免重复
-            doc_name = doc.document_name or ""
-            doc_ext = doc.file_ext or ""
-            
-            # 检查 document_name 是否已经包含扩展名（防止重复）
-            doc_extensions = ['.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt', '.pdf']
-            for ext in doc_extensions:
-                if doc_name.lower().endswith(ext):
-                    # document_name 已经包含扩展名，移除它
-                    doc_name = doc_name[:-len(ext)]
-                    # 如果 file_ext 为空，使用检测到的扩展名
-                    if not doc_ext:
-                        doc_ext = ext
-                    break
-            
-            # 组合标签：document_name + file_ext
-            doc_label = f"{doc_name}{doc_ext}"
-            
-            doc_node = {
-                'id': doc.id,  # 直接使用文档ID，不加doc_前缀
-                'label': doc_label,
-                'path': doc.file_url or '',  # 使用 file_url 获取完整URL
-                'file_path': doc.file_path or '',  # 保留相对路径供参考
-                'type': 'file',
-                'document_id': doc.id,
-                'file_size': doc.file_size,
-                'document_type': doc.document_type,
-                'version': doc.version,
-                'print_count': doc.print_count,  # ✅ 打印数量
-                'is_selected': getattr(doc, 'is_selected', False),  # ✅ 是否选中（新增字段）
-                'sort_order': doc.sort_order,  # ✅ 排序序号
-                'created_at': doc.create_datetime.strftime('%Y-%m-%d %H:%M:%S') if doc.create_datetime else None
-            }
-            folder_node['children'].append(doc_node)
+            'children': [_document_node(doc) for doc in documents_by_path.get(folder.folder_path, ())]
+        })
+    
+    return tree
+
+
+def get_case_document_tree(case_id, use_cache=True):
+    """
+    获取案件文档树结构（按案件缓存，目录/文档变更时递增数据库中的版本号）
+    
+    Args:
+        case_id: 案件ID
+        use_cache: 是否使用缓存
         
-        tree.append(folder_node)
+    Returns:
+        list: 文档树结构
+    """
+    if not use_cache:
+        return build_case_document_tree(case_id)
     
+    from customer_management.models import StatsCacheVersion
+    version = StatsCacheVersion.current(DOCUMENT_TREE_VERSION_NAME.format(case_id=case_id))
+    cache_key = DOCUMENT_TREE_CACHE_KEY.format(case_id=case_id, version=version)
+    tree = cache.get(cache_key)
+    if tree is None:
+        tree = build_case_document_tree(case_id)
+        cache.set(cache_key, tree, getattr(settings, 'CASE_DOCUMENT_TREE_CACHE_TTL', 600))
     return tree
 
 
@@ -0,0 +1,230 @@
+"""
+法规文档缓存模块
+按内容寻址缓存下载的法规文档（.docx）及其解析结果，支持基于 ETag/Last-Modified 的条件重验证
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import requests
+from django.conf import settings
+
+from case_management.document_parser import parse_regulation_document
+
+logger = logging.getLogger(__name__)
+
+# 解析器版本号：解析逻辑变化时递增，使旧的解析结果自动失效
+PARSER_VERSION = 1
+
+
+class RegulationDocumentCache:
+    """
+    法规文档缓存
+
+    目录结构：
+        <cache_dir>/blobs/<sha256>.docx          原始文档（按内容哈希寻址，同一内容只存一份）
+        <cache_dir>/parsed/<sha256>.v<N>.json    解析后的章节/条款结构
+        <cache_dir>/urls/<sha256(url)>.json      URL 元数据（content_sha、ETag、Last-Modified、校验时间）
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, revalidate_after: Optional[int] = None,
+                 memory_size: int = 64, timeout: int = 30):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存根目录，默认 settings.REGULATION_CACHE_DIR
+            revalidate_after: 距离上次校验超过该秒数后才向源站发起条件请求
+            memory_size: 进程内解析结果的 LRU 容量
+            timeout: 下载超时时间（秒）
+        """
+        self.cache_dir = cache_dir or getattr(
+            settings, 'REGULATION_CACHE_DIR',
+            os.path.join(settings.BASE_DIR, 'cache', 'regulations')
+        )
+        self.revalidate_after = revalidate_after if revalidate_after is not None else getattr(
+            settings, 'REGULATION_CACHE_REVALIDATE_SECONDS', 3600
+        )
+        self.memory_size = memory_size
+        self.timeout = timeout
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        for sub in ('blobs', 'parsed', 'urls'):
+            os.makedirs(os.path.join(self.cache_dir, sub), exist_ok=True)
+
+    # ------------------------------------------------------------------ #
+    # 路径与读写工具
+    # ------------------------------------------------------------------ #
+
+    def _blob_path(self, content_sha: str) -> str:
+        return os.path.join(self.cache_dir, 'blobs', f'{content_sha}.docx')
+
+    def _parsed_path(self, content_sha: str) -> str:
+        return os.path.join(self.cache_dir, 'parsed', f'{content_sha}.v{PARSER_VERSION}.json')
+
+    def _meta_path(self, url: str) -> str:
+        url_key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, 'urls', f'{url_key}.json')
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        """先写临时文件再替换，避免并发读取到半写入的文件"""
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取法规缓存文件失败，将忽略: {path}, {e}")
+            return None
+
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        self._atomic_write(path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    # ------------------------------------------------------------------ #
+    # 解析结果缓存
+    # ------------------------------------------------------------------ #
+
+    def _memory_get(self, content_sha: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._memory.get(content_sha)
+            if result is not None:
+                self._memory.move_to_end(content_sha)
+            return result
+
+    def _memory_set(self, content_sha: str, result: Dict[str, Any]):
+        with self._lock:
+            self._memory[content_sha] = result
+            self._memory.move_to_end(content_sha)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get_parsed(self, content_sha: str) -> Optional[Dict[str, Any]]:
+        """按内容哈希获取解析结果：进程内存 -> 磁盘 JSON -> 原始文档重新解析"""
+        result = self._memory_get(content_sha)
+        if result is not None:
+            return result
+
+        result = self._read_json(self._parsed_path(content_sha))
+        if result is None:
+            blob_path = self._blob_path(content_sha)
+            if not os.path.exists(blob_path):
+                return None
+            with open(blob_path, 'rb') as f:
+                result = self._parse_and_store(content_sha, f.read())
+            if not result.get('success'):
+                # 解析失败的结果不进入 LRU，下次访问重新解析
+                return result
+
+        self._memory_set(content_sha, result)
+        return result
+
+    def _parse_and_store(self, content_sha: str, content: bytes) -> Optional[Dict[str, Any]]:
+        parse_result = parse_regulation_document(content)
+        if not parse_result.get('success'):
+            # 解析失败不写缓存，交由调用方处理错误
+            return parse_result
+        self._write_json(self._parsed_path(content_sha), parse_result)
+        return parse_result
+
+    # ------------------------------------------------------------------ #
+    # 对外接口
+    # ------------------------------------------------------------------ #
+
+    def get(self, url: str) -> Dict[str, Any]:
+        """
+        获取法规文档解析结果
+
+        未过重验证期直接返回缓存；过期后发起条件请求（If-None-Match / If-Modified-Since），
+        304 或内容哈希未变时沿用已有解析结果，仅内容变化时才重新解析。
+
+        Args:
+            url: 文档下载地址
+
+        Returns:
+            parse_regulation_document 的结果，额外包含 cache 字段（hit/revalidated/miss/stale）
+
+        Raises:
+            requests.RequestException: 下载失败且没有可用的旧缓存
+        """
+        meta_path = self._meta_path(url)
+        meta = self._read_json(meta_path)
+
+        if meta and time.time() - meta.get('checked_at', 0) < self.revalidate_after:
+            cached = self.get_parsed(meta['content_sha'])
+            if cached is not None and cached.get('success'):
+                return dict(cached, cache='hit')
+
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and meta:
+                cached = self.get_parsed(meta['content_sha'])
+                if cached is not None and cached.get('success'):
+                    meta['checked_at'] = time.time()
+                    self._write_json(meta_path, meta)
+                    return dict(cached, cache='revalidated')
+                # 304 但本地缓存已丢失：去掉条件头重新下载
+                response = requests.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if meta:
+                cached = self.get_parsed(meta['content_sha'])
+                if cached is not None and cached.get('success'):
+                    logger.warning(f"法规文档重验证失败，返回旧缓存: {url}, {e}")
+                    return dict(cached, cache='stale')
+            raise
+
+        content = response.content
+        content_sha = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(content_sha)
+        if not os.path.exists(blob_path):
+            self._atomic_write(blob_path, content)
+
+        result = self._memory_get(content_sha) or self._read_json(self._parsed_path(content_sha))
+        if result is None:
+            result = self._parse_and_store(content_sha, content)
+        if not result.get('success'):
+            return result
+        self._memory_set(content_sha, result)
+
+        self._write_json(meta_path, {
+            'url': url,
+            'content_sha': content_sha,
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'checked_at': time.time(),
+        })
+        return dict(result, cache='miss')
+
+
+_regulation_cache = None
+_regulation_cache_lock = threading.Lock()
+
+
+def get_regulation_cache() -> RegulationDocumentCache:
+    """获取进程级法规文档缓存单例"""
+    global _regulation_cache
+    if _regulation_cache is None:
+        with _regulation_cache_lock:
+            if _regulation_cache is None:
+                _regulation_cache = RegulationDocumentCache()
+    return _regulation_cache
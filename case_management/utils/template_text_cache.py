@@ -0,0 +1,130 @@
+"""
+模板文本缓存
+
+按 (路径, mtime, 大小) 缓存模板文件解析出的文本与占位符列表，生成请求不再重复打开和解析 DOCX：
+- 文件被替换（mtime 或大小变化）时自动重新解析
+- DocumentTemplate 保存/删除时由信号主动失效
+- 服务进程启动（加载 ASGI/WSGI 应用）时在后台线程预热
+"""
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateTextCache:
+    """进程内模板文本缓存"""
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stamp(filepath: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, filepath: str) -> Optional[dict]:
+        """
+        获取模板解析结果
+
+        Returns:
+            dict: {'content': str, 'file_type': str, 'placeholders': [str]}；文件不存在、类型不支持或内容为空时返回 None
+        """
+        stamp = self._stamp(filepath)
+        if stamp is None:
+            self.invalidate(filepath)
+            return None
+
+        cached = self._entries.get(filepath)
+        if cached is not None and cached[0] == stamp:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        entry = self._parse(filepath)
+        with self._lock:
+            # 解析期间文件可能再次变化，以解析前的状态为准，下次访问会重新校验
+            self._entries[filepath] = (stamp, entry)
+        return entry
+
+    @staticmethod
+    def _parse(filepath: str) -> Optional[dict]:
+        from case_management.direct_langchain_ai_service import get_file_type, parse_template_file
+        from case_management.placeholder_parser import placeholder_parser
+
+        file_type = get_file_type(os.path.basename(filepath))
+        content = parse_template_file(filepath, file_type)
+        if not content or not content.strip():
+            return None
+        keys = []
+        for match in placeholder_parser.placeholder_pattern.finditer(content):
+            key = match.group(1).strip()
+            if key not in keys:
+                keys.append(key)
+        return {'content': content, 'file_type': file_type, 'placeholders': keys}
+
+    def invalidate(self, filepath: Optional[str] = None) -> None:
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(filepath, None)
+
+    def retain(self, filepaths: Iterable[str]) -> None:
+        """只保留仍被模板引用的路径，清理已删除或改路径的模板"""
+        keep = set(filepaths)
+        with self._lock:
+            for filepath in [path for path in self._entries if path not in keep]:
+                del self._entries[filepath]
+
+    def warm(self) -> int:
+        """预热所有启用的模板，返回成功解析的数量"""
+        from case_management.models import DocumentTemplate
+
+        paths = [
+            template.full_file_path
+            for template in DocumentTemplate.objects.filter(is_active=True, is_deleted=False)
+            if template.file_path
+        ]
+        loaded = sum(1 for path in paths if self.get(path) is not None)
+        self.retain(paths)
+        logger.info(f"模板文本缓存预热完成: {loaded}/{len(paths)}")
+        return loaded
+
+
+template_text_cache = TemplateTextCache()
+
+_warm_started = False
+_warm_lock = threading.Lock()
+
+
+def warm_in_background():
+    """在后台线程预热，每个进程只执行一次；由 application/asgi.py、wsgi.py 在服务启动时调用"""
+    global _warm_started
+    if _warm_started or not getattr(settings, 'TEMPLATE_TEXT_CACHE_WARMUP', True):
+        return
+    with _warm_lock:
+        if _warm_started:
+            return
+        _warm_started = True
+
+    def _warm():
+        try:
+            template_text_cache.warm()
+        except Exception as e:
+            logger.warning(f"模板文本缓存预热失败: {str(e)}")
+        finally:
+            connection.close()
+
+    threading.Thread(target=_warm, name='template-cache-warmup', daemon=True).start()
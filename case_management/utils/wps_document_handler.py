@@ -2,7 +2,6 @@
 WPS文档处理模块
 """
 import os
-import shutil
 import logging
 from datetime import datetime
 from typing import Dict, Optional
@@ -14,6 +13,11 @@ from django.db import transaction
 logger = logging.getLogger(__name__)
 
 from case_management.models import CaseDocument
+from case_management.services.document_version_store import (
+    DocumentVersionStore,
+    _iter_source,
+    sha1_of_chunks,
+)
 
 
 class WPSDocumentHandler:
@@ -105,15 +109,20 @@ class WPSDocumentHandler:
         self, 
         document_id: int, 
         file: UploadedFile, 
-        user_id: int
+        user_id: int,
+        sha1: Optional[str] = None
     ) -> Dict:
         """
         保存WPS编辑后的文档
         
+        启用版本管理时内容只写入按 SHA-1 寻址的版本库，文档文件路径指向最新版本的内容块；
+        与当前版本内容相同的保存只增加一行版本记录，不写任何文件。
+        
         Args:
             document_id: 文档ID
             file: 上传的文件
             user_id: 用户ID
+            sha1: 已校验的内容 SHA-1（WPS 回调提供），为空时自动计算
         
         Returns:
             dict: {
@@ -147,13 +156,23 @@ class WPSDocumentHandler:
             
             # 使用事务确保数据一致性
             with transaction.atomic():
-                # 创建版本备份
+                blob = None
                 backup_path = None
-                if self.version_management_enabled and document.file_path:
-                    backup_path = self.create_version_backup(document_id)
-                
-                # 保存新文件
-                file_path = self._save_file(document, file)
+                unchanged = False
+                if self.version_management_enabled:
+                    store = DocumentVersionStore()
+                    if document.file_path and not store.has_versions(document_id):
+                        # 首次保存：把原始文件作为基线版本入库
+                        backup_path = self.create_version_backup(document_id)
+                    if not sha1:
+                        sha1, _ = sha1_of_chunks(_iter_source(file))
+                    latest = store.latest(document_id)
+                    unchanged = bool(latest and latest.blob_id == sha1)
+                    # 内容已在版本库中时 put_blob 不写文件
+                    blob = store.put_blob(file, sha1=sha1, size=file.size)
+                    file_path = blob.storage_path
+                else:
+                    file_path = self._save_file(document, file)
                 
                 # 更新文档信息
                 document.file_path = file_path
@@ -171,9 +190,12 @@ class WPSDocumentHandler:
                 
                 document.save()
                 
+                if blob is not None:
+                    store.record_version(document_id, document.version, blob, file.name, user_id)
+                
                 logger.info(
                     f"保存WPS文档: document_id={document_id}, user_id={user_id}, "
-                    f"size={file.size}, version={document.version}, backup={backup_path}"
+                    f"size={file.size}, version={document.version}, sha1={sha1}, unchanged={unchanged}"
                 )
                 
                 return {
@@ -182,6 +204,8 @@ class WPSDocumentHandler:
                     'fileSize': file.size,
                     'version': document.version,
                     'backupPath': backup_path,
+                    'sha1': sha1,
+                    'unchanged': unchanged,
                 }
             
         except Exception as e:
@@ -295,13 +319,15 @@ class WPSDocumentHandler:
     
     def create_version_backup(self, document_id: int) -> Optional[str]:
         """
-        创建版本备份
+        把文档当前文件作为一个版本写入版本库
+        
+        内容已在版本库中时只增加引用，不复制文件；超出保留数量的旧版本由版本库按索引裁剪。
         
         Args:
             document_id: 文档ID
         
         Returns:
-            str: 备份文件路径，如果失败返回None
+            str: 内容块文件路径，如果失败返回None
         """
         try:
             document = CaseDocument.objects.get(id=document_id)
@@ -313,27 +339,12 @@ class WPSDocumentHandler:
             if not original_path or not os.path.exists(original_path):
                 return None
             
-            # 创建版本目录
-            version_dir = os.path.join(
-                settings.MEDIA_ROOT,
-                'documents',
-                'versions',
-                str(document_id)
-            )
-            os.makedirs(version_dir, exist_ok=True)
-            
-            # 生成备份文件名
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f"v{document.version}_{timestamp}.docx"
-            backup_path = os.path.join(version_dir, backup_filename)
-            
-            # 复制文件
-            shutil.copy2(original_path, backup_path)
+            store = DocumentVersionStore()
+            blob = store.put_blob(original_path)
+            store.record_version(document_id, document.version, blob, document.file_name, None)
+            backup_path = store.blob_fullpath(blob)
             
-            # 清理旧版本（保留最近N个版本）
-            self._cleanup_old_versions(version_dir)
-            
-            logger.info(f"创建版本备份: document_id={document_id}, backup={backup_path}")
+            logger.info(f"创建版本备份: document_id={document_id}, sha1={blob.sha1}")
             
             return backup_path
             
@@ -384,40 +395,6 @@ class WPSDocumentHandler:
         relative_path = os.path.relpath(file_path, settings.MEDIA_ROOT)
         return relative_path.replace('\\', '/')
     
-    def _cleanup_old_versions(self, version_dir: str) -> None:
-        """
-        清理旧版本备份
-        
-        Args:
-            version_dir: 版本目录
-        """
-        try:
-            if not os.path.exists(version_dir):
-                return
-            
-            # 获取所有版本文件，按修改时间排序
-            files = []
-            for filename in os.listdir(version_dir):
-                if filename.startswith('v') and filename.endswith('.docx'):
-                    file_path = os.path.join(version_dir, filename)
-                    mtime = os.path.getmtime(file_path)
-                    files.append((mtime, file_path))
-            
-            # 按修改时间倒序排序（最新的在前）
-            files.sort(key=lambda x: x[0], reverse=True)
-            
-            # 删除超出保留数量的旧版本
-            if len(files) > self.version_backup_count:
-                for mtime, file_path in files[self.version_backup_count:]:
-                    try:
-                        os.remove(file_path)
-                        logger.info(f"删除旧版本备份: {file_path}")
-                    except Exception as e:
-                        logger.warning(f"删除旧版本失败: {file_path}, error={str(e)}")
-            
-        except Exception as e:
-            logger.error(f"清理旧版本失败: {str(e)}", exc_info=True)
-    
     def check_document_permission(
         self, 
         document_id: int, 
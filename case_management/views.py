@@ -4,10 +4,11 @@
 import os
 import json
 import logging
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db import models
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, FileResponse, JsonResponse
+from django.http import HttpResponse, FileResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.clickjacking import xframe_options_exempt
 from rest_framework import status
 from rest_framework.decorators import action, api_view, permission_classes
@@ -41,9 +42,11 @@ from .serializers import (
 from .ai_service import generate_document_with_ai, generate_all_documents_with_ai, ai_chat_with_documents
 from .smart_document_filler import smart_fill_document, smart_fill_all_templates, generate_smart_documents
 from .xpert_integration import XpertAIClient
-from .utils.document_converter import DocumentConverter
+from .services.document_version_store import DocumentVersionStore
+from .utils.conversion_cache import ConversionFailed, get_conversion_cache, get_or_schedule_html
 from .utils.document_file_manager import DocumentFileManager
 from .utils.image_handler import ImageHandler
+from .utils.wps_document_handler import WPSDocumentHandler
 
 
 class CaseManagementViewSet(CustomModelViewSet):
@@ -269,7 +272,10 @@ class CaseManagementViewSet(CustomModelViewSet):
         instance = self.get_object()
         
         try:
-            # 删除关联的文档
+            # 先释放文档在版本库中的全部版本（按引用计数回收内容块），再删除关联的文档
+            store = DocumentVersionStore()
+            for document_id in CaseDocument.objects.filter(case=instance).values_list('id', flat=True):
+                store.prune(document_id, keep=0)
             CaseDocument.objects.filter(case=instance).delete()
             
             # 删除关联的目录
@@ -509,21 +515,7 @@ class CaseManagementViewSet(CustomModelViewSet):
             case = self.get_object()
             
             # 准备案例数据
-            case_data = {
-                'case_number': case.case_number,
-                'case_name': case.case_name,
-                'case_type': case.case_type,
-                'jurisdiction': case.jurisdiction,
-                'draft_person': case.draft_person,
-                'defendant_name': case.defendant_name,
-                'defendant_credit_code': case.defendant_credit_code,
-                'defendant_address': case.defendant_address,
-                'plaintiff_name': case.plaintiff_name,
-                'plaintiff_credit_code': case.plaintiff_credit_code,
-                'plaintiff_address': case.plaintiff_address,
-                'contract_amount': float(case.contract_amount) if case.contract_amount else 0.0,
-                'lawyer_fee': float(case.lawyer_fee) if case.lawyer_fee else 0.0
-            }
+            case_data = self._case_generation_data(case)
             
             # 调用AI生成所有文档
             result = generate_all_documents_with_ai(case_data)
@@ -533,30 +525,7 @@ class CaseManagementViewSet(CustomModelViewSet):
                 created_documents = []
                 for doc_data in result['documents']:
                     if doc_data['success']:
-                        # 检查是否已存在相同类型的文档
-                        existing_doc = CaseDocument.objects.filter(
-                            case=case,
-                            document_type=doc_data['document_name']
-                        ).first()
-                        
-                        if existing_doc:
-                            # 更新现有文档
-                            existing_doc.document_content = doc_data['content']
-                            existing_doc.template_used = doc_data['template_name']
-                            existing_doc.save()
-                            created_documents.append(CaseDocumentSerializer(existing_doc).data)
-                        else:
-                            # 创建新文档
-                            document = CaseDocument.objects.create(
-                                case=case,
-                                document_name=doc_data['template_name'],  # 使用模板名称作为文档名称
-                                document_content=doc_data['content'],
-                                document_type=doc_data['document_name'],
-                                file_path='',  # 提供空字符串作为默认值
-                                generation_method='manual',
-                                template_used=doc_data['template_name']
-                            )
-                            created_documents.append(CaseDocumentSerializer(document).data)
+                        created_documents.append(self._save_generated_document(case, doc_data))
                 
                 return DetailResponse(
                     data={
@@ -580,6 +549,89 @@ class CaseManagementViewSet(CustomModelViewSet):
             traceback.print_exc()
             return Response({"error": f"生成所有文档异常: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @staticmethod
+    def _case_generation_data(case):
+        """准备文书生成所需的案例数据"""
+        return {
+            'case_number': case.case_number,
+            'case_name': case.case_name,
+            'case_type': case.case_type,
+            'jurisdiction': case.jurisdiction,
+            'draft_person': case.draft_person,
+            'defendant_name': case.defendant_name,
+            'defendant_credit_code': case.defendant_credit_code,
+            'defendant_address': case.defendant_address,
+            'plaintiff_name': case.plaintiff_name,
+            'plaintiff_credit_code': case.plaintiff_credit_code,
+            'plaintiff_address': case.plaintiff_address,
+            'contract_amount': float(case.contract_amount) if case.contract_amount else 0.0,
+            'lawyer_fee': float(case.lawyer_fee) if case.lawyer_fee else 0.0
+        }
+    
+    @staticmethod
+    def _save_generated_document(case, doc_data):
+        """保存一份生成成功的文书：同类型已存在时更新，否则新建"""
+        existing_doc = CaseDocument.objects.filter(
+            case=case,
+            document_type=doc_data['document_name']
+        ).first()
+        
+        if existing_doc:
+            # 更新现有文档
+            existing_doc.document_content = doc_data['content']
+            existing_doc.template_used = doc_data['template_name']
+            existing_doc.save()
+            return CaseDocumentSerializer(existing_doc).data
+        
+        # 创建新文档
+        document = CaseDocument.objects.create(
+            case=case,
+            document_name=doc_data['template_name'],  # 使用模板名称作为文档名称
+            document_content=doc_data['content'],
+            document_type=doc_data['document_name'],
+            file_path='',  # 提供空字符串作为默认值
+            generation_method='manual',
+            template_used=doc_data['template_name']
+        )
+        return CaseDocumentSerializer(document).data
+    
+    @action(detail=True, methods=['post'], url_path='generate_all_documents_stream')
+    def generate_all_documents_stream(self, request, pk=None):
+        """并发生成所有文档，以 SSE 逐个推送完成的文档（每完成一个即保存）"""
+        case = self.get_object()
+        case_data = self._case_generation_data(case)
+        
+        from .direct_langchain_ai_service import iter_generate_all_documents_with_langchain
+        events = iter_generate_all_documents_with_langchain(case_data)
+        
+        def next_event():
+            # 在同步线程中推进生成器（内部以线程池并发调用模型）并保存完成的文档
+            event = next(events, None)
+            if event is not None and event['type'] == 'document' and event['success']:
+                event['document'] = self._save_generated_document(case, event)
+            return event
+        
+        # ASGI 下同步生成器会被整体缓冲后才输出，改用异步生成器逐个推送
+        async def event_stream():
+            try:
+                while True:
+                    event = await sync_to_async(next_event)()
+                    if event is None:
+                        break
+                    yield f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+            except Exception as e:
+                logger.error(f"流式生成所有文档异常: {str(e)}")
+                error_data = {'type': 'error', 'error': f"生成所有文档异常: {str(e)}"}
+                yield f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
+            finally:
+                # 客户端断开时关闭生成器，停止提交新的生成任务
+                await sync_to_async(events.close)()
+        
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
     @action(detail=False, methods=['post'])
     def ai_chat(self, request):
         """AI对话并生成文书"""
@@ -1678,8 +1730,11 @@ class CaseDocumentViewSet(CustomModelViewSet):
             # 获取文件的完整物理路径
             file_path = document.full_file_path
             
+            # 释放版本库中的全部版本（内容块按引用计数回收，可能被其他文档共享，不直接删除）
+            DocumentVersionStore().prune(document.id, keep=0)
+            
             # 删除物理文件
-            if file_path and os.path.exists(file_path):
+            if file_path and os.path.exists(file_path) and not DocumentVersionStore.is_blob_path(document.file_path):
                 try:
                     os.remove(file_path)
                     logger.info(f"已删除文件: {file_path}")
@@ -2247,6 +2302,10 @@ class CaseDocumentViewSet(CustomModelViewSet):
                 if has_is_selected:
                     update_fields.append('is_selected')
                 CaseDocument.objects.bulk_update(documents, update_fields)
+                # bulk_update 不触发信号，手动更新文档树版本号
+                from .utils.folder_helper import invalidate_case_document_tree
+                for case_id in {doc.case_id for doc in documents}:
+                    invalidate_case_document_tree(case_id)
                 
                 # 准备返回数据
                 updated_documents = [
@@ -2386,10 +2445,11 @@ class CaseDocumentViewSet(CustomModelViewSet):
                 except Exception as e:
                     logger.warning(f"备份文件失败: {str(e)}")
             
-            # 保存新文件到原位置（如果原文件存在）或新位置
+            # 保存新文件到原位置（如果原文件存在）或新位置；版本库内容块被多个版本共享，不能原地覆盖
             original_file_path = document.full_file_path
             
-            if original_file_path and os.path.exists(original_file_path):
+            if original_file_path and os.path.exists(original_file_path) \
+                    and not DocumentVersionStore.is_blob_path(document.file_path):
                 # 保存到原位置（覆盖原文件）
                 saved_full_path = original_file_path
                 saved_relative_path = document.file_path  # 保持原路径
@@ -3308,10 +3368,6 @@ def convert_docx_to_html(request):
             # 可以添加更多权限检查
             pass
         
-        # 初始化转换器
-        converter = DocumentConverter()
-        file_manager = DocumentFileManager()
-        
         # 获取文件路径
         media_root = getattr(settings, 'MEDIA_ROOT', 'media')
         if document.file_path:
@@ -3328,19 +3384,33 @@ def convert_docx_to_html(request):
         docx_path = full_path
         title = document.document_name or os.path.splitext(document.file_name or 'document')[0]
         
-        # 创建图片输出目录
-        from datetime import datetime
-        now = datetime.now()
-        year_month = now.strftime('%Y/%m')
-        image_output_dir = os.path.join(settings.MEDIA_ROOT, 'images', 'documents', year_month)
-        os.makedirs(image_output_dir, exist_ok=True)
-        
-        # 转换为HTML
-        result = converter.docx_to_html(docx_path, image_output_dir)
+        # 转换为HTML：按内容哈希缓存（图片资源随缓存条目保存），大文件首次转换在后台执行
+        try:
+            result = get_or_schedule_html(docx_path)
+        except ConversionFailed as e:
+            return ErrorResponse(
+                data={
+                    'documentId': document_id,
+                    'status': 'failed',
+                    'title': title,
+                    'error': e.error,
+                },
+                msg=f'文档转换失败: {e.error}'
+            )
+        if result is None:
+            return DetailResponse(
+                data={
+                    'documentId': document_id,
+                    'status': 'pending',
+                    'title': title,
+                },
+                msg='文档较大，正在后台转换，请稍后重试'
+            )
         
         return DetailResponse(
             data={
                 'documentId': document_id,
+                'status': 'ready',
                 'html': result['html'],
                 'title': result.get('title', title),
                 'images': result['images']
@@ -3386,8 +3456,7 @@ def convert_html_to_docx(request):
         # 检查权限
         user = get_request_user(request)
         
-        # 初始化转换器和文件管理器
-        converter = DocumentConverter()
+        # 初始化文件管理器
         file_manager = DocumentFileManager()
         
         # 创建临时文件
@@ -3400,8 +3469,8 @@ def convert_html_to_docx(request):
                 media_root = getattr(settings, 'MEDIA_ROOT', 'media')
                 image_base_dir = os.path.join(media_root, 'images', 'documents')
             
-            # 转换为DOCX
-            converter.html_to_docx(html_content, temp_file_path, image_base_dir)
+            # 转换为DOCX（相同 HTML 直接复用缓存的转换结果）
+            get_conversion_cache().html_to_docx(html_content, temp_file_path, image_base_dir)
             
             # 读取生成的DOCX文件
             with open(temp_file_path, 'rb') as f:
@@ -3412,14 +3481,37 @@ def convert_html_to_docx(request):
             if not filename.endswith('.docx'):
                 filename += '.docx'
             
-            saved_path = file_manager.save_document(docx_content, document_id, filename)
-            
-            # 更新文档记录
-            document.file_path = saved_path
-            document.file_size = len(docx_content)
-            document.file_ext = '.docx'
-            document.mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            document.save()
+            handler = WPSDocumentHandler()
+            if not handler.version_management_enabled:
+                saved_path = file_manager.save_document(docx_content, document_id, filename)
+                
+                # 更新文档记录
+                document.file_path = saved_path
+                document.file_size = len(docx_content)
+                document.file_ext = '.docx'
+                document.mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                document.save()
+            else:
+                # 与 WPS 保存一致：内容写入版本库，文档文件路径指向最新版本的内容块
+                from django.db import transaction
+                
+                store = DocumentVersionStore()
+                with transaction.atomic():
+                    if document.file_path and not store.has_versions(document.id):
+                        # 首次保存：把原始文件作为基线版本入库
+                        handler.create_version_backup(document.id)
+                    blob = store.put_blob(temp_file_path)
+                    saved_path = blob.storage_path
+                    
+                    document.file_path = saved_path
+                    document.file_name = filename
+                    document.file_size = len(docx_content)
+                    document.file_ext = '.docx'
+                    document.mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                    document.version += 1
+                    document.save()
+                    
+                    store.record_version(document.id, document.version, blob, filename, getattr(user, 'id', None))
             
             return DetailResponse(
                 data={
@@ -659,7 +659,7 @@ def wps_save_file(request, file_id):
         
         # 保存文档
         handler = WPSDocumentHandler()
-        result = handler.save_document(file_id, uploaded_file, user_id)
+        result = handler.save_document(file_id, uploaded_file, user_id, sha1=file_sha1 or None)
         
         logger.info(
             f"WPS保存文档成功: file_id={file_id}, user_id={user_id}, "
@@ -1903,6 +1903,7 @@ def wps_upload_commit(request, file_id):
                     logger.warning(f"删除临时文件失败: {latest_temp_file}, error={str(e)}")
         
         if uploaded_file:
+            calculated_sha1 = None
             # 验证摘要
             if digest:
                 import hashlib
@@ -1923,8 +1924,8 @@ def wps_upload_commit(request, file_id):
                         "message": "file sha1 mismatch"
                     }, status=400, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
             
-            # 保存文档
-            result = handler.save_document(file_id, uploaded_file, user_id)
+            # 保存文档（已计算的摘要交给版本库复用）
+            result = handler.save_document(file_id, uploaded_file, user_id, sha1=calculated_sha1)
         else:
             # 如果文件已经保存，只更新元数据
             result = handler.update_document_metadata(file_id, user_id, file_name, file_size)
@@ -5,3 +5,7 @@ class CustomerManagementConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "customer_management"
     verbose_name = "客户管理"
+
+    def ready(self):
+        """应用就绪时导入信号"""
+        import customer_management.signals  # noqa
@@ -0,0 +1,358 @@
+"""
+CRM 性能基准数据集。
+
+说明：
+1) generate_plan 只依赖 (规模, 随机种子)，输出纯数据（时间以相对 anchor 的分钟偏移表示），同一参数必然得到同一份数据。
+2) load_dataset 把计划写入当前数据库（组织/部门/角色/用户/客户/经办人/跟进/拜访/日程），全部走 bulk_create。
+3) 组织口径：Branch/Team 的 id 与对应部门 id 一致，用户与客户的 branch_id/team_id/dept_id 互相对齐，
+   这样按部门、按组织表、按 role_level 的几种范围判定都能命中同一批数据。
+"""
+from __future__ import annotations
+
+import random
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "tiny": {
+        "branches": 1, "teams_per_branch": 2, "sales_per_team": 2, "customers": 40,
+        "followups_per_customer": 2, "visits_per_customer": 1, "schedules_per_user": 2,
+    },
+    "small": {
+        "branches": 2, "teams_per_branch": 3, "sales_per_team": 5, "customers": 1000,
+        "followups_per_customer": 3, "visits_per_customer": 1, "schedules_per_user": 10,
+    },
+    "medium": {
+        "branches": 4, "teams_per_branch": 4, "sales_per_team": 8, "customers": 10000,
+        "followups_per_customer": 4, "visits_per_customer": 2, "schedules_per_user": 20,
+    },
+    "large": {
+        "branches": 8, "teams_per_branch": 5, "sales_per_team": 10, "customers": 50000,
+        "followups_per_customer": 5, "visits_per_customer": 2, "schedules_per_user": 40,
+    },
+}
+
+# 客户创建时间分布在 anchor 之前的天数范围内，覆盖看板“近30天 vs 前30天”与月度报表
+HISTORY_DAYS = 180
+BATCH_SIZE = 1000
+NAME_PREFIX = "bench"
+# CustomModelViewSet 权限与数据权限过滤使用的接口
+CUSTOMER_LIST_API = "/api/customer/customers/"
+
+STATUS_WEIGHTS = (("PUBLIC_POOL", 20), ("FOLLOW_UP", 50), ("CASE", 15), ("PAYMENT", 8), ("WON", 7))
+GRADES = ("A", "B", "C", "D")
+CATEGORIES = ("construction", "material")
+SOURCE_CHANNELS = ("官网", "广告", "转介绍", "展会", "电话营销")
+FOLLOWUP_METHODS = ("PHONE", "WECHAT", "EMAIL", "VISIT", "OTHER")
+LOCATION_STATUSES = ("success", "success", "success", "fail", "offline")
+SCHEDULE_TYPES = ("meeting", "court", "deadline", "reminder", "other")
+SCHEDULE_STATUSES = ("pending", "in_progress", "completed", "cancelled")
+SCHEDULE_PRIORITIES = ("low", "medium", "high", "urgent")
+
+
+def resolve_scale(name: str = "small", **overrides) -> Dict[str, int]:
+    """取预设规模并覆盖单项数量（值为 None 的覆盖项忽略）。"""
+    if name not in SCALES:
+        raise ValueError(f"未知的数据规模: {name}，可选 {', '.join(SCALES)}")
+    scale = dict(SCALES[name])
+    for key, value in overrides.items():
+        if key not in scale:
+            raise ValueError(f"未知的规模参数: {key}")
+        if value is not None:
+            scale[key] = int(value)
+    return scale
+
+
+def _weighted(rng: random.Random, weights) -> str:
+    values, counts = zip(*weights)
+    return rng.choices(values, weights=counts, k=1)[0]
+
+
+def _around(rng: random.Random, mean: int) -> int:
+    """0 ~ 2*mean 的均匀整数，均值为 mean。"""
+    return rng.randint(0, mean * 2) if mean > 0 else 0
+
+
+def generate_plan(scale: Dict[str, int], seed: int = 42) -> Dict[str, Any]:
+    """生成确定性的数据计划（不访问数据库）。"""
+    rng = random.Random(seed)
+    branches, users, customers = [], [], []
+    followups, visits, schedules = [], [], []
+
+    users.append({"key": "hq", "role_level": "HQ", "branch": None, "team": None})
+    for branch_index in range(scale["branches"]):
+        teams = []
+        users.append({"key": f"b{branch_index}", "role_level": "BRANCH", "branch": branch_index, "team": None})
+        for team_index in range(scale["teams_per_branch"]):
+            teams.append(team_index)
+            users.append({
+                "key": f"b{branch_index}t{team_index}", "role_level": "TEAM",
+                "branch": branch_index, "team": team_index,
+            })
+            for sales_index in range(scale["sales_per_team"]):
+                users.append({
+                    "key": f"b{branch_index}t{team_index}s{sales_index}", "role_level": "SALES",
+                    "branch": branch_index, "team": team_index,
+                })
+        branches.append({"index": branch_index, "teams": teams})
+
+    sales = [index for index, user in enumerate(users) if user["role_level"] == "SALES"]
+    teammates: Dict[tuple, list] = {}
+    for index in sales:
+        teammates.setdefault((users[index]["branch"], users[index]["team"]), []).append(index)
+
+    history_minutes = HISTORY_DAYS * 24 * 60
+    for customer_index in range(scale["customers"]):
+        owner = rng.choice(sales)
+        group = teammates[(users[owner]["branch"], users[owner]["team"])]
+        handlers = [owner]
+        if len(group) > 1 and rng.random() < 0.3:
+            handlers.append(rng.choice([index for index in group if index != owner]))
+        created = rng.randint(0, history_minutes)
+        customers.append({
+            "name": f"{NAME_PREFIX}客户{customer_index:06d}",
+            "owner": owner,
+            "handlers": handlers,
+            "status": _weighted(rng, STATUS_WEIGHTS),
+            "client_grade": rng.choice(GRADES),
+            "client_category": rng.choice(CATEGORIES),
+            "source_channel": rng.choice(SOURCE_CHANNELS),
+            "created": created,
+        })
+        # 跟进/拜访发生在客户创建之后
+        for _ in range(_around(rng, scale["followups_per_customer"])):
+            followups.append({
+                "customer": customer_index,
+                "user": rng.choice(handlers),
+                "method": rng.choice(FOLLOWUP_METHODS),
+                "duration": rng.randint(1, 90),
+                "time": rng.randint(0, created),
+            })
+        for _ in range(_around(rng, scale["visits_per_customer"])):
+            visits.append({
+                "customer": customer_index,
+                "user": rng.choice(handlers),
+                "duration": rng.randint(10, 180),
+                "location_status": rng.choice(LOCATION_STATUSES),
+                "time": rng.randint(0, created),
+            })
+
+    for user_index, user in enumerate(users):
+        for _ in range(scale["schedules_per_user"]):
+            # 日程分布在 anchor 前后 30 天
+            start = rng.randint(-30 * 24 * 60, 30 * 24 * 60)
+            schedules.append({
+                "user": user_index,
+                "schedule_type": rng.choice(SCHEDULE_TYPES),
+                "status": rng.choice(SCHEDULE_STATUSES),
+                "priority": rng.choice(SCHEDULE_PRIORITIES),
+                "start": start,
+                "minutes": rng.choice((30, 60, 90, 120)),
+            })
+
+    return {
+        "scale": dict(scale),
+        "seed": seed,
+        "branches": branches,
+        "users": users,
+        "customers": customers,
+        "followups": followups,
+        "visits": visits,
+        "schedules": schedules,
+    }
+
+
+def plan_counts(plan: Dict[str, Any]) -> Dict[str, int]:
+    return {
+        "branches": len(plan["branches"]),
+        "teams": sum(len(branch["teams"]) for branch in plan["branches"]),
+        "users": len(plan["users"]),
+        "customers": len(plan["customers"]),
+        "handlers": sum(len(customer["handlers"]) for customer in plan["customers"]),
+        "followups": len(plan["followups"]),
+        "visits": len(plan["visits"]),
+        "schedules": len(plan["schedules"]),
+    }
+
+
+def default_anchor():
+    """默认以当天零点为基准，同一天内多次构建得到完全相同的时间。"""
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _minutes_before(anchor, minutes: int):
+    return anchor - timedelta(minutes=minutes)
+
+
+@transaction.atomic
+def load_dataset(plan: Dict[str, Any], anchor=None) -> Dict[str, Any]:
+    """
+    把数据计划写入当前数据库。
+
+    Returns:
+        {"anchor": ..., "counts": {...}, "personas": {"HQ": [user_id], "BRANCH": [...], "TEAM": [...], "SALES": [...]}}
+    """
+    from customer_management.models import (
+        Branch, Customer, CustomerHandler, FollowupRecord, Headquarters, Schedule, Team, VisitRecord,
+    )
+    from dvadmin.system.models import Dept, Menu, MenuButton, Role, RoleMenuButtonPermission, Users
+
+    anchor = anchor or default_anchor()
+    seed = plan["seed"]
+    prefix = f"{NAME_PREFIX}{seed}"
+
+    # 组织：总部部门 -> 分所部门 -> 团队部门；Branch/Team 与部门同 id
+    root = Dept.objects.create(name=f"{prefix}总所", key=f"{prefix}-hq")
+    headquarters = Headquarters.objects.create(name=f"{prefix}总所", code=f"{prefix}-hq")
+    branch_depts, team_depts = {}, {}
+    for branch in plan["branches"]:
+        branch_index = branch["index"]
+        dept = Dept.objects.create(name=f"分所{branch_index}", key=f"{prefix}-b{branch_index}", parent=root)
+        Branch.objects.create(
+            id=dept.id, headquarters=headquarters, name=dept.name, code=dept.key, sort=branch_index,
+        )
+        branch_depts[branch_index] = dept
+        for team_index in branch["teams"]:
+            team_dept = Dept.objects.create(
+                name=f"分所{branch_index}团队{team_index}", key=f"{prefix}-b{branch_index}t{team_index}", parent=dept,
+            )
+            Team.objects.create(
+                id=team_dept.id, branch_id=dept.id, name=team_dept.name, code=team_dept.key, sort=team_index,
+            )
+            team_depts[(branch_index, team_index)] = team_dept
+
+    # 角色：客户列表接口的“本部门及以下”数据权限，覆盖 CustomPermission 与 DataLevelPermissionsFilter
+    role = Role.objects.create(name=f"{prefix}销售", key=f"{prefix}-sales")
+    menu = Menu.objects.create(name=f"{prefix}客户管理")
+    button = MenuButton.objects.create(
+        menu=menu, name="客户列表", value=f"{prefix}:customer:list", api=CUSTOMER_LIST_API, method=0,
+    )
+    RoleMenuButtonPermission.objects.create(role=role, menu_button=button, data_range=1)
+
+    user_rows = []
+    for user in plan["users"]:
+        dept = root
+        if user["team"] is not None:
+            dept = team_depts[(user["branch"], user["team"])]
+        elif user["branch"] is not None:
+            dept = branch_depts[user["branch"]]
+        user_rows.append(Users(
+            username=f"{prefix}_{user['key']}",
+            name=f"{prefix}_{user['key']}",
+            password="!",
+            role_level=user["role_level"],
+            dept_id=dept.id,
+            headquarters_id=headquarters.id,
+            branch_id=branch_depts[user["branch"]].id if user["branch"] is not None else None,
+            team_id=dept.id if user["team"] is not None else None,
+        ))
+    Users.objects.bulk_create(user_rows, batch_size=BATCH_SIZE)
+    # bulk_create 在 MySQL 下不回填主键，按用户名取回
+    user_ids = dict(Users.objects.filter(username__startswith=f"{prefix}_").values_list("username", "id"))
+    users = [user_ids[row.username] for row in user_rows]
+    user_depts = {index: row.dept_id for index, row in enumerate(user_rows)}
+    Users.role.through.objects.bulk_create(
+        [Users.role.through(users_id=user_id, role_id=role.id) for user_id in users], batch_size=BATCH_SIZE,
+    )
+
+    customer_rows = []
+    for customer in plan["customers"]:
+        owner = plan["users"][customer["owner"]]
+        row = Customer(
+            name=customer["name"],
+            owner_user_id=users[customer["owner"]],
+            owner_user_name=user_rows[customer["owner"]].name,
+            team_id=team_depts[(owner["branch"], owner["team"])].id,
+            branch_id=branch_depts[owner["branch"]].id,
+            hq_id=headquarters.id,
+            status=customer["status"],
+            client_grade=customer["client_grade"],
+            client_category=customer["client_category"],
+            source_channel=customer["source_channel"],
+            creator_id=users[customer["owner"]],
+            dept_belong_id=str(user_depts[customer["owner"]]),
+        )
+        row.sales_stage = row.calculate_sales_stage()
+        customer_rows.append(row)
+    Customer.objects.bulk_create(customer_rows, batch_size=BATCH_SIZE)
+    customer_ids = dict(
+        Customer.objects.filter(name__startswith=f"{NAME_PREFIX}客户", hq_id=headquarters.id).values_list("name", "id")
+    )
+    customers = [customer_ids[customer["name"]] for customer in plan["customers"]]
+
+    # create_datetime 为 auto_now_add，落库后再按计划回写
+    created = [
+        Customer(id=customer_id, create_datetime=_minutes_before(anchor, customer["created"]))
+        for customer_id, customer in zip(customers, plan["customers"])
+    ]
+    Customer.objects.bulk_update(created, ["create_datetime"], batch_size=BATCH_SIZE)
+
+    CustomerHandler.objects.bulk_create([
+        CustomerHandler(customer_id=customer_id, user_id=users[user_index], is_primary=sort == 0, sort=sort)
+        for customer_id, customer in zip(customers, plan["customers"])
+        for sort, user_index in enumerate(customer["handlers"])
+    ], batch_size=BATCH_SIZE)
+
+    FollowupRecord.objects.bulk_create([
+        FollowupRecord(
+            client_id=customers[row["customer"]],
+            user_id=users[row["user"]],
+            method=row["method"],
+            summary="基准跟进",
+            duration=row["duration"],
+            followup_time=_minutes_before(anchor, row["time"]),
+            creator_id=users[row["user"]],
+            dept_belong_id=str(user_depts[row["user"]]),
+        )
+        for row in plan["followups"]
+    ], batch_size=BATCH_SIZE)
+
+    VisitRecord.objects.bulk_create([
+        VisitRecord(
+            client_id=customers[row["customer"]],
+            user_id=users[row["user"]],
+            visit_time=_minutes_before(anchor, row["time"]),
+            duration=row["duration"],
+            content="基准拜访",
+            location_status=row["location_status"],
+            creator_id=users[row["user"]],
+            dept_belong_id=str(user_depts[row["user"]]),
+        )
+        for row in plan["visits"]
+    ], batch_size=BATCH_SIZE)
+
+    schedule_rows = []
+    for row in plan["schedules"]:
+        start_time = _minutes_before(anchor, -row["start"])
+        schedule_rows.append(Schedule(
+            title=f"{row['schedule_type']}日程",
+            schedule_type=row["schedule_type"],
+            status=row["status"],
+            priority=row["priority"],
+            start_time=start_time,
+            end_time=start_time + timedelta(minutes=row["minutes"]),
+            creator_id=users[row["user"]],
+            dept_belong_id=str(user_depts[row["user"]]),
+        ))
+    Schedule.objects.bulk_create(schedule_rows, batch_size=BATCH_SIZE)
+
+    personas: Dict[str, list] = {}
+    for index, user in enumerate(plan["users"]):
+        personas.setdefault(user["role_level"], []).append(users[index])
+    return {
+        "anchor": anchor,
+        "counts": plan_counts(plan),
+        "personas": personas,
+    }
+
+
+def build_dataset(scale_name: str = "small", seed: int = 42, anchor=None,
+                  overrides: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """generate_plan + load_dataset 的便捷入口。"""
+    scale = resolve_scale(scale_name, **(overrides or {}))
+    dataset = load_dataset(generate_plan(scale, seed), anchor)
+    dataset.update({"scale_name": scale_name, "scale": scale, "seed": seed})
+    return dataset
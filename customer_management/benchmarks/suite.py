@@ -0,0 +1,269 @@
+"""
+CRM 性能基准用例与结果对比。
+
+说明：
+1) 用例分三组：service（ReportService / scope_service 直接调用）、filter（DataLevelPermissionsFilter）、
+   endpoint（经 Django 测试客户端走完整中间件与视图）。
+2) 每次迭代前清空缓存，测得的是冷路径；耗时与查询数由 RequestQueryStats 记录，结果可直接 json.dumps。
+3) compare_reports 按用例对比两次结果的中位耗时与查询数，用于判断改动是否带来回退。
+"""
+from __future__ import annotations
+
+import json
+import math
+import platform
+import statistics
+from collections import namedtuple
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from dvadmin.utils.query_metrics import RequestQueryStats
+
+REPORT_VERSION = 1
+
+BenchmarkCase = namedtuple("BenchmarkCase", ["name", "group", "func"])
+
+
+def _persona(dataset: Dict[str, Any], role_level: str):
+    from dvadmin.system.models import Users
+
+    return Users.objects.get(id=dataset["personas"][role_level][0])
+
+
+def _client_for(user):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def _endpoint(client, method: str, path: str, data=None) -> Callable[[], Any]:
+    def call():
+        if method == "post":
+            return client.post(path, data or {}, format="json")
+        return client.get(path, data or {})
+    return call
+
+
+def build_cases(dataset: Dict[str, Any]) -> List[BenchmarkCase]:
+    """按数据集中的角色样本构建用例。"""
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from customer_management.benchmarks.dataset import CUSTOMER_LIST_API
+    from customer_management.models import Customer
+    from customer_management.services.report_service import ReportService
+    from customer_management.services.scope_service import filter_customer_queryset_for_user
+    from dvadmin.utils.filters import DataLevelPermissionsFilter
+
+    users = {role: _persona(dataset, role) for role in ("HQ", "BRANCH", "TEAM", "SALES")}
+    end_date = dataset["anchor"]
+    start_date = end_date - timedelta(days=30)
+    branch_filter = {"scope": "BRANCH", "dimension": "NONE"}
+    cases: List[BenchmarkCase] = []
+
+    # ReportService：四种数据范围下的转化率，以及分所范围的看板指标
+    scoped_users = {"SELF": users["SALES"], "TEAM": users["TEAM"], "BRANCH": users["BRANCH"], "HQ": users["HQ"]}
+    for scope, user in scoped_users.items():
+        cases.append(BenchmarkCase(
+            f"report.conversion_rate[{scope}]", "service",
+            lambda scope=scope, user=user: ReportService.calculate_conversion_rate({"scope": scope, "dimension": "NONE"}, user),
+        ))
+    for name in ("new_customers", "lead_frequency", "visit_frequency", "conversion_funnel"):
+        method = getattr(ReportService, f"calculate_{name}")
+        cases.append(BenchmarkCase(
+            f"report.{name}[BRANCH]", "service",
+            lambda method=method: method(branch_filter, users["BRANCH"], start_date, end_date),
+        ))
+    cases.append(BenchmarkCase(
+        "report.breakdown.personnel[BRANCH]", "service",
+        lambda: ReportService.get_dimension_breakdown(
+            "new_customers", "PERSONNEL", branch_filter, users["BRANCH"], start_date, end_date,
+        ),
+    ))
+
+    # scope_service：按角色过滤客户并取第一页
+    for role in ("SALES", "TEAM", "BRANCH"):
+        def scoped(user=users[role]):
+            queryset = filter_customer_queryset_for_user(Customer.objects.filter(is_deleted=False), user)
+            return queryset.count(), list(queryset.order_by("-id")[:20])
+        cases.append(BenchmarkCase(f"scope.customers[{role}]", "service", scoped))
+
+    # DataLevelPermissionsFilter：销售角色（本部门及以下）
+    def data_level_filter(user=users["SALES"]):
+        request = Request(APIRequestFactory().get(CUSTOMER_LIST_API), parser_context={"kwargs": {}})
+        request.user = user
+        queryset = DataLevelPermissionsFilter().filter_queryset(request, Customer.objects.filter(is_deleted=False), None)
+        return queryset.count()
+    cases.append(BenchmarkCase("filter.data_level[SALES]", "filter", data_level_filter))
+
+    # 接口：经完整中间件与 DRF 视图
+    for role in ("SALES", "TEAM", "BRANCH"):
+        cases.append(BenchmarkCase(
+            f"endpoint.crm_client_list[{role}]", "endpoint",
+            _endpoint(_client_for(users[role]), "get", "/api/crm/client/list", {"page": 1, "pageSize": 20}),
+        ))
+    cases.append(BenchmarkCase(
+        "endpoint.customers[SALES]", "endpoint",
+        _endpoint(_client_for(users["SALES"]), "get", CUSTOMER_LIST_API, {"page": 1, "limit": 20}),
+    ))
+    cases.append(BenchmarkCase(
+        "endpoint.reports_dashboard[BRANCH]", "endpoint",
+        _endpoint(_client_for(users["BRANCH"]), "post", "/api/customer/reports/dashboard/", {"dimensionFilter": branch_filter}),
+    ))
+    cases.append(BenchmarkCase(
+        "endpoint.organization_tree[HQ]", "endpoint",
+        _endpoint(_client_for(users["HQ"]), "get", "/api/customer/organization/tree/"),
+    ))
+    return cases
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """最近秩百分位数。"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_case(case: BenchmarkCase, repeat: int = 5, warmup: int = 1) -> Dict[str, Any]:
+    """执行单个用例：warmup 次预热（不计入），repeat 次计时。"""
+    timings, db_timings, queries, duplicates = [], [], [], []
+    status_code = None
+    error = None
+    for iteration in range(warmup + repeat):
+        cache.clear()
+        try:
+            with RequestQueryStats() as stats:
+                result = case.func()
+        except Exception as exc:  # 记录失败而不中断整套基准
+            error = f"{type(exc).__name__}: {exc}"
+            break
+        status_code = getattr(result, "status_code", status_code)
+        if iteration < warmup:
+            continue
+        timings.append(stats.elapsed * 1000)
+        db_timings.append(stats.db_seconds * 1000)
+        queries.append(stats.queries)
+        duplicates.append(stats.duplicates)
+
+    row: Dict[str, Any] = {"group": case.group, "runs": len(timings)}
+    if status_code is not None:
+        row["status_code"] = status_code
+        if status_code >= 400:
+            error = error or f"HTTP {status_code}"
+    if error:
+        row["error"] = error
+    if timings:
+        row.update({
+            "median_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(_percentile(timings, 95), 3),
+            "min_ms": round(min(timings), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "db_median_ms": round(statistics.median(db_timings), 3),
+            "queries": max(queries),
+            "duplicates": max(duplicates),
+        })
+    return row
+
+
+def run_suite(dataset: Dict[str, Any], repeat: int = 5, warmup: int = 1,
+              only: Optional[Iterable[str]] = None,
+              progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """执行全部（或名称包含 only 中任一片段的）用例。"""
+    patterns = [pattern for pattern in (only or []) if pattern]
+    results: Dict[str, Dict[str, Any]] = {}
+    for case in build_cases(dataset):
+        if patterns and not any(pattern in case.name for pattern in patterns):
+            continue
+        results[case.name] = run_case(case, repeat=repeat, warmup=warmup)
+        if progress:
+            progress(case.name, results[case.name])
+    return results
+
+
+def build_report(dataset: Dict[str, Any], results: Dict[str, Dict[str, Any]], repeat: int, warmup: int,
+                 revision: str = "") -> Dict[str, Any]:
+    return {
+        "version": REPORT_VERSION,
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "revision": revision,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "platform": platform.platform(),
+            "database": connection.vendor,
+            "scale_name": dataset.get("scale_name"),
+            "scale": dataset.get("scale"),
+            "seed": dataset.get("seed"),
+            "anchor": dataset["anchor"].isoformat(),
+            "counts": dataset["counts"],
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+def dump_report(report: Dict[str, Any], path: str):
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 10.0,
+                    min_delta_ms: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    对比两次结果。
+
+    中位耗时增幅超过 threshold% 且绝对增量超过 min_delta_ms，或查询数增加，记为回退。
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, row in current.get("results", {}).items():
+        base = base_results.get(name)
+        if not base or "median_ms" not in base or "median_ms" not in row:
+            rows.append({"name": name, "status": "new" if not base else "error"})
+            continue
+        delta_ms = row["median_ms"] - base["median_ms"]
+        delta_pct = (delta_ms / base["median_ms"] * 100) if base["median_ms"] else 0.0
+        query_delta = row["queries"] - base["queries"]
+        if query_delta > 0 or (delta_pct > threshold and delta_ms > min_delta_ms):
+            status = "regression"
+        elif query_delta < 0 or (delta_pct < -threshold and -delta_ms > min_delta_ms):
+            status = "improvement"
+        else:
+            status = "same"
+        rows.append({
+            "name": name,
+            "status": status,
+            "base_ms": base["median_ms"],
+            "current_ms": row["median_ms"],
+            "delta_pct": round(delta_pct, 1),
+            "base_queries": base["queries"],
+            "current_queries": row["queries"],
+        })
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'case':<44} {'base ms':>10} {'now ms':>10} {'delta':>8} {'queries':>12}  status"]
+    for row in rows:
+        if "base_ms" not in row:
+            lines.append(f"{row['name']:<44} {'-':>10} {'-':>10} {'-':>8} {'-':>12}  {row['status']}")
+            continue
+        queries = f"{row['base_queries']}->{row['current_queries']}"
+        lines.append(
+            f"{row['name']:<44} {row['base_ms']:>10.2f} {row['current_ms']:>10.2f} "
+            f"{row['delta_pct']:>+7.1f}% {queries:>12}  {row['status']}"
+        )
+    return "\n".join(lines)
@@ -4,7 +4,9 @@ from datetime import timedelta
 from urllib.parse import urlparse
 
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 
 from customer_management.models import (
@@ -14,8 +16,9 @@ from customer_management.models import (
     RecoveryPayment,
     Schedule,
 )
-from dvadmin.system.models import FileList
+from dvadmin.system.models import FileBlob, FileList
 from dvadmin.utils.aliyunoss import ali_oss_delete, aliyun_oss_extract_key
+from dvadmin.utils.file_dedup import get_dedup_stats
 from dvadmin.utils.tencentcos import tencent_cos_delete, tencent_cos_extract_key
 
 
@@ -162,21 +165,21 @@ class Command(BaseCommand):
                 ref_keys.update(keys)
         return ref_ids, ref_urls, ref_keys
 
-    def _delete_file_object(self, file_obj):
-        engine = (getattr(file_obj, "engine", "") or "local").lower()
-        file_url = (getattr(file_obj, "file_url", "") or "").replace("\\", "/")
+    def _delete_stored_file(self, engine, file_url, storage_name):
+        engine = (engine or "local").lower()
+        file_url = (file_url or "").replace("\\", "/")
         local_deleted = False
         remote_deleted = False
 
         if engine == "cos":
-            remote_deleted = tencent_cos_delete(file_url) or tencent_cos_delete(getattr(file_obj, "url", ""))
+            remote_deleted = tencent_cos_delete(file_url) or tencent_cos_delete(storage_name)
         elif engine == "oss":
-            remote_deleted = ali_oss_delete(file_url) or ali_oss_delete(getattr(file_obj, "url", ""))
+            remote_deleted = ali_oss_delete(file_url) or ali_oss_delete(storage_name)
         else:
             # local: 优先走 storage.delete，回退直接删磁盘
             try:
-                if file_obj.url and file_obj.url.name:
-                    file_obj.url.storage.delete(file_obj.url.name)
+                if storage_name:
+                    default_storage.delete(storage_name)
                     local_deleted = True
             except Exception:
                 pass
@@ -191,6 +194,38 @@ class Command(BaseCommand):
 
         return local_deleted or remote_deleted or engine in {"cos", "oss"}
 
+    def _delete_file_object(self, file_obj):
+        storage_name = file_obj.url.name if file_obj.url else ""
+        return self._delete_stored_file(
+            getattr(file_obj, "engine", ""), getattr(file_obj, "file_url", ""), storage_name or str(file_obj.url or "")
+        )
+
+    def _collect_blobs(self, cutoff, limit, dry_run):
+        """回收引用计数归零的共享物理文件"""
+        collected = 0
+        blob_ids = list(
+            FileBlob.objects.filter(ref_count__lte=0, update_datetime__lt=cutoff)
+            .order_by("update_datetime").values_list("id", flat=True)[:limit]
+        )
+        for blob_id in blob_ids:
+            with transaction.atomic():
+                # 加锁复核：期间若有新上传命中该文件，引用计数已大于 0
+                blob = FileBlob.objects.select_for_update().filter(pk=blob_id, ref_count__lte=0).first()
+                if blob is None:
+                    continue
+                if dry_run:
+                    self.stdout.write(
+                        f"[dry-run] delete blob id={blob.id}, engine={blob.engine}, file_url={blob.file_url}"
+                    )
+                    collected += 1
+                    continue
+                blob.delete()
+                transaction.on_commit(
+                    lambda b=blob: self._delete_stored_file(b.engine, b.file_url, b.storage_name)
+                )
+                collected += 1
+        return collected
+
     def handle(self, *args, **options):
         dry_run = options["dry_run"]
         hours = max(int(options["hours"]), 1)
@@ -231,12 +266,26 @@ class Command(BaseCommand):
                 deleted += 1
                 continue
 
-            self._delete_file_object(file_obj)
-            file_obj.delete()
+            if file_obj.blob_id:
+                # 共享物理文件：只删除记录并释放引用，物理文件在引用归零后统一回收
+                file_obj.delete()
+            else:
+                self._delete_file_object(file_obj)
+                file_obj.delete()
             deleted += 1
 
+        blobs_deleted = self._collect_blobs(cutoff, limit, dry_run)
+
         self.stdout.write(
             self.style.SUCCESS(
-                f"[cleanup] done: scanned={scanned}, deleted={deleted}, skipped={skipped}, dry_run={dry_run}"
+                f"[cleanup] done: scanned={scanned}, deleted={deleted}, skipped={skipped}, "
+                f"blobs_deleted={blobs_deleted}, dry_run={dry_run}"
+            )
+        )
+        stats = get_dedup_stats()
+        self.stdout.write(
+            self.style.NOTICE(
+                f"[cleanup] dedup stats: blobs={stats['blobs']}, references={stats['references']}, "
+                f"dedup_ratio={stats['dedup_ratio']}, saved_bytes={stats['saved_bytes']}"
             )
         )
@@ -0,0 +1,34 @@
+"""
+日程提醒投递 worker
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from customer_management.services.schedule_reminder_dispatcher import (
+    dispatch_due_reminders,
+    enqueue_due_reminders,
+)
+
+
+class Command(BaseCommand):
+    help = '生成到期的日程提醒并分批投递；可启动多个进程并行处理（行锁 SKIP LOCKED 互不阻塞）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='每批认领的提醒数量')
+        parser.add_argument('--loop', action='store_true', help='常驻运行，按间隔持续轮询')
+        parser.add_argument('--interval', type=int, default=30, help='常驻运行时的轮询间隔（秒）')
+        parser.add_argument('--no-enqueue', action='store_true', help='只投递，不生成新的提醒记录')
+
+    def handle(self, *args, **options):
+        while True:
+            created = 0 if options['no_enqueue'] else enqueue_due_reminders()
+            totals = dispatch_due_reminders(batch_size=options['batch_size'])
+            if created or totals['claimed'] or not options['loop']:
+                self.stdout.write(
+                    f"生成 {created} 条，认领 {totals['claimed']} 条：成功 {totals['sent']}，"
+                    f"待重试 {totals['retry']}，失败 {totals['failed']}"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
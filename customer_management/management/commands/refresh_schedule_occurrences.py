@@ -0,0 +1,22 @@
+"""
+刷新日程发生实例（滚动展开窗口）
+"""
+from django.core.management.base import BaseCommand
+
+from customer_management.models import Schedule
+from customer_management.services.schedule_recurrence_service import refresh_occurrences
+
+
+class Command(BaseCommand):
+    help = '按重复规则刷新日程发生实例表；celery beat 每天执行一次（CELERY_BEAT_SCHEDULE），也可手动补齐历史日程'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='刷新所有未删除日程（默认只处理重复日程和缺少实例的日程）')
+
+    def handle(self, *args, **options):
+        queryset = Schedule.objects.filter(is_deleted=False) if options['all'] else None
+        totals = refresh_occurrences(queryset)
+        self.stdout.write(self.style.SUCCESS(
+            f"日程实例刷新完成：日程 {totals['schedules']} 个，新增 {totals['created']} 条，"
+            f"更新 {totals['updated']} 条，删除 {totals['deleted']} 条"
+        ))
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customer_management", "0019_rename_reminder_indexes_state"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="approvaltask",
+            index=models.Index(fields=["status", "create_datetime", "id"], name="approval_status_created_idx"),
+        ),
+    ]
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customer_management", "0020_approvaltask_status_created_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduleOccurrence",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False, verbose_name="ID")),
+                ("sequence", models.IntegerField(default=0, help_text="在重复序列中的序号（从0开始）", verbose_name="实例序号")),
+                ("start_time", models.DateTimeField(help_text="本次实例的开始时间", verbose_name="开始时间")),
+                ("end_time", models.DateTimeField(help_text="本次实例的结束时间（无结束时间的日程与开始时间相同）", verbose_name="结束时间")),
+                (
+                    "schedule",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        help_text="关联的日程",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occurrences",
+                        to="customer_management.schedule",
+                        verbose_name="关联的日程",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "日程发生实例",
+                "verbose_name_plural": "日程发生实例",
+                "db_table": "schedule_occurrence",
+                "ordering": ["start_time", "id"],
+                "unique_together": {("schedule", "start_time")},
+                "indexes": [models.Index(fields=["start_time", "end_time"], name="schedule_occ_range_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_sent_reminders(apps, schema_editor):
+    """
+    已发送的历史提醒标记为 sent；提醒时间已过仍未发送的历史提醒标记为 failed，
+    避免调度器首次运行时重复投递或集中补发过期提醒
+    """
+    ScheduleReminder = apps.get_model("customer_management", "ScheduleReminder")
+    ScheduleReminder.objects.filter(is_sent=True).update(status="sent")
+    ScheduleReminder.objects.filter(is_sent=False, remind_time__lte=timezone.now()).update(
+        status="failed", error_message="提醒时间已过，启用投递调度前未发送"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customer_management", "0021_scheduleoccurrence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedulereminder",
+            name="status",
+            field=models.CharField(
+                choices=[("pending", "待发送"), ("sending", "发送中"), ("sent", "已发送"), ("failed", "发送失败")],
+                default="pending",
+                help_text="投递状态：pending(待发送)、sending(发送中)、sent(已发送)、failed(发送失败)",
+                max_length=20,
+                verbose_name="投递状态",
+            ),
+        ),
+        migrations.AddField(
+            model_name="schedulereminder",
+            name="attempts",
+            field=models.IntegerField(default=0, help_text="已尝试发送的次数", verbose_name="已尝试次数"),
+        ),
+        migrations.AddField(
+            model_name="schedulereminder",
+            name="next_attempt_time",
+            field=models.DateTimeField(
+                blank=True, help_text="待发送时为下次重试时间；发送中为认领租约到期时间", null=True, verbose_name="下次尝试时间"
+            ),
+        ),
+        migrations.AddField(
+            model_name="schedulereminder",
+            name="error_message",
+            field=models.TextField(blank=True, help_text="最近一次发送失败的错误信息", null=True, verbose_name="错误信息"),
+        ),
+        migrations.AddIndex(
+            model_name="schedulereminder",
+            index=models.Index(fields=["status", "next_attempt_time"], name="schedule_rem_dispatch_idx"),
+        ),
+        migrations.RunPython(mark_sent_reminders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def remind_backfill(apps, schema_editor):
+    """
+    已有日程的发生实例不在迁移中展开：展开逻辑随 schedule_recurrence_service 演进，
+    迁移引用它会让历史迁移的结果随代码变化。日历只读取实例表，存在缺少实例的日程时提示执行
+    python manage.py refresh_schedule_occurrences（celery beat 每天也会执行一次）补齐。
+    """
+    Schedule = apps.get_model("customer_management", "Schedule")
+    missing = Schedule.objects.filter(is_deleted=False, occurrences__isnull=True).count()
+    if missing:
+        print(
+            f"\n  {missing} 个日程尚未生成发生实例，请执行 python manage.py refresh_schedule_occurrences 补齐"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customer_management", "0022_schedulereminder_delivery_state"),
+    ]
+
+    operations = [
+        migrations.RunPython(remind_backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customer_management", "0023_backfill_schedule_occurrences"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatsCacheVersion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(help_text="缓存名称", max_length=100, unique=True, verbose_name="缓存名称")),
+                ("version", models.BigIntegerField(default=1, help_text="版本号", verbose_name="版本号")),
+            ],
+            options={
+                "verbose_name": "统计缓存版本",
+                "verbose_name_plural": "统计缓存版本",
+                "db_table": "crm_stats_cache_version",
+            },
+        ),
+    ]
@@ -5,13 +5,14 @@ from .followup_record import FollowupRecord
 from .visit_record import VisitRecord
 from .contract import Contract, RecoveryPayment, LegalFee
 from .transfer import TransferLog
-from .schedule import Schedule, ScheduleReminder
+from .schedule import Schedule, ScheduleReminder, ScheduleOccurrence
 from .organization import Headquarters, Branch, Team
 from .report import Report
 from .feedback import Feedback
 from .plan import CustomerPlan
 from .collection_progress import CollectionProgress
 from .reminder import ReminderMessage
+from .stats_cache import StatsCacheVersion
 
 __all__ = [
     "Customer",
@@ -26,6 +27,7 @@ __all__ = [
     "TransferLog",
     "Schedule",
     "ScheduleReminder",
+    "ScheduleOccurrence",
     "Headquarters",
     "Branch",
     "Team",
@@ -34,4 +36,5 @@ __all__ = [
     "CustomerPlan",
     "CollectionProgress",
     "ReminderMessage",
+    "StatsCacheVersion",
 ]
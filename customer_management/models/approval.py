@@ -47,6 +47,9 @@ class ApprovalTask(CoreModel):
         db_table = "customer_approval_task"
         verbose_name = "审批任务"
         verbose_name_plural = "审批任务"
+        indexes = [
+            models.Index(fields=["status", "create_datetime", "id"], name="approval_status_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.approval_type} - {self.related_customer}"
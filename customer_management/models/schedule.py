@@ -208,6 +208,18 @@ class ScheduleReminder(CoreModel):
         ('wechat', '微信'),
     ]
     
+    # 投递状态选项
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '待发送'),
+        (STATUS_SENDING, '发送中'),
+        (STATUS_SENT, '已发送'),
+        (STATUS_FAILED, '发送失败'),
+    ]
+    
     schedule = models.ForeignKey(
         Schedule,
         on_delete=models.CASCADE,
@@ -245,6 +257,32 @@ class ScheduleReminder(CoreModel):
         blank=True
     )
     
+    # 投递状态（由 schedule_reminder_dispatcher 维护）
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="投递状态",
+        help_text="投递状态：pending(待发送)、sending(发送中)、sent(已发送)、failed(发送失败)"
+    )
+    attempts = models.IntegerField(
+        default=0,
+        verbose_name="已尝试次数",
+        help_text="已尝试发送的次数"
+    )
+    next_attempt_time = models.DateTimeField(
+        verbose_name="下次尝试时间",
+        help_text="待发送时为下次重试时间；发送中为认领租约到期时间",
+        null=True,
+        blank=True
+    )
+    error_message = models.TextField(
+        verbose_name="错误信息",
+        help_text="最近一次发送失败的错误信息",
+        null=True,
+        blank=True
+    )
+    
     class Meta:
         db_table = "schedule_reminder"
         verbose_name = "日程提醒记录"
@@ -253,7 +291,56 @@ class ScheduleReminder(CoreModel):
         indexes = [
             models.Index(fields=['schedule', 'is_sent']),
             models.Index(fields=['remind_time', 'is_sent']),
+            models.Index(fields=['status', 'next_attempt_time'], name='schedule_rem_dispatch_idx'),
         ]
     
     def __str__(self):
         return f"{self.schedule.title} - {self.remind_time.strftime('%Y-%m-%d %H:%M')} - {self.get_remind_method_display()}"
+
+
+class ScheduleOccurrence(models.Model):
+    """
+    日程发生实例（物化表）
+
+    由 schedule_recurrence_service 根据日程的重复规则在滚动窗口内展开生成；
+    非重复日程也保存一条实例，日历等按时间范围的查询统一走本表的索引扫描。
+    """
+    id = models.BigAutoField(primary_key=True, verbose_name="ID")
+    schedule = models.ForeignKey(
+        Schedule,
+        on_delete=models.CASCADE,
+        related_name='occurrences',
+        db_constraint=False,
+        verbose_name="关联的日程",
+        help_text="关联的日程"
+    )
+    sequence = models.IntegerField(
+        default=0,
+        verbose_name="实例序号",
+        help_text="在重复序列中的序号（从0开始）"
+    )
+    start_time = models.DateTimeField(
+        verbose_name="开始时间",
+        help_text="本次实例的开始时间"
+    )
+    end_time = models.DateTimeField(
+        verbose_name="结束时间",
+        help_text="本次实例的结束时间（无结束时间的日程与开始时间相同）"
+    )
+
+    class Meta:
+        db_table = "schedule_occurrence"
+        verbose_name = "日程发生实例"
+        verbose_name_plural = "日程发生实例"
+        ordering = ['start_time', 'id']
+        unique_together = ('schedule', 'start_time')
+        indexes = [
+            models.Index(fields=['start_time', 'end_time'], name='schedule_occ_range_idx'),
+        ]
+
+    def delete(self, using=None, soft_delete=False, *args, **kwargs):
+        # 日程软删除时会级联调用 delete(soft_delete=True)；实例表没有软删除字段，直接物理删除
+        return super().delete(using=using, *args, **kwargs)
+
+    def __str__(self):
+        return f"{self.schedule_id} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
@@ -0,0 +1,30 @@
+from django.db import models
+from django.db.models import F
+
+
+class StatsCacheVersion(models.Model):
+    """
+    统计缓存版本号
+
+    统计结果缓存在各进程的本地缓存中，版本号存放在数据库里供所有 worker 共享：
+    数据变更时递增版本号，其他进程下次读取即使用新的缓存键。
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="缓存名称", help_text="缓存名称")
+    version = models.BigIntegerField(default=1, verbose_name="版本号", help_text="版本号")
+
+    class Meta:
+        db_table = "crm_stats_cache_version"
+        verbose_name = "统计缓存版本"
+        verbose_name_plural = verbose_name
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 1
+
+    @classmethod
+    def bump(cls, name: str):
+        if not cls.objects.filter(name=name).update(version=F('version') + 1):
+            cls.objects.get_or_create(name=name, defaults={'version': 2})
+
+    def __str__(self):
+        return f"{self.name}:{self.version}"
@@ -0,0 +1,190 @@
+"""
+审批收件箱查询层
+
+- 审批历史、审批人、申请人、关联客户以固定次数的查询批量加载，与列表长度无关
+- 按 (create_datetime, id) 倒序的游标分页，翻页结果稳定且不随偏移量变慢
+"""
+from __future__ import annotations
+
+import base64
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+from customer_management.models import ApprovalTask, ApprovalHistory, Customer
+
+PENDING_STATUSES = ["pending"]
+HANDLED_STATUSES = ["approved", "rejected"]
+
+
+def build_inbox_queryset(user, status: str = "pending") -> QuerySet:
+    """
+    构建审批收件箱查询集
+
+    HQ 可查看全部审批任务，其他角色只能查看自己提交的任务。
+    """
+    role_level = getattr(user, "role_level", None) or getattr(user, "org_scope", None)
+    statuses = PENDING_STATUSES if status == "pending" else HANDLED_STATUSES
+    queryset = ApprovalTask.objects.filter(status__in=statuses)
+    if role_level != "HQ":
+        queryset = queryset.filter(applicant=user)
+    return queryset.select_related("applicant").order_by("-create_datetime", "-id")
+
+
+def encode_cursor(task: ApprovalTask) -> str:
+    raw = f"{task.create_datetime.isoformat() if task.create_datetime else ''}|{task.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[Optional[datetime], int]]:
+    """解析游标，格式不正确时返回 None"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_raw, task_id = raw.rsplit("|", 1)
+        created = datetime.fromisoformat(created_raw) if created_raw else None
+        return created, int(task_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def apply_cursor(queryset: QuerySet, cursor: Optional[str]) -> QuerySet:
+    """取游标之后（更早）的记录；create_datetime 为空的记录排在最后"""
+    decoded = decode_cursor(cursor) if cursor else None
+    if not decoded:
+        return queryset
+    created, task_id = decoded
+    if created is None:
+        return queryset.filter(create_datetime__isnull=True, id__lt=task_id)
+    return queryset.filter(
+        Q(create_datetime__lt=created)
+        | Q(create_datetime=created, id__lt=task_id)
+        | Q(create_datetime__isnull=True)
+    )
+
+
+def fetch_page(queryset: QuerySet, cursor: Optional[str] = None, page: int = 1,
+               page_size: int = 20) -> Tuple[List[ApprovalTask], Optional[str]]:
+    """
+    获取一页审批任务
+
+    传入 cursor 时使用游标分页，否则回退为页码分页（兼容旧客户端）。
+    多取一条用于判断是否还有下一页。
+
+    Returns:
+        (任务列表, 下一页游标；没有更多数据时为 None)
+    """
+    if cursor:
+        tasks = list(apply_cursor(queryset, cursor)[:page_size + 1])
+    else:
+        start = (max(page, 1) - 1) * page_size
+        tasks = list(queryset[start:start + page_size + 1])
+    has_more = len(tasks) > page_size
+    tasks = tasks[:page_size]
+    next_cursor = encode_cursor(tasks[-1]) if has_more and tasks else None
+    return tasks, next_cursor
+
+
+def _load_histories(tasks: List[ApprovalTask]) -> Dict[int, List[ApprovalHistory]]:
+    histories = defaultdict(list)
+    task_ids = [task.id for task in tasks]
+    if not task_ids:
+        return histories
+    for history in (
+        ApprovalHistory.objects.filter(approval_task_id__in=task_ids)
+        .select_related("approver")
+        .order_by("approval_time", "id")
+    ):
+        histories[history.approval_task_id].append(history)
+    return histories
+
+
+def _load_customers(tasks: List[ApprovalTask]) -> Dict[int, Customer]:
+    # 关联客户外键未建数据库约束，客户可能已被删除，因此单独批量查询而不是 JOIN
+    customer_ids = {task.related_customer_id for task in tasks if task.related_customer_id}
+    if not customer_ids:
+        return {}
+    return {
+        customer.id: customer
+        for customer in Customer._base_manager.filter(id__in=customer_ids).only("id", "name")
+    }
+
+
+def _build_payload(task: ApprovalTask) -> Dict[str, Any]:
+    related_data = task.related_data or {}
+    if task.approval_type == "LEAD_CLAIM":
+        return {
+            "client_id": str(related_data.get("client_id", "")),
+            "name": related_data.get("name", ""),
+            "reason": related_data.get("reason", ""),
+        }
+    if task.approval_type == "LEAD_CREATE":
+        return {"form": related_data.get("form", {})}
+    if task.approval_type == "HANDOVER":
+        to_users = related_data.get("to_users")
+        if not to_users:
+            to_user = related_data.get("to_user")
+            to_users = [to_user] if to_user else []
+        return {
+            "client_id": str(related_data.get("client_id", "")),
+            "from_user": related_data.get("from_user", {}),
+            "to_users": to_users,
+            "reason": related_data.get("reason", ""),
+        }
+    return related_data
+
+
+def serialize_tasks(tasks: List[ApprovalTask]) -> List[Dict[str, Any]]:
+    """序列化审批任务（批量加载历史与客户，查询次数固定）"""
+    histories = _load_histories(tasks)
+    customers = _load_customers(tasks)
+
+    rows = []
+    for task in tasks:
+        related_data = task.related_data or {}
+        client_id = None
+        client_name = None
+        customer = customers.get(task.related_customer_id)
+        if customer:
+            client_id = str(customer.id)
+            client_name = customer.name
+        else:
+            # 客户不存在时从 related_data 获取
+            if task.approval_type == "LEAD_CLAIM":
+                client_id = str(related_data.get("client_id", ""))
+                client_name = related_data.get("name", "")
+            elif task.approval_type == "LEAD_CREATE" and related_data.get("form"):
+                client_name = related_data.get("form", {}).get("client_name", "")
+
+        history_list = [
+            {
+                "step_role": hist.approver_role,
+                "approver_user_id": str(hist.approver.id) if hist.approver else "",
+                "approver_user_name": hist.approver.name if hist.approver else "",
+                "decision": "approved" if hist.action == "approve" else "rejected",
+                "reject_reason": hist.comment if hist.action == "reject" else None,
+                "decided_at": hist.approval_time.strftime("%Y-%m-%d %H:%M:%S") if hist.approval_time else None,
+            }
+            for hist in histories.get(task.id, [])
+        ]
+
+        rows.append({
+            "id": f"approval_{task.id}",
+            "type": task.approval_type,
+            "status": task.status,
+            "applicant_user_id": str(task.applicant.id) if task.applicant else "",
+            "applicant_user_name": task.applicant.name if task.applicant else "",
+            "client_id": client_id,
+            "client_name": client_name,
+            "created_at": task.create_datetime.strftime("%Y-%m-%d %H:%M:%S") if task.create_datetime else None,
+            "approved_at": task.update_datetime.strftime("%Y-%m-%d %H:%M:%S")
+            if task.status == "approved" and task.update_datetime else None,
+            "reject_reason": task.reject_reason,
+            "approval_chain": task.approval_chain,
+            "current_step_index": task.current_step,
+            "current_approver_role": task.current_approver_role,
+            "history": history_list,
+            "payload": _build_payload(task),
+        })
+    return rows
@@ -0,0 +1,71 @@
+"""
+客户统计服务
+
+一次条件聚合查询同时得到生命周期状态分布、展业状态分布与客户总数，
+结果按数据范围缓存在本地缓存中；客户及经办人变更时通过信号递增数据库中的版本号
+（StatsCacheVersion），所有 worker 进程下次读取时即改用新的缓存键。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, Q, QuerySet
+
+from customer_management.models import Customer, StatsCacheVersion
+
+STATS_CACHE_VERSION_NAME = "crm:client_stats"
+STATS_CACHE_TTL = 300
+
+STATUS_KEYS = [
+    Customer.STATUS_PUBLIC_POOL,
+    Customer.STATUS_FOLLOW_UP,
+    Customer.STATUS_CASE,
+    Customer.STATUS_PAYMENT,
+    Customer.STATUS_WON,
+]
+SALES_STAGE_KEYS = [
+    Customer.SALES_STAGE_PUBLIC,
+    Customer.SALES_STAGE_BLANK,
+    Customer.SALES_STAGE_MEETING,
+    Customer.SALES_STAGE_CASE,
+    Customer.SALES_STAGE_PAYMENT,
+    Customer.SALES_STAGE_WON,
+]
+
+
+def invalidate_customer_stats():
+    """使所有进程、所有数据范围的统计缓存失效"""
+    StatsCacheVersion.bump(STATS_CACHE_VERSION_NAME)
+
+
+def compute_customer_stats(queryset: QuerySet) -> Dict[str, Any]:
+    """单次条件聚合计算状态分布、展业状态分布与总数"""
+    aggregates = {"total": Count("id", distinct=True)}
+    for key in STATUS_KEYS:
+        aggregates[f"status__{key}"] = Count("id", filter=Q(status=key), distinct=True)
+    for key in SALES_STAGE_KEYS:
+        aggregates[f"stage__{key}"] = Count("id", filter=Q(sales_stage=key), distinct=True)
+    result = queryset.order_by().aggregate(**aggregates)
+    return {
+        "total_clients": result["total"] or 0,
+        "status_counts": {key: result[f"status__{key}"] or 0 for key in STATUS_KEYS},
+        "sales_stage_counts": {key: result[f"stage__{key}"] or 0 for key in SALES_STAGE_KEYS},
+    }
+
+
+def get_customer_stats(queryset: QuerySet, scope_key: Tuple) -> Dict[str, Any]:
+    """
+    获取客户统计（带缓存）
+
+    Args:
+        queryset: 已按数据范围过滤的客户查询集
+        scope_key: 数据范围标识，如 ("HQ",)、("TEAM", team_id)、("SELF", user_id)
+    """
+    version = StatsCacheVersion.current(STATS_CACHE_VERSION_NAME)
+    cache_key = f"crm:client_stats:{version}:{':'.join(str(part) for part in scope_key)}"
+    stats = cache.get(cache_key)
+    if stats is None:
+        stats = compute_customer_stats(queryset)
+        cache.set(cache_key, stats, timeout=STATS_CACHE_TTL)
+    return stats
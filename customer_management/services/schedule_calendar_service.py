@@ -0,0 +1,149 @@
+"""
+日程日历构建
+
+从物化的日程发生实例表（ScheduleOccurrence）一次查询取出整个时间窗口内的实例，
+再在 Python 中按本地日期分桶，月视图、周视图、议程视图共用同一套逻辑；
+每个日程只序列化一次，重复日程的各个实例复用同一份数据并覆盖开始/结束时间。
+
+分桶规则：
+- 实例覆盖从开始时间的本地日期到结束时间的本地日期之间的每一天
+- 没有结束时间（或结束早于开始）的实例只落在开始当天
+- 全天日程的结束时间若恰为本地零点，视为不包含当天（[开始, 结束) 语义）
+- 同一天内沿用 Schedule 的默认排序：开始时间倒序，相同时按日程 ID 倒序
+"""
+from __future__ import annotations
+
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from customer_management.models import ScheduleOccurrence
+from customer_management.serializers import ScheduleListSerializer
+from customer_management.services.schedule_recurrence_service import occurrences_in_range
+
+MAX_AGENDA_DAYS = 92
+
+
+def _local_date(value: datetime) -> date:
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def _day_start(day: date) -> datetime:
+    value = datetime.combine(day, time.min)
+    return timezone.make_aware(value) if settings.USE_TZ else value
+
+
+def fetch_window(queryset: QuerySet, start_date: date, end_date: date) -> List[ScheduleOccurrence]:
+    """一次查询取出与 [start_date, end_date] 有交集的发生实例（含日程与创建人）"""
+    return list(occurrences_in_range(
+        queryset, _day_start(start_date), _day_start(end_date + timedelta(days=1))
+    ))
+
+
+def event_dates(occurrence: ScheduleOccurrence):
+    """返回实例覆盖的第一天和最后一天（本地日期，含端点）"""
+    first = _local_date(occurrence.start_time)
+    if not occurrence.end_time or occurrence.end_time <= occurrence.start_time:
+        return first, first
+    end = occurrence.end_time
+    if timezone.is_aware(end):
+        end = timezone.localtime(end)
+    last = end.date()
+    if occurrence.schedule.is_all_day and end.time() == time.min and last > first:
+        last -= timedelta(days=1)
+    return first, last
+
+
+def bucket_by_date(occurrences: Iterable[ScheduleOccurrence], start_date: date,
+                   end_date: date) -> "OrderedDict[date, List[ScheduleOccurrence]]":
+    """把实例分到窗口内的每一天；跨天实例出现在它覆盖的每一天"""
+    buckets = OrderedDict()
+    day = start_date
+    while day <= end_date:
+        buckets[day] = []
+        day += timedelta(days=1)
+
+    for occurrence in occurrences:
+        first, last = event_dates(occurrence)
+        day = max(first, start_date)
+        last = min(last, end_date)
+        while day <= last:
+            buckets[day].append(occurrence)
+            day += timedelta(days=1)
+    return buckets
+
+
+def build_days(queryset: QuerySet, start_date: date, end_date: date,
+               skip_empty: bool = False) -> List[Dict[str, Any]]:
+    """构建 [start_date, end_date] 的按天日程列表"""
+    occurrences = fetch_window(queryset, start_date, end_date)
+    # 与逐日查询时 Schedule.Meta.ordering（-start_time, -id）一致
+    occurrences.sort(key=lambda occurrence: (occurrence.start_time, occurrence.schedule_id), reverse=True)
+    schedules = list({occurrence.schedule_id: occurrence.schedule for occurrence in occurrences}.values())
+    serializer = ScheduleListSerializer(schedules, many=True)
+    serialized = {item['id']: item for item in serializer.data}
+    time_field = serializer.child.fields['start_time']
+
+    rows = {}
+    for occurrence in occurrences:
+        data = serialized[occurrence.schedule_id]
+        row = dict(data)
+        row['occurrence_id'] = occurrence.id
+        row['sequence'] = occurrence.sequence
+        if occurrence.sequence:
+            # 重复日程的后续实例：开始/结束时间取实例自身的值
+            row['start_time'] = time_field.to_representation(occurrence.start_time)
+            row['end_time'] = time_field.to_representation(occurrence.end_time) if data['end_time'] else None
+        rows[occurrence.id] = row
+
+    days = []
+    for day, items in bucket_by_date(occurrences, start_date, end_date).items():
+        if skip_empty and not items:
+            continue
+        days.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'schedules': [rows[occurrence.id] for occurrence in items],
+            'count': len(items),
+        })
+    return days
+
+
+def build_month(queryset: QuerySet, year: int, month: int) -> Dict[str, Any]:
+    """月视图"""
+    _, last_day = monthrange(year, month)
+    start_date = date(year, month, 1)
+    end_date = date(year, month, last_day)
+    return {
+        'year': year,
+        'month': month,
+        'days': build_days(queryset, start_date, end_date),
+    }
+
+
+def build_week(queryset: QuerySet, anchor: date) -> Dict[str, Any]:
+    """周视图（周一至周日）"""
+    week_start = anchor - timedelta(days=anchor.weekday())
+    week_end = week_start + timedelta(days=6)
+    return {
+        'week_start': week_start.strftime('%Y-%m-%d'),
+        'week_end': week_end.strftime('%Y-%m-%d'),
+        'days': build_days(queryset, week_start, week_end),
+    }
+
+
+def build_agenda(queryset: QuerySet, start_date: date, days: Optional[int] = None) -> Dict[str, Any]:
+    """议程视图：从 start_date 起若干天内有日程的日期"""
+    days = min(max(days or 14, 1), MAX_AGENDA_DAYS)
+    end_date = start_date + timedelta(days=days - 1)
+    return {
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'days': build_days(queryset, start_date, end_date, skip_empty=True),
+    }
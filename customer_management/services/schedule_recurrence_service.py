@@ -0,0 +1,281 @@
+"""
+日程重复规则展开
+
+把 Schedule.recurrence_rule 展开为 ScheduleOccurrence 物化实例，日历等按时间范围的查询
+直接走实例表的 (start_time, end_time) 索引，不再在每次请求中重复展开。
+
+规则格式（JSON）：
+    {
+        "freq": "daily" | "weekly" | "monthly" | "yearly",   # 也兼容 frequency / type
+        "interval": 1,                # 间隔，默认 1
+        "byweekday": [0, 2, 4],       # 按周重复时的星期（0=周一），默认开始时间所在星期
+        "bymonthday": [1, 15, -1],    # 按月重复时的日期，负数表示倒数第几天，默认开始日期
+        "count": 10,                  # 共重复多少次（含首次）
+        "until": "2025-12-31",        # 截止日期（含当天）
+        "exdates": ["2025-05-01"]     # 例外日期，也兼容 exceptions
+    }
+
+展开范围为滚动窗口：[当前时间 - 回看天数, 当前时间 + 展开天数]，单个日程最多物化
+SCHEDULE_RECURRENCE_MAX_OCCURRENCES 条；非重复日程固定保存一条实例。
+规则修改后按开始时间与已有实例做差异比对，只增删改发生变化的行。
+"""
+from __future__ import annotations
+
+import json
+import logging
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from customer_management.models import Schedule, ScheduleOccurrence
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+# 连续多少个周期没有任何候选日期即停止展开（如每 12 个月的 2 月 30 日永远不存在）
+MAX_EMPTY_PERIODS = 100
+
+
+def _setting(name: str, default: int) -> int:
+    return getattr(settings, name, default)
+
+
+def _to_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if isinstance(value, date):
+        return value
+    if not value or not isinstance(value, str):
+        return None
+    parsed = parse_datetime(value)
+    if parsed:
+        return _to_date(parsed)
+    try:
+        return parse_date(value[:10])
+    except ValueError:
+        return None
+
+
+def parse_rule(rule: Any) -> Optional[Dict[str, Any]]:
+    """规范化重复规则；不是有效的重复规则时返回 None"""
+    if isinstance(rule, str):
+        try:
+            rule = json.loads(rule)
+        except ValueError:
+            return None
+    if not isinstance(rule, dict):
+        return None
+
+    freq = str(rule.get('freq') or rule.get('frequency') or rule.get('type') or '').lower()
+    if freq not in FREQUENCIES:
+        return None
+
+    try:
+        interval = max(int(rule.get('interval') or 1), 1)
+        count = int(rule['count']) if rule.get('count') else None
+        byweekday = sorted({int(day) % 7 for day in rule.get('byweekday') or rule.get('weekdays') or []})
+        bymonthday = sorted({int(day) for day in rule.get('bymonthday') or [] if 1 <= abs(int(day)) <= 31})
+    except (TypeError, ValueError):
+        logger.warning(f"日程重复规则格式错误，按不重复处理: {rule}")
+        return None
+
+    exdates = {_to_date(item) for item in rule.get('exdates') or rule.get('exceptions') or []}
+    exdates.discard(None)
+    return {
+        'freq': freq,
+        'interval': interval,
+        'count': count if count and count > 0 else None,
+        'until': _to_date(rule.get('until')),
+        'byweekday': byweekday,
+        'bymonthday': bymonthday,
+        'exdates': exdates,
+    }
+
+
+def _add_months(day: date, months: int) -> Tuple[int, int]:
+    total = day.year * 12 + day.month - 1 + months
+    return total // 12, total % 12 + 1
+
+
+def _iter_dates(first: date, rule: Dict[str, Any], last: Optional[date] = None) -> Iterator[date]:
+    """
+    按规则依次生成候选日期（从首次发生日起，不含早于首日的日期）
+
+    last 为最后可能的日期（截止日期与展开窗口的较早者），周期起始日超过它即停止；
+    连续 MAX_EMPTY_PERIODS 个周期没有候选日期时也停止，避免规则永远无法命中时死循环。
+    """
+    freq, interval = rule['freq'], rule['interval']
+    period = 0
+    empty_periods = 0
+    while True:
+        if freq == 'daily':
+            period_start = first + timedelta(days=period * interval)
+            candidates = [period_start]
+        elif freq == 'weekly':
+            period_start = first - timedelta(days=first.weekday()) + timedelta(weeks=period * interval)
+            weekdays = rule['byweekday'] or [first.weekday()]
+            candidates = [period_start + timedelta(days=weekday) for weekday in weekdays]
+        elif freq == 'monthly':
+            year, month = _add_months(first, period * interval)
+            period_start = date(year, month, 1)
+            last_day = monthrange(year, month)[1]
+            candidates = []
+            for day in rule['bymonthday'] or [first.day]:
+                day = last_day + day + 1 if day < 0 else day
+                # 当月没有该日期（如 2 月 30 日）时跳过，与 RFC 5545 一致
+                if 1 <= day <= last_day:
+                    candidates.append(date(year, month, day))
+            candidates.sort()
+        else:
+            year = first.year + period * interval
+            period_start = date(year, first.month, 1)
+            last_day = monthrange(year, first.month)[1]
+            candidates = [date(year, first.month, first.day)] if first.day <= last_day else []
+
+        if last and period_start > last:
+            return
+        candidates = [candidate for candidate in candidates if candidate >= first]
+        if candidates:
+            empty_periods = 0
+        else:
+            empty_periods += 1
+            if empty_periods >= MAX_EMPTY_PERIODS:
+                return
+        yield from candidates
+        period += 1
+
+
+def expand(schedule: Schedule, window_start: datetime, window_end: datetime,
+           limit: Optional[int] = None) -> List[Tuple[int, datetime, datetime]]:
+    """
+    展开日程在窗口内的发生实例
+
+    Returns:
+        [(序号, 开始时间, 结束时间)]，按开始时间升序
+    """
+    start_time = schedule.start_time
+    duration = (schedule.end_time - start_time) if schedule.end_time and schedule.end_time > start_time else timedelta(0)
+    rule = parse_rule(schedule.recurrence_rule)
+    if rule is None:
+        return [(0, start_time, start_time + duration)]
+
+    limit = limit or _setting('SCHEDULE_RECURRENCE_MAX_OCCURRENCES', 1000)
+    aware = timezone.is_aware(start_time)
+    local_start = timezone.localtime(start_time) if aware else start_time
+    wall_time = local_start.replace(tzinfo=None).time()
+
+    last = _to_date(window_end)
+    if rule['until']:
+        last = min(last, rule['until'])
+
+    occurrences = []
+    for sequence, day in enumerate(_iter_dates(local_start.date(), rule, last)):
+        if rule['count'] and sequence >= rule['count']:
+            break
+        if rule['until'] and day > rule['until']:
+            break
+        occurrence_start = datetime.combine(day, wall_time)
+        if aware:
+            occurrence_start = timezone.make_aware(occurrence_start)
+        if occurrence_start >= window_end:
+            break
+        occurrence_end = occurrence_start + duration
+        if occurrence_end < window_start or day in rule['exdates']:
+            continue
+        occurrences.append((sequence, occurrence_start, occurrence_end))
+        if len(occurrences) >= limit:
+            break
+    return occurrences
+
+
+def _window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    now = now or timezone.now()
+    return (
+        now - timedelta(days=_setting('SCHEDULE_RECURRENCE_LOOKBACK_DAYS', 365)),
+        now + timedelta(days=_setting('SCHEDULE_RECURRENCE_HORIZON_DAYS', 180)),
+    )
+
+
+def sync_occurrences(schedule: Schedule, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    增量刷新单个日程的物化实例
+
+    以开始时间为键与已有实例比对：新增缺失的、删除不再出现的、更新结束时间或序号变化的。
+    """
+    result = {'created': 0, 'updated': 0, 'deleted': 0}
+    if schedule.is_deleted:
+        result['deleted'], _ = ScheduleOccurrence.objects.filter(schedule_id=schedule.id).delete()
+        return result
+
+    window_start, window_end = _window(now)
+    expected = {
+        start: (sequence, end)
+        for sequence, start, end in expand(schedule, window_start, window_end)
+    }
+    existing = {item.start_time: item for item in ScheduleOccurrence.objects.filter(schedule_id=schedule.id)}
+
+    stale_ids = [item.id for start, item in existing.items() if start not in expected]
+    to_create = [
+        ScheduleOccurrence(schedule_id=schedule.id, sequence=sequence, start_time=start, end_time=end)
+        for start, (sequence, end) in expected.items()
+        if start not in existing
+    ]
+    to_update = []
+    for start, item in existing.items():
+        if start in expected and (item.sequence, item.end_time) != expected[start]:
+            item.sequence, item.end_time = expected[start]
+            to_update.append(item)
+
+    with transaction.atomic():
+        if stale_ids:
+            ScheduleOccurrence.objects.filter(id__in=stale_ids).delete()
+        if to_create:
+            ScheduleOccurrence.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            ScheduleOccurrence.objects.bulk_update(to_update, ['sequence', 'end_time'], batch_size=500)
+
+    result.update(created=len(to_create), updated=len(to_update), deleted=len(stale_ids))
+    return result
+
+
+def refresh_occurrences(queryset: Optional[QuerySet] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    批量刷新物化实例（滚动窗口前移 / 补齐历史数据）
+
+    默认处理所有设置了重复规则的日程，以及还没有任何实例的日程。
+    """
+    if queryset is None:
+        base = Schedule.objects.filter(is_deleted=False)
+        ids = set(base.filter(recurrence_rule__isnull=False).values_list('id', flat=True))
+        ids.update(base.filter(occurrences__isnull=True).values_list('id', flat=True))
+        queryset = Schedule.objects.filter(id__in=ids)
+
+    totals = {'schedules': 0, 'created': 0, 'updated': 0, 'deleted': 0}
+    for schedule in queryset.order_by('id').iterator(chunk_size=500):
+        changes = sync_occurrences(schedule, now=now)
+        totals['schedules'] += 1
+        for key, value in changes.items():
+            totals[key] += value
+    return totals
+
+
+def occurrences_in_range(queryset: QuerySet, start: datetime, end: datetime) -> QuerySet:
+    """
+    时间范围内的发生实例（与 [start, end) 有交集）
+
+    Args:
+        queryset: 已按数据范围过滤的日程查询集
+    """
+    return (
+        ScheduleOccurrence.objects.filter(
+            schedule__in=queryset, start_time__lt=end, end_time__gte=start
+        )
+        .select_related('schedule', 'schedule__creator')
+        .order_by('start_time', 'id')
+    )
@@ -0,0 +1,323 @@
+"""
+日程提醒投递调度
+
+- enqueue_due_reminders：根据日程发生实例生成到期的 ScheduleReminder（每种提醒方式一条，已存在的跳过）
+- dispatch_due_reminders：用 select_for_update(skip_locked=True) 分批认领到期提醒，
+  按 (接收人, 提醒方式) 分组后交给可插拔的投递后端，记录投递状态，失败按指数退避重试
+
+认领时把状态置为 sending 并写入租约到期时间，worker 异常退出时租约过期后会被重新认领；
+多个 worker 并行运行时互不阻塞，提醒吞吐量随 worker 数量扩展，而不受接口请求耗时影响。
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from customer_management.models import ReminderMessage, ScheduleOccurrence, ScheduleReminder
+from customer_management.services.notification_service import EmailService, SMSService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISPATCH_CONFIG = {
+    'BACKEND': 'customer_management.services.schedule_reminder_dispatcher.NotificationServiceBackend',
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 60,        # 首次重试等待秒数，之后每次翻倍
+    'MAX_RETRY_DELAY': 3600,
+    'LEASE_SECONDS': 300,       # 认领租约，超时未回写结果的提醒会被重新认领
+    'MAX_LEAD_MINUTES': 7 * 24 * 60,  # 生成提醒时向后扫描的最大提前量
+}
+
+
+def get_dispatch_config() -> Dict[str, Any]:
+    return {**DEFAULT_DISPATCH_CONFIG, **(getattr(settings, 'SCHEDULE_REMINDER_DISPATCH', None) or {})}
+
+
+def _format_time(value: datetime) -> str:
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime('%Y-%m-%d %H:%M')
+
+
+# ---------------------------------------------------------------------- #
+# 投递后端
+# ---------------------------------------------------------------------- #
+
+class BaseReminderBackend:
+    """投递后端基类：一次发送同一接收人、同一提醒方式的一组提醒"""
+
+    def send(self, channel: str, recipient, reminders: List[ScheduleReminder]) -> Dict[int, Optional[str]]:
+        """
+        Returns:
+            {reminder_id: 错误信息}，成功的提醒对应 None；抛出异常视为整组失败
+        """
+        raise NotImplementedError
+
+
+class InMemoryReminderBackend(BaseReminderBackend):
+    """进程内存后端（测试用）：记录每次投递，可指定失败的提醒方式"""
+
+    outbox: List[Dict[str, Any]] = []
+
+    def __init__(self, fail_channels=None):
+        self.fail_channels = set(fail_channels or [])
+
+    def send(self, channel, recipient, reminders):
+        if channel in self.fail_channels:
+            raise RuntimeError(f'{channel} 投递失败（模拟）')
+        self.outbox.append({
+            'channel': channel,
+            'recipient_id': getattr(recipient, 'id', None),
+            'reminder_ids': [reminder.id for reminder in reminders],
+        })
+        return {reminder.id: None for reminder in reminders}
+
+    @classmethod
+    def clear(cls):
+        cls.outbox.clear()
+
+
+class NotificationServiceBackend(BaseReminderBackend):
+    """
+    默认后端：系统通知写入 ReminderMessage，短信/邮件复用 notification_service
+
+    notification_service 尚未接入微信发送（只有占位实现），微信提醒按不支持的提醒方式返回错误，
+    进入重试/失败而不是被标记为已发送。
+    """
+
+    def send(self, channel, recipient, reminders):
+        handler = getattr(self, f'_send_{channel}', None)
+        if handler is None:
+            return {reminder.id: f'不支持的提醒方式: {channel}' for reminder in reminders}
+        return handler(recipient, reminders)
+
+    def _send_system(self, recipient, reminders):
+        ReminderMessage.objects.bulk_create([
+            ReminderMessage(
+                reminder_type='other',
+                title=f'日程提醒：{reminder.schedule.title}',
+                content=f'{reminder.schedule.title} 将于 {_format_time(reminder.schedule_start)} 开始',
+                related_type='schedule',
+                related_id=reminder.schedule_id,
+                recipient=recipient,
+            )
+            for reminder in reminders
+        ])
+        return {reminder.id: None for reminder in reminders}
+
+    def _send_email(self, recipient, reminders):
+        if not recipient.email:
+            return {reminder.id: '接收人未配置邮箱' for reminder in reminders}
+        if len(reminders) == 1:
+            reminder = reminders[0]
+            result = EmailService.send_schedule_reminder(
+                recipient.email, reminder.schedule.title, _format_time(reminder.schedule_start),
+                reminder.schedule.description or ''
+            )
+        else:
+            # 同一接收人的多条提醒合并为一封摘要邮件
+            lines = [f'- {_format_time(item.schedule_start)}  {item.schedule.title}' for item in reminders]
+            result = EmailService.send_email(
+                recipient.email, f'日程提醒（{len(reminders)} 条）',
+                '您好，\n\n以下日程即将开始：\n\n' + '\n'.join(lines) + '\n\n此邮件由系统自动发送，请勿回复。'
+            )
+        error = None if result.get('success') else result.get('message') or '邮件发送失败'
+        return {reminder.id: error for reminder in reminders}
+
+    def _send_sms(self, recipient, reminders):
+        if not recipient.mobile:
+            return {reminder.id: '接收人未配置手机号' for reminder in reminders}
+        results = {}
+        for reminder in reminders:
+            result = SMSService.send_schedule_reminder(
+                recipient.mobile, reminder.schedule.title, _format_time(reminder.schedule_start)
+            )
+            results[reminder.id] = None if result.get('success') else result.get('message') or '短信发送失败'
+        return results
+
+def get_backend() -> BaseReminderBackend:
+    return import_string(get_dispatch_config()['BACKEND'])()
+
+
+# ---------------------------------------------------------------------- #
+# 生成提醒
+# ---------------------------------------------------------------------- #
+
+def enqueue_due_reminders(now: Optional[datetime] = None, lookahead_minutes: int = 0) -> int:
+    """
+    为提醒时间已到（或在 lookahead_minutes 内到达）的日程实例生成提醒记录
+
+    Returns:
+        新生成的提醒数量
+    """
+    now = now or timezone.now()
+    config = get_dispatch_config()
+    horizon = now + timedelta(minutes=lookahead_minutes)
+
+    occurrences = list(
+        ScheduleOccurrence.objects.filter(
+            start_time__gte=now,
+            start_time__lte=horizon + timedelta(minutes=config['MAX_LEAD_MINUTES']),
+            schedule__is_deleted=False,
+            schedule__reminder_enabled=True,
+            schedule__status='pending',
+        ).select_related('schedule')
+    )
+    wanted = []
+    for occurrence in occurrences:
+        schedule = occurrence.schedule
+        remind_time = occurrence.start_time - timedelta(minutes=schedule.reminder_time or 30)
+        if remind_time > horizon:
+            continue
+        methods = {
+            method.strip() for method in (schedule.reminder_method or 'system').split(',')
+            if method.strip() in dict(ScheduleReminder.REMIND_METHOD_CHOICES)
+        }
+        wanted.extend((schedule, remind_time, method) for method in sorted(methods))
+    if not wanted:
+        return 0
+
+    existing = set(
+        ScheduleReminder.objects.filter(
+            schedule_id__in={schedule.id for schedule, _, _ in wanted}
+        ).values_list('schedule_id', 'remind_time', 'remind_method')
+    )
+    to_create = [
+        ScheduleReminder(
+            schedule=schedule, remind_time=remind_time, remind_method=method,
+            next_attempt_time=remind_time, creator_id=schedule.creator_id,
+        )
+        for schedule, remind_time, method in wanted
+        if (schedule.id, remind_time, method) not in existing
+    ]
+    ScheduleReminder.objects.bulk_create(to_create, batch_size=500)
+    return len(to_create)
+
+
+# ---------------------------------------------------------------------- #
+# 认领与投递
+# ---------------------------------------------------------------------- #
+
+def _due_filter(now: datetime) -> Q:
+    pending = Q(status=ScheduleReminder.STATUS_PENDING, remind_time__lte=now) & (
+        Q(next_attempt_time__isnull=True) | Q(next_attempt_time__lte=now)
+    )
+    lease_expired = Q(status=ScheduleReminder.STATUS_SENDING, next_attempt_time__lte=now)
+    return pending | lease_expired
+
+
+def claim_batch(batch_size: int, now: Optional[datetime] = None) -> List[ScheduleReminder]:
+    """认领一批到期提醒：锁定时跳过其他 worker 已锁定的行，并写入租约"""
+    now = now or timezone.now()
+    lease_until = now + timedelta(seconds=get_dispatch_config()['LEASE_SECONDS'])
+    with transaction.atomic():
+        ids = list(
+            ScheduleReminder.objects.select_for_update(skip_locked=True)
+            .filter(_due_filter(now), is_sent=False)
+            .order_by('remind_time', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        ScheduleReminder.objects.filter(id__in=ids).update(
+            status=ScheduleReminder.STATUS_SENDING,
+            next_attempt_time=lease_until,
+            attempts=F('attempts') + 1,
+        )
+    return list(
+        ScheduleReminder.objects.filter(id__in=ids)
+        .select_related('schedule', 'schedule__creator')
+        .order_by('remind_time', 'id')
+    )
+
+
+def _retry_delay(attempts: int, config: Dict[str, Any]) -> timedelta:
+    delay = config['RETRY_BACKOFF'] * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, config['MAX_RETRY_DELAY']))
+
+
+def _group(reminders: List[ScheduleReminder]) -> Dict[Tuple[int, str], List[ScheduleReminder]]:
+    groups = defaultdict(list)
+    for reminder in reminders:
+        groups[(reminder.schedule.creator_id, reminder.remind_method)].append(reminder)
+    return groups
+
+
+def dispatch_batch(reminders: List[ScheduleReminder], backend: Optional[BaseReminderBackend] = None,
+                   now: Optional[datetime] = None) -> Dict[str, int]:
+    """投递已认领的一批提醒并回写状态"""
+    config = get_dispatch_config()
+    backend = backend or get_backend()
+    now = now or timezone.now()
+    outcome: Dict[int, Optional[str]] = {}
+    no_retry = set()
+
+    for (recipient_id, channel), items in _group(reminders).items():
+        for item in items:
+            item.schedule_start = item.remind_time + timedelta(minutes=item.schedule.reminder_time or 30)
+        recipient = items[0].schedule.creator
+        if recipient is None:
+            for item in items:
+                outcome[item.id] = '日程没有接收人'
+                no_retry.add(item.id)
+            continue
+        try:
+            outcome.update(backend.send(channel, recipient, items))
+        except Exception as e:
+            logger.warning(f"日程提醒投递失败: recipient={recipient_id}, channel={channel}, {e}")
+            outcome.update({item.id: str(e) or e.__class__.__name__ for item in items})
+
+    stats = {'sent': 0, 'retry': 0, 'failed': 0}
+    for reminder in reminders:
+        error = outcome.get(reminder.id, '投递后端未返回结果')
+        if error is None:
+            reminder.status = ScheduleReminder.STATUS_SENT
+            reminder.is_sent = True
+            reminder.sent_time = now
+            reminder.send_result = 'success'
+            reminder.error_message = None
+            reminder.next_attempt_time = None
+            stats['sent'] += 1
+        elif reminder.id in no_retry or reminder.attempts >= config['MAX_ATTEMPTS']:
+            reminder.status = ScheduleReminder.STATUS_FAILED
+            reminder.error_message = error
+            reminder.next_attempt_time = None
+            stats['failed'] += 1
+        else:
+            reminder.status = ScheduleReminder.STATUS_PENDING
+            reminder.error_message = error
+            reminder.next_attempt_time = now + _retry_delay(reminder.attempts, config)
+            stats['retry'] += 1
+
+    ScheduleReminder.objects.bulk_update(
+        reminders,
+        ['status', 'is_sent', 'sent_time', 'send_result', 'error_message', 'next_attempt_time'],
+        batch_size=500,
+    )
+    return stats
+
+
+def dispatch_due_reminders(backend: Optional[BaseReminderBackend] = None, batch_size: Optional[int] = None,
+                           max_batches: int = 100, now: Optional[datetime] = None) -> Dict[str, int]:
+    """循环认领并投递到期提醒，直到没有到期提醒或达到批次上限"""
+    batch_size = batch_size or get_dispatch_config()['BATCH_SIZE']
+    backend = backend or get_backend()
+    totals = {'claimed': 0, 'sent': 0, 'retry': 0, 'failed': 0}
+    for _ in range(max_batches):
+        reminders = claim_batch(batch_size, now=now)
+        if not reminders:
+            break
+        totals['claimed'] += len(reminders)
+        for key, value in dispatch_batch(reminders, backend=backend, now=now).items():
+            totals[key] += value
+        if len(reminders) < batch_size:
+            break
+    return totals
@@ -0,0 +1,92 @@
+"""
+日程统计服务
+
+一次条件聚合查询同时得到类型、状态、优先级分布以及即将到来/逾期数量，
+查询次数与选项数量无关；结果可按用户与日期窗口缓存，日程变更时递增数据库中的版本号
+（StatsCacheVersion）使所有 worker 进程的缓存失效。
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.core.cache import cache
+from django.db.models import Count, Q, QuerySet
+from django.utils import timezone
+
+from customer_management.models import Schedule, StatsCacheVersion
+
+STATS_CACHE_VERSION_NAME = "crm:schedule_stats"
+STATS_CACHE_TTL = 60
+UPCOMING_DAYS = 7
+
+BREAKDOWNS = (
+    ("by_type", "schedule_type", Schedule.SCHEDULE_TYPE_CHOICES),
+    ("by_status", "status", Schedule.STATUS_CHOICES),
+    ("by_priority", "priority", Schedule.PRIORITY_CHOICES),
+)
+
+
+def invalidate_schedule_stats():
+    """使所有进程、所有用户的日程统计缓存失效"""
+    StatsCacheVersion.bump(STATS_CACHE_VERSION_NAME)
+
+
+def compute_schedule_stats(queryset: QuerySet, now=None) -> Dict[str, Any]:
+    """
+    单次条件聚合计算日程统计
+
+    返回结构与原接口一致：各分布只包含数量大于 0 的选项。
+    """
+    now = now or timezone.now()
+    aggregates = {
+        "total": Count("id"),
+        "upcoming": Count("id", filter=Q(
+            status="pending", start_time__gte=now, start_time__lte=now + timedelta(days=UPCOMING_DAYS)
+        )),
+        "overdue": Count("id", filter=Q(status="pending", start_time__lt=now)),
+    }
+    for name, field, choices in BREAKDOWNS:
+        for value, _label in choices:
+            aggregates[f"{name}__{value}"] = Count("id", filter=Q(**{field: value}))
+
+    result = queryset.order_by().aggregate(**aggregates)
+
+    stats = {"total_count": result["total"] or 0}
+    for name, _field, choices in BREAKDOWNS:
+        stats[name] = {
+            value: result[f"{name}__{value}"]
+            for value, _label in choices
+            if result[f"{name}__{value}"]
+        }
+    stats["upcoming_count"] = result["upcoming"] or 0
+    stats["overdue_count"] = result["overdue"] or 0
+    return stats
+
+
+def get_schedule_stats(queryset: QuerySet, user_id: Any = None, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    获取日程统计（可选缓存）
+
+    Args:
+        queryset: 已按数据范围过滤的日程查询集
+        user_id: 当前用户ID，作为缓存键的一部分
+        start_date / end_date: 日期窗口（YYYY-MM-DD），为空表示不限
+        use_cache: 是否使用缓存
+    """
+    if start_date:
+        queryset = queryset.filter(start_time__date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(start_time__date__lte=end_date)
+
+    if not use_cache:
+        return compute_schedule_stats(queryset)
+
+    version = StatsCacheVersion.current(STATS_CACHE_VERSION_NAME)
+    cache_key = f"crm:schedule_stats:{version}:{user_id}:{start_date or ''}:{end_date or ''}"
+    stats = cache.get(cache_key)
+    if stats is None:
+        stats = compute_schedule_stats(queryset)
+        cache.set(cache_key, stats, timeout=STATS_CACHE_TTL)
+    return stats
@@ -0,0 +1,34 @@
+"""
+客户管理信号处理
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Customer, CustomerHandler, Schedule
+from .services.customer_stats_service import invalidate_customer_stats
+from .services.schedule_stats_service import invalidate_schedule_stats
+from .services.schedule_recurrence_service import sync_occurrences
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=CustomerHandler)
+@receiver(post_delete, sender=CustomerHandler)
+def invalidate_customer_stats_cache(sender, **kwargs):
+    """客户或经办人变更后使客户统计缓存失效"""
+    invalidate_customer_stats()
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def invalidate_schedule_stats_cache(sender, **kwargs):
+    """日程变更后使日程统计缓存失效"""
+    invalidate_schedule_stats()
+
+
+@receiver(post_save, sender=Schedule)
+def sync_schedule_occurrences(sender, instance, raw=False, **kwargs):
+    """日程保存后增量刷新物化的发生实例"""
+    if raw:
+        return
+    sync_occurrences(instance)
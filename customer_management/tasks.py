@@ -0,0 +1,8 @@
+from application.celery import app
+from customer_management.services.schedule_recurrence_service import refresh_occurrences
+
+
+@app.task
+def refresh_schedule_occurrences_task():
+    """每日前移重复日程的展开窗口（见 CELERY_BEAT_SCHEDULE）"""
+    return refresh_occurrences()
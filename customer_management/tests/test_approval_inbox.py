@@ -0,0 +1,76 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from customer_management.models import ApprovalTask, ApprovalHistory, Customer
+from customer_management.services import approval_inbox_service
+from dvadmin.system.models import Users
+
+
+class ApprovalInboxQueryTestCase(TestCase):
+    """审批收件箱查询层测试：查询次数不随任务数量增长，游标分页稳定"""
+
+    def setUp(self):
+        self.hq_user = Users.objects.create(username='hq_inbox', name='总所', role_level='HQ')
+        self.sales_user = Users.objects.create(username='sales_inbox', name='销售', role_level='SALES')
+
+    def _seed(self, count, status='approved'):
+        for index in range(count):
+            customer = Customer.objects.create(name=f'客户{index}', client_category='construction')
+            task = ApprovalTask.objects.create(
+                approval_type='LEAD_CLAIM',
+                applicant=self.sales_user,
+                related_customer=customer,
+                approval_chain=['HQ'],
+                status=status,
+                related_data={'client_id': customer.id, 'name': customer.name},
+            )
+            for action in ('approve', 'reject'):
+                ApprovalHistory.objects.create(
+                    approval_task=task, approver=self.hq_user, approver_role='HQ', action=action
+                )
+
+    def _load_inbox(self, user, page_size):
+        queryset = approval_inbox_service.build_inbox_queryset(user, 'handled')
+        total = queryset.count()
+        tasks, next_cursor = approval_inbox_service.fetch_page(queryset, page_size=page_size)
+        return total, approval_inbox_service.serialize_tasks(tasks), next_cursor
+
+    def test_query_count_is_flat_as_inbox_grows(self):
+        self._seed(5)
+        with CaptureQueriesContext(connection) as small:
+            _, rows, _ = self._load_inbox(self.hq_user, page_size=50)
+        self.assertEqual(len(rows), 5)
+
+        self._seed(45)
+        with CaptureQueriesContext(connection) as large:
+            _, rows, _ = self._load_inbox(self.hq_user, page_size=50)
+        self.assertEqual(len(rows), 50)
+
+        # count + 任务(含申请人) + 审批历史(含审批人) + 关联客户
+        self.assertEqual(len(small.captured_queries), 4)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+        self.assertEqual(len(rows[0]['history']), 2)
+        self.assertTrue(rows[0]['client_name'].startswith('客户'))
+
+    def test_cursor_pagination_is_stable(self):
+        self._seed(25)
+        queryset = approval_inbox_service.build_inbox_queryset(self.hq_user, 'handled')
+
+        seen = []
+        cursor = None
+        while True:
+            tasks, cursor = approval_inbox_service.fetch_page(queryset, cursor=cursor, page_size=10)
+            seen.extend(task.id for task in tasks)
+            if not cursor:
+                break
+
+        expected = list(queryset.values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_non_hq_user_only_sees_own_tasks(self):
+        self._seed(3, status='pending')
+        other = Users.objects.create(username='other_inbox', name='其他', role_level='SALES')
+        self.assertEqual(approval_inbox_service.build_inbox_queryset(other, 'pending').count(), 0)
+        self.assertEqual(approval_inbox_service.build_inbox_queryset(self.sales_user, 'pending').count(), 3)
@@ -0,0 +1,46 @@
+import copy
+import json
+
+from django.test import TestCase
+
+from customer_management.benchmarks.dataset import build_dataset, generate_plan, plan_counts, resolve_scale
+from customer_management.benchmarks.suite import build_report, compare_reports, run_suite
+from customer_management.models import Customer, CustomerHandler, FollowupRecord, Schedule, VisitRecord
+
+
+class CrmBenchmarkTestCase(TestCase):
+    """性能基准：数据集确定性、用例可执行、结果可序列化与对比"""
+
+    def test_plan_is_deterministic(self):
+        scale = resolve_scale("tiny", customers=25)
+        self.assertEqual(generate_plan(scale, seed=7), generate_plan(scale, seed=7))
+        self.assertNotEqual(generate_plan(scale, seed=7)["customers"], generate_plan(scale, seed=8)["customers"])
+        with self.assertRaises(ValueError):
+            resolve_scale("huge")
+
+    def test_suite_runs_on_tiny_dataset(self):
+        dataset = build_dataset("tiny", seed=3)
+        counts = dataset["counts"]
+        self.assertEqual(counts, plan_counts(generate_plan(resolve_scale("tiny"), seed=3)))
+        self.assertEqual(Customer.objects.filter(hq_id__isnull=False).count(), counts["customers"])
+        self.assertEqual(CustomerHandler.objects.count(), counts["handlers"])
+        self.assertEqual(FollowupRecord.objects.count(), counts["followups"])
+        self.assertEqual(VisitRecord.objects.count(), counts["visits"])
+        self.assertEqual(Schedule.objects.count(), counts["schedules"])
+
+        results = run_suite(dataset, repeat=1, warmup=0)
+        self.assertIn("endpoint.crm_client_list[SALES]", results)
+        for name, row in results.items():
+            self.assertNotIn("error", row, name)
+            self.assertGreater(row["queries"], 0, name)
+
+        report = json.loads(json.dumps(build_report(dataset, results, repeat=1, warmup=0)))
+        self.assertEqual(report["meta"]["counts"], counts)
+        self.assertTrue(all(row["status"] == "same" for row in compare_reports(report, report)))
+
+        slower = copy.deepcopy(report)
+        slow_row = slower["results"]["endpoint.crm_client_list[SALES]"]
+        slow_row["median_ms"] = slow_row["median_ms"] * 2 + 5
+        slower["results"]["scope.customers[TEAM]"]["queries"] += 1
+        regressions = {row["name"] for row in compare_reports(report, slower) if row["status"] == "regression"}
+        self.assertEqual(regressions, {"endpoint.crm_client_list[SALES]", "scope.customers[TEAM]"})
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from customer_management.models import Customer, CustomerHandler, StatsCacheVersion
+from customer_management.services import customer_stats_service
+from customer_management.views.crm.client_views import _filter_by_scope, _resolve_data_scope
+from dvadmin.system.models import Users
+
+
+class CustomerStatsTestCase(TestCase):
+    """客户统计：数据范围与缓存键同源，版本号存数据库供所有进程共享"""
+
+    def setUp(self):
+        cache.clear()
+        self.sales = Users.objects.create(username='stats_sales', name='销售', role_level='SALES')
+        self.team_lead = Users.objects.create(username='stats_team', name='团队', role_level='TEAM', team_id=7)
+        self.hq = Users.objects.create(username='stats_hq', name='总部', role_level='HQ')
+        for index in range(3):
+            customer = Customer.objects.create(name=f'统计客户{index}', client_category='construction', team_id=7)
+            if index < 2:
+                CustomerHandler.objects.create(customer=customer, user=self.sales, is_primary=True)
+        Customer.objects.create(name='其他团队客户', client_category='construction', team_id=8)
+
+    def _stats(self, user):
+        scope = _resolve_data_scope(user)
+        queryset = _filter_by_scope(Customer.objects.filter(is_deleted=False), scope)
+        return customer_stats_service.get_customer_stats(queryset, scope)
+
+    def test_scope_resolution(self):
+        self.assertEqual(_resolve_data_scope(self.hq), ('HQ',))
+        self.assertEqual(_resolve_data_scope(self.team_lead), ('TEAM', 7))
+        self.assertEqual(_resolve_data_scope(self.sales), ('SELF', self.sales.id))
+        self.assertEqual([self._stats(user)['total_clients'] for user in (self.hq, self.team_lead, self.sales)],
+                         [4, 3, 2])
+
+        lost = Users(username='stats_lost', name='无团队', role_level='TEAM')
+        self.assertFalse(_filter_by_scope(Customer.objects.all(), _resolve_data_scope(lost)).exists())
+
+    def test_cached_until_customers_change(self):
+        self.assertEqual(self._stats(self.team_lead)['total_clients'], 3)
+        # 命中缓存时只读取一次版本号
+        with self.assertNumQueries(1):
+            self.assertEqual(self._stats(self.team_lead)['total_clients'], 3)
+
+        Customer.objects.create(name='新增客户', client_category='construction', team_id=7)
+        self.assertEqual(self._stats(self.team_lead)['total_clients'], 4)
+
+        customer = Customer.objects.filter(team_id=7).exclude(handlers=self.sales).first()
+        CustomerHandler.objects.create(customer=customer, user=self.sales, is_primary=True)
+        self.assertEqual(self._stats(self.sales)['total_clients'], 3)
+
+    def test_version_shared_across_processes(self):
+        self.assertEqual(self._stats(self.hq)['total_clients'], 4)
+        # 其他 worker 写入后只递增了数据库中的版本号，本进程的本地缓存仍在
+        Customer.objects.bulk_create([Customer(name='批量客户', client_category='construction')])
+        self.assertEqual(self._stats(self.hq)['total_clients'], 4)
+        StatsCacheVersion.bump(customer_stats_service.STATS_CACHE_VERSION_NAME)
+        self.assertEqual(self._stats(self.hq)['total_clients'], 5)
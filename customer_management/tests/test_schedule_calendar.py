@@ -0,0 +1,144 @@
+from datetime import date, datetime, timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from customer_management.models import Schedule
+from customer_management.serializers import ScheduleListSerializer
+from customer_management.services import schedule_calendar_service, schedule_recurrence_service
+from dvadmin.system.models import Users
+
+
+def _aware(year, month, day, hour=0, minute=0):
+    return timezone.make_aware(datetime(year, month, day, hour, minute))
+
+
+def _legacy_month(queryset, year, month, last_day):
+    """改造前 calendar_view 的逐日查询实现，仅用于基准对比"""
+    start_date = date(year, month, 1)
+    end_date = date(year, month, last_day)
+    schedules = queryset.filter(start_time__date__lte=end_date).filter(
+        Q(end_time__date__gte=start_date) | Q(end_time__isnull=True)
+    )
+    days = []
+    for day in range(1, last_day + 1):
+        current_date = date(year, month, day)
+        day_schedules = schedules.filter(start_time__date__lte=current_date).filter(
+            Q(end_time__date__gte=current_date) | Q(end_time__isnull=True, start_time__date=current_date)
+        )
+        days.append({
+            'date': current_date.strftime('%Y-%m-%d'),
+            'schedules': ScheduleListSerializer(day_schedules, many=True).data,
+            'count': day_schedules.count(),
+        })
+    return days
+
+
+class ScheduleCalendarTestCase(TestCase):
+    """日历构建测试：跨天、全天日程分桶正确，查询次数固定"""
+
+    def setUp(self):
+        self.user = Users.objects.create(username='calendar_user', name='日历', role_level='SALES')
+
+    def _create(self, title, start, end=None, all_day=False):
+        return Schedule.objects.create(
+            title=title, schedule_type='meeting', start_time=start, end_time=end,
+            is_all_day=all_day, creator=self.user,
+        )
+
+    def _queryset(self):
+        return Schedule.objects.filter(is_deleted=False, creator=self.user)
+
+    def _titles_by_date(self, days):
+        return {day['date']: [item['title'] for item in day['schedules']] for day in days}
+
+    def test_multi_day_and_all_day_bucketing(self):
+        self._create('单日', _aware(2025, 3, 5, 9), _aware(2025, 3, 5, 10))
+        self._create('跨天', _aware(2025, 3, 10, 20), _aware(2025, 3, 12, 8))
+        self._create('全天', _aware(2025, 3, 15), _aware(2025, 3, 17), all_day=True)
+        self._create('无结束', _aware(2025, 3, 20, 14))
+        self._create('跨月', _aware(2025, 2, 27, 9), _aware(2025, 3, 2, 9))
+
+        with self.assertNumQueries(1):
+            result = schedule_calendar_service.build_month(self._queryset(), 2025, 3)
+        titles = self._titles_by_date(result['days'])
+
+        self.assertEqual(len(result['days']), 31)
+        self.assertEqual(titles['2025-03-01'], ['跨月'])
+        self.assertEqual(titles['2025-03-02'], ['跨月'])
+        self.assertEqual(titles['2025-03-03'], [])
+        self.assertEqual(titles['2025-03-05'], ['单日'])
+        for day in ('2025-03-10', '2025-03-11', '2025-03-12'):
+            self.assertEqual(titles[day], ['跨天'])
+        self.assertEqual(titles['2025-03-13'], [])
+        # 全天日程结束于零点时不包含结束当天
+        self.assertEqual(titles['2025-03-16'], ['全天'])
+        self.assertEqual(titles['2025-03-17'], [])
+        self.assertEqual(titles['2025-03-20'], ['无结束'])
+        self.assertEqual(titles['2025-03-21'], [])
+
+    def test_same_day_keeps_schedule_ordering(self):
+        # 与 Schedule.Meta.ordering 一致：开始时间倒序，相同开始时间按 ID 倒序
+        self._create('上午', _aware(2025, 3, 5, 9))
+        self._create('下午', _aware(2025, 3, 5, 14))
+        self._create('下午2', _aware(2025, 3, 5, 14))
+        self._create('跨天', _aware(2025, 3, 4, 20), _aware(2025, 3, 5, 8))
+
+        titles = self._titles_by_date(schedule_calendar_service.build_month(self._queryset(), 2025, 3)['days'])
+        self.assertEqual(titles['2025-03-05'], ['下午2', '下午', '上午', '跨天'])
+        self.assertEqual(
+            titles['2025-03-05'],
+            [schedule.title for schedule in self._queryset().filter(start_time__date__lte=date(2025, 3, 5))],
+        )
+
+    def test_week_and_agenda_views(self):
+        self._create('周一', _aware(2025, 3, 10, 9))
+        self._create('周日', _aware(2025, 3, 16, 9))
+        self._create('下周', _aware(2025, 3, 18, 9))
+
+        with self.assertNumQueries(1):
+            week = schedule_calendar_service.build_week(self._queryset(), date(2025, 3, 12))
+        self.assertEqual(week['week_start'], '2025-03-10')
+        self.assertEqual(len(week['days']), 7)
+        self.assertEqual(sum(day['count'] for day in week['days']), 2)
+
+        with self.assertNumQueries(1):
+            agenda = schedule_calendar_service.build_agenda(self._queryset(), date(2025, 3, 10), days=14)
+        self.assertEqual([day['date'] for day in agenda['days']], ['2025-03-10', '2025-03-16', '2025-03-18'])
+
+
+class ScheduleCalendarBenchmarkTestCase(TestCase):
+    """月视图基准：对比改造前后的查询次数，结果与顺序保持一致（耗时对比见 scripts/benchmark_schedule_calendar.py）"""
+
+    def setUp(self):
+        self.user = Users.objects.create(username='calendar_bench', name='基准', role_level='SALES')
+        Schedule.objects.bulk_create([
+            Schedule(
+                title=f'日程{index}', schedule_type='meeting', creator=self.user,
+                start_time=_aware(2025, 5, 1 + index % 31, 8 + index % 10),
+                end_time=_aware(2025, 5, 1 + index % 31, 8 + index % 10) + timedelta(hours=1 + (index % 7) * 12),
+            )
+            for index in range(400)
+        ])
+        # bulk_create 不触发信号，手动物化发生实例
+        schedule_recurrence_service.refresh_occurrences()
+
+    def test_month_benchmark(self):
+        queryset = Schedule.objects.filter(is_deleted=False, creator=self.user)
+
+        with CaptureQueriesContext(connection) as legacy_queries:
+            legacy = _legacy_month(queryset, 2025, 5, 31)
+        with CaptureQueriesContext(connection) as new_queries:
+            result = schedule_calendar_service.build_month(queryset, 2025, 5)
+
+        self.assertEqual(len(new_queries.captured_queries), 1)
+        self.assertGreater(len(legacy_queries.captured_queries), 31)
+        self.assertEqual([day['count'] for day in result['days']], [day['count'] for day in legacy])
+        # 每天的日程及其顺序与改造前一致
+        self.assertEqual(
+            [[item['id'] for item in day['schedules']] for day in result['days']],
+            [[item['id'] for item in day['schedules']] for day in legacy],
+        )
@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from customer_management.models import Schedule, ScheduleOccurrence
+from customer_management.services import schedule_calendar_service, schedule_recurrence_service
+from dvadmin.system.models import Users
+
+
+def _aware(day, hour=9):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+
+
+class ScheduleRecurrenceExpandTestCase(TestCase):
+    """重复规则展开测试（不落库）"""
+
+    window = (_aware(date(2020, 1, 1)), _aware(date(2030, 1, 1)))
+
+    def _dates(self, start, rule, end=None):
+        schedule = Schedule(title='重复', schedule_type='meeting', start_time=start, end_time=end, recurrence_rule=rule)
+        return [
+            (sequence, timezone.localtime(occ_start).date())
+            for sequence, occ_start, _ in schedule_recurrence_service.expand(schedule, *self.window)
+        ]
+
+    def test_daily_count_with_exception(self):
+        result = self._dates(_aware(date(2025, 3, 1)), {'freq': 'daily', 'count': 5, 'exdates': ['2025-03-03']})
+        self.assertEqual(result, [
+            (0, date(2025, 3, 1)), (1, date(2025, 3, 2)), (3, date(2025, 3, 4)), (4, date(2025, 3, 5)),
+        ])
+
+    def test_weekly_byweekday_until(self):
+        # 2025-03-03 为周一
+        result = self._dates(_aware(date(2025, 3, 3)), {'freq': 'weekly', 'byweekday': [0, 2], 'until': '2025-03-12'})
+        self.assertEqual([day for _, day in result], [
+            date(2025, 3, 3), date(2025, 3, 5), date(2025, 3, 10), date(2025, 3, 12),
+        ])
+
+    def test_monthly_skips_missing_days_and_supports_last_day(self):
+        result = self._dates(_aware(date(2025, 1, 31)), {'freq': 'monthly', 'count': 3})
+        self.assertEqual([day for _, day in result], [date(2025, 1, 31), date(2025, 3, 31), date(2025, 5, 31)])
+
+        result = self._dates(_aware(date(2025, 1, 31)), {'freq': 'monthly', 'bymonthday': [-1], 'count': 3})
+        self.assertEqual([day for _, day in result], [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)])
+
+    def test_rule_without_valid_dates_terminates(self):
+        # 每 12 个月的 30 日，首日在 2 月：之后每个周期都落在 2 月，永远没有候选日期
+        rule = {'freq': 'monthly', 'interval': 12, 'bymonthday': [30], 'until': '2026-12-31'}
+        self.assertEqual(self._dates(_aware(date(2026, 2, 10)), rule), [])
+
+        # 没有截止日期时由展开窗口结束
+        rule = {'freq': 'yearly', 'interval': 4}
+        result = self._dates(_aware(date(2021, 2, 28)), rule)
+        self.assertEqual([day for _, day in result], [date(2021, 2, 28), date(2025, 2, 28), date(2029, 2, 28)])
+
+        # 既无截止日期也无窗口时，连续空周期达到上限即停止
+        days = schedule_recurrence_service._iter_dates(date(2026, 2, 10), {
+            'freq': 'monthly', 'interval': 12, 'bymonthday': [30],
+        })
+        self.assertEqual(list(days), [])
+
+    def test_duration_and_invalid_rule(self):
+        start = _aware(date(2025, 3, 1), 9)
+        schedule = Schedule(title='重复', schedule_type='meeting', start_time=start, end_time=start + timedelta(hours=2),
+                            recurrence_rule={'freq': 'daily', 'interval': 2, 'count': 2})
+        occurrences = schedule_recurrence_service.expand(schedule, *self.window)
+        self.assertEqual(occurrences[1][1], start + timedelta(days=2))
+        self.assertEqual(occurrences[1][2] - occurrences[1][1], timedelta(hours=2))
+
+        self.assertEqual(len(self._dates(start, {'freq': 'hourly'})), 1)
+        self.assertEqual(len(self._dates(start, None)), 1)
+
+
+class ScheduleOccurrenceSyncTestCase(TestCase):
+    """物化实例增量刷新与日历读取测试"""
+
+    def setUp(self):
+        self.user = Users.objects.create(username='recurrence_user', name='重复', role_level='SALES')
+        self.start_day = timezone.localdate() + timedelta(days=3)
+
+    def _create(self, rule):
+        return Schedule.objects.create(
+            title='周会', schedule_type='meeting', start_time=_aware(self.start_day),
+            end_time=_aware(self.start_day, 10), recurrence_rule=rule, creator=self.user,
+        )
+
+    def test_materialized_on_save_and_refreshed_incrementally(self):
+        schedule = self._create({'freq': 'daily', 'count': 5})
+        original_ids = list(schedule.occurrences.order_by('start_time').values_list('id', flat=True))
+        self.assertEqual(len(original_ids), 5)
+
+        schedule.recurrence_rule = {'freq': 'daily', 'count': 3}
+        schedule.save()
+        kept_ids = list(schedule.occurrences.order_by('start_time').values_list('id', flat=True))
+        self.assertEqual(kept_ids, original_ids[:3])
+
+        changes = schedule_recurrence_service.sync_occurrences(schedule)
+        self.assertEqual(changes, {'created': 0, 'updated': 0, 'deleted': 0})
+
+    def test_horizon_limits_unbounded_rules(self):
+        schedule = self._create({'freq': 'daily'})
+        with self.settings(SCHEDULE_RECURRENCE_HORIZON_DAYS=30):
+            schedule_recurrence_service.sync_occurrences(schedule, now=_aware(timezone.localdate(), 12))
+        # 展开到 今天+30 天 12:00 为止：第 3 天至第 30 天
+        self.assertEqual(schedule.occurrences.count(), 28)
+
+    def test_soft_delete_removes_occurrences(self):
+        schedule = self._create({'freq': 'weekly', 'count': 4})
+        schedule.delete()
+        self.assertFalse(ScheduleOccurrence.objects.filter(schedule_id=schedule.id).exists())
+
+    def test_calendar_reads_occurrences_in_one_query(self):
+        self._create({'freq': 'daily', 'count': 3})
+        queryset = Schedule.objects.filter(is_deleted=False, creator=self.user)
+        with self.assertNumQueries(1):
+            agenda = schedule_calendar_service.build_agenda(queryset, self.start_day, days=7)
+        self.assertEqual(len(agenda['days']), 3)
+        self.assertEqual([day['schedules'][0]['sequence'] for day in agenda['days']], [0, 1, 2])
@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from customer_management.models import Schedule, ScheduleReminder
+from customer_management.services import schedule_reminder_dispatcher as dispatcher
+from dvadmin.system.models import Users
+
+IN_MEMORY_BACKEND = {
+    'BACKEND': 'customer_management.services.schedule_reminder_dispatcher.InMemoryReminderBackend',
+    'BATCH_SIZE': 2,
+    'MAX_ATTEMPTS': 2,
+    'RETRY_BACKOFF': 60,
+}
+
+
+@override_settings(SCHEDULE_REMINDER_DISPATCH=IN_MEMORY_BACKEND)
+class ScheduleReminderDispatchTestCase(TestCase):
+    """日程提醒调度测试：生成、分组投递、失败重试"""
+
+    def setUp(self):
+        dispatcher.InMemoryReminderBackend.clear()
+        self.now = timezone.now()
+        self.alice = Users.objects.create(username='reminder_alice', name='甲', role_level='SALES')
+        self.bob = Users.objects.create(username='reminder_bob', name='乙', role_level='SALES')
+
+    def _schedule(self, user, minutes_ahead, method='system'):
+        return Schedule.objects.create(
+            title=f'{user.name}-{minutes_ahead}', schedule_type='meeting', creator=user,
+            start_time=self.now + timedelta(minutes=minutes_ahead),
+            reminder_enabled=True, reminder_time=30, reminder_method=method,
+        )
+
+    def test_enqueue_is_idempotent(self):
+        self._schedule(self.alice, 20, method='system,email')
+        self._schedule(self.alice, 120)
+        self.assertEqual(dispatcher.enqueue_due_reminders(now=self.now), 2)
+        self.assertEqual(dispatcher.enqueue_due_reminders(now=self.now), 0)
+        self.assertEqual(dispatcher.enqueue_due_reminders(now=self.now, lookahead_minutes=120), 1)
+
+    def test_dispatch_groups_by_recipient_and_channel(self):
+        for minutes in (10, 15, 20):
+            self._schedule(self.alice, minutes)
+        self._schedule(self.bob, 10)
+        dispatcher.enqueue_due_reminders(now=self.now)
+
+        totals = dispatcher.dispatch_due_reminders(now=self.now)
+        self.assertEqual(totals, {'claimed': 4, 'sent': 4, 'retry': 0, 'failed': 0})
+        # 每批 2 条：共 2 批，每批按接收人分组
+        outbox = dispatcher.InMemoryReminderBackend.outbox
+        self.assertEqual(sum(len(item['reminder_ids']) for item in outbox), 4)
+        self.assertTrue(all(item['channel'] == 'system' for item in outbox))
+        self.assertFalse(ScheduleReminder.objects.filter(is_sent=False).exists())
+        self.assertEqual(set(ScheduleReminder.objects.values_list('status', flat=True)), {'sent'})
+
+        # 已发送的提醒不会被再次认领
+        self.assertEqual(dispatcher.claim_batch(10, now=self.now), [])
+
+    def test_failed_delivery_retries_with_backoff_then_fails(self):
+        self._schedule(self.alice, 10, method='sms')
+        dispatcher.enqueue_due_reminders(now=self.now)
+        backend = dispatcher.InMemoryReminderBackend(fail_channels={'sms'})
+
+        totals = dispatcher.dispatch_due_reminders(backend=backend, now=self.now)
+        self.assertEqual(totals['retry'], 1)
+        reminder = ScheduleReminder.objects.get()
+        self.assertEqual(reminder.status, ScheduleReminder.STATUS_PENDING)
+        self.assertEqual(reminder.attempts, 1)
+        self.assertEqual(reminder.next_attempt_time, self.now + timedelta(seconds=60))
+        self.assertIn('sms', reminder.error_message)
+
+        # 退避时间未到不会被认领
+        self.assertEqual(dispatcher.claim_batch(10, now=self.now + timedelta(seconds=30)), [])
+
+        later = self.now + timedelta(seconds=61)
+        totals = dispatcher.dispatch_due_reminders(backend=backend, now=later)
+        self.assertEqual(totals['failed'], 1)
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, ScheduleReminder.STATUS_FAILED)
+        self.assertEqual(reminder.attempts, 2)
+
+    def test_expired_lease_is_reclaimed(self):
+        self._schedule(self.alice, 10)
+        dispatcher.enqueue_due_reminders(now=self.now)
+        claimed = dispatcher.claim_batch(10, now=self.now)
+        self.assertEqual(len(claimed), 1)
+        # 认领后 worker 未回写结果：租约内不可再认领，过期后可重新认领
+        self.assertEqual(dispatcher.claim_batch(10, now=self.now + timedelta(seconds=10)), [])
+        self.assertEqual(len(dispatcher.claim_batch(10, now=self.now + timedelta(seconds=301))), 1)
+
+    def test_wechat_not_marked_sent(self):
+        self._schedule(self.alice, 10, method='wechat')
+        dispatcher.enqueue_due_reminders(now=self.now)
+
+        totals = dispatcher.dispatch_due_reminders(backend=dispatcher.NotificationServiceBackend(), now=self.now)
+        self.assertEqual(totals['retry'], 1)
+        reminder = ScheduleReminder.objects.get()
+        self.assertFalse(reminder.is_sent)
+        self.assertIn('wechat', reminder.error_message)
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from customer_management.models import Schedule
+from customer_management.services import schedule_stats_service
+from dvadmin.system.models import Users
+
+
+class ScheduleStatisticsTestCase(TestCase):
+    """日程统计测试：所有分布一次查询完成，结果可缓存"""
+
+    def setUp(self):
+        self.user = Users.objects.create(username='schedule_stats', name='统计', role_level='SALES')
+        now = timezone.now()
+        rows = [
+            ('meeting', 'pending', 'high', now + timedelta(days=1)),
+            ('meeting', 'completed', 'medium', now - timedelta(days=2)),
+            ('court', 'pending', 'urgent', now - timedelta(days=1)),
+            ('deadline', 'cancelled', 'low', now + timedelta(days=30)),
+        ]
+        for schedule_type, status, priority, start_time in rows:
+            Schedule.objects.create(
+                title=f'{schedule_type}-{status}', schedule_type=schedule_type, status=status,
+                priority=priority, start_time=start_time, creator=self.user,
+            )
+
+    def _queryset(self):
+        return Schedule.objects.filter(is_deleted=False, creator=self.user)
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            stats = schedule_stats_service.get_schedule_stats(self._queryset(), use_cache=False)
+
+        self.assertEqual(stats['total_count'], 4)
+        self.assertEqual(stats['by_type'], {'meeting': 2, 'court': 1, 'deadline': 1})
+        self.assertEqual(stats['by_status'], {'pending': 2, 'completed': 1, 'cancelled': 1})
+        self.assertEqual(stats['by_priority'], {'low': 1, 'medium': 1, 'high': 1, 'urgent': 1})
+        self.assertEqual(stats['upcoming_count'], 1)
+        self.assertEqual(stats['overdue_count'], 1)
+
+    def test_query_count_independent_of_choices(self):
+        extra_types = Schedule.SCHEDULE_TYPE_CHOICES + [(f'extra_{i}', f'扩展{i}') for i in range(20)]
+        breakdowns = (('by_type', 'schedule_type', extra_types),) + schedule_stats_service.BREAKDOWNS[1:]
+        with mock.patch.object(schedule_stats_service, 'BREAKDOWNS', breakdowns):
+            with self.assertNumQueries(1):
+                stats = schedule_stats_service.get_schedule_stats(self._queryset(), use_cache=False)
+        self.assertEqual(stats['by_type'], {'meeting': 2, 'court': 1, 'deadline': 1})
+
+    def test_cache_keyed_by_user_and_window(self):
+        args = dict(user_id=self.user.id, start_date='2000-01-01', end_date='2100-01-01')
+        first = schedule_stats_service.get_schedule_stats(self._queryset(), **args)
+        # 命中缓存时只读取数据库中的版本号
+        with self.assertNumQueries(1):
+            cached = schedule_stats_service.get_schedule_stats(self._queryset(), **args)
+        self.assertEqual(first, cached)
+
+        # 日程变更后缓存失效
+        Schedule.objects.create(title='新增', schedule_type='other', start_time=timezone.now(), creator=self.user)
+        with self.assertNumQueries(2):
+            fresh = schedule_stats_service.get_schedule_stats(self._queryset(), **args)
+        self.assertEqual(fresh['total_count'], 5)
@@ -24,6 +24,8 @@ from customer_management.serializers import (
     SendEmailSerializer,
 )
 from customer_management.services.notification_service import SMSService, EmailService
+from customer_management.services.schedule_stats_service import get_schedule_stats
+from customer_management.services import schedule_calendar_service
 from customer_management.mixins import RoleBasedFilterMixin
 
 
@@ -246,60 +248,24 @@ class ScheduleViewSet(RoleBasedFilterMixin, CustomModelViewSet):
 
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """获取日程统计"""
-        queryset = self.get_queryset()
-        
-        # 时间范围筛选
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        
-        if start_date:
-            queryset = queryset.filter(start_time__date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(start_time__date__lte=end_date)
-        
-        # 按类型统计
-        by_type = {}
-        for type_value, type_label in Schedule.SCHEDULE_TYPE_CHOICES:
-            count = queryset.filter(schedule_type=type_value).count()
-            if count > 0:
-                by_type[type_value] = count
-        
-        # 按状态统计
-        by_status = {}
-        for status_value, status_label in Schedule.STATUS_CHOICES:
-            count = queryset.filter(status=status_value).count()
-            if count > 0:
-                by_status[status_value] = count
-        
-        # 按优先级统计
-        by_priority = {}
-        for priority_value, priority_label in Schedule.PRIORITY_CHOICES:
-            count = queryset.filter(priority=priority_value).count()
-            if count > 0:
-                by_priority[priority_value] = count
-        
-        # 即将到来的日程数量（未来7天）
-        upcoming_count = queryset.filter(
-            start_time__gte=timezone.now(),
-            start_time__lte=timezone.now() + timedelta(days=7),
-            status='pending'
-        ).count()
-        
-        # 逾期日程数量
-        overdue_count = queryset.filter(
-            start_time__lt=timezone.now(),
-            status='pending'
-        ).count()
-        
-        return SuccessResponse(data={
-            'total_count': queryset.count(),
-            'by_type': by_type,
-            'by_status': by_status,
-            'by_priority': by_priority,
-            'upcoming_count': upcoming_count,
-            'overdue_count': overdue_count
-        })
+        """
+        获取日程统计
+
+        所有分布在一次条件聚合查询中得到；默认按用户与日期窗口缓存，传 refresh=1 跳过缓存
+        """
+        refresh = request.query_params.get('refresh') in ('1', 'true')
+        # get_queryset 的 start_time_after/before 也会收窄范围，此时不走缓存以免键冲突
+        has_time_filter = any(
+            request.query_params.get(key) for key in ('start_time_after', 'start_time_before')
+        )
+        stats = get_schedule_stats(
+            self.get_queryset(),
+            user_id=getattr(request.user, 'id', None),
+            start_date=request.query_params.get('start_date'),
+            end_date=request.query_params.get('end_date'),
+            use_cache=not (refresh or has_time_filter),
+        )
+        return SuccessResponse(data=stats)
     
     @action(detail=False, methods=['post'])
     def create_from_customer_plan(self, request):
@@ -364,8 +330,9 @@ class ScheduleViewSet(RoleBasedFilterMixin, CustomModelViewSet):
                 'remind_time': reminder.remind_time.isoformat() if reminder.remind_time else None,
                 'remind_method': reminder.remind_method,
                 'is_sent': reminder.is_sent,
-                'sent_at': reminder.sent_at.isoformat() if reminder.sent_at else None,
+                'sent_at': reminder.sent_time.isoformat() if reminder.sent_time else None,
                 'status': reminder.status,
+                'attempts': reminder.attempts,
                 'error_message': reminder.error_message
             })
         
@@ -423,7 +390,27 @@ class ScheduleViewSet(RoleBasedFilterMixin, CustomModelViewSet):
     
     @action(detail=False, methods=['get'])
     def calendar_view(self, request):
-        """日历视图数据"""
+        """
+        日历视图数据
+
+        view=month（默认，需 year、month）/ week（date，默认今天）/ agenda（start_date、days）；
+        整个时间窗口只查询一次，在内存中按本地日期分桶
+        """
+        view = request.query_params.get('view', 'month')
+        queryset = self.get_queryset()
+        
+        if view in ('week', 'agenda'):
+            param = 'date' if view == 'week' else 'start_date'
+            raw_date = request.query_params.get(param)
+            try:
+                anchor = datetime.strptime(raw_date, '%Y-%m-%d').date() if raw_date else timezone.localdate()
+                days = int(request.query_params.get('days', 14))
+            except ValueError:
+                return ErrorResponse(msg=f"{param} 格式应为 YYYY-MM-DD，days 必须是整数")
+            if view == 'week':
+                return SuccessResponse(data=schedule_calendar_service.build_week(queryset, anchor))
+            return SuccessResponse(data=schedule_calendar_service.build_agenda(queryset, anchor, days))
+        
         year = request.query_params.get('year')
         month = request.query_params.get('month')
         
@@ -436,40 +423,10 @@ class ScheduleViewSet(RoleBasedFilterMixin, CustomModelViewSet):
         except ValueError:
             return ErrorResponse(msg="year 和 month 必须是整数")
         
-        # 获取该月的第一天和最后一天
-        from calendar import monthrange
-        _, last_day = monthrange(year, month)
+        if not 1 <= month <= 12:
+            return ErrorResponse(msg="month 必须在 1-12 之间")
         
-        start_date = datetime(year, month, 1).date()
-        end_date = datetime(year, month, last_day).date()
-        
-        schedules = self.get_queryset().filter(
-            start_time__date__lte=end_date
-        ).filter(
-            Q(end_time__date__gte=start_date) | Q(end_time__isnull=True)
-        )
-        
-        # 按日期组织数据
-        days = []
-        for day in range(1, last_day + 1):
-            current_date = datetime(year, month, day).date()
-            day_schedules = schedules.filter(
-                start_time__date__lte=current_date
-            ).filter(
-                Q(end_time__date__gte=current_date) | Q(end_time__isnull=True, start_time__date=current_date)
-            )
-            
-            days.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'schedules': ScheduleListSerializer(day_schedules, many=True).data,
-                'count': day_schedules.count()
-            })
-        
-        return SuccessResponse(data={
-            'year': year,
-            'month': month,
-            'days': days
-        })
+        return SuccessResponse(data=schedule_calendar_service.build_month(queryset, year, month))
 
     
     @action(detail=False, methods=['post'], url_path='notification/sms/send')
@@ -6,7 +6,7 @@ CRM客户管理视图
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.db import transaction
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 from datetime import datetime, time, timedelta
@@ -16,6 +16,7 @@ import random
 from customer_management.models import Customer, CustomerPlan
 from customer_management.models.contract import Contract, RecoveryPayment, LegalFee
 from customer_management.services.customer_service import CustomerService
+from customer_management.services.customer_stats_service import get_customer_stats
 from case_management.services.case_service import (
     create_case_from_contract_data,
     create_case_from_effective_case,
@@ -247,21 +248,37 @@ def _generate_mock_clients(status_filter=None, sales_stage_filter=None):
     return mock_clients
 
 
-def _apply_data_scope(queryset, user):
+def _resolve_data_scope(user):
+    """
+    解析用户的数据范围：("HQ",)、("BRANCH", 分所ID)、("TEAM", 团队ID) 或 ("SELF", 用户ID)
+
+    同时作为统计缓存的范围标识，过滤条件与缓存键由同一结果得出。
+    """
     scope = getattr(user, 'role_level', None) or getattr(user, 'org_scope', None)
     if scope == 'HQ':
-        return queryset
+        return ('HQ',)
     if scope == 'BRANCH':
-        branch_id = getattr(user, 'branch_id', None) or getattr(user, 'dept_id', None)
-        if branch_id:
-            return queryset.filter(branch_id=branch_id)
-        return queryset.none()
+        return ('BRANCH', getattr(user, 'branch_id', None) or getattr(user, 'dept_id', None))
     if scope == 'TEAM':
-        team_id = getattr(user, 'team_id', None) or getattr(user, 'dept_id', None)
-        if team_id:
-            return queryset.filter(team_id=team_id)
+        return ('TEAM', getattr(user, 'team_id', None) or getattr(user, 'dept_id', None))
+    return ('SELF', user.id)
+
+
+def _filter_by_scope(queryset, scope):
+    kind = scope[0]
+    if kind == 'HQ':
+        return queryset
+    if kind == 'SELF':
+        return queryset.filter(handlers=scope[1])
+    if not scope[1]:
         return queryset.none()
-    return queryset.filter(handlers=user)
+    if kind == 'BRANCH':
+        return queryset.filter(branch_id=scope[1])
+    return queryset.filter(team_id=scope[1])
+
+
+def _apply_data_scope(queryset, user):
+    return _filter_by_scope(queryset, _resolve_data_scope(user))
 
 
 def _parse_datetime_value(value, end_of_day=False):
@@ -488,41 +505,11 @@ def get_stats(request):
     GET /crm/client/stats
     """
     try:
-        queryset = Customer.objects.filter(is_deleted=False)
-        queryset = _apply_data_scope(queryset, request.user)
+        scope = _resolve_data_scope(request.user)
+        queryset = _filter_by_scope(Customer.objects.filter(is_deleted=False), scope)
 
-        status_keys = [
-            Customer.STATUS_PUBLIC_POOL,
-            Customer.STATUS_FOLLOW_UP,
-            Customer.STATUS_CASE,
-            Customer.STATUS_PAYMENT,
-            Customer.STATUS_WON,
-        ]
-        status_counts = {key: 0 for key in status_keys}
-        for item in queryset.values('status').annotate(total=Count('id')):
-            status = item['status']
-            if status in status_counts:
-                status_counts[status] = item['total']
-
-        sales_stage_keys = [
-            Customer.SALES_STAGE_PUBLIC,
-            Customer.SALES_STAGE_BLANK,
-            Customer.SALES_STAGE_MEETING,
-            Customer.SALES_STAGE_CASE,
-            Customer.SALES_STAGE_PAYMENT,
-            Customer.SALES_STAGE_WON,
-        ]
-        sales_stage_counts = {key: 0 for key in sales_stage_keys}
-        for item in queryset.values('sales_stage').annotate(total=Count('id')):
-            stage = item['sales_stage']
-            if stage in sales_stage_counts:
-                sales_stage_counts[stage] = item['total']
-
-        stats = {
-            'total_clients': queryset.count(),
-            'status_counts': status_counts,
-            'sales_stage_counts': sales_stage_counts,
-        }
+        # 一次条件聚合得到状态/展业状态分布和总数，按数据范围缓存
+        stats = get_customer_stats(queryset, scope)
 
         return DetailResponse(data=stats)
     except Exception as e:
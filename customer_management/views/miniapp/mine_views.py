@@ -10,10 +10,11 @@ from django.db.models import Q
 from django.utils import timezone
 import json
 
-from customer_management.models import ApprovalTask, ApprovalHistory, Customer, TransferLog
+from customer_management.models import ApprovalTask, Customer, TransferLog
 from case_management.models import CaseManagement
 from case_management.services.case_service import generate_case_number
 from customer_management.services.approval_service import ApprovalService
+from customer_management.services import approval_inbox_service
 from customer_management.services.customer_service import CustomerService
 from dvadmin.utils.json_response import DetailResponse, ErrorResponse
 from dvadmin.system.models import Users, Dept
@@ -200,138 +201,27 @@ def get_approval_list(request):
     try:
         user = request.user
         
-        role_level = getattr(user, 'role_level', None) or getattr(user, 'org_scope', None)
         status = request.query_params.get('status', 'pending')
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('pageSize', 20))
+        cursor = request.query_params.get('cursor')
         
-        # 构建查询
-        if role_level == 'HQ':
-            # HQ可以看到所有审批申请
-            if status == 'pending':
-                # 待审批：返回所有待审批的任务（不管current_approver_role是什么，HQ都能看到）
-                # 这样可以兼容旧的审批任务（之前是TEAM/BRANCH审批）和新任务（直接提交给HQ）
-                queryset = ApprovalTask.objects.filter(status='pending')
-            else:
-                # 已处理：返回所有已处理的任务（HQ可以看到所有审批历史）
-                queryset = ApprovalTask.objects.filter(
-                    status__in=['approved', 'rejected']
-                )
-        else:
-            # 非HQ用户只能查看自己作为申请人的审批任务
-            if status == 'pending':
-                # 待审批：返回自己提交的待审批任务
-                queryset = ApprovalTask.objects.filter(
-                    status='pending',
-                    applicant=user
-                )
-            else:
-                # 已处理：返回自己提交的已处理任务（包括已通过和已驳回）
-                queryset = ApprovalTask.objects.filter(
-                    status__in=['approved', 'rejected'],
-                    applicant=user
-                )
+        # HQ可以看到所有审批申请（兼容旧的TEAM/BRANCH审批任务），非HQ用户只能查看自己提交的任务
+        queryset = approval_inbox_service.build_inbox_queryset(user, status)
         
-        # 分页
+        # 分页：传 cursor 时按 (create_datetime, id) 游标分页，否则按页码分页
         total = queryset.count()
-        start = (page - 1) * page_size
-        end = start + page_size
-        tasks = queryset[start:end]
+        tasks, next_cursor = approval_inbox_service.fetch_page(
+            queryset, cursor=cursor, page=page, page_size=page_size
+        )
         
-        # 构建响应数据
-        rows = []
-        for task in tasks:
-            # 安全地获取客户信息，避免客户被删除导致的异常
-            client_id = None
-            client_name = None
-            related_data = task.related_data or {}
-            
-            try:
-                # 尝试访问 related_customer，如果客户不存在，会抛出 DoesNotExist 异常
-                # 使用 try-except 包装，避免访问已删除的客户导致异常
-                if hasattr(task, 'related_customer_id') and task.related_customer_id:
-                    try:
-                        # 直接访问 task.related_customer 会触发数据库查询
-                        # 如果客户不存在（被删除），会抛出 Customer.DoesNotExist
-                        related_customer = task.related_customer
-                        if related_customer:
-                            client_id = str(related_customer.id)
-                            client_name = related_customer.name
-                    except Exception:
-                        # 如果客户不存在（被删除），忽略异常，后续从 related_data 获取
-                        pass
-            except Exception:
-                # 外层异常捕获，确保不会中断整个循环
-                pass
-            
-            # 如果从 related_customer 没有获取到信息，从 related_data 获取
-            if not client_id and not client_name:
-                if task.approval_type == 'LEAD_CLAIM':
-                    client_id = str(related_data.get('client_id', ''))
-                    client_name = related_data.get('name', '')
-                elif task.approval_type == 'LEAD_CREATE' and related_data.get('form'):
-                    client_name = related_data.get('form', {}).get('client_name', '')
-            
-            # 获取审批历史
-            histories = ApprovalHistory.objects.filter(approval_task=task).order_by('approval_time')
-            history_list = []
-            for hist in histories:
-                history_list.append({
-                    'step_role': hist.approver_role,
-                    'approver_user_id': str(hist.approver.id) if hist.approver else '',
-                    'approver_user_name': hist.approver.name if hist.approver else '',
-                    'decision': 'approved' if hist.action == 'approve' else 'rejected',
-                    'reject_reason': hist.comment if hist.action == 'reject' else None,
-                    'decided_at': hist.approval_time.strftime('%Y-%m-%d %H:%M:%S') if hist.approval_time else None,
-                })
-            
-            # 构建 payload
-            related_data = task.related_data or {}
-            if task.approval_type == 'LEAD_CLAIM':
-                payload = {
-                    'client_id': str(related_data.get('client_id', '')),
-                    'name': related_data.get('name', ''),
-                    'reason': related_data.get('reason', '')
-                }
-            elif task.approval_type == 'LEAD_CREATE':
-                payload = {
-                    'form': related_data.get('form', {})
-                }
-            elif task.approval_type == 'HANDOVER':
-                to_users = related_data.get('to_users')
-                if not to_users:
-                    to_user = related_data.get('to_user')
-                    to_users = [to_user] if to_user else []
-                payload = {
-                    'client_id': str(related_data.get('client_id', '')),
-                    'from_user': related_data.get('from_user', {}),
-                    'to_users': to_users,
-                    'reason': related_data.get('reason', '')
-                }
-            else:
-                payload = related_data
-            
-            rows.append({
-                'id': f'approval_{task.id}',
-                'type': task.approval_type,
-                'status': task.status,
-                'applicant_user_id': str(task.applicant.id) if task.applicant else '',
-                'applicant_user_name': task.applicant.name if task.applicant else '',
-                'client_id': client_id,
-                'client_name': client_name,
-                'created_at': task.create_datetime.strftime('%Y-%m-%d %H:%M:%S') if task.create_datetime else None,
-                'approved_at': task.update_datetime.strftime('%Y-%m-%d %H:%M:%S') if task.status == 'approved' and task.update_datetime else None,
-                'reject_reason': task.reject_reason,
-                'approval_chain': task.approval_chain,
-                'current_step_index': task.current_step,
-                'current_approver_role': task.current_approver_role,
-                'history': history_list,
-                'payload': payload,
-            })
+        # 构建响应数据（审批历史与客户信息批量加载）
+        rows = approval_inbox_service.serialize_tasks(tasks)
         
         return DetailResponse(data={
             'rows': rows,
-            'total': total
+            'total': total,
+            'next_cursor': next_cursor,
         })
     except Exception as e:
         import traceback
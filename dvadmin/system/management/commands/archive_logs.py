@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dvadmin.utils.log_archive import LogArchiver, get_log_archive_config
+
+
+class Command(BaseCommand):
+    help = "将超过保留期的日志按月归档为 gzip JSONL 分片并从热表删除（配置见 LOG_ARCHIVE）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", dest="models",
+                            help="只归档指定模型（app_label.ModelName），可重复；默认归档 LOG_ARCHIVE['TABLES'] 全部")
+        parser.add_argument("--days", type=int, help="覆盖保留天数")
+        parser.add_argument("--batch-size", type=int, help="覆盖每批行数")
+        parser.add_argument("--max-batches", type=int, help="每个模型本次最多处理的批数")
+        parser.add_argument("--dry-run", action="store_true", help="仅统计待归档行数，不写分片也不删除")
+
+    def handle(self, *args, **options):
+        config = get_log_archive_config()
+        labels = options["models"] or list(config["TABLES"])
+        unknown = [label for label in labels if label not in config["TABLES"]]
+        if unknown:
+            raise CommandError(f"LOG_ARCHIVE 未配置: {', '.join(unknown)}")
+
+        for label in labels:
+            archiver = LogArchiver.from_config(label, config)
+            if options["days"] is not None:
+                archiver.days = options["days"]
+            if options["batch_size"]:
+                archiver.batch_size = max(options["batch_size"], 1)
+            stats = archiver.run(dry_run=options["dry_run"], max_batches=options["max_batches"])
+            self.stdout.write(self.style.SUCCESS(
+                f"[archive] {label}: archived={stats['archived']}, parts={stats['parts']}, "
+                f"batches={stats['batches']}, cutoff={stats['cutoff']:%Y-%m-%d %H:%M}, dry_run={options['dry_run']}"
+            ))
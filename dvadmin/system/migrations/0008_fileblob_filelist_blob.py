@@ -0,0 +1,49 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("system", "0007_add_file_blob_field"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FileBlob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("engine", models.CharField(help_text="引擎", max_length=100, verbose_name="引擎")),
+                ("md5sum", models.CharField(help_text="文件md5", max_length=36, verbose_name="文件md5")),
+                ("size", models.BigIntegerField(default=0, help_text="文件大小（字节）", verbose_name="文件大小")),
+                ("file_url", models.CharField(blank=True, help_text="文件地址", max_length=255, verbose_name="文件地址")),
+                (
+                    "storage_name",
+                    models.CharField(
+                        blank=True, default="", help_text="本地存储（含云存储本地备份）中的文件名",
+                        max_length=255, verbose_name="本地存储路径",
+                    ),
+                ),
+                ("ref_count", models.IntegerField(default=0, help_text="引用该文件的 FileList 数量", verbose_name="引用计数")),
+                ("create_datetime", models.DateTimeField(auto_now_add=True, help_text="创建时间", verbose_name="创建时间")),
+                ("update_datetime", models.DateTimeField(auto_now=True, help_text="修改时间", verbose_name="修改时间")),
+            ],
+            options={
+                "verbose_name": "文件物理对象",
+                "verbose_name_plural": "文件物理对象",
+                "db_table": settings.TABLE_PREFIX + "system_file_blob",
+                "unique_together": {("engine", "md5sum", "size")},
+                "indexes": [models.Index(fields=["ref_count"], name="system_file_blob_ref_idx")],
+            },
+        ),
+        migrations.AddField(
+            model_name="filelist",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True, db_constraint=False, help_text="去重后共享的物理文件", null=True,
+                on_delete=django.db.models.deletion.SET_NULL, related_name="files",
+                to="system.fileblob", verbose_name="物理文件",
+            ),
+        ),
+    ]
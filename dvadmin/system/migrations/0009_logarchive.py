@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("system", "0008_fileblob_filelist_blob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LogArchive",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("model_label", models.CharField(help_text="app_label.ModelName", max_length=100, verbose_name="日志模型")),
+                ("month", models.CharField(help_text="YYYY-MM", max_length=7, verbose_name="归档月份")),
+                ("path", models.CharField(help_text="相对归档目录的路径", max_length=255, unique=True, verbose_name="分片路径")),
+                ("row_count", models.IntegerField(default=0, help_text="行数", verbose_name="行数")),
+                ("size", models.BigIntegerField(default=0, help_text="压缩后字节数", verbose_name="文件大小")),
+                ("first_id", models.BigIntegerField(help_text="起始ID", verbose_name="起始ID")),
+                ("last_id", models.BigIntegerField(help_text="结束ID", verbose_name="结束ID")),
+                ("start_datetime", models.DateTimeField(blank=True, help_text="最早时间", null=True, verbose_name="最早时间")),
+                ("end_datetime", models.DateTimeField(blank=True, help_text="最晚时间", null=True, verbose_name="最晚时间")),
+                ("create_datetime", models.DateTimeField(auto_now_add=True, help_text="创建时间", verbose_name="创建时间")),
+            ],
+            options={
+                "verbose_name": "日志归档",
+                "verbose_name_plural": "日志归档",
+                "db_table": settings.TABLE_PREFIX + "system_log_archive",
+                "ordering": ("-month", "-first_id"),
+                "indexes": [models.Index(fields=["model_label", "month"], name="system_log_archive_month_idx")],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="operationlog",
+            index=models.Index(fields=["create_datetime"], name="system_oplog_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loginlog",
+            index=models.Index(fields=["create_datetime"], name="system_loginlog_created_idx"),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("system", "0009_logarchive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MultipartUploadState",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("state_key", models.CharField(help_text="后端+对象键+大小+分片大小的摘要", max_length=64, unique=True, verbose_name="状态键")),
+                ("upload_id", models.CharField(help_text="存储服务返回的 UploadId", max_length=255, verbose_name="上传ID")),
+                ("parts", models.JSONField(default=dict, help_text="{分片号: [ETag, MD5]}", verbose_name="已完成分片")),
+                ("update_datetime", models.DateTimeField(auto_now=True, db_index=True, help_text="更新时间", verbose_name="更新时间")),
+            ],
+            options={
+                "verbose_name": "分片上传状态",
+                "verbose_name_plural": "分片上传状态",
+                "db_table": settings.TABLE_PREFIX + "system_multipart_upload_state",
+            },
+        ),
+    ]
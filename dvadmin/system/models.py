@@ -477,6 +477,9 @@ class OperationLog(CoreModel):
         verbose_name = "操作日志"
         verbose_name_plural = verbose_name
         ordering = ("-create_datetime",)
+        indexes = [
+            models.Index(fields=["create_datetime"], name="system_oplog_created_idx"),
+        ]
 
 
 def media_file_name(instance, filename):
@@ -485,6 +488,33 @@ def media_file_name(instance, filename):
     return os.path.join("files", h[:1], h[1:2], h + ext.lower())
 
 
+class FileBlob(models.Model):
+    """
+    去重后的物理文件
+
+    同一存储引擎下 md5 与大小相同的上传共用一个物理对象，ref_count 记录引用它的 FileList 行数，
+    归零后由 cleanup_orphan_uploads 回收物理文件。
+    """
+    engine = models.CharField(max_length=100, verbose_name="引擎", help_text="引擎")
+    md5sum = models.CharField(max_length=36, verbose_name="文件md5", help_text="文件md5")
+    size = models.BigIntegerField(default=0, verbose_name="文件大小", help_text="文件大小（字节）")
+    file_url = models.CharField(max_length=255, blank=True, verbose_name="文件地址", help_text="文件地址")
+    storage_name = models.CharField(max_length=255, blank=True, default='', verbose_name="本地存储路径",
+                                    help_text="本地存储（含云存储本地备份）中的文件名")
+    ref_count = models.IntegerField(default=0, verbose_name="引用计数", help_text="引用该文件的 FileList 数量")
+    create_datetime = models.DateTimeField(auto_now_add=True, verbose_name="创建时间", help_text="创建时间")
+    update_datetime = models.DateTimeField(auto_now=True, verbose_name="修改时间", help_text="修改时间")
+
+    class Meta:
+        db_table = table_prefix + "system_file_blob"
+        verbose_name = "文件物理对象"
+        verbose_name_plural = verbose_name
+        unique_together = (("engine", "md5sum", "size"),)
+        indexes = [
+            models.Index(fields=["ref_count"], name="system_file_blob_ref_idx"),
+        ]
+
+
 class FileList(CoreModel):
     name = models.CharField(max_length=200, null=True, blank=True, verbose_name="名称", help_text="名称")
     url = models.FileField(upload_to=media_file_name, null=True, blank=True,)
@@ -506,6 +536,10 @@ class FileList(CoreModel):
     )
     file_type = models.SmallIntegerField(default=3, choices=FILE_TYPE_CHOIDES, blank=True, null=True, verbose_name='文件类型', help_text='文件类型')
     file_blob = models.BinaryField(null=True, blank=True, verbose_name="文件二进制", help_text="文件二进制内容（db模式）")
+    blob = models.ForeignKey(
+        FileBlob, null=True, blank=True, on_delete=models.SET_NULL, db_constraint=False,
+        related_name='files', verbose_name="物理文件", help_text="去重后共享的物理文件"
+    )
 
     def save(self, *args, **kwargs):
         if (self.engine or '').lower() == 'db':
@@ -672,6 +706,55 @@ class LoginLog(CoreModel):
         verbose_name = "登录日志"
         verbose_name_plural = verbose_name
         ordering = ("-create_datetime",)
+        indexes = [
+            models.Index(fields=["create_datetime"], name="system_loginlog_created_idx"),
+        ]
+
+
+class LogArchive(models.Model):
+    """
+    日志归档分片
+
+    超过保留期的日志行按月份写入 gzip 压缩的 JSONL 分片（见 dvadmin/utils/log_archive.py），
+    每个分片登记一行，后台按需读取分片查询历史日志。
+    """
+    model_label = models.CharField(max_length=100, verbose_name="日志模型", help_text="app_label.ModelName")
+    month = models.CharField(max_length=7, verbose_name="归档月份", help_text="YYYY-MM")
+    path = models.CharField(max_length=255, unique=True, verbose_name="分片路径", help_text="相对归档目录的路径")
+    row_count = models.IntegerField(default=0, verbose_name="行数", help_text="行数")
+    size = models.BigIntegerField(default=0, verbose_name="文件大小", help_text="压缩后字节数")
+    first_id = models.BigIntegerField(verbose_name="起始ID", help_text="起始ID")
+    last_id = models.BigIntegerField(verbose_name="结束ID", help_text="结束ID")
+    start_datetime = models.DateTimeField(null=True, blank=True, verbose_name="最早时间", help_text="最早时间")
+    end_datetime = models.DateTimeField(null=True, blank=True, verbose_name="最晚时间", help_text="最晚时间")
+    create_datetime = models.DateTimeField(auto_now_add=True, verbose_name="创建时间", help_text="创建时间")
+
+    class Meta:
+        db_table = table_prefix + "system_log_archive"
+        verbose_name = "日志归档"
+        verbose_name_plural = verbose_name
+        ordering = ("-month", "-first_id")
+        indexes = [
+            models.Index(fields=["model_label", "month"], name="system_log_archive_month_idx"),
+        ]
+
+
+class MultipartUploadState(models.Model):
+    """
+    对象存储分片上传续传状态
+
+    记录未完成的分片上传（upload_id 与已完成分片），各 worker 共享，重试同一对象时只补传缺失分片
+    （见 dvadmin/utils/object_storage.py）。
+    """
+    state_key = models.CharField(max_length=64, unique=True, verbose_name="状态键", help_text="后端+对象键+大小+分片大小的摘要")
+    upload_id = models.CharField(max_length=255, verbose_name="上传ID", help_text="存储服务返回的 UploadId")
+    parts = models.JSONField(default=dict, verbose_name="已完成分片", help_text="{分片号: [ETag, MD5]}")
+    update_datetime = models.DateTimeField(auto_now=True, db_index=True, verbose_name="更新时间", help_text="更新时间")
+
+    class Meta:
+        db_table = table_prefix + "system_multipart_upload_state"
+        verbose_name = "分片上传状态"
+        verbose_name_plural = verbose_name
 
 
 class MessageCenter(CoreModel):
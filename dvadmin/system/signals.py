@@ -3,7 +3,7 @@ import time
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import Signal, receiver
 from django.core.cache import cache
-from dvadmin.system.models import MessageCenterTargetUser
+from dvadmin.system.models import FileList, MessageCenterTargetUser
 
 # 初始化信号
 pre_init_complete = Signal()
@@ -25,3 +25,11 @@ last_db_change_time = time.time()
 @receiver(post_delete, sender=MessageCenterTargetUser)
 def update_last_change_time(sender, **kwargs):
     cache.set('last_db_change_time', time.time(), timeout=None)  # 设置永不超时的键值对
+
+
+@receiver(post_delete, sender=FileList)
+def release_file_blob(sender, instance, **kwargs):
+    """删除文件记录时释放共享物理文件的引用，物理文件由 cleanup_orphan_uploads 回收"""
+    if instance.blob_id:
+        from dvadmin.utils.file_dedup import release_blob
+        release_blob(instance.blob_id)
@@ -10,6 +10,7 @@ from django.core.files.base import ContentFile
 
 from application.celery import app
 from dvadmin.system.models import DownloadCenter
+from dvadmin.utils.log_archive import archive_logs
 
 def is_number(num):
     if isinstance(num, (list, dict)):
@@ -121,3 +122,10 @@ def async_export_data(data: list, filename: str, dcid: int, export_field_label:
         instance.task_status = 3
         instance.description = str(e)[:250]
     instance.save()
+
+
+@app.task
+def archive_logs_task():
+    """定时归档超过保留期的日志（LOG_ARCHIVE）"""
+    results = archive_logs()
+    return {label: {'archived': stats['archived'], 'parts': stats['parts']} for label, stats in results.items()}
@@ -1,10 +1,27 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from dvadmin.system.models import Users, LoginLog
+from dvadmin.system.models import FileBlob, FileList, LogArchive, MultipartUploadState, OperationLog, Users, LoginLog
 import hashlib
 
+from dvadmin.utils import aliyunoss, log_archive, tencentcos
+from dvadmin.utils.log_archive import archive_logs, query_archive
+from dvadmin.utils.file_dedup import acquire_blob, get_dedup_stats, register_blob
+from dvadmin.utils.middleware import QueryMetricsMiddleware
+from dvadmin.utils.object_storage import LocalStorageBackend, MultipartUploader
+from dvadmin.utils.query_metrics import QueryBudgetExceeded, fingerprint, query_metrics_registry
+
 
 class MiniappLoginTestCase(APITestCase):
     """小程序登录接口测试"""
@@ -290,3 +307,336 @@ class BackendLoginNotAffectedTestCase(APITestCase):
         """测试后清理"""
         Users.objects.all().delete()
         LoginLog.objects.all().delete()
+
+
+class FlakyLocalBackend(LocalStorageBackend):
+    """第一次上传指定分片时失败，用于验证续传"""
+
+    def __init__(self, *args, fail_part=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_part = fail_part
+
+    def upload_part(self, key, upload_id, part_number, data):
+        if part_number == self.fail_part:
+            self.fail_part = None
+            raise IOError('模拟网络中断')
+        return super().upload_part(key, upload_id, part_number, data)
+
+
+class MultipartUploadTestCase(TestCase):
+    """对象存储分片并行上传与断点续传（本地后端）"""
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.content = os.urandom(1024 * 1024 * 5 + 123)
+
+    def _read(self, key):
+        with open(os.path.join(self.root, key), 'rb') as f:
+            return f.read()
+
+    def test_small_file_single_put(self):
+        backend = LocalStorageBackend(root=self.root, base_url='/files')
+        url = MultipartUploader(backend, part_size=1024 * 1024, threshold=1024 * 1024).upload(
+            io.BytesIO(b'small'), 'a/small.txt'
+        )
+        self.assertEqual(url, '/files/a/small.txt')
+        self.assertEqual(self._read('a/small.txt'), b'small')
+        self.assertEqual(backend.part_calls, 0)
+
+    def test_parallel_parts_reassemble(self):
+        backend = LocalStorageBackend(root=self.root)
+        uploader = MultipartUploader(backend, part_size=1024 * 1024, max_workers=3, threshold=0)
+        uploader.upload(io.BytesIO(self.content), 'big.bin')
+        self.assertEqual(self._read('big.bin'), self.content)
+        self.assertEqual(backend.part_calls, 6)
+        self.assertFalse(os.listdir(os.path.join(self.root, '.multipart')))
+
+    def test_resume_uploads_only_missing_parts(self):
+        backend = FlakyLocalBackend(root=self.root, fail_part=4)
+        uploader = MultipartUploader(backend, part_size=1024 * 1024, max_workers=1, threshold=0)
+        with self.assertRaises(IOError):
+            uploader.upload(io.BytesIO(self.content), 'big.bin')
+        self.assertGreaterEqual(backend.part_calls, 3)
+        self.assertLess(backend.part_calls, 6)
+        state = MultipartUploadState.objects.get()
+        self.assertTrue({'1', '2', '3'} <= set(state.parts))
+        self.assertNotIn('4', state.parts)
+
+        # 续传状态存数据库，其他 worker（本地缓存为空）也能接着上传
+        cache.clear()
+        uploader.upload(io.BytesIO(self.content), 'big.bin')
+        # 续传只补传缺失的分片：每片恰好成功上传一次
+        self.assertEqual(backend.part_calls, 6)
+        self.assertEqual(self._read('big.bin'), self.content)
+        self.assertFalse(MultipartUploadState.objects.exists())
+
+    def test_upload_helpers_return_none_on_failure(self):
+        for module, upload in ((aliyunoss, aliyunoss.ali_oss_upload), (tencentcos, tencentcos.tencent_cos_upload)):
+            with mock.patch.object(module, 'upload_file', side_effect=IOError('网络中断')):
+                self.assertIsNone(upload(io.BytesIO(b'data'), 'a.txt'))
+
+
+class FileDedupTestCase(TestCase):
+    """上传去重：按 md5 + 大小共享物理文件并维护引用计数"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _file_row(self, blob):
+        return FileList.objects.create(
+            name='contract.pdf', engine='cos', md5sum=blob.md5sum, size=str(blob.size),
+            file_url=blob.file_url, blob=blob,
+        )
+
+    def test_second_upload_reuses_blob(self):
+        self.assertIsNone(acquire_blob('cos', 'a' * 32, 1024))
+        blob = register_blob('cos', 'a' * 32, 1024, 'https://bucket/contract.pdf')
+        first = self._file_row(blob)
+
+        shared = acquire_blob('cos', 'a' * 32, 1024)
+        self.assertEqual(shared.pk, blob.pk)
+        second = self._file_row(shared)
+        # 大小不同不算同一文件
+        self.assertIsNone(acquire_blob('cos', 'a' * 32, 2048))
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        stats = get_dedup_stats()
+        self.assertEqual((stats['lookups'], stats['hits']), (3, 1))
+        self.assertEqual(stats['saved_bytes'], 1024)
+        self.assertEqual(stats['dedup_ratio'], 0.5)
+
+        # 删除记录释放引用，归零后成为待回收的孤儿物理文件
+        first.delete()
+        second.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertEqual(get_dedup_stats()['orphans'], 1)
+
+    def test_concurrent_register_falls_back(self):
+        register_blob('oss', 'b' * 32, 10, 'https://bucket/a')
+        self.assertIsNone(register_blob('oss', 'b' * 32, 10, 'https://bucket/b'))
+        self.assertEqual(FileBlob.objects.count(), 1)
+
+
+def _user_names_view(request):
+    """N+1 示例：逐个按 id 查询用户"""
+    ids = list(Users.objects.order_by('id').values_list('id', flat=True))
+    names = [Users.objects.filter(id=user_id).values_list('username', flat=True).first() for user_id in ids]
+    return JsonResponse({'names': names})
+
+
+def _streamed_names_view(request):
+    """流式响应：输出期间逐个查询用户"""
+    ids = list(Users.objects.order_by('id').values_list('id', flat=True))
+    return StreamingHttpResponse(
+        Users.objects.filter(id=user_id).values_list('username', flat=True).first() + '\n' for user_id in ids
+    )
+
+
+class QueryMetricsMiddlewareTestCase(TestCase):
+    """请求查询统计：查询数、重复指纹、预算告警/失败与 Prometheus 指标"""
+
+    CONFIG = {
+        'ENABLED': True,
+        'RESPONSE_HEADERS': True,
+        'DEFAULT_BUDGET': {},
+        'BUDGETS': {'/api/users/*': {'queries': 3, 'duplicates': 1}},
+    }
+
+    def setUp(self):
+        for index in range(4):
+            Users.objects.create(username=f'metrics_{index}', name=f'用户{index}')
+        query_metrics_registry.reset()
+        self.factory = RequestFactory()
+        self.middleware = QueryMetricsMiddleware(_user_names_view)
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x''y' AND pk IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'z'  AND pk IN (%s)"),
+        )
+
+    def test_counts_queries_and_duplicates(self):
+        with override_settings(QUERY_METRICS=dict(self.CONFIG, BUDGETS={})):
+            response = self.middleware(self.factory.get('/api/users/names/'))
+        # 1 次列表查询 + 4 次逐个查询（同一指纹重复 3 次）
+        self.assertEqual(response['X-Query-Count'], '5')
+        row = query_metrics_registry.snapshot()[('GET', 'unmatched')]
+        self.assertEqual((row['requests'], row['queries'], row['duplicates'], row['budget_exceeded']), (1, 5, 3, 0))
+
+    def test_budget_exceeded_logs_warning(self):
+        with override_settings(QUERY_METRICS=self.CONFIG), self.assertLogs('query_metrics', 'WARNING') as logs:
+            self.middleware(self.factory.get('/api/users/names/'))
+        self.assertIn('"budget_exceeded"', logs.output[0])
+        self.assertIn('"queries": {"value": 5, "limit": 3}', logs.output[0])
+        self.assertIn('"count": 4', logs.output[0])
+
+        # 不匹配任何规则的路径不检查
+        with override_settings(QUERY_METRICS=self.CONFIG), self.assertNoLogs('query_metrics', 'WARNING'):
+            self.middleware(self.factory.get('/api/other/'))
+
+    def test_budget_exceeded_fails_in_tests(self):
+        with override_settings(QUERY_METRICS=dict(self.CONFIG, RAISE_ON_BUDGET=True)):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.middleware(self.factory.get('/api/users/names/'))
+
+    def test_metrics_endpoint_requires_superuser_or_token(self):
+        config = dict(self.CONFIG, METRICS_TOKEN='secret-token')
+        with override_settings(QUERY_METRICS=config):
+            self.middleware(self.factory.get('/api/users/names/'))
+            response = self.middleware(self.factory.get('/metrics/queries', HTTP_X_METRICS_TOKEN='secret-token'))
+
+            # 本机地址不再直接放行
+            request = self.factory.get('/metrics/queries', REMOTE_ADDR='127.0.0.1', HTTP_X_METRICS_TOKEN='wrong')
+            self.assertEqual(self.middleware(request).status_code, 403)
+
+            request = self.factory.get('/metrics/queries')
+            request.user = Users.objects.create(username='metrics_admin', name='管理员', is_superuser=True)
+            self.assertEqual(self.middleware(request).status_code, 200)
+            request.user = Users.objects.get(username='metrics_0')
+            self.assertEqual(self.middleware(request).status_code, 403)
+        body = response.content.decode()
+        self.assertIn('http_request_db_queries_total{method="GET",route="unmatched"} 5', body)
+        self.assertIn('http_request_query_budget_exceeded_total{method="GET",route="unmatched"} 1', body)
+
+    def test_streaming_response_counted_after_consumed(self):
+        middleware = QueryMetricsMiddleware(_streamed_names_view)
+        with override_settings(QUERY_METRICS=self.CONFIG):
+            response = middleware(self.factory.get('/api/users/names/'))
+            self.assertNotIn('X-Query-Count', response)
+            self.assertEqual(query_metrics_registry.snapshot(), {})
+            with self.assertLogs('query_metrics', 'WARNING') as logs:
+                body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.split(), [f'metrics_{index}' for index in range(4)])
+        self.assertIn('"streamed": true', logs.output[0])
+        row = query_metrics_registry.snapshot()[('GET', 'unmatched')]
+        self.assertEqual((row['queries'], row['duplicates'], row['budget_exceeded']), (5, 3, 1))
+
+
+class LogArchiveTestCase(TestCase):
+    """日志归档：按月分片、分批迁出热表、重复执行无副作用、按需查询归档"""
+
+    ROWS = 12000
+    SPAN_DAYS = 400
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.now = timezone.now()
+        # create_datetime 为 auto_now_add，按计划时间写入需临时关闭
+        created_field = OperationLog._meta.get_field('create_datetime')
+        with mock.patch.object(created_field, 'auto_now_add', False):
+            OperationLog.objects.bulk_create([
+                OperationLog(
+                    request_path=f'/api/demo/{index % 50}/',
+                    request_method='POST' if index % 4 == 0 else 'GET',
+                    request_body='{}',
+                    response_code='2000',
+                    create_datetime=self.now - timedelta(days=self.SPAN_DAYS * (self.ROWS - index) / self.ROWS),
+                )
+                for index in range(self.ROWS)
+            ], batch_size=2000)
+        self.config = {
+            'DIR': self.archive_dir,
+            'BATCH_SIZE': 1000,
+            'TABLES': {'system.OperationLog': {'days': 90, 'filter_fields': ['request_method', 'request_path']}},
+        }
+
+    def test_archive_large_log(self):
+        cutoff = self.now - timedelta(days=90)
+        expected = OperationLog.objects.filter(create_datetime__lt=cutoff).count()
+        expected_post = OperationLog.objects.filter(create_datetime__lt=cutoff, request_method='POST').count()
+        self.assertGreater(expected, 8000)
+
+        with override_settings(LOG_ARCHIVE=self.config):
+            stats = archive_logs(now=self.now)['system.OperationLog']
+            self.assertEqual(stats['archived'], expected)
+            self.assertEqual(OperationLog.objects.count(), self.ROWS - expected)
+            self.assertFalse(OperationLog.objects.filter(create_datetime__lt=cutoff).exists())
+
+            archives = LogArchive.objects.filter(model_label='system.OperationLog')
+            self.assertEqual(sum(archives.values_list('row_count', flat=True)), expected)
+            # 约 10 个月的数据，每批最多跨两个月
+            self.assertGreaterEqual(len(set(archives.values_list('month', flat=True))), 10)
+            for archive in archives:
+                self.assertTrue(os.path.exists(os.path.join(self.archive_dir, archive.path)))
+                self.assertTrue(archive.path.endswith('.jsonl.gz'))
+
+            # 再次执行不会重复归档
+            self.assertEqual(archive_logs(now=self.now)['system.OperationLog']['archived'], 0)
+
+            everything = self.now - timedelta(days=self.SPAN_DAYS + 1)
+            total, rows = query_archive('system.OperationLog', start=everything,
+                                        filters={'request_method': 'POST'}, offset=0, limit=10)
+            self.assertEqual(total, expected_post)
+            self.assertEqual(len(rows), 10)
+            self.assertEqual([row['id'] for row in rows], sorted((row['id'] for row in rows), reverse=True))
+
+            # 不在白名单中的参数不参与过滤
+            total, _ = query_archive('system.OperationLog', start=everything, filters={'_': '1', 'response_code': '0'})
+            self.assertEqual(total, expected)
+
+            month = archives.order_by('month').first().month
+            total, rows = query_archive('system.OperationLog', month=month, search='/api/demo/7/', limit=500)
+            self.assertTrue(all(row['request_path'] == '/api/demo/7/' for row in rows))
+            self.assertEqual(total, len(rows))
+
+    def test_dry_run_and_admin_query(self):
+        with override_settings(LOG_ARCHIVE=self.config):
+            stats = archive_logs(now=self.now, dry_run=True)['system.OperationLog']
+            self.assertGreater(stats['archived'], 0)
+            self.assertEqual(OperationLog.objects.count(), self.ROWS)
+            self.assertFalse(LogArchive.objects.exists())
+
+            archive_logs(now=self.now, max_batches=2)
+            self.assertEqual(OperationLog.objects.count(), self.ROWS - 2000)
+
+            admin = Users.objects.create(username='archive_admin', name='归档管理员', is_superuser=True)
+            client = APIClient()
+            client.force_authenticate(user=admin)
+            start = (self.now - timedelta(days=self.SPAN_DAYS + 1)).isoformat()
+            response = client.get('/admin-api/system/operation_log/archived/', {
+                'start': start, 'request_method': 'POST', 'limit': 5, '_t': '1700000000000',
+            })
+            self.assertEqual(response.data['code'], 2000)
+            self.assertEqual(response.data['total'], 500)
+            self.assertEqual(len(response.data['data']), 5)
+
+            # 不带时区的时间按当前时区解析
+            response = client.get('/admin-api/system/operation_log/archived/', {
+                'start': timezone.localtime(self.now - timedelta(days=self.SPAN_DAYS + 1)).strftime('%Y-%m-%d %H:%M:%S'),
+                'end': timezone.localtime(self.now).strftime('%Y-%m-%d %H:%M:%S'),
+                'request_method': 'POST', 'limit': 5,
+            })
+            self.assertEqual(response.data['code'], 2000)
+            self.assertEqual(response.data['total'], 500)
+
+            response = client.get('/admin-api/system/operation_log/archived/', {'start': '2024-13-01 00:00:00'})
+            self.assertEqual(response.data['code'], 400)
+            response = client.get('/admin-api/system/operation_log/archived/', {'end': '昨天'})
+            self.assertEqual(response.data['code'], 400)
+
+            response = client.get('/admin-api/system/log_archive/rows/', {'model_label': 'system.LoginLog'})
+            self.assertEqual(response.data['code'], 400)
+
+    def test_query_reads_only_needed_parts(self):
+        with override_settings(LOG_ARCHIVE=self.config):
+            archive_logs(now=self.now)
+            archives = LogArchive.objects.filter(model_label='system.OperationLog')
+            latest = archives.order_by('-month').first().month
+            latest_parts = archives.filter(month=latest)
+            with mock.patch('dvadmin.utils.log_archive.iter_archive_rows',
+                            wraps=log_archive.iter_archive_rows) as reader:
+                # 未指定范围时默认最近一个归档月份；总数取自 row_count，只解压第一页所在的分片
+                total, rows = query_archive('system.OperationLog', limit=1)
+            self.assertEqual(total, sum(latest_parts.values_list('row_count', flat=True)))
+            self.assertEqual(rows[0]['id'], latest_parts.order_by('-last_id').first().last_id)
+            self.assertEqual(reader.call_count, 1)
+
+            part = archives.order_by('month').first()
+            total, rows = query_archive('system.OperationLog', archive_id=part.id, limit=part.row_count)
+            self.assertEqual((total, len(rows)), (part.row_count, part.row_count))
+            self.assertEqual(query_archive('system.LoginLog'), (0, []))
@@ -3,7 +3,7 @@ import mimetypes
 
 import django_filters
 from django.conf import settings
-from django.db import connection
+from django.db import connection, transaction
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.shortcuts import get_object_or_404
@@ -16,6 +16,7 @@ from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 
 from application import dispatch
 from dvadmin.system.models import FileList
+from dvadmin.utils.file_dedup import acquire_blob, get_dedup_stats, register_blob
 from dvadmin.utils.json_response import DetailResponse, SuccessResponse
 from dvadmin.utils.serializers import CustomModelSerializer
 from dvadmin.utils.viewset import CustomModelViewSet
@@ -85,6 +86,7 @@ class FileSerializer(CustomModelSerializer):
     class Meta:
         model = FileList
         fields = "__all__"
+        read_only_fields = ["blob"]
 
     def create(self, validated_data):
         file_engine = dispatch.get_system_config_values("file_storage.file_engine") or 'local'
@@ -101,31 +103,54 @@ class FileSerializer(CustomModelSerializer):
         validated_data['mime_type'] = file.content_type
         ft = {'image':0,'video':1,'audio':2}.get(file.content_type.split('/')[0], None)
         validated_data['file_type'] = 3 if ft is None else ft
-        if file_backup and file_engine != 'db':
-            validated_data['url'] = file
-        if file_engine == 'oss':
-            from dvadmin.utils.aliyunoss import ali_oss_upload
-            file_path = ali_oss_upload(file, file_name=validated_data['name'])
-            if file_path:
-                validated_data['file_url'] = file_path
-            else:
-                raise ValueError("上传失败")
-        elif file_engine == 'cos':
-            from dvadmin.utils.tencentcos import tencent_cos_upload
-            file_path = tencent_cos_upload(file, file_name=validated_data['name'])
-            if file_path:
-                validated_data['file_url'] = file_path
-            else:
-                raise ValueError("上传失败")
-        elif file_engine == 'db':
+        if file_engine == 'db':
             try:
                 file.seek(0)
                 validated_data['file_blob'] = file.read()
             except Exception:
                 raise ValueError("上传失败")
             validated_data['file_url'] = ''
-        else:
-            validated_data['url'] = file
+            return self._create_with_audit(validated_data)
+
+        with transaction.atomic():
+            # 相同内容已存储过时直接复用物理文件，不再写入
+            blob = acquire_blob(file_engine, validated_data['md5sum'], file_size)
+            if blob is not None:
+                validated_data['blob'] = blob
+                validated_data['file_url'] = blob.file_url
+                if blob.storage_name:
+                    validated_data['url'] = blob.storage_name
+                return self._create_with_audit(validated_data)
+
+            if file_backup:
+                validated_data['url'] = file
+            if file_engine == 'oss':
+                from dvadmin.utils.aliyunoss import ali_oss_upload
+                file_path = ali_oss_upload(file, file_name=validated_data['name'])
+                if file_path:
+                    validated_data['file_url'] = file_path
+                else:
+                    raise ValueError("上传失败")
+            elif file_engine == 'cos':
+                from dvadmin.utils.tencentcos import tencent_cos_upload
+                file_path = tencent_cos_upload(file, file_name=validated_data['name'])
+                if file_path:
+                    validated_data['file_url'] = file_path
+                else:
+                    raise ValueError("上传失败")
+            else:
+                validated_data['url'] = file
+            instance = self._create_with_audit(validated_data)
+            blob = register_blob(
+                file_engine, instance.md5sum, file_size, instance.file_url,
+                instance.url.name if instance.url else '',
+            )
+            if blob is not None:
+                FileList.objects.filter(pk=instance.pk).update(blob=blob)
+                instance.blob = blob
+            return instance
+
+    def _create_with_audit(self, validated_data):
         # 审计字段
         try:
             request_user = self.request.user
@@ -217,6 +242,11 @@ class FileViewSet(CustomModelViewSet):
         normalized = target_url if target_url.startswith('/') else f'/{target_url}'
         return redirect(serializer._append_access_token(normalized))
 
+    @action(methods=['GET'], detail=False, url_path='dedup_stats')
+    def dedup_stats(self, request):
+        """上传去重指标：命中率、共享引用数、节省的存储字节数"""
+        return DetailResponse(data=get_dedup_stats())
+
     @action(methods=['GET'], detail=False)
     def get_all(self, request):
         data1 = self.get_serializer(self.get_queryset(), many=True).data
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+@Remark: 日志归档查询
+"""
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.decorators import action
+
+from dvadmin.system.models import LogArchive
+from dvadmin.utils.json_response import ErrorResponse, SuccessResponse
+from dvadmin.utils.log_archive import archive_filter_fields, get_log_archive_config, query_archive
+from dvadmin.utils.viewset import CustomModelViewSet
+
+
+def _parse_time_param(value):
+    """解析 start/end 参数；无时区的时间按当前时区处理，无法解析时返回 None"""
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class LogArchiveSerializer(serializers.ModelSerializer):
+    """
+    日志归档分片-序列化器
+    """
+
+    class Meta:
+        model = LogArchive
+        fields = "__all__"
+        read_only_fields = ["id"]
+
+
+def archived_rows_response(request, model_label):
+    """
+    按需读取归档分片：?archive=<分片ID>|month=YYYY-MM|start=&end=&search=&page=&limit=&<字段>=<值>
+
+    未指定分片、月份或时间范围时默认最近一个归档月份；只有 filter_fields 中的字段参与精确匹配，
+    其余参数（如前端的 _、_t 防缓存参数）忽略。
+    """
+    config = get_log_archive_config()
+    if model_label not in config["TABLES"]:
+        return ErrorResponse(msg=f"未配置归档的日志模型: {model_label}")
+    params = request.query_params
+    try:
+        page = max(int(params.get("page", 1)), 1)
+        limit = min(max(int(params.get("limit", 20)), 1), 200)
+        archive_id = int(params["archive"]) if params.get("archive") else None
+    except ValueError:
+        return ErrorResponse(msg="分页参数错误")
+    start = _parse_time_param(params["start"]) if params.get("start") else None
+    end = _parse_time_param(params["end"]) if params.get("end") else None
+    if (params.get("start") and start is None) or (params.get("end") and end is None):
+        return ErrorResponse(msg="时间参数格式错误，应为 YYYY-MM-DD HH:MM:SS")
+    filters = {
+        key: params[key] for key in archive_filter_fields(model_label, config) if params.get(key, "") != ""
+    }
+    total, rows = query_archive(
+        model_label, month=params.get("month") or None, start=start, end=end,
+        filters=filters, search=params.get("search") or None, offset=(page - 1) * limit, limit=limit,
+        archive_id=archive_id,
+    )
+    return SuccessResponse(data=rows, total=total, page=page, limit=limit)
+
+
+class ArchivedLogMixin:
+    """
+    为日志接口增加 archived 查询：GET <日志接口>/archived/
+    """
+    archive_model_label = None
+
+    @action(methods=["GET"], detail=False)
+    def archived(self, request):
+        return archived_rows_response(request, self.archive_model_label)
+
+
+class LogArchiveViewSet(CustomModelViewSet):
+    """
+    日志归档接口
+    list:分片列表（?model_label=&month=）
+    retrieve:单例
+    rows:按需查询归档日志（?model_label=...&archive=|month=）
+    """
+    queryset = LogArchive.objects.all()
+    serializer_class = LogArchiveSerializer
+    filter_fields = ["model_label", "month"]
+    http_method_names = ["get"]
+
+    @action(methods=["GET"], detail=False)
+    def rows(self, request):
+        return archived_rows_response(request, request.query_params.get("model_label"))
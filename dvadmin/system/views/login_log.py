@@ -7,6 +7,7 @@
 @Remark: 按钮权限管理
 """
 from dvadmin.system.models import LoginLog
+from dvadmin.system.views.log_archive import ArchivedLogMixin
 from dvadmin.utils.field_permission import FieldPermissionMixin
 from dvadmin.utils.serializers import CustomModelSerializer
 from dvadmin.utils.viewset import CustomModelViewSet
@@ -23,7 +24,7 @@ class LoginLogSerializer(CustomModelSerializer):
         read_only_fields = ["id"]
 
 
-class LoginLogViewSet(CustomModelViewSet, FieldPermissionMixin):
+class LoginLogViewSet(ArchivedLogMixin, CustomModelViewSet, FieldPermissionMixin):
     """
     登录日志接口
     list:查询
@@ -31,7 +32,9 @@ class LoginLogViewSet(CustomModelViewSet, FieldPermissionMixin):
     update:修改
     retrieve:单例
     destroy:删除
+    archived:查询已归档的日志
     """
+    archive_model_label = "system.LoginLog"
     queryset = LoginLog.objects.all()
     serializer_class = LoginLogSerializer
     # extra_filter_class = []
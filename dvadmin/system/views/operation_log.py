@@ -8,6 +8,7 @@
 """
 
 from dvadmin.system.models import OperationLog
+from dvadmin.system.views.log_archive import ArchivedLogMixin
 from dvadmin.utils.serializers import CustomModelSerializer
 from dvadmin.utils.viewset import CustomModelViewSet
 
@@ -33,7 +34,7 @@ class OperationLogCreateUpdateSerializer(CustomModelSerializer):
         fields = '__all__'
 
 
-class OperationLogViewSet(CustomModelViewSet):
+class OperationLogViewSet(ArchivedLogMixin, CustomModelViewSet):
     """
     操作日志接口
     list:查询
@@ -41,7 +42,9 @@ class OperationLogViewSet(CustomModelViewSet):
     update:修改
     retrieve:单例
     destroy:删除
+    archived:查询已归档的日志
     """
+    archive_model_label = "system.OperationLog"
     queryset = OperationLog.objects.order_by('-create_datetime')
     serializer_class = OperationLogSerializer
     # permission_classes = []
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+上传文件去重
+
+同一存储引擎下 md5 与大小相同的上传共用一个 FileBlob：
+- 命中时新 FileList 行直接指向已有物理对象，不再写本地文件或请求云存储
+- 每个 FileList 行持有一个引用，删除行时释放；归零的 FileBlob 由 cleanup_orphan_uploads 回收
+- 命中率：进程内计数（lookups/hits）与按 FileBlob 表统计的持久指标
+"""
+import logging
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from dvadmin.system.models import FileBlob
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS_KEY = 'file_dedup:lookups'
+HITS_KEY = 'file_dedup:hits'
+
+
+def _incr(key: str) -> None:
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def acquire_blob(engine: str, md5sum: str, size: int) -> Optional[FileBlob]:
+    """按 md5 与大小查找已有物理文件并增加引用；未命中返回 None"""
+    _incr(LOOKUPS_KEY)
+    blob = FileBlob.objects.filter(engine=engine, md5sum=md5sum, size=size).first()
+    if blob is None:
+        return None
+    # 与回收并发时行可能已被删除，此时按未命中处理
+    if not FileBlob.objects.filter(pk=blob.pk).update(
+        ref_count=F('ref_count') + 1, update_datetime=timezone.now()
+    ):
+        return None
+    _incr(HITS_KEY)
+    return blob
+
+
+def register_blob(engine: str, md5sum: str, size: int, file_url: str,
+                  storage_name: str = '') -> Optional[FileBlob]:
+    """登记新写入的物理文件（引用计数为 1）；并发登记了相同内容时返回 None，该上传不参与去重"""
+    try:
+        with transaction.atomic():
+            return FileBlob.objects.create(
+                engine=engine, md5sum=md5sum, size=size, file_url=file_url or '',
+                storage_name=storage_name or '', ref_count=1,
+            )
+    except IntegrityError:
+        logger.info(f'并发上传相同文件，跳过去重登记: engine={engine}, md5={md5sum}')
+        return None
+
+
+def release_blob(blob_id: int) -> None:
+    # update_datetime 记录最后一次引用变化，回收时据此保留宽限期
+    FileBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1, update_datetime=timezone.now())
+
+
+def get_dedup_stats() -> dict:
+    """去重指标：进程内查找命中率 + FileBlob 表上的引用统计"""
+    lookups = cache.get(LOOKUPS_KEY) or 0
+    hits = cache.get(HITS_KEY) or 0
+    totals = FileBlob.objects.aggregate(
+        blobs=Count('id'),
+        references=Sum('ref_count'),
+        live_blobs=Count('id', filter=Q(ref_count__gt=0)),
+        orphans=Count('id', filter=Q(ref_count__lte=0)),
+        stored_bytes=Sum('size'),
+        saved_bytes=Sum(F('size') * (F('ref_count') - 1), filter=Q(ref_count__gt=1)),
+    )
+    references = totals['references'] or 0
+    blobs = totals['blobs'] or 0
+    return {
+        'lookups': lookups,
+        'hits': hits,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        'blobs': blobs,
+        'references': references,
+        'orphans': totals['orphans'] or 0,
+        # 历史累计：引用中有多少比例复用了已有物理文件
+        'dedup_ratio': round(1 - (totals['live_blobs'] or 0) / references, 4) if references > 0 else 0.0,
+        'stored_bytes': totals['stored_bytes'] or 0,
+        'saved_bytes': totals['saved_bytes'] or 0,
+    }
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+日志归档
+
+超过保留期的日志行（操作日志、登录日志、WPS 回调日志、法规搜索历史等）按批迁出热表：
+- 按主键顺序分批读取，每批按 create_datetime 所在月份写入 gzip 压缩的 JSONL 分片，
+  分片落盘后在同一事务内登记 LogArchive 并删除原行；中途失败时重跑会以相同文件名覆盖分片
+- 日志表只追加，遇到未超过保留期的行即停止，不需要 create_datetime 上的全表扫描
+- 级联删除的子表（如法规搜索结果）随父行一起写入分片的 _children 字段
+- query_archive 按需读取分片，供后台查询历史日志；只解压当前页需要的分片
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from dvadmin.system.models import LogArchive
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_ARCHIVE_CONFIG = {
+    'DIR': os.path.join(settings.BASE_DIR, 'logs', 'archive'),
+    'BATCH_SIZE': 2000,
+    # {'system.OperationLog': {'days': 90, 'children': [('app_label.Model', 'fk_attname')], 'filter_fields': [...]}}
+    'TABLES': {},
+}
+# 未配置 filter_fields 时归档查询允许精确匹配的字段
+DEFAULT_FILTER_FIELDS = ('creator_id',)
+
+
+def get_log_archive_config() -> dict:
+    config = dict(DEFAULT_LOG_ARCHIVE_CONFIG)
+    config.update(getattr(settings, 'LOG_ARCHIVE', None) or {})
+    return config
+
+
+def archive_month(value) -> str:
+    return timezone.localtime(value).strftime('%Y-%m') if timezone.is_aware(value) else value.strftime('%Y-%m')
+
+
+def _dumps(row: dict) -> str:
+    return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+class LogArchiver:
+    """单个日志模型的归档器"""
+
+    def __init__(self, model_label: str, days: int, batch_size: int = 2000, archive_dir: Optional[str] = None,
+                 children: Optional[List[Tuple[str, str]]] = None):
+        self.model_label = model_label
+        self.model = apps.get_model(model_label)
+        self.days = int(days)
+        self.batch_size = max(int(batch_size), 1)
+        self.archive_dir = archive_dir or get_log_archive_config()['DIR']
+        self.children = [(apps.get_model(label), field) for label, field in (children or [])]
+
+    @classmethod
+    def from_config(cls, model_label: str, config: Optional[dict] = None) -> 'LogArchiver':
+        config = config or get_log_archive_config()
+        options = config['TABLES'][model_label]
+        return cls(
+            model_label, options['days'], options.get('batch_size') or config['BATCH_SIZE'],
+            config['DIR'], options.get('children'),
+        )
+
+    def cutoff(self, now=None):
+        return (now or timezone.now()) - timedelta(days=self.days)
+
+    def _next_batch(self, last_id: int) -> List[dict]:
+        return list(self.model._base_manager.filter(pk__gt=last_id).order_by('pk').values()[:self.batch_size])
+
+    def _attach_children(self, rows: List[dict]):
+        ids = [row['id'] for row in rows]
+        by_parent: Dict[int, dict] = {row['id']: row for row in rows}
+        for child_model, field in self.children:
+            name = child_model._meta.label
+            for child in child_model._base_manager.filter(**{f'{field}__in': ids}).order_by('pk').values():
+                by_parent[child[field]].setdefault('_children', {}).setdefault(name, []).append(child)
+
+    def part_path(self, month: str, rows: List[dict]) -> str:
+        return os.path.join(self.model_label.lower(), month, f"{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz")
+
+    def _write_part(self, relative_path: str, rows: List[dict]) -> int:
+        path = os.path.join(self.archive_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as raw:
+            # mtime=0：同一批数据得到相同的分片内容
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as handle:
+                for row in rows:
+                    handle.write(_dumps(row).encode('utf-8'))
+                    handle.write(b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temp_path, path)
+        return os.path.getsize(path)
+
+    def _archive_rows(self, rows: List[dict]) -> int:
+        """写出一批已超过保留期的行，返回写出的分片数"""
+        if self.children:
+            self._attach_children(rows)
+        months: Dict[str, List[dict]] = {}
+        for row in rows:
+            months.setdefault(archive_month(row['create_datetime']), []).append(row)
+
+        parts = []
+        for month, month_rows in sorted(months.items()):
+            relative_path = self.part_path(month, month_rows)
+            size = self._write_part(relative_path, month_rows)
+            parts.append((month, relative_path, size, month_rows))
+
+        with transaction.atomic():
+            for month, relative_path, size, month_rows in parts:
+                times = [row['create_datetime'] for row in month_rows]
+                LogArchive.objects.update_or_create(path=relative_path, defaults={
+                    'model_label': self.model_label,
+                    'month': month,
+                    'row_count': len(month_rows),
+                    'size': size,
+                    'first_id': month_rows[0]['id'],
+                    'last_id': month_rows[-1]['id'],
+                    'start_datetime': min(times),
+                    'end_datetime': max(times),
+                })
+            self.model._base_manager.filter(pk__in=[row['id'] for row in rows]).delete()
+        return len(parts)
+
+    def run(self, now=None, dry_run: bool = False, max_batches: Optional[int] = None) -> dict:
+        """归档 create_datetime 早于保留期的行，返回 {'cutoff', 'archived', 'parts', 'batches'}"""
+        cutoff = self.cutoff(now)
+        stats = {'cutoff': cutoff, 'archived': 0, 'parts': 0, 'batches': 0}
+        last_id = 0
+        while max_batches is None or stats['batches'] < max_batches:
+            batch = self._next_batch(last_id)
+            if not batch:
+                break
+            last_id = batch[-1]['id']
+            # create_datetime 为空的行无法判断归属月份，保留在热表
+            expired = [row for row in batch if row['create_datetime'] is not None and row['create_datetime'] < cutoff]
+            reached_recent = any(row['create_datetime'] is not None and row['create_datetime'] >= cutoff for row in batch)
+            if expired:
+                stats['batches'] += 1
+                stats['archived'] += len(expired)
+                if not dry_run:
+                    stats['parts'] += self._archive_rows(expired)
+            if reached_recent:
+                break
+        if stats['archived']:
+            logger.info(f"日志归档 {self.model_label}: archived={stats['archived']}, parts={stats['parts']}, "
+                        f"cutoff={cutoff.isoformat()}, dry_run={dry_run}")
+        return stats
+
+
+def archive_logs(labels: Optional[List[str]] = None, now=None, dry_run: bool = False,
+                 max_batches: Optional[int] = None) -> Dict[str, dict]:
+    """按 LOG_ARCHIVE['TABLES'] 归档全部（或指定的）日志模型"""
+    config = get_log_archive_config()
+    results = {}
+    for label in labels or list(config['TABLES']):
+        if label not in config['TABLES']:
+            raise ValueError(f'LOG_ARCHIVE 未配置该模型: {label}')
+        results[label] = LogArchiver.from_config(label, config).run(now=now, dry_run=dry_run, max_batches=max_batches)
+    return results
+
+
+def iter_archive_rows(archive: LogArchive, archive_dir: Optional[str] = None,
+                      search: Optional[str] = None) -> Iterator[dict]:
+    """读取分片中的行；search 先在原始 JSON 文本上做子串过滤，命中后才解析"""
+    path = os.path.join(archive_dir or get_log_archive_config()['DIR'], archive.path)
+    if not os.path.exists(path):
+        logger.warning(f'日志归档分片不存在: {path}')
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            if search and search not in line:
+                continue
+            yield json.loads(line)
+
+
+def archive_filter_fields(model_label: str, config: Optional[dict] = None) -> List[str]:
+    """归档查询允许精确匹配的字段（LOG_ARCHIVE['TABLES'][模型]['filter_fields']）"""
+    config = config or get_log_archive_config()
+    options = config['TABLES'].get(model_label) or {}
+    return list(options.get('filter_fields') or DEFAULT_FILTER_FIELDS)
+
+
+def _filter_text(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def query_archive(model_label: str, month: Optional[str] = None, start=None, end=None,
+                  filters: Optional[Dict[str, str]] = None, search: Optional[str] = None,
+                  offset: int = 0, limit: int = 20, archive_id: Optional[int] = None) -> Tuple[int, List[dict]]:
+    """
+    查询归档日志，按时间倒序分页，返回 (总数, 当前页)
+
+    范围：archive_id 指定单个分片，或 month 指定月份，或 start/end（datetime，按 create_datetime 过滤）；
+    都未指定时默认查询最近一个归档月份。filters 只接受 archive_filter_fields 中的字段，按文本精确匹配。
+    没有行级条件的分片直接用 LogArchive.row_count 计数，只有当前页落在其中时才解压读取。
+    """
+    archives = LogArchive.objects.filter(model_label=model_label)
+    if archive_id:
+        archives = archives.filter(id=archive_id)
+    elif not (month or start or end):
+        month = archives.order_by('-month').values_list('month', flat=True).first()
+        if month is None:
+            return 0, []
+    if month:
+        archives = archives.filter(month=month)
+    if start:
+        archives = archives.filter(end_datetime__gte=start)
+    if end:
+        archives = archives.filter(start_datetime__lt=end)
+    allowed = set(archive_filter_fields(model_label))
+    filters = {key: _filter_text(value) for key, value in (filters or {}).items() if key in allowed}
+
+    total = 0
+    page: List[dict] = []
+    for archive in archives.order_by('-last_id'):
+        whole = (
+            not filters and not search
+            and (not start or archive.start_datetime >= start) and (not end or archive.end_datetime < end)
+        )
+        if whole:
+            # 整个分片都满足条件：不在当前页范围内时无需解压
+            if total + archive.row_count <= offset or total >= offset + limit:
+                total += archive.row_count
+                continue
+        rows = list(iter_archive_rows(archive, search=search))
+        for row in reversed(rows):
+            if any(_filter_text(row.get(key)) != value for key, value in filters.items()):
+                continue
+            if start or end:
+                created = parse_datetime(row.get('create_datetime') or '')
+                if created is None or (start and created < start) or (end and created >= end):
+                    continue
+            if offset <= total < offset + limit:
+                page.append(row)
+            total += 1
+    return total, page
@@ -1,15 +1,24 @@
 """
 日志 django中间件
 """
+import hmac
 import json
 import logging
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.http import HttpResponse, HttpResponseServerError
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseServerError
 from django.utils.deprecation import MiddlewareMixin
 
 from dvadmin.system.models import OperationLog
+from dvadmin.utils.query_metrics import (
+    QueryBudgetExceeded,
+    RequestQueryStats,
+    check_budget,
+    get_query_metrics_config,
+    query_metrics_registry,
+    resolve_budget,
+)
 from dvadmin.utils.request_util import get_request_user, get_request_ip, get_request_data, get_request_path, get_os, \
     get_browser, get_verbose_name
 
@@ -153,3 +162,97 @@ class HealthCheckMiddleware(object):
             return HttpResponseServerError("cache: cannot connect to cache.")
 
         return HttpResponse("OK")
+
+
+query_logger = logging.getLogger("query_metrics")
+
+
+class QueryMetricsMiddleware(object):
+    """
+    请求查询统计中间件
+
+    记录每个请求的 SQL 查询数、数据库耗时、重复查询指纹与响应耗时，按 QUERY_METRICS['BUDGETS'] 检查预算；
+    GET QUERY_METRICS['METRICS_PATH'] 返回本进程的 Prometheus 文本格式指标（仅超级管理员或持有 METRICS_TOKEN 可访问）。
+
+    同步流式响应在内容输出完毕后才记录，统计包含输出期间的查询，但不再附加响应头、也不抛出预算异常；
+    异步流式响应（async 生成器）输出期间的查询不在统计内，只统计视图本身。
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_query_metrics_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        if config['METRICS_PATH'] and request.method == "GET" and request.path == config['METRICS_PATH']:
+            return self.metrics(request, config)
+
+        with RequestQueryStats() as stats:
+            response = self.get_response(request)
+        if getattr(response, "streaming", False) and not getattr(response, "is_async", False):
+            response.streaming_content = self.stream(request, response, response.streaming_content, stats, config)
+            return response
+        self.report(request, response, stats, config)
+        return response
+
+    def stream(self, request, response, content, stats, config):
+        """输出流式响应时继续统计查询，输出结束后记录"""
+        try:
+            with stats:
+                yield from content
+        finally:
+            self.report(request, response, stats, config, streamed=True)
+
+    @staticmethod
+    def route_of(request) -> str:
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            return match.route or match.view_name or request.path
+        return "unmatched"
+
+    def report(self, request, response, stats, config, streamed=False):
+        route = self.route_of(request)
+        exceeded = check_budget(stats, resolve_budget(request.path, config))
+        query_metrics_registry.observe(request.method, route, stats, bool(exceeded))
+
+        if config['RESPONSE_HEADERS'] and not streamed:
+            response["X-Query-Count"] = str(stats.queries)
+            response["X-DB-Time-ms"] = f"{stats.db_seconds * 1000:.1f}"
+
+        if exceeded or config['LOG_REQUESTS']:
+            record = {
+                "method": request.method,
+                "path": request.path,
+                "route": route,
+                "status": getattr(response, "status_code", None),
+                **stats.as_dict(),
+            }
+            if streamed:
+                record["streamed"] = True
+            if exceeded:
+                record["budget_exceeded"] = {key: {"value": value, "limit": limit} for key, (value, limit) in exceeded.items()}
+                record["top_duplicates"] = stats.top_duplicates(config['TOP_DUPLICATES'])
+                query_logger.warning(json.dumps(record, ensure_ascii=False))
+            else:
+                query_logger.info(json.dumps(record, ensure_ascii=False))
+
+        if exceeded and config['RAISE_ON_BUDGET'] and not streamed:
+            detail = ", ".join(f"{key}={value}>{limit}" for key, (value, limit) in exceeded.items())
+            raise QueryBudgetExceeded(f"{request.method} {request.path} 超出查询预算: {detail}")
+
+    @staticmethod
+    def metrics_allowed(request, config) -> bool:
+        token = config['METRICS_TOKEN']
+        supplied = request.META.get("HTTP_X_METRICS_TOKEN", "")
+        if token and supplied and hmac.compare_digest(token.encode(), supplied.encode()):
+            return True
+        # 反向代理与应用同机部署时 REMOTE_ADDR 恒为本机地址，不能据此放行
+        return bool(getattr(get_request_user(request), "is_superuser", False))
+
+    def metrics(self, request, config):
+        if not self.metrics_allowed(request, config):
+            return HttpResponseForbidden("forbidden")
+        return HttpResponse(
+            query_metrics_registry.render_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
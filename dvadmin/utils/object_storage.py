@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+对象存储上传层
+
+- SDK 客户端按配置在进程内复用（腾讯云 COS / 阿里云 OSS），配置变化时自动重建
+- 大文件分片上传：按 PART_SIZE 顺序读取，最多 MAX_WORKERS 个分片并行上传，内存中最多同时持有
+  MAX_WORKERS * 2 个分片
+- 断点续传：已完成分片（分片号、ETag、MD5）记录在数据库（MultipartUploadState）中，各 worker 共享，
+  重试同一对象时只重传缺失或内容不一致的分片
+- LocalStorageBackend 在本地目录模拟分片上传，用于离线测试与基准测试
+"""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from application import dispatch
+from dvadmin.system.models import MultipartUploadState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPLOAD_CONFIG = {
+    'PART_SIZE': 8 * 1024 * 1024,
+    'MULTIPART_THRESHOLD': 16 * 1024 * 1024,
+    'MAX_WORKERS': 4,
+    'STATE_TTL': 7 * 24 * 3600,
+    'LOCAL_ROOT': os.path.join(settings.BASE_DIR, 'media', 'object_storage'),
+    'LOCAL_BASE_URL': '/media/object_storage',
+    'LOCAL_PART_LATENCY': 0,
+}
+
+
+class StorageUploadError(Exception):
+    """存储服务返回失败状态"""
+
+
+# 分片上传最小分片（COS/OSS 均要求除最后一片外不小于 100KB，这里取 1MB）
+MIN_PART_SIZE = 1024 * 1024
+
+
+def get_upload_config() -> dict:
+    config = dict(DEFAULT_UPLOAD_CONFIG)
+    config.update(getattr(settings, 'OBJECT_STORAGE_UPLOAD', None) or {})
+    return config
+
+
+def normalize_prefix(path_prefix: Optional[str]) -> str:
+    path_prefix = path_prefix or ''
+    if path_prefix and not path_prefix.endswith('/'):
+        path_prefix = path_prefix + '/'
+    if path_prefix.startswith('/'):
+        path_prefix = path_prefix[1:]
+    return path_prefix
+
+
+# ------------------------------------------------------------------ #
+# 进程内客户端池
+# ------------------------------------------------------------------ #
+
+_client_pool: Dict[tuple, object] = {}
+_client_lock = threading.Lock()
+
+
+def get_pooled_client(kind: str, config: tuple, factory):
+    """按 (类型, 配置) 复用客户端；配置变化时旧客户端自然失效"""
+    key = (kind,) + tuple(config)
+    client = _client_pool.get(key)
+    if client is not None:
+        return client
+    with _client_lock:
+        client = _client_pool.get(key)
+        if client is None:
+            # 同类型只保留最新配置的客户端
+            for stale in [k for k in _client_pool if k[0] == kind]:
+                _client_pool.pop(stale, None)
+            client = factory()
+            _client_pool[key] = client
+    return client
+
+
+def clear_client_pool():
+    with _client_lock:
+        _client_pool.clear()
+
+
+# ------------------------------------------------------------------ #
+# 存储后端
+# ------------------------------------------------------------------ #
+
+class BaseStorageBackend:
+    """
+    对象存储后端
+
+    子类实现 put_object / initiate_multipart / upload_part / complete_multipart / abort_multipart / public_url。
+    """
+    name = 'base'
+
+    def identity(self) -> str:
+        """区分续传状态的后端标识（如桶名）"""
+        return self.name
+
+    def put_object(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def initiate_multipart(self, key: str) -> str:
+        raise NotImplementedError
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """上传单个分片，返回 ETag"""
+        raise NotImplementedError
+
+    def complete_multipart(self, key: str, upload_id: str, parts: list) -> None:
+        """parts: [(part_number, etag), ...]，按分片号升序"""
+        raise NotImplementedError
+
+    def abort_multipart(self, key: str, upload_id: str) -> None:
+        raise NotImplementedError
+
+    def public_url(self, key: str) -> str:
+        raise NotImplementedError
+
+
+class TencentCosBackend(BaseStorageBackend):
+    name = 'cos'
+
+    def __init__(self):
+        self.secret_id = dispatch.get_system_config_values("file_storage.tencent_secret_id")
+        self.secret_key = dispatch.get_system_config_values("file_storage.tencent_secret_key")
+        self.region = dispatch.get_system_config_values("file_storage.tencent_region")
+        self.bucket = dispatch.get_system_config_values("file_storage.tencent_bucket")
+        self.path_prefix = normalize_prefix(dispatch.get_system_config_values("file_storage.tencent_path"))
+
+    @property
+    def client(self):
+        return get_pooled_client('cos', (self.secret_id, self.secret_key, self.region), self._create_client)
+
+    def _create_client(self):
+        from qcloud_cos import CosConfig, CosS3Client
+
+        config = CosConfig(Region=self.region, SecretId=self.secret_id, SecretKey=self.secret_key,
+                           PoolConnections=get_upload_config()['MAX_WORKERS'],
+                           PoolMaxSize=get_upload_config()['MAX_WORKERS'] * 2)
+        return CosS3Client(config)
+
+    def identity(self) -> str:
+        return f'cos:{self.region}:{self.bucket}'
+
+    def put_object(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Body=data, Key=key, EnableMD5=False)
+
+    def initiate_multipart(self, key):
+        return self.client.create_multipart_upload(Bucket=self.bucket, Key=key)['UploadId']
+
+    def upload_part(self, key, upload_id, part_number, data):
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=key, Body=data, PartNumber=part_number, UploadId=upload_id
+        )
+        return response['ETag']
+
+    def complete_multipart(self, key, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={'Part': [{'PartNumber': number, 'ETag': etag} for number, etag in parts]},
+        )
+
+    def abort_multipart(self, key, upload_id):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def public_url(self, key):
+        return f'https://{self.bucket}.cos.{self.region}.myqcloud.com/{key}'
+
+
+class AliyunOssBackend(BaseStorageBackend):
+    name = 'oss'
+
+    def __init__(self):
+        self.access_key_id = dispatch.get_system_config_values("file_storage.aliyun_access_key")
+        self.access_key_secret = dispatch.get_system_config_values("file_storage.aliyun_access_secret")
+        self.endpoint = dispatch.get_system_config_values("file_storage.aliyun_endpoint")
+        bucket_name = dispatch.get_system_config_values("file_storage.aliyun_bucket") or ''
+        if self.endpoint and bucket_name.endswith(self.endpoint):
+            bucket_name = bucket_name.replace(f'.{self.endpoint}', '')
+        self.bucket_name = bucket_name
+        self.cdn_url = dispatch.get_system_config_values("file_storage.aliyun_cdn_url")
+        self.path_prefix = normalize_prefix(dispatch.get_system_config_values("file_storage.aliyun_path"))
+
+    @property
+    def bucket(self):
+        return get_pooled_client(
+            'oss', (self.access_key_id, self.access_key_secret, self.endpoint, self.bucket_name), self._create_bucket
+        )
+
+    def _create_bucket(self):
+        import oss2
+
+        auth = oss2.Auth(self.access_key_id, self.access_key_secret)
+        # Session 内部维护连接池，多线程共享同一 Bucket
+        return oss2.Bucket(auth, self.endpoint, self.bucket_name, session=oss2.Session())
+
+    def identity(self) -> str:
+        return f'oss:{self.endpoint}:{self.bucket_name}'
+
+    def put_object(self, key, data):
+        result = self.bucket.put_object(key, data)
+        if result.status != 200:
+            raise StorageUploadError(f'OSS 上传失败: status={result.status}')
+
+    def initiate_multipart(self, key):
+        return self.bucket.init_multipart_upload(key).upload_id
+
+    def upload_part(self, key, upload_id, part_number, data):
+        return self.bucket.upload_part(key, upload_id, part_number, data).etag
+
+    def complete_multipart(self, key, upload_id, parts):
+        from oss2.models import PartInfo
+
+        self.bucket.complete_multipart_upload(key, upload_id, [PartInfo(number, etag) for number, etag in parts])
+
+    def abort_multipart(self, key, upload_id):
+        self.bucket.abort_multipart_upload(key, upload_id)
+
+    def public_url(self, key):
+        if self.cdn_url:
+            return f"{self.cdn_url.rstrip('/')}/{key}"
+        return f"https://{self.bucket_name}.{self.endpoint}/{key}"
+
+
+class LocalStorageBackend(BaseStorageBackend):
+    """
+    本地目录模拟的对象存储
+
+    分片写入 <root>/.multipart/<upload_id>/<part_number>，完成时按序拼接；LOCAL_PART_LATENCY 可为每个
+    分片模拟网络耗时，便于离线对比串行与并行上传。
+    """
+    name = 'local'
+
+    def __init__(self, root: Optional[str] = None, base_url: Optional[str] = None,
+                 part_latency: Optional[float] = None):
+        config = get_upload_config()
+        self.root = root or config['LOCAL_ROOT']
+        self.base_url = (base_url if base_url is not None else config['LOCAL_BASE_URL']).rstrip('/')
+        self.part_latency = config['LOCAL_PART_LATENCY'] if part_latency is None else part_latency
+        self.path_prefix = ''
+        self.part_calls = 0
+        self._lock = threading.Lock()
+
+    def identity(self) -> str:
+        return f'local:{self.root}'
+
+    def _object_path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f'非法对象键: {key}')
+        return path
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, '.multipart', upload_id)
+
+    def put_object(self, key, data):
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def initiate_multipart(self, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        return upload_id
+
+    def upload_part(self, key, upload_id, part_number, data):
+        upload_dir = self._upload_dir(upload_id)
+        if not os.path.isdir(upload_dir):
+            raise IOError(f'分片上传不存在: {upload_id}')
+        if self.part_latency:
+            time.sleep(self.part_latency)
+        with open(os.path.join(upload_dir, str(part_number)), 'wb') as f:
+            f.write(data)
+        with self._lock:
+            self.part_calls += 1
+        return hashlib.md5(data).hexdigest()
+
+    def complete_multipart(self, key, upload_id, parts):
+        upload_dir = self._upload_dir(upload_id)
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            for number, etag in parts:
+                with open(os.path.join(upload_dir, str(number)), 'rb') as f:
+                    data = f.read()
+                if hashlib.md5(data).hexdigest() != etag:
+                    raise IOError(f'分片 ETag 不一致: part={number}')
+                out.write(data)
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def abort_multipart(self, key, upload_id):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+    def public_url(self, key):
+        return f'{self.base_url}/{key}'
+
+
+def get_storage_backend(engine: str) -> BaseStorageBackend:
+    backends = {
+        'cos': TencentCosBackend,
+        'oss': AliyunOssBackend,
+        'local': LocalStorageBackend,
+    }
+    backend_class = backends.get(engine) or import_string(engine)
+    return backend_class()
+
+
+# ------------------------------------------------------------------ #
+# 上传
+# ------------------------------------------------------------------ #
+
+def _read_part(file, part_size):
+    data = file.read(part_size)
+    return data or b''
+
+
+def _file_size(file) -> Optional[int]:
+    size = getattr(file, 'size', None)
+    if size is not None:
+        return size
+    try:
+        current = file.tell()
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(current)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def _state_key(backend: BaseStorageBackend, key: str, size: int, part_size: int) -> str:
+    return hashlib.md5(f'{backend.identity()}|{key}|{size}|{part_size}'.encode('utf-8')).hexdigest()
+
+
+def _load_state(state_key: str, ttl: int) -> Optional[MultipartUploadState]:
+    """读取续传状态，顺带清理超过 ttl 未更新的状态"""
+    MultipartUploadState.objects.filter(update_datetime__lt=timezone.now() - timedelta(seconds=ttl)).delete()
+    return MultipartUploadState.objects.filter(state_key=state_key).first()
+
+
+def _save_state(state_key: str, upload_id: str, done: dict) -> None:
+    parts = {str(number): list(value) for number, value in done.items()}
+    MultipartUploadState.objects.update_or_create(
+        state_key=state_key, defaults={'upload_id': upload_id, 'parts': parts},
+    )
+
+
+def _delete_state(state_key: str) -> None:
+    MultipartUploadState.objects.filter(state_key=state_key).delete()
+
+
+class MultipartUploader:
+    """分片并行上传与断点续传"""
+
+    def __init__(self, backend: BaseStorageBackend, part_size: Optional[int] = None,
+                 max_workers: Optional[int] = None, threshold: Optional[int] = None):
+        config = get_upload_config()
+        self.backend = backend
+        self.part_size = max(part_size or config['PART_SIZE'], MIN_PART_SIZE)
+        self.max_workers = max(1, max_workers or config['MAX_WORKERS'])
+        self.threshold = config['MULTIPART_THRESHOLD'] if threshold is None else threshold
+        self.state_ttl = config['STATE_TTL']
+
+    def upload(self, file, key: str) -> str:
+        """上传文件对象并返回外网访问地址；失败时抛出异常，未完成的分片保留以便续传"""
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        size = _file_size(file)
+        if size is None or size <= max(self.threshold, self.part_size):
+            data = file.read() if hasattr(file, 'read') else file
+            self.backend.put_object(key, data)
+        else:
+            self._upload_multipart(file, key, size)
+        return self.backend.public_url(key)
+
+    def _upload_multipart(self, file, key, size):
+        state_key = _state_key(self.backend, key, size, self.part_size)
+        state = _load_state(state_key, self.state_ttl)
+        if state and state.upload_id:
+            upload_id = state.upload_id
+            done = {int(number): tuple(value) for number, value in (state.parts or {}).items()}
+        else:
+            upload_id = self.backend.initiate_multipart(key)
+            done = {}
+            _save_state(state_key, upload_id, done)
+
+        def _send(number, data, md5):
+            return number, self.backend.upload_part(key, upload_id, number, data), md5
+
+        def _record(finished):
+            # 状态只在当前线程写库，上传线程不占用数据库连接
+            changed = False
+            for future in finished:
+                if future.cancelled() or future.exception() is not None:
+                    continue
+                number, etag, md5 = future.result()
+                done[number] = (etag, md5)
+                changed = True
+            if changed:
+                _save_state(state_key, upload_id, done)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='storage-upload')
+        pending = set()
+        part_count = 0
+        try:
+            number = 0
+            while True:
+                data = _read_part(file, self.part_size)
+                if not data:
+                    break
+                number += 1
+                md5 = hashlib.md5(data).hexdigest()
+                previous = done.get(number)
+                if previous and previous[1] == md5:
+                    continue
+                # 控制在途分片数量，避免整个文件进入内存
+                while len(pending) >= self.max_workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _record(finished)
+                    for future in finished:
+                        future.result()
+                pending.add(executor.submit(_send, number, data, md5))
+            part_count = number
+            finished, pending = wait(pending)
+            _record(finished)
+            for future in finished:
+                future.result()
+        except BaseException:
+            # 未开始的分片不再上传，已完成的分片记录下来留待续传
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            _record(pending)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+
+        parts = [(n, done[n][0]) for n in range(1, part_count + 1)]
+        try:
+            self.backend.complete_multipart(key, upload_id, parts)
+        except Exception:
+            # 合并失败时分片状态已不可信，放弃本次上传，下次从头开始
+            _delete_state(state_key)
+            try:
+                self.backend.abort_multipart(key, upload_id)
+            except Exception as e:
+                logger.warning(f'取消分片上传失败: key={key}, upload_id={upload_id}, error={str(e)}')
+            raise
+        _delete_state(state_key)
+        logger.info(f'分片上传完成: backend={self.backend.name}, key={key}, parts={part_count}, size={size}')
+
+
+def upload_file(file, file_name: str, engine: str, backend: Optional[BaseStorageBackend] = None) -> str:
+    """按引擎上传文件，对象键为 <路径前缀><文件名>"""
+    backend = backend or get_storage_backend(engine)
+    key = f'{getattr(backend, "path_prefix", "")}{file_name}'
+    return MultipartUploader(backend).upload(file, key)
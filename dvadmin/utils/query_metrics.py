@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+请求级 SQL 查询统计
+
+- RequestQueryStats：通过 connection.execute_wrapper 记录单个请求的查询数、数据库耗时与重复查询指纹
+- 预算：按路径（fnmatch 通配）配置查询数 / 重复查询数 / 数据库耗时 / 响应耗时上限，超出时记录告警，测试中可配置为直接失败
+- QueryMetricsRegistry：进程内按路由聚合，输出 Prometheus 文本格式（每个 worker 进程各自统计）
+"""
+import fnmatch
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_QUERY_METRICS_CONFIG = {
+    'ENABLED': True,
+    # 每个请求输出一行结构化日志（JSON）；关闭时仅超出预算的请求记录日志
+    'LOG_REQUESTS': False,
+    # 响应头附带 X-Query-Count / X-DB-Time-ms
+    'RESPONSE_HEADERS': False,
+    # 超出预算时抛出 QueryBudgetExceeded（测试环境使用）
+    'RAISE_ON_BUDGET': False,
+    # 未匹配任何路径规则时使用的预算，为空表示不检查
+    'DEFAULT_BUDGET': {'queries': 100, 'duplicates': 20},
+    # {'/api/customer/miniapp/clients/*': {'queries': 20, 'duplicates': 3, 'db_ms': 300, 'response_ms': 1500}}
+    'BUDGETS': {},
+    # 指标端点，为空表示关闭；仅超级管理员或携带 X-Metrics-Token 请求头（与 METRICS_TOKEN 一致）可访问
+    'METRICS_PATH': '/metrics/queries',
+    'METRICS_TOKEN': '',
+    # 日志中列出的重复查询指纹数量
+    'TOP_DUPLICATES': 5,
+}
+
+BUDGET_KEYS = ('queries', 'duplicates', 'db_ms', 'response_ms')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|NULL)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def get_query_metrics_config() -> dict:
+    config = dict(DEFAULT_QUERY_METRICS_CONFIG)
+    config.update(getattr(settings, 'QUERY_METRICS', None) or {})
+    return config
+
+
+def fingerprint(sql: str) -> str:
+    """SQL 指纹：去掉字面量并折叠 IN 列表，只差参数的查询得到相同指纹（用于发现 N+1）"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """请求超出查询预算（RAISE_ON_BUDGET 开启时抛出）"""
+
+
+class RequestQueryStats:
+    """
+    单个请求的查询统计，作为上下文管理器包裹请求处理
+
+    可多次进入（如流式响应输出期间），查询数累加，耗时从第一次进入算到最后一次退出。
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.fingerprints: Counter = Counter()
+        self.started = None
+        self.elapsed = 0.0
+        self._stack: Optional[ExitStack] = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stack.close()
+        self.elapsed = time.perf_counter() - self.started
+        return False
+
+    @property
+    def duplicates(self) -> int:
+        """重复执行的次数：同一指纹除第一次外的执行次数之和"""
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def top_duplicates(self, limit: int = 5) -> List[dict]:
+        return [
+            {'sql': sql[:300], 'count': count}
+            for sql, count in self.fingerprints.most_common(limit) if count > 1
+        ]
+
+    def as_dict(self) -> dict:
+        return {
+            'queries': self.queries,
+            'duplicates': self.duplicates,
+            'db_ms': round(self.db_seconds * 1000, 2),
+            'response_ms': round(self.elapsed * 1000, 2),
+        }
+
+
+def resolve_budget(path: str, config: Optional[dict] = None) -> dict:
+    """按路径匹配预算：BUDGETS 中第一个匹配的通配规则，否则 DEFAULT_BUDGET"""
+    config = config or get_query_metrics_config()
+    for pattern, budget in (config.get('BUDGETS') or {}).items():
+        if fnmatch.fnmatchcase(path, pattern):
+            return budget or {}
+    return config.get('DEFAULT_BUDGET') or {}
+
+
+def check_budget(stats: RequestQueryStats, budget: dict) -> Dict[str, tuple]:
+    """返回超出的预算项 {key: (实际值, 上限)}"""
+    values = stats.as_dict()
+    return {
+        key: (values[key], budget[key])
+        for key in BUDGET_KEYS
+        if budget.get(key) is not None and values[key] > budget[key]
+    }
+
+
+class QueryMetricsRegistry:
+    """进程内按 (method, route) 聚合的请求指标"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[tuple, dict] = {}
+
+    def observe(self, method: str, route: str, stats: RequestQueryStats, exceeded: bool):
+        with self._lock:
+            row = self._routes.setdefault((method, route), {
+                'requests': 0, 'queries': 0, 'duplicates': 0, 'db_seconds': 0.0,
+                'response_seconds': 0.0, 'max_queries': 0, 'budget_exceeded': 0,
+            })
+            row['requests'] += 1
+            row['queries'] += stats.queries
+            row['duplicates'] += stats.duplicates
+            row['db_seconds'] += stats.db_seconds
+            row['response_seconds'] += stats.elapsed
+            row['max_queries'] = max(row['max_queries'], stats.queries)
+            row['budget_exceeded'] += int(exceeded)
+
+    def snapshot(self) -> Dict[tuple, dict]:
+        with self._lock:
+            return {key: dict(row) for key, row in self._routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render_prometheus(self) -> str:
+        metrics = (
+            ('requests', 'http_requests_total', 'counter', '请求数'),
+            ('queries', 'http_request_db_queries_total', 'counter', 'SQL 查询总数'),
+            ('duplicates', 'http_request_db_duplicate_queries_total', 'counter', '重复 SQL 查询总数'),
+            ('db_seconds', 'http_request_db_seconds_total', 'counter', '数据库耗时（秒）'),
+            ('response_seconds', 'http_request_seconds_total', 'counter', '响应耗时（秒）'),
+            ('max_queries', 'http_request_db_queries_max', 'gauge', '单个请求最大查询数'),
+            ('budget_exceeded', 'http_request_query_budget_exceeded_total', 'counter', '超出查询预算的请求数'),
+        )
+        snapshot = self.snapshot()
+        lines = []
+        for key, name, metric_type, help_text in metrics:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for (method, route), row in sorted(snapshot.items()):
+                route_label = route.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{name}{{method="{method}",route="{route_label}"}} {row[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+query_metrics_registry = QueryMetricsRegistry()
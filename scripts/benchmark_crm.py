@@ -0,0 +1,136 @@
+"""
+CRM 性能基准：在确定性的 SQLite 数据集上执行热点服务与接口，结果写入 JSON 便于对比。
+
+用法：
+    python scripts/benchmark_crm.py --scale small --seed 42 --output benchmarks/before.json
+    # 改动后
+    python scripts/benchmark_crm.py --scale small --seed 42 --output benchmarks/after.json \
+        --compare benchmarks/before.json --fail-on-regression
+
+说明：
+- 数据库固定为 --db 指定的 SQLite 文件（每次重建），不触碰 conf/env.py 中配置的数据库。
+- 表结构直接按当前模型创建（部分迁移含 MySQL 专用 SQL，无法在 SQLite 上执行）。
+- 同一 --scale/--seed/--anchor 生成的数据完全一致；--anchor 缺省为当天零点，跨天对比时请显式指定。
+"""
+import argparse
+import os
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+SCALE_OPTIONS = (
+    "branches", "teams_per_branch", "sales_per_team", "customers",
+    "followups_per_customer", "visits_per_customer", "schedules_per_user",
+)
+
+
+def _setup_django(db_path):
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "application.settings")
+    from django.conf import settings
+
+    settings.DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": db_path,
+    }
+    import django
+
+    django.setup()
+    from django.test.utils import setup_test_environment
+
+    # 允许 testserver 主机、使用内存邮件后端
+    setup_test_environment()
+
+
+def _create_schema():
+    from django.apps import apps
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model in apps.get_models():
+            options = model._meta
+            if options.managed and not options.proxy and not options.swapped:
+                editor.create_model(model)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CRM 性能基准")
+    parser.add_argument("--scale", default="small", help="数据规模：tiny/small/medium/large")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", help="数据时间基准（YYYY-MM-DD），缺省为当天")
+    for name in SCALE_OPTIONS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int, help="覆盖预设规模")
+    parser.add_argument("--db", default=str(BASE_DIR / "cache" / "crm_benchmark.sqlite3"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--only", action="append", help="只执行名称包含该片段的用例，可重复")
+    parser.add_argument("--output", help="结果 JSON 路径，缺省为 cache/benchmarks/crm-<时间>-<版本>.json")
+    parser.add_argument("--compare", help="对比的基线结果 JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="中位耗时回退阈值（%%）")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在回退时以非零状态退出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    db_path = os.path.abspath(args.db)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    _setup_django(db_path)
+
+    from django.utils import timezone
+
+    from customer_management.benchmarks.dataset import build_dataset
+    from customer_management.benchmarks.suite import (
+        build_report, compare_reports, dump_report, format_comparison, load_report, run_suite,
+    )
+
+    anchor = None
+    if args.anchor:
+        anchor = timezone.make_aware(datetime.strptime(args.anchor, "%Y-%m-%d"))
+    overrides = {name: getattr(args, name) for name in SCALE_OPTIONS}
+
+    _create_schema()
+    dataset = build_dataset(args.scale, args.seed, anchor, overrides)
+    print(f"Dataset {args.scale} seed={args.seed}: " + ", ".join(f"{k}={v}" for k, v in dataset["counts"].items()))
+
+    def progress(name, row):
+        if "median_ms" in row:
+            print(f"  {name:<44} {row['median_ms']:>10.2f} ms  {row['queries']:>5} queries")
+        else:
+            print(f"  {name:<44} ERROR {row.get('error')}")
+
+    results = run_suite(dataset, repeat=args.repeat, warmup=args.warmup, only=args.only, progress=progress)
+    revision = _git_revision()
+    report = build_report(dataset, results, args.repeat, args.warmup, revision)
+
+    output = args.output or str(
+        BASE_DIR / "cache" / "benchmarks" / f"crm-{timezone.localtime():%Y%m%d-%H%M%S}-{revision or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    dump_report(report, output)
+    print(f"Results written to {output}")
+
+    exit_code = 1 if any("error" in row for row in results.values()) else 0
+    if args.compare:
+        rows = compare_reports(load_report(args.compare), report, threshold=args.threshold)
+        print(format_comparison(rows))
+        if args.fail_on_regression and any(row["status"] == "regression" for row in rows):
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+日程月视图基准：对比改造前 calendar_view 的逐日查询与一次窗口查询分桶的查询次数和耗时。
+
+用法：
+    python scripts/benchmark_schedule_calendar.py --schedules 2000 --seed 42 --repeat 5
+
+说明：
+- 数据库固定为 --db 指定的 SQLite 文件（每次重建），不触碰 conf/env.py 中配置的数据库；
+  表结构直接按当前模型创建（同 scripts/benchmark_crm.py）。
+- 日程按 --seed 随机生成在 --month 所在月份（缺省为当月）前后，含跨天与全天日程；
+  两种实现每天的日程及其顺序必须一致，否则以非零状态退出。
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from benchmark_crm import _create_schema, _setup_django
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="日程月视图基准")
+    parser.add_argument("--schedules", type=int, default=2000, help="日程数量")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--month", help="统计月份（YYYY-MM），缺省为当月")
+    parser.add_argument("--db", default=str(BASE_DIR / "cache" / "calendar_benchmark.sqlite3"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="结果 JSON 路径（可选）")
+    return parser.parse_args(argv)
+
+
+def legacy_month(queryset, year, month):
+    """改造前 calendar_view 的逐日查询实现"""
+    from django.db.models import Q
+
+    from customer_management.serializers import ScheduleListSerializer
+
+    last_day = monthrange(year, month)[1]
+    start_date = date(year, month, 1)
+    end_date = date(year, month, last_day)
+    schedules = queryset.filter(start_time__date__lte=end_date).filter(
+        Q(end_time__date__gte=start_date) | Q(end_time__isnull=True)
+    )
+    days = []
+    for day in range(1, last_day + 1):
+        current_date = date(year, month, day)
+        day_schedules = schedules.filter(start_time__date__lte=current_date).filter(
+            Q(end_time__date__gte=current_date) | Q(end_time__isnull=True, start_time__date=current_date)
+        )
+        days.append({
+            "date": current_date.strftime("%Y-%m-%d"),
+            "schedules": ScheduleListSerializer(day_schedules, many=True).data,
+            "count": day_schedules.count(),
+        })
+    return days
+
+
+def _seed(count, seed, year, month):
+    from django.utils import timezone
+
+    from customer_management.models import Schedule
+    from dvadmin.system.models import Users
+
+    rng = random.Random(seed)
+    user = Users.objects.create(username="calendar_bench", name="基准", role_level="SALES")
+    first = timezone.make_aware(datetime(year, month, 1))
+    schedules = []
+    for index in range(count):
+        start = first + timedelta(days=rng.randint(-5, 35), hours=rng.randint(7, 20), minutes=rng.choice((0, 30)))
+        all_day = rng.random() < 0.1
+        if all_day:
+            start = start.replace(hour=0, minute=0)
+            end = start + timedelta(days=rng.randint(1, 3))
+        else:
+            end = rng.choice((None, start + timedelta(hours=1), start + timedelta(hours=rng.randint(12, 60))))
+        schedules.append(Schedule(
+            title=f"日程{index}", schedule_type="meeting", creator=user,
+            start_time=start, end_time=end, is_all_day=all_day,
+        ))
+    Schedule.objects.bulk_create(schedules, batch_size=1000)
+    return user
+
+
+def _measure(func, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings, result, queries = [], None, 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(captured.captured_queries)
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3),
+            "queries": queries}, result
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    db_path = os.path.abspath(args.db)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    _setup_django(db_path)
+
+    from django.utils import timezone
+
+    from customer_management.models import Schedule
+    from customer_management.services import schedule_calendar_service, schedule_recurrence_service
+
+    if args.month:
+        year, month = (int(part) for part in args.month.split("-"))
+    else:
+        today = timezone.localdate()
+        year, month = today.year, today.month
+
+    _create_schema()
+    user = _seed(args.schedules, args.seed, year, month)
+    # bulk_create 不触发信号，手动物化发生实例
+    schedule_recurrence_service.refresh_occurrences(now=timezone.make_aware(datetime(year, month, 1)))
+    queryset = Schedule.objects.filter(is_deleted=False, creator=user)
+
+    before, legacy = _measure(lambda: legacy_month(queryset, year, month), args.repeat)
+    after, result = _measure(lambda: schedule_calendar_service.build_month(queryset, year, month)["days"],
+                             args.repeat)
+
+    same = (
+        [[item["id"] for item in day["schedules"]] for day in legacy]
+        == [[item["id"] for item in day["schedules"]] for day in result]
+    )
+    report = {
+        "month": f"{year:04d}-{month:02d}",
+        "schedules": args.schedules,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "before": before,
+        "after": after,
+        "speedup": round(before["median_ms"] / max(after["median_ms"], 1e-6), 1),
+        "identical": same,
+    }
+    print(f"{report['month']} 共 {args.schedules} 个日程，每组 {args.repeat} 次")
+    print(f"  {'改造前（逐日查询）':<18} {before['median_ms']:>10.2f} ms  {before['queries']:>5} queries")
+    print(f"  {'改造后（窗口查询）':<18} {after['median_ms']:>10.2f} ms  {after['queries']:>5} queries")
+    print(f"  加速比 {report['speedup']}x，结果{'一致' if same else '不一致'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.output}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
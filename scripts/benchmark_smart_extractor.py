@@ -0,0 +1,91 @@
+"""
+智能内容提取吞吐量基准：对比逐个模式整篇扫描（改造前）与字面量预筛选（改造后）在长文本上的吞吐量。
+
+用法：
+    python scripts/benchmark_smart_extractor.py --sizes 100,800,4000 --repeat 5
+
+说明：
+- 文本为重复的判决书式段落，关键字段放在末尾（最坏情况：每个模式都要扫到文本结尾）。
+- 两种实现的提取结果必须一致，否则以非零状态退出。
+- 不依赖 Django 配置与数据库。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+PARAGRAPH = "本院受理原告张三与被告李四合同纠纷一案，依法组成合议庭，公开开庭进行了审理。"
+TAIL = "合同金额：1,000元 律师费：500元 管辖法院：北京市海淀区人民法院"
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="智能内容提取吞吐量基准")
+    parser.add_argument("--sizes", default="100,800,4000", help="文本大小（KB，UTF-8），逗号分隔")
+    parser.add_argument("--repeat", type=int, default=5, help="每种大小的计时次数")
+    parser.add_argument("--output", help="结果 JSON 路径（可选）")
+    return parser.parse_args(argv)
+
+
+def _build_text(size_kb):
+    paragraph_bytes = len(PARAGRAPH.encode("utf-8"))
+    return PARAGRAPH * max(size_kb * 1024 // paragraph_bytes, 1) + TAIL
+
+
+def _measure(extractor, content, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = extractor.extract_from_content(content)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    sys.path.insert(0, str(BASE_DIR))
+    from case_management.smart_content_extractor import SmartContentExtractor
+
+    class FullScanExtractor(SmartContentExtractor):
+        """改造前的行为：每个模式都从头整篇搜索"""
+
+        def _first_match(self, content, compiled, positions):
+            return compiled.regex.search(content)
+
+    before, after = FullScanExtractor(), SmartContentExtractor()
+    rows = []
+    exit_code = 0
+    print(f"{'大小':>10} {'改造前 MB/s':>14} {'改造后 MB/s':>14} {'加速比':>8}")
+    for size_kb in (int(size) for size in args.sizes.split(",") if size.strip()):
+        content = _build_text(size_kb)
+        megabytes = len(content.encode("utf-8")) / 1024 / 1024
+        before_seconds, before_result = _measure(before, content, args.repeat)
+        after_seconds, after_result = _measure(after, content, args.repeat)
+        if before_result != after_result:
+            print(f"{size_kb}KB 文本的提取结果不一致: {before_result} != {after_result}", file=sys.stderr)
+            exit_code = 1
+        row = {
+            "size_kb": size_kb,
+            "before_ms": round(before_seconds * 1000, 3),
+            "after_ms": round(after_seconds * 1000, 3),
+            "before_mb_s": round(megabytes / before_seconds, 2),
+            "after_mb_s": round(megabytes / after_seconds, 2),
+            "speedup": round(before_seconds / max(after_seconds, 1e-9), 1),
+        }
+        rows.append(row)
+        print(f"{size_kb:>8}KB {row['before_mb_s']:>14.2f} {row['after_mb_s']:>14.2f} {row['speedup']:>7.1f}x")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"repeat": args.repeat, "results": rows}, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
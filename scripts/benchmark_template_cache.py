@@ -0,0 +1,118 @@
+"""
+模板加载基准：对比每次生成请求逐个解析模板（改造前）与模板文本缓存（改造后）的单次请求加载耗时。
+
+用法：
+    python scripts/benchmark_template_cache.py --templates 20 --paragraphs 200 --repeat 20
+
+说明：
+- 在临时目录生成确定内容的 DOCX 模板，不读取数据库中的模板记录，也不触碰 conf/env.py 中配置的数据库。
+- “改造前”每次请求对全部模板调用 parse_template_file；“改造后”使用新的 TemplateTextCache，
+  首次请求（冷）解析并写入缓存，之后的请求（热）只校验 mtime/大小。
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmark_crm import _setup_django
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="模板加载基准")
+    parser.add_argument("--templates", type=int, default=20, help="模板数量")
+    parser.add_argument("--paragraphs", type=int, default=200, help="每个模板的段落数")
+    parser.add_argument("--repeat", type=int, default=20, help="计时的请求次数")
+    parser.add_argument("--output", help="结果 JSON 路径（可选）")
+    return parser.parse_args(argv)
+
+
+def _build_templates(root, count, paragraphs):
+    from docx import Document
+
+    paths = []
+    for index in range(count):
+        document = Document()
+        document.add_heading(f"民事起诉状{index}", level=1)
+        for line in range(paragraphs):
+            document.add_paragraph(f"原告：{{{{ plaintiff.name }}}}，第{line}段，金额 {{{{ case.amount | 0 }}}}")
+        path = os.path.join(root, f"template_{index}.docx")
+        document.save(path)
+        paths.append(path)
+    return paths
+
+
+def _time_request(load):
+    started = time.perf_counter()
+    result = load()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def _summary(timings):
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    _setup_django(":memory:")
+
+    from case_management.direct_langchain_ai_service import parse_template_file
+    from case_management.utils.template_text_cache import TemplateTextCache
+
+    root = tempfile.mkdtemp()
+    try:
+        paths = _build_templates(root, args.templates, args.paragraphs)
+
+        def legacy_request():
+            return [parse_template_file(path, "word_new") for path in paths]
+
+        cache = TemplateTextCache()
+
+        def cached_request():
+            return [cache.get(path)["content"] for path in paths]
+
+        before = [_time_request(legacy_request) for _ in range(args.repeat)]
+        cold_ms, cold = _time_request(cached_request)
+        warm = [_time_request(cached_request) for _ in range(args.repeat)]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    expected = before[0][1]
+    if cold != expected or any(result != expected for _, result in warm):
+        print("缓存结果与直接解析不一致", file=sys.stderr)
+        return 1
+
+    report = {
+        "templates": args.templates,
+        "paragraphs": args.paragraphs,
+        "repeat": args.repeat,
+        "before": _summary([ms for ms, _ in before]),
+        "after_cold": {"median_ms": round(cold_ms, 3)},
+        "after_warm": _summary([ms for ms, _ in warm]),
+        "cache": {"hits": cache.hits, "misses": cache.misses},
+    }
+    report["speedup"] = round(report["before"]["median_ms"] / max(report["after_warm"]["median_ms"], 1e-6), 1)
+
+    print(f"模板 {args.templates} 个 × {args.paragraphs} 段，每组 {args.repeat} 次请求")
+    print(f"  {'改造前（每次解析）':<20} {report['before']['median_ms']:>10.2f} ms/请求")
+    print(f"  {'改造后（首次请求）':<20} {report['after_cold']['median_ms']:>10.2f} ms/请求")
+    print(f"  {'改造后（命中缓存）':<20} {report['after_warm']['median_ms']:>10.2f} ms/请求")
+    print(f"  加速比 {report['speedup']}x，命中 {cache.hits} 次，未命中 {cache.misses} 次")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())